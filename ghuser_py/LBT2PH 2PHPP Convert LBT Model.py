@@ -58,6 +58,11 @@ EM July 14, 2022
             -  Electricity non-res, Lighting: ## (Default= 19)
             -  Electricity non-res, Office Equip: ## (Default=62)
             -  Electricity non-res, Kitchen: ## (Default=77)
+            -  U-Values, Constructions: ## (Default=10)
+            -  Components, Glazing: ## (Default=15)
+            -  Components, Frames: ## (Default=15)
+            -  Windows, Windows: ## (Default=24)
+            -  Shading, Windows: ## (Default=17)
         ---or---
         If you work for bldgtyp, you can input the string 'bldgtyp_standard' to use the default
         values for our 'normal' large-phpp.
@@ -69,28 +74,68 @@ EM July 14, 2022
         ud_custom_: Input one or more 'UD XL Obj' items here to write custom values anywhere in the workbook. Be careful with this as you can break the PHPP by accident. For experienced users only.
         
         _footprint_area: (float) An optional value for the building 'footprint' used in PER renewable generation evaluation. 
+        
+        template_: <Optional :str> The file path to the PHPP (.xlsx) which will be 
+        written to. If given, the start rows of the tables are found by looking for 
+        their headings in the file, in place of the defaults above (or the 
+        'bldgtyp_standard' ones). Tables whose heading isn't found, or is found more 
+        than once, keep their default row. The rows found are saved in the temp 
+        folder so the file is only scanned again if it changes. Any other 
+        ud_row_starts_ still override the rows found.
+        
+        plan_file_: <Optional :str> A file path to save the Excel objects to as a 
+        'write-plan' (ending in '.lbt2ph_plan'). The plan file can be passed to the 
+        'Write XL Workbook' component in place of the Excel objects, for instance to 
+        write the PHPP on another computer, or to re-run the same export later.
+        
+        delta_export_: <Optional :bool> Set True to only convert the rooms, faces, 
+        apertures and spaces which changed since the last run, and only build the 
+        'Areas', 'Windows', 'Shading' and 'Additional Vent' rows they own. The rest 
+        of the rows are kept from the last run. If anything is added, removed or 
+        renamed (so that the rows would move), or any of the other inputs change, 
+        the whole model is converted again. (Default: False)
+        
+        room_cache_: <Optional :bool :str> Set True to keep what each room was 
+        converted to (its surfaces, windows, spaces, ventilation and ground) and 
+        re-use it on the next run if the room hasn't changed, so only the changed 
+        rooms are converted again. Input a file path (.json) to also save the cache 
+        to that file so it can be re-used after Rhino is closed. (Default: False)
     
     Returns:
         footprint_: Preview of the 'footprint' found based on the input geometry. This is used for PER evaluation in the PHPP.
         excel_objects_: Excel obejcts which are ready to wrtite out to the PHPP file. Connect these tothe 'Wrtie XL Workbook' component.
+        stage_stats_: For each worksheet section, whether the Excel objects from the last run could be re-used ('hit') or had to be built again ('miss'), with the total counts. Sections are only rebuilt when something they depend on changes. With delta_export_, also the number of rows built for each of the sections with one row per face, aperture or space. With room_cache_, also the number of rooms re-used and converted, and the hit rate.
 """
 
 from System import Object
 from Grasshopper import DataTree
 from Grasshopper.Kernel.Data import GH_Path
 import Grasshopper.Kernel as ghK
+import scriptcontext as sc
 
 import LBT2PH
 import LBT2PH.__versions__
+import LBT2PH.model_visitor
 import LBT2PH.lbt_to_phpp
 import LBT2PH.to_excel
 import LBT2PH.helpers
+import LBT2PH.stage_cache
+import LBT2PH.model_delta
+import LBT2PH.room_cache
+import LBT2PH.xl_planfile
+import LBT2PH.xl_layout
 
 reload(LBT2PH)
 reload(LBT2PH.__versions__)
+reload(LBT2PH.model_visitor)
 reload(LBT2PH.lbt_to_phpp)
 reload(LBT2PH.to_excel)
 reload(LBT2PH.helpers)
+reload(LBT2PH.stage_cache)
+reload(LBT2PH.model_delta)
+reload(LBT2PH.room_cache)
+reload(LBT2PH.xl_planfile)
+reload(LBT2PH.xl_layout)
 
 ghenv.Component.Name = "LBT2PH 2PHPP Convert LBT Model"
 LBT2PH.__versions__.set_component_params(ghenv, dev='JUL_14_22')
@@ -108,31 +153,55 @@ if msg:
 # Get all the info from the LBT Model
 if _HB_model:
     print('- '*25)
-    materials_opaque = LBT2PH.lbt_to_phpp.get_opaque_materials_from_model(
-        _HB_model, ghenv)
-    constructions_opaque = LBT2PH.lbt_to_phpp.get_opaque_constructions_from_model(
-        _HB_model, ghenv)
-    surfaces_opaque = LBT2PH.lbt_to_phpp.get_exposed_surfaces_from_model(
-        _HB_model, LBT2PH.lbt_to_phpp._find_north(north_), ghenv)
-
-    materials_windows = LBT2PH.lbt_to_phpp.get_aperture_materials_from_model(
-        _HB_model)
-    constructions_windows = LBT2PH.lbt_to_phpp.get_aperture_constructions_from_model(
-        _HB_model)
-    surfaces_windows = LBT2PH.lbt_to_phpp.get_aperture_surfaces_from_model(
-        _HB_model, ghdoc)
-    hb_rooms = LBT2PH.lbt_to_phpp.get_zones_from_model(_HB_model)
-    phpp_spaces = LBT2PH.lbt_to_phpp.get_spaces_from_model(
-        _HB_model, ghdoc, _sort=True)
-    ventilation_system = LBT2PH.lbt_to_phpp.get_ventilation_systems_from_model(
-        _HB_model, ghenv)
-
-    ground_objs = LBT2PH.lbt_to_phpp.get_ground_from_model(_HB_model, ghenv)
+    # With delta_export_, only the entities which changed since the last run are
+    # converted, and the rest are taken from the last run
+    delta_export = None
+    if delta_export_:
+        delta_export = sc.sticky.setdefault('lbt2ph_delta_exports', {}).setdefault(
+            ghenv.Component.InstanceGuid, LBT2PH.model_delta.DeltaExport())
+        delta_export.start(LBT2PH.model_delta.Fingerprint.from_model(_HB_model),
+            [north_, rooms_included_, rooms_excluded_, ud_row_starts_, template_])
+    changed = delta_export.changed if delta_export else (lambda _kind: None)
+
+    # With room_cache_, the rooms which haven't changed since the last run
+    # re-use what they were converted to then (a delta export already only
+    # converts the changed entities, so doesn't use it)
+    room_cache = None
+    if room_cache_ and changed('room') is None:
+        cache_file = None if str(room_cache_).lower() == 'true' else LBT2PH.room_cache.cache_path(room_cache_)
+        room_caches = sc.sticky.setdefault('lbt2ph_room_caches', {})
+        room_cache = room_caches.get(ghenv.Component.InstanceGuid)
+        if room_cache is None or room_cache.path != cache_file:
+            room_cache = room_caches[ghenv.Component.InstanceGuid] = LBT2PH.room_cache.RoomCache(cache_file)
+
+    # The rooms, faces and apertures are all read in one walk over the model
+    model_visitor, model_data = LBT2PH.lbt_to_phpp.get_model_data(_HB_model,
+        LBT2PH.lbt_to_phpp._find_north(north_), ghenv,
+        {kind: changed(kind) for kind in ('face', 'aperture', 'space')}, room_cache,
+        [rooms_included_, rooms_excluded_, ud_row_starts_])
+    print(model_visitor)
+    if room_cache:
+        print(room_cache)
+    materials_opaque = model_data['materials_opaque']
+    constructions_opaque = model_data['constructions_opaque']
+    surfaces_opaque = model_data['surfaces_opaque']
+    materials_windows = model_data['materials_windows']
+    constructions_windows = model_data['constructions_windows']
+    surfaces_windows = model_data['surfaces_windows']
+    hb_rooms = model_data['hb_rooms']
+    phpp_spaces = model_data['phpp_spaces']
+    if delta_export:
+        surfaces_opaque = delta_export.update('face', surfaces_opaque)
+        surfaces_windows = delta_export.update('aperture', surfaces_windows)
+        phpp_spaces = delta_export.update('space', phpp_spaces)
+    ventilation_system = model_data['ventilation_system']
+
+    ground_objs = model_data['ground_objs']
     thermal_bridges = LBT2PH.lbt_to_phpp.get_thermal_bridges(_HB_model, ghenv)
 
-    dhw_systems = LBT2PH.lbt_to_phpp.get_dhw_systems(_HB_model)
+    dhw_systems = model_data['dhw_systems']
     appliances = LBT2PH.lbt_to_phpp.get_appliances(_HB_model)
-    lighting = LBT2PH.lbt_to_phpp.get_lighting(_HB_model)
+    lighting = model_data['lighting']
     climate = LBT2PH.lbt_to_phpp.get_climate(_HB_model, epw_file_)
 
     if _calc_footprint:
@@ -140,9 +209,9 @@ if _HB_model:
         footprint_ = footprint.Footprint_surface
 
     phpp_settings = LBT2PH.lbt_to_phpp.get_settings(_HB_model)
-    summer_vent = LBT2PH.lbt_to_phpp.get_summ_vent(_HB_model)
-    heating_cooling = LBT2PH.lbt_to_phpp.get_heating_cooling(_HB_model)
-    per = LBT2PH.lbt_to_phpp.get_PER(_HB_model)
+    summer_vent = model_data['summer_vent']
+    heating_cooling = model_data['heating_cooling']
+    per = model_data['per']
     occupancy = LBT2PH.lbt_to_phpp.get_occupancy(_HB_model)
 
     # ---------------------------------------------------------------------------
@@ -150,47 +219,112 @@ if _HB_model:
     print('- '*25)
     hb_room_names = LBT2PH.to_excel.include_rooms(
         hb_rooms, rooms_included_, rooms_excluded_, ghenv)
-    start_row_dict = LBT2PH.to_excel.start_rows(ud_row_starts_, ghenv)
+    layout = None
+    if template_:
+        layout = LBT2PH.xl_layout.load_layout(template_)
+        print(layout)
+    start_row_dict = LBT2PH.to_excel.start_rows(ud_row_starts_, ghenv, layout)
 
     # ---------------------------------------------------------------------------
     # Create Xl Objects
     print('- '*25)
-    uValuesList, uValueUID_Names = LBT2PH.to_excel.build_u_values(
-        constructions_opaque, materials_opaque)
-    winComponentsList = LBT2PH.to_excel.build_components(surfaces_windows)
-    areasList, surfacesIncluded = LBT2PH.to_excel.build_areas(
-        surfaces_opaque, hb_room_names, uValueUID_Names)
-    tb_List = LBT2PH.to_excel.build_thermal_bridges(
-        thermal_bridges, start_row_dict)
-    winSurfacesList = LBT2PH.to_excel.build_windows(
-        surfaces_windows, surfacesIncluded, surfaces_opaque)
-    shadingList = LBT2PH.to_excel.build_shading(
-        surfaces_windows, surfacesIncluded)
-    tfa = LBT2PH.to_excel.build_TFA(
-        phpp_spaces, hb_room_names, estimated_tfa_, _HB_model)
-    addnlVentRooms, ventUnitsUsed = LBT2PH.to_excel.build_addnl_vent_rooms(
-        phpp_spaces, ventilation_system, hb_room_names, start_row_dict)
-    vent = LBT2PH.to_excel.build_addnl_vent_systems(
-        ventilation_system, ventUnitsUsed, start_row_dict)
-    airtightness = LBT2PH.to_excel.build_infiltration(hb_rooms, hb_room_names)
+    # Sections whose inputs haven't changed since the last run re-use their
+    # objects from then. The ones which add warnings to the component always run.
+    stage_cache = sc.sticky.setdefault('lbt2ph_stage_caches', {}).setdefault(
+        ghenv.Component.InstanceGuid, LBT2PH.stage_cache.StageCache())
+    stage_cache.new_run()
+    run = stage_cache.run
+
+    uValuesList, uValueUID_Names = run('U-Values',
+        LBT2PH.to_excel.build_u_values, constructions_opaque, materials_opaque, start_row_dict)
+    winComponentsList = run('Components',
+        LBT2PH.to_excel.build_components, surfaces_windows, start_row_dict)
+    # With delta_export_, the sections with a row per face, aperture or space only
+    # build the rows of the changed ones if nothing else they depend on changed.
+    cells = LBT2PH.model_delta.cells
+    if delta_export and delta_export.can_patch('Areas', [hb_room_names, uValueUID_Names, start_row_dict]):
+        areasList, _ = LBT2PH.to_excel.build_areas(delta_export.changed_objects('face'),
+            hb_room_names, uValueUID_Names, start_row_dict,
+            delta_export.rows('face', 'Areas_Row', lambda srfc: srfc.identifier))
+        areasList, surfacesIncluded = delta_export.save('Areas', areasList, True)
+    else:
+        areasList, surfacesIncluded = run('Areas',
+            LBT2PH.to_excel.build_areas, surfaces_opaque, hb_room_names, uValueUID_Names, start_row_dict)
+        if delta_export:
+            delta_export.save('Areas', areasList, _extra=surfacesIncluded)
+    tb_List = run('Thermal Bridges',
+        LBT2PH.to_excel.build_thermal_bridges, thermal_bridges, start_row_dict)
+    if delta_export and delta_export.can_patch('Windows', [surfacesIncluded, cells(winComponentsList), start_row_dict]):
+        winSurfacesList = LBT2PH.to_excel.build_windows(delta_export.changed_objects('aperture'),
+            surfacesIncluded, surfaces_opaque, start_row_dict,
+            delta_export.rows('aperture', 'Windows_Row', lambda window: window.aperture.identifier))
+        winSurfacesList, _ = delta_export.save('Windows', winSurfacesList, True)
+    else:
+        winSurfacesList = run('Windows',
+            LBT2PH.to_excel.build_windows, surfaces_windows, surfacesIncluded, surfaces_opaque, start_row_dict)
+        if delta_export:
+            delta_export.save('Windows', winSurfacesList)
+    if delta_export and delta_export.can_patch('Shading', [surfacesIncluded, start_row_dict]):
+        shadingList = LBT2PH.to_excel.build_shading(delta_export.changed_objects('aperture'),
+            surfacesIncluded, start_row_dict,
+            delta_export.rows('aperture', 'Shading_Row', lambda window: window.aperture.identifier))
+        shadingList, _ = delta_export.save('Shading', shadingList, True)
+    else:
+        shadingList = run('Shading',
+            LBT2PH.to_excel.build_shading, surfaces_windows, surfacesIncluded, start_row_dict)
+        if delta_export:
+            delta_export.save('Shading', shadingList)
+    tfa = run('TFA',
+        LBT2PH.to_excel.build_TFA, phpp_spaces, hb_room_names, estimated_tfa_, _HB_model)
+    if delta_export and delta_export.can_patch('Additional Vent Rooms', [ventilation_system, hb_room_names, start_row_dict]):
+        addnlVentRooms, ventUnitsUsed = LBT2PH.to_excel.build_addnl_vent_rooms(phpp_spaces,
+            ventilation_system, hb_room_names, start_row_dict,
+            delta_export.rows('space', 'Vent_Row', lambda space: space.id))
+        addnlVentRooms, ventUnitsUsed = delta_export.save('Additional Vent Rooms', addnlVentRooms, True, ventUnitsUsed)
+    else:
+        addnlVentRooms, ventUnitsUsed = run('Additional Vent Rooms',
+            LBT2PH.to_excel.build_addnl_vent_rooms, phpp_spaces, ventilation_system, hb_room_names, start_row_dict)
+        if delta_export:
+            delta_export.save('Additional Vent Rooms', addnlVentRooms, _extra=ventUnitsUsed)
+    vent = run('Additional Vent Systems',
+        LBT2PH.to_excel.build_addnl_vent_systems, ventilation_system, ventUnitsUsed, start_row_dict)
+    airtightness = run('Airtightness',
+        LBT2PH.to_excel.build_infiltration, hb_rooms, hb_room_names)
     ground = LBT2PH.to_excel.build_ground(ground_objs, hb_room_names, ghenv)
     dhw = LBT2PH.to_excel.build_DHW_system(dhw_systems, hb_room_names, ghenv)
-    nonRes_Elec = LBT2PH.to_excel.build_non_res_space_info(
-        phpp_spaces, hb_room_names, start_row_dict)
-    location = LBT2PH.to_excel.build_location(climate)
+    nonRes_Elec = run('Electricity non-res',
+        LBT2PH.to_excel.build_non_res_space_info, phpp_spaces, hb_room_names, start_row_dict)
+    location = run('Location',
+        LBT2PH.to_excel.build_location, climate)
     elec_equip_appliance = LBT2PH.to_excel.build_appliances(
         appliances, hb_room_names, ghenv)
-    lighting = LBT2PH.to_excel.build_lighting(lighting, hb_room_names)
+    lighting = run('Lighting',
+        LBT2PH.to_excel.build_lighting, lighting, hb_room_names)
     if _calc_footprint:
-        footprint = LBT2PH.to_excel.build_footprint(footprint)
-    settings = LBT2PH.to_excel.build_settings(phpp_settings)
-    summer_vent = LBT2PH.to_excel.build_summ_vent(summer_vent)
-    heating_cooling = LBT2PH.to_excel.build_heating_cooling(
-        heating_cooling, hb_room_names)
+        footprint = run('Footprint',
+            LBT2PH.to_excel.build_footprint, footprint)
+    settings = run('Settings',
+        LBT2PH.to_excel.build_settings, phpp_settings)
+    summer_vent = run('Summer Vent',
+        LBT2PH.to_excel.build_summ_vent, summer_vent)
+    heating_cooling = run('Heating / Cooling',
+        LBT2PH.to_excel.build_heating_cooling, heating_cooling, hb_room_names)
     per = LBT2PH.to_excel.build_PER(per, hb_room_names, ghenv)
-    occupancy = LBT2PH.to_excel.build_occupancy(occupancy)
-    variants = LBT2PH.to_excel.build_variants(variants_)
-    ud_custom = LBT2PH.to_excel.build_ud_custom(ud_custom_)
+    occupancy = run('Occupancy',
+        LBT2PH.to_excel.build_occupancy, occupancy)
+    variants = run('Variants',
+        LBT2PH.to_excel.build_variants, variants_)
+    ud_custom = run('UD Custom',
+        LBT2PH.to_excel.build_ud_custom, ud_custom_)
+
+    print(stage_cache)
+    stage_stats_ = stage_cache.stats()
+    if delta_export:
+        delta_export.finish()
+        print(delta_export)
+        stage_stats_ += delta_export.stats()
+    if room_cache:
+        stage_stats_ += room_cache.stats()
 
     # ---------------------------------------------------------------------------
     # Add all the Excel-Ready Objects to a master Tree for outputting / passing
@@ -222,6 +356,16 @@ if _HB_model:
     # Make sure this always at the end so it overwrites anything else
     excel_objects_.AddRange(ud_custom, GH_Path(excel_objects_.BranchCount+1))
 
+    # ---------------------------------------------------------------------------
+    # Save a write-plan file, if asked for
+    if plan_file_:
+        plan_path = str(plan_file_)
+        if not LBT2PH.xl_planfile.is_plan_file(plan_path):
+            plan_path += LBT2PH.xl_planfile.FILE_EXTENSION
+        plan_header = LBT2PH.xl_planfile.write_plan(plan_path, excel_objects_,
+            LBT2PH.xl_planfile.model_hash(_HB_model))
+        print('Saved {} objects to the write-plan: {}'.format(plan_header['objects'], plan_path))
+
     # ---------------------------------------------------------------------------
     # Give Warnings
     if len(excel_objects_.Branch(GH_Path(2)))/10 > 100:
@@ -26,6 +26,9 @@ Enables the connection from Rhino to Excel.
 will be created and automatically opened. 
 > Once open, this new PHPP can be connected to the 'Write to Excel' or the 'Read 
 from Excel' components.
+> The open workbook is kept running between solves (and re-opened if it was 
+closed in Excel) until _run is set to False, the target file is changed, or 
+the Grasshopper file is closed.
 -
 Original component design by Jack Hymowitz <https://github.com/jackhymowitz>, 
 Pinacle Scholar Summer Research Student, Stevens Institute of Technology
@@ -39,6 +42,10 @@ March 1, 2021
         _new_PHPP_filepath: (str) The new filepath to the PHPP you would like to 
             create. If this file does not already exist it will be created by 
             this component when _run==True.
+        headless_: (bool) Set True to edit the PHPP file directly without 
+            starting Excel. Writes are saved to the file when _run is set back 
+            to False. Note: nothing is recalculated in this mode, so any values 
+            read back will be the ones last calculated by Excel. Default=False
     Returns:
         excel: The Excel COM interface created, or None if not running.
 """
@@ -49,10 +56,12 @@ import scriptcontext as sc
 import LBT2PH
 import LBT2PH.__versions__
 import LBT2PH.xl_connect
+import LBT2PH.xl_headless
 
 reload( LBT2PH )
 reload(LBT2PH.__versions__)
 reload( LBT2PH.xl_connect )
+reload( LBT2PH.xl_headless )
 
 ghenv.Component.Name = "LBT2PH XL Open Workbook"
 LBT2PH.__versions__.set_component_params(ghenv, dev=False)
@@ -60,32 +69,37 @@ LBT2PH.__versions__.set_component_params(ghenv, dev=False)
 
 class ThisComponent(component):
     
-    def RunScript(self, _run, _source_PHPP_filepath, _new_PHPP_filepath):
+    def RunScript(self, _run, _source_PHPP_filepath, _new_PHPP_filepath, headless_):
         #---- Sort out the file paths
         path_source_file = LBT2PH.xl_connect.FileManager.get_path_source_file(_source_PHPP_filepath, ghenv)
         path_target_file = LBT2PH.xl_connect.FileManager.get_path_target_file(_new_PHPP_filepath, ghenv)
         
         #---- Execute
         if _run and path_source_file and path_target_file:
+            #If the target file was changed, the workbook open before is closed
+            #first, so it isn't left running in the background
+            previous = sc.sticky.get('excel')
+            if previous and previous.filename and (LBT2PH.xl_connect.ExcelSessions.key(previous.filename)
+                                                   != LBT2PH.xl_connect.ExcelSessions.key(path_target_file)):
+                sc.sticky.pop('excel', None)
+                if not LBT2PH.xl_connect.ExcelSessions.release(previous.filename):
+                    previous.save_and_quit()
+            
             LBT2PH.xl_connect.FileManager.make_target_file(path_source_file, path_target_file, ghenv)
             
-            #In order for this to close and save properly, the Excel instance needs
-            #so stick around even after _run is truned to FALSE. So always refer to
-            #the Excel instance saved in sc.sticky['excel']
-            excel = sc.sticky.get('excel', None)
-            if not excel:
-                excel = LBT2PH.xl_connect.ExcelInstance()
-                excel.start_new_instance( path_target_file )
-                excel.open_workbook()
-                excel.load_sheets()
-                
-                sc.sticky['excel'] = excel
+            #The running Excel instance for each file is kept in the ExcelSessions
+            #between solves, so re-solving re-uses the open workbook instead of 
+            #starting Excel again. sc.sticky['excel'] is the one in use right now.
+            excel = LBT2PH.xl_connect.ExcelSessions.get(path_target_file, headless_,
+                                                        ghenv.Component.OnPingDocument())
+            sc.sticky['excel'] = excel
             
         else:
             excel = sc.sticky.pop('excel', None)
             
             if excel:
-                excel.save_and_quit()
+                if not LBT2PH.xl_connect.ExcelSessions.release(excel.filename):
+                    excel.save_and_quit()
                 excel = None
         
         return excel
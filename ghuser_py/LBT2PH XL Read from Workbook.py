@@ -24,6 +24,11 @@ Read a list of fields from an Excel workbook.
 To configure this module, provide three comma separated lists of the same length 
 for the sheet name, cell name, and the label of the result. Alternatively, use 
 the form entry option.
+The fields on each worksheet are read all at once, as a single block of cells.
+If the 'Write to Workbook' component is still writing in the background, the 
+last values read are output until it is done (the Write component re-runs the
+solution when it finishes). If the Write component's recalculation was 'deferred', 
+the workbook is recalculated before reading.
 -
 Original component design by Jack Hymowitz <https://github.com/jackhymowitz>, 
 Pinacle Scholar Summer Research Student, Stevens Institute of Technology
@@ -34,9 +39,18 @@ March 1, 2021
         sheets: A comma separated list of the worksheet to read from for each output.
         fields: A comma separated list of the cells to read for each output
         labels: A comma separated list of what to  label each read cell
+        cache_: Set True to keep the values read from the workbook and re-use 
+            them for the rest of the Grasshopper solution (ie: in other 'Read
+            from Workbook' components), until the workbook is recalculated (ie:
+            by the 'Write to Workbook' component). Edits made by hand in Excel
+            are read on the next solution. Default is False.
+        profile_: Set True to count and time every call made to Excel during the 
+            read. The summary table is output to 'profile'. Set False to turn it 
+            off again. Leave empty to not change it.
     Returns:
         data: The values of the requested fields in a list of length-2 tuple (label, value)
         text: The information from data written out to a string.
+        profile: The summary of the calls made to Excel during the read, if profile_ is on.
 """
 
 from System import Object
@@ -53,7 +67,16 @@ import Grasshopper.Kernel as ghK
 from math import floor,log10
 
 import LBT2PH.__versions__
+import LBT2PH.xl_profile
+import LBT2PH.xl_queue
+import LBT2PH.xl_read
+import LBT2PH.xl_recalc
+
 reload(LBT2PH.__versions__)
+reload(LBT2PH.xl_profile)
+reload(LBT2PH.xl_queue)
+reload(LBT2PH.xl_read)
+reload(LBT2PH.xl_recalc)
 
 ghenv.Component.Name = "LBT2PH XL Read from Workbook"
 LBT2PH.__versions__.set_component_params(ghenv, dev=False)
@@ -61,7 +84,35 @@ LBT2PH.__versions__.set_component_params(ghenv, dev=False)
 
 class MyComponent(component):
     
-    def doRead(self, excel, sheets, fields, labels):
+    def getCache(self, excel, cache):
+        """ Gets the block cache for the workbook, if caching is turned on """
+        
+        caches = sc.sticky.setdefault('lbt2ph_read_caches', {})
+        if not cache:
+            caches.pop(excel.filename, None)
+            return None
+        
+        self.watchSolutionEnd()
+        return caches.setdefault(excel.filename, LBT2PH.xl_read.BlockCache())
+    
+    def watchSolutionEnd(self):
+        """ Clears the block caches after each solution. Excel doesn't report the
+        user's edits, so the blocks can't be trusted after that. Hooked up once per document """
+        
+        doc = ghenv.Component.OnPingDocument()
+        watching = sc.sticky.setdefault('lbt2ph_read_caches_watching', set())
+        if doc is None or str(doc.DocumentID) in watching:
+            return
+        
+        def _on_solution_end(sender, e):
+            # Only uses sc.sticky, so this still works after the module is reload()ed
+            for readCache in sc.sticky.get('lbt2ph_read_caches', {}).values():
+                readCache.clear()
+        
+        doc.SolutionEnd += _on_solution_end
+        watching.add(str(doc.DocumentID))
+    
+    def doRead(self, excel, sheets, fields, labels, cache, profile):
         if sheets:
             sheetsList=sheets.split(",")
             fieldsList=fields.split(",")
@@ -70,7 +121,7 @@ class MyComponent(component):
             if len(sheetsList) != len(fieldsList) or len(sheetsList) != len(labelsList):
                 msg1 = "Fields and Labels don't match!"
                 ghenv.Component.AddRuntimeMessage(ghK.GH_RuntimeMessageLevel.Error, msg1)
-                return (None,None)
+                return (None,None,None)
             
             labelList=[]
             for i in range(len(sheetsList)):
@@ -81,48 +132,53 @@ class MyComponent(component):
                 #ghenv.Component.AddRuntimeMessage(ghK.GH_RuntimeMessageLevel.Error, msg1)
                 #return (None,None)
                 #Default, verification page
-                labelList=[
-                    ["TFA","Verification","I34"],
-                    ["Heating Demand","Verification","I35"],
-                    ["Heating Load","Verification","I36"],
-                    ["Cooling + Dehum Demand","Verification","I38"],
-                    ["Cooling Load","Verification","I39"],
-                    ["Frequency of Overheating","Verification","I40"],
-                    ["Frequency of excessively high humidity","Verification","I41"],
-                    ["Pressurization test result","Verification","I43"],
-                    ["Non-Renewable PE","Verification","I53"],
-                    ["PER Demand","Verification","I55"],
-                    ["PER","Verification","I56"],
-                    ["Heating Total","Heating","O27"],
-                    ["Cooling Total","Cooling","O28"]
-                    ]
+                labelList=[list(field) for field in LBT2PH.xl_read.DEFAULT_FIELDS]
             else:
                 labelList=sc.sticky["displayFields"]
         
         data = DataTree[Object]() 
         text = ""
         
-        for i, cell in enumerate(labelList):
-            label=cell[0].strip()
-            sheet=cell[1].strip()
-            field=cell[2].strip()
+        toRead = [(i, cell[0].strip(), cell[1].strip(), cell[2].strip())
+                  for i, cell in enumerate(labelList)
+                  if cell[1].strip() in excel.sheets_dict]
+        
+        readCache = self.getCache(excel, cache)
+        
+        # Don't read while the Write component is part-way through a write
+        with LBT2PH.xl_queue.workbook_lock(excel):
+            if profile:
+                LBT2PH.xl_profile.instrument(excel)
+            elif profile is not None:
+                LBT2PH.xl_profile.uninstrument(excel)
+            callStats = LBT2PH.xl_profile.start(excel)
             
-            if sheet in excel.sheets_dict:
-                val=excel.sheets_dict[sheet].Range[field].Value2
-                
-                if(type(val).__name__=="float" and val!=0): #Round to 4 significant figures
-                    val=str(round(val,3-int(floor(log10(abs(val))))))
-                data.Add(label, GH_Path(i))
-                data.Add(val, GH_Path(i))
-                text+=str(label)+": "+str(val)+"\n"
+            # Any recalculation the Write component put off ('deferred') is done now
+            if LBT2PH.xl_recalc.ensure_calculated(excel) != []:
+                print(LBT2PH.xl_recalc.get_state(excel))
+            values = LBT2PH.xl_read.read_fields(excel, [(x[2], x[3]) for x in toRead], readCache)
+        if readCache is not None: print(readCache)
+        
+        for (i, label, sheet, field), val in zip(toRead, values):
+            if(type(val).__name__=="float" and val!=0): #Round to 4 significant figures
+                val=str(round(val,3-int(floor(log10(abs(val))))))
+            data.Add(label, GH_Path(i))
+            data.Add(val, GH_Path(i))
+            text+=str(label)+": "+str(val)+"\n"
         
-        return (data, text)
+        return (data, text, callStats.summary_lines() if callStats else None)
     
-    def RunScript(self, excel, sheets, fields, labels):
+    def RunScript(self, excel, sheets, fields, labels, cache, profile):
         if excel and excel.active_workbook and excel.sheets_dict:
-            return self.doRead(excel, sheets, fields, labels)
+            if LBT2PH.xl_queue.get_queue(excel).busy:
+                msg1 = "The workbook is still being written to. Showing the last values read."
+                ghenv.Component.AddRuntimeMessage(ghK.GH_RuntimeMessageLevel.Remark, msg1)
+                return getattr(self, 'lastResult', (None, None, None))
+            
+            self.lastResult = self.doRead(excel, sheets, fields, labels, cache, profile)
+            return self.lastResult
         
         msg1 = "No Excel Instance!"
         ghenv.Component.AddRuntimeMessage(ghK.GH_RuntimeMessageLevel.Warning, msg1)
         
-        return (None, None)
+        return (None, None, None)
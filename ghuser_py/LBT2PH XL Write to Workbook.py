@@ -23,7 +23,11 @@
 Writes a series of objects to an excel sheet, then recalculates the sheet.
 These objects should be in a Treemap, and need a Worksheet, Range, and Value variable.
 Optionally only writes the differances from the last execution of this function, 
-to reduce writing time.
+to reduce writing time. The last written values are kept in a small 'ledger' file 
+saved next to the PHPP file so that this still works after restarting Rhino.
+Before writing, overlapping objects are merged so each cell is only written once 
+(the last value wins) and the cells are sorted to write in as few blocks as possible. 
+What got dropped is printed out.
 -
 Original component design by Jack Hymowitz <https://github.com/jackhymowitz>, 
 Pinacle Scholar Summer Research Student, Stevens Institute of Technology
@@ -33,10 +37,48 @@ March 1, 2021
         _excel: A running ExcelInterface from OpenExcel Workbook
         useDiff_: Set to True to only write the differance out to excel, enabled by default.
         color_: set to True to highlight outputted fields, enabled by default.
-        _XL_Objects: TreeMap of objects to write with Worksheet, Range, and Value
+            Fields which were already highlighted by an earlier write are skipped.
+        blockWrite_: Set to True to group the fields into blocks of neighboring 
+            cells and write each block with a single call to Excel. This is much 
+            faster for large models. Set False to write the fields one cell at 
+            a time. Enabled by default.
+        resetSheets_: (list) Optional names of worksheets to write in full on this
+            run, even if nothing in them changed since the last write. Useful if 
+            cells were edited by hand in Excel.
+        background_: Set True to write to Excel in the background, so the 
+            Grasshopper solution doesn't wait for the export. The write itself 
+            runs on Rhino's UI thread (as Excel needs) once the solution is done. 
+            If new values come in while a write is still running, only the newest 
+            ones are written once it is done. The component re-runs itself when each write is 
+            finished to update the status. Default is False.
+        template_: (str) Optional path to the blank PHPP template (.xlsx) the workbook 
+            was made from. If given, cells which would be set to the same value they 
+            already have in the template are not written. Only use this if the 
+            workbook's cells haven't been edited by hand.
+        recalc_: (str) How to recalculate the workbook after writing:
+            'full' (default): Recalculate the whole workbook, as before.
+            'targeted': Only recalculate the worksheets which were written to, and 
+                the ones which depend on them. Falls back to 'full' if the 
+                worksheets' formulas reference each other in a loop.
+            'deferred': Like 'targeted', but only once the 'Read from Workbook' 
+                component asks for results.
+            With 'targeted' or 'deferred' the workbook is left in manual calculation
+            mode until it is closed.
+        profile_: Set True to count and time every call made to Excel during the 
+            write (opening, unprotecting, writing, styling, recalculating), by 
+            worksheet. The summary table is output to 'profile'. Set False to turn 
+            it off again. Leave empty to not change it.
+        _XL_Objects: TreeMap of objects to write with Worksheet, Range, and Value. 
+            Can also be the path to a write-plan file saved by the 'Convert LBT Model'
+            component.
     Returns:
         excel: The running ExcelInterface is outputted after this function runs.
         numWrites: The number of writes that occured, for debugging purposes.
+            Always 0 when writing in the background (see status).
+        status: The background writer's status: cells waiting to be written, 
+            the last completed write and any errors.
+        profile: The summary of the calls made to Excel during the last write, 
+            if profile_ is on.
 """
 
 from ghpythonlib.componentbase import executingcomponent as component
@@ -49,12 +91,36 @@ import scriptcontext as sc
 from System import Object
 from Grasshopper.Kernel.Data import GH_Path
 import clr
+import os
 from contextlib import contextmanager
 clr.AddReferenceByName('Microsoft.Office.Interop.Excel')#, Culture=neutral, PublicKeyToken=71e9bce111e9429c')
 from Microsoft.Office.Interop import Excel
 
+import LBT2PH
 import LBT2PH.__versions__
+import LBT2PH.units
+import LBT2PH.xl_ledger
+import LBT2PH.xl_plan
+import LBT2PH.xl_planfile
+import LBT2PH.xl_profile
+import LBT2PH.xl_queue
+import LBT2PH.xl_ranges
+import LBT2PH.xl_read
+import LBT2PH.xl_recalc
+import LBT2PH.xl_write
+
+reload(LBT2PH)
 reload(LBT2PH.__versions__)
+reload(LBT2PH.units)
+reload(LBT2PH.xl_ledger)
+reload(LBT2PH.xl_plan)
+reload(LBT2PH.xl_planfile)
+reload(LBT2PH.xl_profile)
+reload(LBT2PH.xl_queue)
+reload(LBT2PH.xl_ranges)
+reload(LBT2PH.xl_read)
+reload(LBT2PH.xl_recalc)
+reload(LBT2PH.xl_write)
 
 ghenv.Component.Name = "LBT2PH XL Write to Workbook"
 LBT2PH.__versions__.set_component_params(ghenv, dev=False)
@@ -64,8 +130,9 @@ class MyComponent(component):
     
     @staticmethod
     @contextmanager
-    def writingToExcel(_excel):
-        """ Changes the Excel Doc settings to help speed up """
+    def writingToExcel(_excel, _calculation=-4105):
+        """ Changes the Excel Doc settings to help speed up. Calculation is set 
+        to _calculation afterwards (automatic, unless LBT2PH does the recalc) """
         
         # Note: xlCalculationManual / Automatic set only works AFTER the workbook is opened
         
@@ -74,86 +141,308 @@ class MyComponent(component):
             _excel.excel_app.ScreenUpdating = False
             yield
         finally:
-            _excel.excel_app.Calculation = -4105 
+            _excel.excel_app.Calculation = _calculation 
             _excel.excel_app.ScreenUpdating = True
     
     def checkPHPPVersion(self, _excel):
         """ Looks at !Data:D3 to find version number. Returns 'SI' or 'IP' unit type"""
-        version = _excel.sheets_dict['Data'].Range['B3'].Value2
+        
+        unitTypes = sc.sticky.setdefault('lbt2ph_unit_types', {})
+        key = LBT2PH.xl_ledger.DiffLedger.key(_excel.filename)
+        if key in unitTypes:
+            return unitTypes[key]
+        
+        with LBT2PH.xl_queue.workbook_lock(_excel):
+            version = _excel.sheets_dict['Data'].Range['B3'].Value2
         
         if not version:
             print('Using "SI" Units')
-            return 'SI'
+            unitTypes[key] = 'SI'
         elif 'IP' in version:
             print('Using "IP" Units')
-            return 'IP'
+            unitTypes[key] = 'IP'
         else:
             print('Using "SI" Units')
-            return 'SI'
-    
-    def doReadObjs(self, objects, _unitType):
-        #If useDiff is false, this is used. Simply reads all objects in
-        
-        diff=[]
-        for eachBranch in objects.Branches:
-            for obj in eachBranch:
-                diff.append((obj.getWorksheet(_unitType),obj.Range,obj.getValue(_unitType)))
-        return diff
-    
-    def doDiff(self, objects, _unitType):
-        #If useDiff is true (or not set), this is used. Only objects that have changed are written
-        
-        newObj={}
-        for eachBranch in objects.Branches:
-            for obj in eachBranch:
-                newObj[(obj.getWorksheet(_unitType),obj.Range)]=obj.getValue(_unitType);
-        
-        diff=[]
-        if "XLSdata" in sc.sticky:    #We are checking diffs
-            oldObj=sc.sticky["XLSdata"]
-            for x in newObj.keys():
-                if not x in oldObj.keys() or oldObj[x]!=newObj[x]: #If the value didn't exist before or was changed, it's a change
-                    diff.append((x[0],x[1],newObj[x]))
-            for x in oldObj.keys():
-                if not x in newObj.keys():                         #If the value existed before and is now gone, it is a change
-                    diff.append((x[0],x[1],""))
+            unitTypes[key] = 'SI'
+        
+        return unitTypes[key]
+    
+    def getLedger(self, excel, resetSheets):
+        """ Gets the diff ledger for the workbook. Loaded from disk the first time.
+        Returns the ledger, and False if it didn't match the workbook """
+        
+        ledgers = sc.sticky.setdefault('lbt2ph_ledgers', {})
+        key = LBT2PH.xl_ledger.DiffLedger.key(excel.filename)
+        ledger = ledgers.get(key)
+        verified = True
+        
+        if ledger is None:
+            ledger = LBT2PH.xl_ledger.DiffLedger.load(excel.filename)
+            # Only if the file changed since the ledger was saved (ie: edited by hand)
+            if ledger.workbook_changed and not ledger.verify(lambda fields: LBT2PH.xl_read.read_fields(excel, fields)):
+                print('The workbook does not match the saved ledger. Writing all the cells.')
+                ledger.clear()
+                verified = False
+            ledgers[key] = ledger
+        
+        for sheet in resetSheets or []:
+            ledger.invalidate_sheet(str(sheet).strip())
+        
+        return ledger, verified
+    
+    def getDefaults(self, template):
+        """ Gets the template's values, kept until the template file changes """
+        
+        if not template:
+            return None
+        
+        template = str(template)
+        if not os.path.isfile(template):
+            msg1 = "Template file not found: {}. Writing all the cells.".format(template)
+            ghenv.Component.AddRuntimeMessage(ghK.GH_RuntimeMessageLevel.Warning, msg1)
+            return None
+        
+        templates = sc.sticky.setdefault('lbt2ph_template_defaults', {})
+        mtime = os.path.getmtime(template)
+        if template not in templates or templates[template][0] != mtime:
+            templates[template] = (mtime, LBT2PH.xl_plan.TemplateDefaults(template))
+        
+        return templates[template][1]
+    
+    def getObjValue(self, obj, _unitType, _warnings):
+        """ Gets the object's value in the right units. Writes the raw value if it can't be converted """
+        
+        return obj.getValueOrRaw(_unitType, _warnings)
+    
+    def getBranchItems(self, i, branch, _unitType):
+        """ The (worksheet, range, value) items for one branch of objects. If the
+        branch holds the very same objects as last time (ie: the Convert 
+        component re-used them), the items from last time are re-used too. """
+        
+        objs = list(branch)
+        if not hasattr(self, 'branchItems'):
+            self.branchItems = {}
+        cache = self.branchItems
+        cached = cache.get(i)
+        if (cached and cached[0] == _unitType and len(cached[1]) == len(objs) and
+                all(a is b for a, b in zip(cached[1], objs))):
+            items, warnings = cached[2], cached[3]
+            self.branchesReused += 1
+        else:
+            warnings = []
+            items = [(obj.getWorksheet(_unitType), obj.Range, self.getObjValue(obj, _unitType, warnings))
+                     for obj in objs]
+            cache[i] = (_unitType, objs, items, warnings)
+        
+        for msg1 in warnings:
+            ghenv.Component.AddRuntimeMessage(ghK.GH_RuntimeMessageLevel.Warning, msg1)
+        return items
+    
+    def checkPlanFile(self, path):
+        """ Prints the write-plan file's header. Warns if it was made by another LBT2PH version """
+        
+        header = LBT2PH.xl_planfile.read_header(path)
+        print('Write-plan: {}  |  Model: {}  |  Made: {}  |  {}'.format(
+            path, header.get('model_hash'), header.get('created'), header.get('lbt2ph_version')))
+        
+        if header.get('lbt2ph_version') != LBT2PH.__versions__.RELEASE_VERSION:
+            msg1 = "The write-plan {} was made with {}, not {}.".format(
+                path, header.get('lbt2ph_version'), LBT2PH.__versions__.RELEASE_VERSION)
+            ghenv.Component.AddRuntimeMessage(ghK.GH_RuntimeMessageLevel.Warning, msg1)
+    
+    def getPlan(self, objects, _unitType):
+        #All the cells to write, sorted: {(worksheet, range): value}. If a cell 
+        #is in there more than once, the last one wins.
+        
+        items = []
+        self.branchesReused = 0
+        for i, eachBranch in enumerate(objects.Branches):
+            planFiles = [path for path in eachBranch if LBT2PH.xl_planfile.is_plan_file(path)]
+            if not planFiles:
+                items.extend(self.getBranchItems(i, eachBranch, _unitType))
+                continue
             
-        else:                                       #Not checking diffs
-            for x in newObj.keys():
-                diff.append((x[0],x[1],newObj[x]))
-        sc.sticky["newXLSdata"]=newObj
-        return diff
+            warnings = []
+            for path in planFiles:
+                self.checkPlanFile(path)
+            for obj in LBT2PH.xl_planfile.iter_objects(eachBranch):
+                items.append((obj.getWorksheet(_unitType), obj.Range, self.getObjValue(obj, _unitType, warnings)))
+            for msg1 in warnings:
+                ghenv.Component.AddRuntimeMessage(ghK.GH_RuntimeMessageLevel.Warning, msg1)
+        
+        if self.branchesReused:
+            print('Re-used the values of {} unchanged branches.'.format(self.branchesReused))
+        
+        return LBT2PH.xl_plan.compile_plan(items)
+    
+    def getDependencyMap(self, excel, template, recalc):
+        """ Gets the map of which worksheets depend on which, for the targeted recalc.
+        Scanned from the template if there is one, otherwise from the workbook itself """
+        
+        if recalc == LBT2PH.xl_recalc.FULL:
+            return None
+        
+        source = str(template) if template and os.path.isfile(str(template)) else excel.filename
+        depMaps = sc.sticky.setdefault('lbt2ph_dependency_maps', {})
+        
+        # Scanned again whenever the file changes (ie: the workbook was saved with new formulas)
+        mtime = os.path.getmtime(source) if os.path.isfile(source) else None
+        if source not in depMaps or mtime is None or depMaps[source][0] != mtime:
+            try:
+                depMaps[source] = (mtime, LBT2PH.xl_recalc.DependencyMap.from_xlsx(source))
+            except Exception as e:
+                msg1 = "Could not read the worksheet dependencies from {}: {}. "\
+                    "Recalculating the whole workbook.".format(source, e)
+                ghenv.Component.AddRuntimeMessage(ghK.GH_RuntimeMessageLevel.Warning, msg1)
+                return None
+            print(depMaps[source][1])
+        
+        return depMaps[source][1]
     
-    def doWrite(self, excel, border, data):
+    def doWrite(self, excel, border, data, blockWrite, ledger, recalc):
         #Write out the data we have found
         
-        with self.writingToExcel(excel):
-            for eachItem in data:
-                try:
-                    excel.sheets_dict[eachItem[0]].Range[eachItem[1]].Value2 = eachItem[2]
-                    if(border == None or border):
-                        excel.sheets_dict[eachItem[0]].Range[eachItem[1]].Interior.ColorIndex=8
-                except:
-                    msg1 = "Sheet not found: " + eachItem[0]
-                    ghenv.Component.AddRuntimeMessage(ghK.GH_RuntimeMessageLevel.Warning, msg1)
-            if "newXLSdata" in sc.sticky:
-                sc.sticky["XLSdata"]=sc.sticky["newXLSdata"]
+        highlight = border == None or border
+        
+        # Only the sheets being written to get unprotected. Any missing are reported by the writer
+        excel.require_sheets(sorted(set(item[0] for item in data)))
+        
+        #Excel recalculates everything itself in automatic mode, so LBT2PH's own recalc needs manual
+        if recalc == LBT2PH.xl_recalc.FULL:
+            calculation = LBT2PH.xl_recalc.XL_CALCULATION_AUTOMATIC
+        else:
+            calculation = LBT2PH.xl_recalc.XL_CALCULATION_MANUAL
+        
+        with self.writingToExcel(excel, calculation):
+            if blockWrite is None or blockWrite:
+                report = LBT2PH.xl_write.write_blocks(excel, data, highlight, ledger.highlighted)
+            else:
+                report = LBT2PH.xl_write.write_cells(excel, data, highlight, ledger.highlighted)
+        
+        ledger.mark_highlighted(report.highlighted)
+        return report
+    
+    def applyWrite(self, excel, plan, defaults, depMap, recalc, useDiff, border, blockWrite, resetSheets):
+        """ Diffs, writes and records one state of the cells. Doesn't touch the 
+        component (ghenv), so that it can also run on the background writer. """
+        
+        callStats = LBT2PH.xl_profile.start(excel)
+        ledger, verified = self.getLedger(excel, resetSheets)
+        
+        #Cells LBT2PH wrote before might not hold the template value anymore, so those are kept
+        if defaults is not None and verified:
+            plan.prune_defaults(defaults, ledger.cells, resetSheets)
+        
+        #If useDiff is true (or not set) only cells that have changed are written
+        diff = ledger.diff(plan.cells, _full=not (useDiff is None or useDiff))
+        
+        report = self.doWrite(excel, border, diff, blockWrite, ledger, recalc)
+        ledger.commit()
+        ledger.save()
+        
+        recalcState = LBT2PH.xl_recalc.get_state(excel)
+        if depMap is not None and (recalcState.dep_map is None or recalcState.dep_map.source != depMap.source):
+            recalcState.dep_map = depMap.copy()
+        recalcState.mark_written(diff)
+        
+        #Deferred: the sheets are recalculated when the Read component needs them
+        if recalc != LBT2PH.xl_recalc.DEFERRED:
+            recalcState.calculate(excel, _full=recalc == LBT2PH.xl_recalc.FULL)
+        
+        return {'writes': len(diff), 'report': report, 'ledger': unicode(ledger),
+                'plan': plan.log_lines(), 'recalc': unicode(recalcState),
+                'profile': callStats.summary_lines() if callStats else None}
     
-    def RunScript(self, excel, useDiff, border, XL_Objects):
+    @staticmethod
+    def setProfiling(excel, profile):
+        """ Turns the recording of the calls made to Excel on or off (see xl_profile) """
+        
+        with LBT2PH.xl_queue.workbook_lock(excel):
+            if profile:
+                LBT2PH.xl_profile.instrument(excel)
+            elif profile is not None:
+                LBT2PH.xl_profile.uninstrument(excel)
+    
+    def expireWhenDone(self, queue):
+        """ Re-runs this component once a background write is finished, to update its outputs """
+        
+        ghdoc = ghenv.Component.OnPingDocument()
+        if not ghdoc:
+            return
+        
+        def _expire(doc):
+            ghenv.Component.ExpireSolution(False)
+        
+        def _schedule():
+            ghdoc.ScheduleSolution(1, Grasshopper.Kernel.GH_Document.GH_ScheduleDelegate(_expire))
+        
+        Rhino.RhinoApp.InvokeOnUiThread(System.Action(_schedule))
+    
+    @staticmethod
+    def runOnUiThread(call):
+        """ Runs a background write on the UI thread, which Excel's COM objects and 
+        sc.sticky belong to. The queue's worker waits for it to finish. """
+        
+        def _post(_call):
+            Rhino.RhinoApp.InvokeOnUiThread(System.Action(_call))
+        
+        return LBT2PH.xl_queue.call_on(_post, call)
+    
+    def showResult(self, result):
+        if not result:
+            return
+        
+        print('\n'.join(result['plan']))
+        print(result['report'])
+        print(result['ledger'])
+        print(result['recalc'])
+        for msg1 in result['report'].warnings:
+            ghenv.Component.AddRuntimeMessage(ghK.GH_RuntimeMessageLevel.Warning, msg1)
+    
+    def RunScript(self, excel, useDiff, border, blockWrite, resetSheets, background, template, recalc, profile, XL_Objects):
         
         if not excel or not excel.active_workbook or not XL_Objects:
             msg1 = "No Excel Instance!"
             ghenv.Component.AddRuntimeMessage(ghK.GH_RuntimeMessageLevel.Warning, msg1)
-            return (None,0)
+            return (None,0,None,None)
+        
+        self.setProfiling(excel, profile)
         
         unitType = self.checkPHPPVersion(excel)
+        plan = self.getPlan(XL_Objects, unitType)
+        defaults = self.getDefaults(template)
+        queue = LBT2PH.xl_queue.get_queue(excel)
+        resetSheets = [str(sheet).strip() for sheet in resetSheets or []]
         
-        if useDiff is None or useDiff:
-            diff=self.doDiff(XL_Objects, unitType)
-        else:
-            diff=self.doReadObjs(XL_Objects, unitType)
+        recalc = str(recalc).strip().lower() if recalc else LBT2PH.xl_recalc.FULL
+        if recalc not in LBT2PH.xl_recalc.MODES:
+            msg1 = "recalc_ should be one of: {}. Got '{}', using 'full'.".format(
+                ', '.join(LBT2PH.xl_recalc.MODES), recalc)
+            ghenv.Component.AddRuntimeMessage(ghK.GH_RuntimeMessageLevel.Warning, msg1)
+            recalc = LBT2PH.xl_recalc.FULL
+        depMap = self.getDependencyMap(excel, template, recalc)
+        
+        def job():
+            return self.applyWrite(excel, plan, defaults, depMap, recalc, useDiff, border, blockWrite, resetSheets)
+        
+        if background:
+            #Skip it if this exact state is already written (or about to be)
+            key = (plan.content_key(), useDiff, border, blockWrite, tuple(resetSheets), template, recalc)
+            queue.on_done = self.expireWhenDone
+            queue.invoke = self.runOnUiThread
+            if queue.submit(key, job, len(plan.cells)):
+                print('Queued {} cells to write in the background.'.format(len(plan.cells)))
+            
+            status = queue.status()
+            self.showResult(status['last_result'])
+            for msg1 in status['errors']:
+                ghenv.Component.AddRuntimeMessage(ghK.GH_RuntimeMessageLevel.Error, msg1)
+            
+            lastResult = status['last_result'] or {}
+            return (excel,0,str(queue),lastResult.get('profile'))
         
-        self.doWrite(excel, border,diff)
-        excel.excel_app.Calculate()
+        with queue.workbook_lock:
+            result = job()
+        self.showResult(result)
         
-        return (excel,len(diff))
+        return (excel,result['writes'],str(queue),result['profile'])
@@ -8,6 +8,10 @@ import Grasshopper.Kernel as ghK
 import rhinoscriptsyntax as rs
 from timeit import default_timer
 
+import LBT2PH.units
+
+reload( LBT2PH.units )
+
 
 def get_warning_level(_warning_level):
     """Takes warning level as text, returns ghK object """
@@ -130,30 +134,16 @@ def find_input_string(_in):
 def convert_value_to_metric(_inputString, _outputUnit):
     """ Will convert a string such as "12 FT" into the corresponding Metric unit
 
+    Inputs without any number in them (ie: "Auto") are returned as-is. If there
+    is no conversion to the _outputUnit, the number is used as is (with a warning).
+
     Arguments:
         _inputString: String: The input value from the user
         _outputUnit: String: ('M', 'CM', 'MM', 'W/M2K', 'W/MK', 'M3') The desired unit
+    Raises:
+        LBT2PH.units.UnitValueError: If the number can't be converted
     """
 
-    # {Unit you want: {unit user input}, {..}, ...}
-    schema = {
-        'F':    {'SI': '*(9.0/5.0)+32.0', 'C': '*(9.0/5.0)+32.0', 'F': 1, 'IP': 1},
-        'C':    {'SI': 1, 'C': 1, 'K': 1, 'F': '-32.0)*(5.0/9.0', 'IP': '-32.0)*(5.0/9.0'},
-        'M':    {'SI': 1, 'M': 1, 'CM': 0.01, 'MM': 0.001, 'FT': 0.3048, "'": 0.3048, 'IN': 0.0254, '"': 0.0254},
-        'CM':   {'SI': 1, 'M': 100, 'CM': 1, 'MM': 0.1, 'FT': 30.48, "'": 30.48, 'IN': 2.54, '"': 2.54},
-        'MM':   {'SI': 1, 'M': 1000, 'CM': 10, 'MM': 1, 'FT': 304.8, "'": 304.8, 'IN': 25.4, '"': 25.4},
-        'W/M2K': {'SI': 1, 'W/M2K': 1, 'IP': 5.678264134, 'BTU/HR-FT2-F': 5.678264134, 'HR-FT2-F/BTU': '**-1*5.678264134'},
-        'W/MK': {'SI': 1, 'W/MK': 1, 'IP': 1.730734908, 'BTU/HR-FT-F': 1.730734908, 'R/IN': '**-1*0.144227909'},
-        'W/K':  {'SI': 1, 'W/K': 1, 'BTU/HR-F': 1.895633976, 'IP': 1.895633976},
-        'M3':   {'SI': 1, 'FT3': 0.028316847},
-        '-':   {'SI': 1, '-': 1},
-        'M3/H': {'SI': 1, 'CFM': 1.699010796, 'IP': 1.699010796, 'CFH': 101.9406477},
-        'L':    {'SI': 1, 'L': 1, 'GALLON': 3.78541, "GA": 3.78541, "GAL": 3.78541},
-        'KW':   {'SI': 1, 'KW': 1, 'W': 1000, 'BTUH': 3412.141156, 'KBTUH': 3.412141156, 'TON': 0.284345096},
-        'W':    {'SI': 1, 'W': 1, 'KW': 0.001, 'BTUH': 3.412141156, 'KBTUH': 0.003412141, 'TON': 0.000284345},
-        'W/W':  {'SI': 1, 'BTU/WH': 0.293071111, 'IP': 0.293071111}
-    }
-
     inputValue = _inputString
 
     if _inputString is None:
@@ -161,46 +151,42 @@ def convert_value_to_metric(_inputString, _outputUnit):
 
     try:
         return float(inputValue)
-    except:
-        try:
-            string_found, value_found = None, None
-
-            # Pull out just the decimal numeric characters, if any
-            for each in re.split(r'[^\d\.]', _inputString):
-                if len(each) > 0:
-                    value_found = each
-                    break  # so it will only take the first number found, "123 ft3" doesn't work otherwise
-
-            # Pull out just the NON decimal numeric characters, if any
-            for each in re.split(r'[^\D\.]', _inputString):
-                if each == '.':
-                    continue
-
-                if len(each) == 0:
-                    continue
-
-                string_found = each.upper().lstrip().rstrip()
-                break
-
-            if string_found or value_found:
-                input_unit = find_input_string(string_found)
-                conversion_factor = schema.get(_outputUnit, {}).get(input_unit, 1)
-
-                try:
-                    output_val = float(value_found) * float(conversion_factor)
-                    print('Converting input "{}" >>> {} * {} = {} {}'.format(inputValue,
-                          value_found, conversion_factor, output_val, _outputUnit))
-                except ValueError as e:
-                    output_val = float(
-                        eval('({}{})'.format(value_found, conversion_factor)))
-                    print('Converting input "{}" >>> ({}{}) = {} {}'.format(
-                        inputValue, value_found, conversion_factor, output_val, _outputUnit))
-
-                return output_val
-            else:
-                return _inputString
-        except:
-            return inputValue
+    except (TypeError, ValueError):
+        pass
+
+    string_found, value_found = None, None
+
+    # Pull out just the decimal numeric characters, if any
+    for each in re.split(r'[^\d\.]', unicode(_inputString)):
+        if len(each) > 0:
+            value_found = each
+            break  # so it will only take the first number found, "123 ft3" doesn't work otherwise
+
+    # Pull out just the NON decimal numeric characters, if any
+    for each in re.split(r'[^\D\.]', unicode(_inputString)):
+        if each == '.':
+            continue
+
+        if len(each) == 0:
+            continue
+
+        string_found = each.upper().lstrip().rstrip()
+        break
+
+    if value_found is None:
+        return _inputString
+
+    input_unit = find_input_string(string_found)
+    try:
+        conversion = LBT2PH.units.get_metric_conversion(input_unit, _outputUnit)
+    except LBT2PH.units.UnknownUnitError as e:
+        print('Warning: {}. Using the input "{}" as is, without any conversion.'.format(e, inputValue))
+        conversion = LBT2PH.units.Conversion()
+    output_val = float(conversion(value_found))
+    print('Converting input "{}" >>> {} {} = {} {}'.format(inputValue,
+          value_found, input_unit, output_val, _outputUnit))
+
+    return output_val
 
 
 class code_timer:
@@ -19,6 +19,7 @@ import LBT2PH.summer_vent
 import LBT2PH.heating_cooling
 import LBT2PH.occupancy
 import LBT2PH.surfaces
+import LBT2PH.model_visitor
 
 reload(LBT2PH.materials)
 reload(LBT2PH.assemblies)
@@ -32,6 +33,7 @@ reload(LBT2PH.summer_vent)
 reload(LBT2PH.heating_cooling)
 reload(LBT2PH.occupancy)
 reload(LBT2PH.surfaces)
+reload(LBT2PH.model_visitor)
 
 try:
     import ladybug.epw as epw  
@@ -41,9 +43,9 @@ except ImportError as e:
     raise ImportError('\nFailed to import ladybug:\n\t{}'.format(e))
 
 class PHPP_Zone:
-    def __init__(self, _room):
+    def __init__(self, _room, _phpp_spaces=None):
         self.hb_room = _room
-        self.phpp_spaces = self._create_phpp_spaces()
+        self.phpp_spaces = self._create_phpp_spaces() if _phpp_spaces is None else _phpp_spaces
         self.ScheduleName = 'Schedule Name'
         self.DesignFlowRate = 'Design Flow Rate'
         self.FlowRatePerFloorArea = 'Flow per Zone Floor Area'
@@ -149,206 +151,451 @@ def _find_north( _north ):
     else:
         return to_vector2d( Rhino.Geometry.Vector2d(0,1) )
 
-def get_zones_from_model(_model):
-    zones = []
+# ------------------------------------------------------------------------------
+# Collectors: Each gathers one kind of PHPP object while the model is walked
+# (see LBT2PH.model_visitor). get_model_data() walks the model once for all of
+# them. The get_* functions below each walk it for just one.
+
+def _room_spaces(_room):
+    ''' The PHPP Spaces of a room (an Entity), shared by the Zones and Spaces Collectors '''
+    spaces = []
+    if not _room.user_data:
+        return spaces
     
-    for room in _model.rooms:
-        new_room = PHPP_Zone(room)
-        zones.append(new_room)
+    try:
+        for space_dict in _room.phpp.get('spaces', {}).values():
+            spaces.append( LBT2PH.spaces.Space.from_dict(space_dict) )
+    except KeyError as e:
+        print(e)
     
-    return zones
-
-def get_exposed_surfaces_from_model(_model, _north, _ghenv):
-    exposed_surfaces = []
-
-    for room in _model.rooms: 
-        room_name = room.display_name
-        room_id = room.identifier
-
-        for face in room:
-            bc = str(face.boundary_condition)
+    return spaces
 
-            if bc == 'Surface': continue
-            phpp_srfc = LBT2PH.surfaces.PHPP_Surface(face, room_name, room_id, _north, _ghenv )
-            
-            # Pull out any custom attributes set within the GH scene
-            # Set Object Attributes using the Key / Value
-            if face.user_data:
-                custom_attributes = face.user_data.get('phpp', {})
-            
-                for k, v in custom_attributes.items():
-                    setattr(phpp_srfc, k, v)
-                
-            exposed_surfaces.append(phpp_srfc)
+class ZonesCollector(LBT2PH.model_visitor.Collector):
+    def __init__(self):
+        self.zones = []
+    
+    def room(self, _room):
+        self.zones.append( PHPP_Zone(_room.obj, _room.shared('spaces', _room_spaces)) )
+    
+    def result(self):
+        return self.zones
 
-    return exposed_surfaces
+class ExposedSurfacesCollector(LBT2PH.model_visitor.Collector):
+    ''' PHPP_Surface objects for the room faces which aren't between two rooms.
+    These keep the Honeybee Face, so aren't saved to the RoomCache file. '''
+    cached = True
+    
+    def __init__(self, _north, _ghenv, _identifiers=None):
+        self.north = _north
+        self.ghenv = _ghenv
+        self.identifiers = _identifiers
+        self.items = []
+    
+    def face(self, _face):
+        if _face.parent is None: return
+        face = _face.obj
+        if str(face.boundary_condition) == 'Surface': return
+        if self.identifiers is not None and face.identifier not in self.identifiers: return
+        
+        room = _face.parent.obj
+        phpp_srfc = LBT2PH.surfaces.PHPP_Surface(face, room.display_name, room.identifier, self.north, self.ghenv )
+        
+        # Pull out any custom attributes set within the GH scene
+        # Set Object Attributes using the Key / Value
+        for k, v in _face.phpp.items():
+            setattr(phpp_srfc, k, v)
+        
+        self.items.append(phpp_srfc)
+    
+    def result(self):
+        return self.items
 
-def get_opaque_materials_from_model(_model, _ghenv):
-    phpp_materials = {}
-    for face in _model.faces:
-        for ep_mat in face.properties.energy.construction.materials:
-            if ep_mat.display_name not in phpp_materials:
+class OpaqueMaterialsCollector(LBT2PH.model_visitor.Collector):
+    def __init__(self):
+        self.phpp_materials = {}
+    
+    def face(self, _face):
+        for ep_mat in _face.obj.properties.energy.construction.materials:
+            if ep_mat.display_name not in self.phpp_materials:
                 phpp_material = LBT2PH.materials.PHPP_Material_Opaque( ep_mat )
-                phpp_materials[ep_mat.display_name] = phpp_material
-            
-    return phpp_materials
+                self.phpp_materials[ep_mat.display_name] = phpp_material
+    
+    def result(self):
+        return self.phpp_materials
 
-def get_opaque_constructions_from_model(_model, _ghenv):
-    ep_constructions = {}
-    for face in _model.faces:
-        construction = face.properties.energy.construction
-        ep_constructions[construction.display_name] = construction
+class OpaqueConstructionsCollector(LBT2PH.model_visitor.Collector):
+    def __init__(self):
+        self.ep_constructions = {}
     
-    phpp_constructions = []
-    for k, v in ep_constructions.items():
-        new_construction = LBT2PH.assemblies.PHPP_Construction(v)
-        phpp_constructions.append(new_construction)
+    def face(self, _face):
+        construction = _face.obj.properties.energy.construction
+        self.ep_constructions[construction.display_name] = construction
     
-    return phpp_constructions
+    def result(self):
+        return [LBT2PH.assemblies.PHPP_Construction(v) for v in self.ep_constructions.values()]
 
-def get_aperture_materials_from_model(_model):
-    ep_mats = OrderedDict()
-    for aperture in _model.apertures:
-        for mat in aperture.properties.energy.construction.materials:
-            ep_mats[mat.identifier] = mat
+class ApertureMaterialsCollector(LBT2PH.model_visitor.Collector):
+    def __init__(self):
+        self.ep_mats = OrderedDict()
     
-    phpp_materials = []
-    for i, (k, v) in enumerate(ep_mats.items()):
-        ud_num = i+1
-        new_window_material = LBT2PH.materials.PHPP_Material_Window_EP(v, ud_num)
-        phpp_materials.append(new_window_material)
-
-    return phpp_materials
-
-def get_aperture_constructions_from_model(_model):
-    ep_constructions = {}
-    for aperture in _model.apertures:
-        construction = aperture.properties.energy.construction
-        ep_constructions[construction.identifier] = construction
+    def aperture(self, _aperture):
+        for mat in _aperture.obj.properties.energy.construction.materials:
+            self.ep_mats[mat.identifier] = mat
+    
+    def result(self):
+        return [LBT2PH.materials.PHPP_Material_Window_EP(v, i+1) for i, v in enumerate(self.ep_mats.values())]
 
-    phpp_constructions = []
-    for k, v in ep_constructions.items():
-        new_construction = LBT2PH.assemblies.PHPP_Construction(v)
-        phpp_constructions.append(new_construction)
+class ApertureConstructionsCollector(LBT2PH.model_visitor.Collector):
+    def __init__(self):
+        self.ep_constructions = {}
     
-    return phpp_constructions        
+    def aperture(self, _aperture):
+        construction = _aperture.obj.properties.energy.construction
+        self.ep_constructions[construction.identifier] = construction
+    
+    def result(self):
+        return [LBT2PH.assemblies.PHPP_Construction(v) for v in self.ep_constructions.values()]
 
-def get_aperture_surfaces_from_model(_model, _ghenv):
-    ''' Returns a list of PHPP_Window objects found in the HB Model '''
+class ApertureSurfacesCollector(LBT2PH.model_visitor.Collector):
+    ''' PHPP_Window objects for the apertures '''
+    cached = True
     
-    phpp_apertures = []
+    def __init__(self, _ghenv, _identifiers=None):
+        self.ghenv = _ghenv
+        self.identifiers = _identifiers
+        self.items = []
     
-    for hb_aperture in _model.apertures:
+    def aperture(self, _aperture):
+        hb_aperture = _aperture.obj
+        if self.identifiers is not None and hb_aperture.identifier not in self.identifiers:
+            return
+        
         try:
-            window_dict = hb_aperture.user_data.get('phpp', {})
+            window_dict = _aperture.phpp
             if not window_dict:
                 raise AttributeError
 
             new_phpp_aperture = LBT2PH.windows.PHPP_Window.from_dict( window_dict )
             new_phpp_aperture.aperture = hb_aperture
             
-            phpp_apertures.append(new_phpp_aperture)
+            self.items.append(new_phpp_aperture)
         except AttributeError as e:
             try:
                 msg = 'I did not find any user-determined info for window: < {} >.\n'\
                     'I will use the basic Honeybee Aperture info for now, but to customize\n'\
                     'this window you can use a PH-Tools "Create PHPP Aperture" Component\n'\
                     'to apply specific PHPP style information to this element.'.format(hb_aperture.display_name)
-                _ghenv.Component.AddRuntimeMessage( ghK.GH_RuntimeMessageLevel.Remark, msg)
+                self.ghenv.Component.AddRuntimeMessage( ghK.GH_RuntimeMessageLevel.Remark, msg)
                 
                 # Build a basic aperture from the Honeybee only
                 new_phpp_aperture = LBT2PH.windows.PHPP_Window.from_aperture(hb_aperture)
                 
-                phpp_apertures.append(new_phpp_aperture)
+                self.items.append(new_phpp_aperture)
             except Exception as e:
                 msg = 'Error trying to create the PHPP window for < {} >.\n'\
                     'Make sure that you use a PH-Tools "Create PHPP Aperture" Component\n'\
                     'to apply the PHPP style information to this element.'.format(hb_aperture.display_name)
-                _ghenv.Component.AddRuntimeMessage( ghK.GH_RuntimeMessageLevel.Warning, msg)
-
-    return phpp_apertures
-
-def get_spaces_from_model(_model, _ghdoc, _sort=False):
-    ''' Returns a list of PHPP_Space objects found in the HB Model '''
-    spaces = [] 
+                self.ghenv.Component.AddRuntimeMessage( ghK.GH_RuntimeMessageLevel.Warning, msg)
     
-    # -- sort
-    if _sort:
-        rooms = sorted(_model.rooms, key=lambda room: room.identifier)
-    else:
-        rooms = _model.rooms
-
-    # -- 
-    for room in rooms:
-        if not room.user_data:
-            print('No User_Data dict found for room < {} >.\n'\
-            'Ignoring any Space/Room/TFA/Volume info for now.'.format(room.display_name))
-            return []
-        
-        spaces_dict = room.user_data.get('phpp', {}).get('spaces', {})
-        for space_data in spaces_dict.values():
-            space_obj = LBT2PH.spaces.Space.from_dict( space_data )
-            spaces.append(space_obj)
+    def result(self):
+        return self.items
     
-    return spaces
-
-def get_ventilation_systems_from_model(_model, _ghenv):
-    model_vent_systems = set()
+    def dump(self, _item):
+        return _item.to_dict()
+    
+    def load(self, _data, _room):
+        window = LBT2PH.windows.PHPP_Window.from_dict( _data )
+        apertures = [aperture for face in _room.obj.faces for aperture in face.apertures]
+        window.aperture = next(ap for ap in apertures if ap.identifier == window.aperture.identifier)
+        return window
+
+class SpacesCollector(LBT2PH.model_visitor.Collector):
+    ''' PHPP_Space objects, sorted by room identifier if _sort. If any room
+    has no user_data there are no Spaces at all '''
+    cached = True
+    
+    def __init__(self, _sort=False, _identifiers=None):
+        self.sort = _sort
+        self.identifiers = _identifiers
+        self.items = [] # (room identifier, room name, spaces or None)
     
-    for hb_room in _model.rooms:
+    def room(self, _room):
+        if not _room.user_data:
+            spaces = None
+        elif self.identifiers is None:
+            spaces = _room.shared('spaces', _room_spaces)
+        else:
+            spaces = [LBT2PH.spaces.Space.from_dict( space_data )
+                for space_data in _room.phpp.get('spaces', {}).values()
+                if space_data.get('id') in self.identifiers]
+        self.items.append( (_room.obj.identifier, _room.obj.display_name, spaces) )
+    
+    def result(self):
+        rooms = sorted(self.items, key=lambda room: room[0]) if self.sort else self.items
         
-        if not hb_room.user_data:
-            continue
+        spaces = []
+        for _, room_name, room_spaces in rooms:
+            if room_spaces is None:
+                print('No User_Data dict found for room < {} >.\n'\
+                'Ignoring any Space/Room/TFA/Volume info for now.'.format(room_name))
+                return []
+            spaces.extend(room_spaces)
         
-        vent_system_dict = hb_room.user_data.get('phpp', {}).get('vent_system', {})
+        return spaces
+    
+    def dump(self, _item):
+        identifier, room_name, spaces = _item
+        return [identifier, room_name, None if spaces is None else [space.to_dict() for space in spaces]]
+    
+    def load(self, _data, _room):
+        identifier, room_name, spaces = _data
+        if spaces is not None:
+            spaces = [LBT2PH.spaces.Space.from_dict( space_data ) for space_data in spaces]
+        return (identifier, room_name, spaces)
+
+class VentilationSystemsCollector(LBT2PH.model_visitor.Collector):
+    cached = True
+    
+    def __init__(self, _ghenv):
+        self.ghenv = _ghenv
+        self.items = []
+    
+    def room(self, _room):
+        vent_system_dict = _room.phpp.get('vent_system', {})
         
         if vent_system_dict:
-            room_vent_system = LBT2PH.ventilation.PHPP_Sys_Ventilation.from_dict(vent_system_dict, _ghenv)
-            model_vent_systems.add(room_vent_system)
-
-    return list(model_vent_systems)
-
-def get_ground_from_model(_model, _ghenv):  
-    ground_objs = []
+            room_vent_system = LBT2PH.ventilation.PHPP_Sys_Ventilation.from_dict(vent_system_dict, self.ghenv)
+            self.items.append(room_vent_system)
     
-    for hb_room in _model.rooms:      
-        if not hb_room.user_data:
-            continue
+    def result(self):
+        return list(set(self.items))
+    
+    def dump(self, _item):
+        return _item.to_dict()
+    
+    def load(self, _data, _room):
+        return LBT2PH.ventilation.PHPP_Sys_Ventilation.from_dict(_data, self.ghenv)
 
-        ground_dict = hb_room.user_data.get('phpp', {}).get('ground', {})
+class GroundCollector(LBT2PH.model_visitor.Collector):
+    cached = True
+    
+    def __init__(self, _ghenv):
+        self.ghenv = _ghenv
+        self.items = []
+    
+    def room(self, _room):
+        ground_dict = _room.phpp.get('ground', {})
         if not ground_dict:
-            continue
+            return
 
-        ground_type = ground_dict.get('type', {})
+        obj = self.load(ground_dict, _room)
+        if obj:
+            self.items.append( obj )
+    
+    def result(self):
+        return self.items
+    
+    def dump(self, _item):
+        return _item.to_dict()
+    
+    def load(self, _data, _room):
+        ''' The PHPP_Ground object for a room's 'ground' dict (or one from dump()) '''
+        ground_type = _data.get('type', {})
         if '1' in ground_type:
-            obj = LBT2PH.ground.PHPP_Ground_Slab_on_Grade.from_dict( ground_dict, _ghenv )
+            obj = LBT2PH.ground.PHPP_Ground_Slab_on_Grade.from_dict( _data, self.ghenv )
         elif '2' in ground_type:
-            obj = LBT2PH.ground.PHPP_Ground_Heated_Basement.from_dict( ground_dict, _ghenv )
+            obj = LBT2PH.ground.PHPP_Ground_Heated_Basement.from_dict( _data, self.ghenv )
         elif '3' in ground_type:
-            obj = LBT2PH.ground.PHPP_Ground_Unheated_Basement.from_dict( ground_dict, _ghenv )
+            obj = LBT2PH.ground.PHPP_Ground_Unheated_Basement.from_dict( _data, self.ghenv )
         elif '4' in ground_type:
-            obj = LBT2PH.ground.PHPP_Ground_Crawl_Space.from_dict( ground_dict, _ghenv )
+            obj = LBT2PH.ground.PHPP_Ground_Crawl_Space.from_dict( _data, self.ghenv )
         else:
             obj = None
+        
+        return obj
+
+class DHWSystemsCollector(LBT2PH.model_visitor.Collector):
+    def __init__(self):
+        self.dhw_systems = []
     
-        if obj:
-            ground_objs.append( obj )
+    def room(self, _room):
+        for system in _room.phpp.get('dhw_systems', {}).values():
+            self.dhw_systems.append( LBT2PH.dhw.PHPP_DHW_System.from_dict( system ) )
+    
+    def result(self):
+        return self.dhw_systems
 
-    return ground_objs
+Lighting = namedtuple('Lighting', ['efficacy', 'hb_room_name', 'hb_room_tfa'])
 
-def get_dhw_systems(_model):
-    dhw_systems = []
+class LightingCollector(LBT2PH.model_visitor.Collector):
+    def __init__(self):
+        self.out = []
+    
+    def room(self, _room):
+        appliances_dicts = _room.phpp.get('appliances', {})
+        spaces_dicts = _room.phpp.get('spaces', {})
+        if not appliances_dicts or not spaces_dicts:
+            return
+        
+        name = _room.obj.display_name
+        efficacy =  float( appliances_dicts.get('lighting_efficacy', 50) )
+        space_tfa = sum( float( space_dict.get('_tfa', 0)) for space_dict in spaces_dicts.values() )
+
+        self.out.append( Lighting(efficacy, name, space_tfa) )
+    
+    def result(self):
+        return self.out
+
+class SummVentCollector(LBT2PH.model_visitor.Collector):
+    def __init__(self):
+        self.summ_vent_objs = []
+    
+    def room(self, _room):
+        summ_vent_d = _room.phpp.get('summ_vent', None)
+        if summ_vent_d:
+            for summ_vent_params in summ_vent_d.values():
+                self.summ_vent_objs.append( LBT2PH.summer_vent.PHPP_SummVent.from_dict( summ_vent_params ) )
+    
+    def result(self):
+        return self.summ_vent_objs
+
+class HeatingCoolingCollector(LBT2PH.model_visitor.Collector):
+    def __init__(self):
+        self.hc_objs = {}
+    
+    def room(self, _room):
+        d = _room.phpp.get('heating_cooling')
+        if not d:
+            return
+        
+        this_room = {}
+        for k, v in d.items():
+            if 'supply_air_cooling' in k:
+                this_room['supply_air_cooling'] = LBT2PH.heating_cooling.PHPP_Cooling_SupplyAir.from_dict(v)
+            elif 'recirc_air_cooling' in k:
+                this_room['recirc_air_cooling'] = LBT2PH.heating_cooling.PHPP_Cooling_RecircAir.from_dict(v)
+            elif 'addnl_dehumid' in k:
+                this_room['addnl_dehumid'] = LBT2PH.heating_cooling.PHPP_Cooling_Dehumid.from_dict(v)
+            elif 'panel_cooling' in k:
+                this_room['panel_cooling'] =  LBT2PH.heating_cooling.PHPP_Cooling_Panel.from_dict(v)
+            elif 'hp_heating' in k:
+                this_room['hp_heating'] = LBT2PH.heating_cooling.PHPP_HP_AirSource.from_dict(v)
+            elif 'hp_DHW_' in k:
+                this_room['hp_DHW'] = LBT2PH.heating_cooling.PHPP_HP_AirSource.from_dict(v)
+            elif 'hp_options_' in k:
+                this_room['hp_options'] = LBT2PH.heating_cooling.PHPP_HP_Options.from_dict(v)
+            elif 'hp_ground_' in k:
+                this_room['hp_ground'] = None
+            elif 'boiler' in k:
+                this_room['boiler'] = LBT2PH.heating_cooling.PHPP_Boiler.from_dict(v)
+            elif 'compact' in k:
+                this_room['compact'] = None
+            elif 'district_heat' in k:
+                this_room['district_heat'] = None
 
-    for hb_room in _model.rooms:
-        if not hb_room.user_data:
-            continue
+        self.hc_objs[_room.obj.display_name] = this_room
+    
+    def result(self):
+        return self.hc_objs
 
-        dhw_dict = hb_room.user_data.get('phpp', {}).get('dhw_systems', {})
-        for system in dhw_dict.values():
-            new_system = LBT2PH.dhw.PHPP_DHW_System.from_dict( system )
-            dhw_systems.append( new_system )
+class PERCollector(LBT2PH.model_visitor.Collector):
+    def __init__(self):
+        self.per_objs = {}
+    
+    def room(self, _room):
+        d = _room.phpp.get('PER')
+        if not d:
+            return
+        
+        per_params = d.values()[0]
+        per_params.update( {'room_floor_area':_room.obj.floor_area} )
 
-    return dhw_systems
+        self.per_objs.update( {_room.obj.display_name:per_params} )
+    
+    def result(self):
+        return self.per_objs
+
+def get_model_data(_model, _north, _ghenv, _identifiers=None, _room_cache=None, _settings=None):
+    ''' Walks the model once, and returns all the PHPP objects from its rooms, faces and apertures
+    
+    Arguments:
+        _model: The Honeybee Model
+        _north: The scene's north (see _find_north)
+        _ghenv: The Grasshopper component's ghenv
+        _identifiers: Optional {'face': ids, 'aperture': ids, 'space': ids} to only
+            build the surfaces, windows and spaces for those (see LBT2PH.model_delta)
+        _room_cache (RoomCache): Optional. To re-use the surfaces, windows, spaces,
+            ventilation and ground of the rooms which haven't changed since the
+            last run (see LBT2PH.room_cache). Not used with _identifiers.
+        _settings (list): Optional. The other inputs the export depends on (ie: the
+            rooms included), so the _room_cache is cleared when they change.
+    Returns:
+        visitor (ModelVisitor): With the counts and time taken
+        results (OrderedDict): {name: objects}, using the same names as the
+            Convert component ('surfaces_opaque', 'phpp_spaces', ...)
+    '''
+    identifiers = _identifiers or {}
+    room_cache = _room_cache
+    if any(ids is not None for ids in identifiers.values()):
+        room_cache = None
+    elif room_cache is not None:
+        room_cache.check_settings([_north] + list(_settings or []))
+    
+    visitor = LBT2PH.model_visitor.ModelVisitor()
+    visitor.register('materials_opaque', OpaqueMaterialsCollector())
+    visitor.register('constructions_opaque', OpaqueConstructionsCollector())
+    visitor.register('surfaces_opaque', ExposedSurfacesCollector(_north, _ghenv, identifiers.get('face')))
+    visitor.register('materials_windows', ApertureMaterialsCollector())
+    visitor.register('constructions_windows', ApertureConstructionsCollector())
+    visitor.register('surfaces_windows', ApertureSurfacesCollector(_ghenv, identifiers.get('aperture')))
+    visitor.register('hb_rooms', ZonesCollector())
+    visitor.register('phpp_spaces', SpacesCollector(True, identifiers.get('space')))
+    visitor.register('ventilation_system', VentilationSystemsCollector(_ghenv))
+    visitor.register('ground_objs', GroundCollector(_ghenv))
+    visitor.register('dhw_systems', DHWSystemsCollector())
+    visitor.register('lighting', LightingCollector())
+    visitor.register('summer_vent', SummVentCollector())
+    visitor.register('heating_cooling', HeatingCoolingCollector())
+    visitor.register('per', PERCollector())
+    
+    return visitor, visitor.visit(_model, room_cache)
+
+# ------------------------------------------------------------------------------
+def get_zones_from_model(_model):
+    return LBT2PH.model_visitor.collect(_model, ZonesCollector())
+
+def get_exposed_surfaces_from_model(_model, _north, _ghenv, _identifiers=None):
+    ''' Returns a list of PHPP_Surface objects, or only those for the Face identifiers given '''
+    return LBT2PH.model_visitor.collect(_model, ExposedSurfacesCollector(_north, _ghenv, _identifiers))
+
+def get_opaque_materials_from_model(_model, _ghenv):
+    return LBT2PH.model_visitor.collect(_model, OpaqueMaterialsCollector())
+
+def get_opaque_constructions_from_model(_model, _ghenv):
+    return LBT2PH.model_visitor.collect(_model, OpaqueConstructionsCollector())
+
+def get_aperture_materials_from_model(_model):
+    return LBT2PH.model_visitor.collect(_model, ApertureMaterialsCollector())
+
+def get_aperture_constructions_from_model(_model):
+    return LBT2PH.model_visitor.collect(_model, ApertureConstructionsCollector())
+
+def get_aperture_surfaces_from_model(_model, _ghenv, _identifiers=None):
+    ''' Returns a list of PHPP_Window objects found in the HB Model, or only those for the Aperture identifiers given '''
+    return LBT2PH.model_visitor.collect(_model, ApertureSurfacesCollector(_ghenv, _identifiers))
+
+def get_spaces_from_model(_model, _ghdoc, _sort=False, _identifiers=None):
+    ''' Returns a list of PHPP_Space objects found in the HB Model, or only those for the Space ids given '''
+    return LBT2PH.model_visitor.collect(_model, SpacesCollector(_sort, _identifiers))
+
+def get_ventilation_systems_from_model(_model, _ghenv):
+    return LBT2PH.model_visitor.collect(_model, VentilationSystemsCollector(_ghenv))
+
+def get_ground_from_model(_model, _ghenv):  
+    return LBT2PH.model_visitor.collect(_model, GroundCollector(_ghenv))
+
+def get_dhw_systems(_model):
+    return LBT2PH.model_visitor.collect(_model, DHWSystemsCollector())
 
 def get_appliances(_model):
     appliance_objs = []
@@ -365,29 +612,7 @@ def get_appliances(_model):
     return appliance_objs
 
 def get_lighting(_model):
-    Lighting = namedtuple('Lighting', ['efficacy', 'hb_room_name', 'hb_room_tfa'])
-
-    out = []
-    for room in _model.rooms:
-        if not room.user_data:
-            continue
-        
-        appliances_dicts = room.user_data.get('phpp', {}).get('appliances', {})
-        spaces_dicts = room.user_data.get('phpp', {}).get('spaces', {})
-        if not appliances_dicts or not spaces_dicts:
-            continue
-        
-        name = room.display_name
-        efficacy =  float( appliances_dicts.get('lighting_efficacy', 50) )
-
-        space_tfas = []
-        for space_dict in spaces_dicts.values():
-            space_tfas.append( float( space_dict.get('_tfa', 0)) )
-        space_tfa = sum(space_tfas)
-
-        out.append( Lighting(efficacy, name, space_tfa) )
-
-    return out
+    return LBT2PH.model_visitor.collect(_model, LightingCollector())
 
 def get_climate(_model, _epw_file):
     if not _model.user_data:
@@ -610,75 +835,13 @@ def get_settings(_model):
         return settings_obj
 
 def get_summ_vent(_model):
-    summ_vent_objs = []
-    for room in _model.rooms:
-        if not room.user_data:
-            continue
-        
-        summ_vent_d = room.user_data.get('phpp', {}).get('summ_vent', None)
-        if summ_vent_d:
-            for summ_vent_params in summ_vent_d.values():
-                new_obj = LBT2PH.summer_vent.PHPP_SummVent.from_dict( summ_vent_params )    
-                summ_vent_objs.append( new_obj )
-    
-    return summ_vent_objs
+    return LBT2PH.model_visitor.collect(_model, SummVentCollector())
 
 def get_heating_cooling(_model):
-    hc_objs = {}
-    for room in _model.rooms:
-        if not room.user_data:
-            continue
-
-        d = room.user_data.get('phpp', {}).get('heating_cooling')
-        if not d:
-            continue
-        
-        this_room = {}
-        for k, v in d.items():
-            if 'supply_air_cooling' in k:
-                this_room['supply_air_cooling'] = LBT2PH.heating_cooling.PHPP_Cooling_SupplyAir.from_dict(v)
-            elif 'recirc_air_cooling' in k:
-                this_room['recirc_air_cooling'] = LBT2PH.heating_cooling.PHPP_Cooling_RecircAir.from_dict(v)
-            elif 'addnl_dehumid' in k:
-                this_room['addnl_dehumid'] = LBT2PH.heating_cooling.PHPP_Cooling_Dehumid.from_dict(v)
-            elif 'panel_cooling' in k:
-                this_room['panel_cooling'] =  LBT2PH.heating_cooling.PHPP_Cooling_Panel.from_dict(v)
-            elif 'hp_heating' in k:
-                this_room['hp_heating'] = LBT2PH.heating_cooling.PHPP_HP_AirSource.from_dict(v)
-            elif 'hp_DHW_' in k:
-                this_room['hp_DHW'] = LBT2PH.heating_cooling.PHPP_HP_AirSource.from_dict(v)
-            elif 'hp_options_' in k:
-                this_room['hp_options'] = LBT2PH.heating_cooling.PHPP_HP_Options.from_dict(v)
-            elif 'hp_ground_' in k:
-                this_room['hp_ground'] = None
-            elif 'boiler' in k:
-                this_room['boiler'] = LBT2PH.heating_cooling.PHPP_Boiler.from_dict(v)
-            elif 'compact' in k:
-                this_room['compact'] = None
-            elif 'district_heat' in k:
-                this_room['district_heat'] = None
-
-        hc_objs[room.display_name] = this_room
-
-    return hc_objs
+    return LBT2PH.model_visitor.collect(_model, HeatingCoolingCollector())
 
 def get_PER( _model ):
-    per_objs = {}
-
-    for room in _model.rooms:
-        if not room.user_data:
-            continue
-        
-        d = room.user_data.get('phpp', {}).get('PER')
-        if not d:
-            continue
-        
-        per_params = d.values()[0]
-        per_params.update( {'room_floor_area':room.floor_area} )
-
-        per_objs.update( {room.display_name:per_params} )
-
-    return per_objs
+    return LBT2PH.model_visitor.collect(_model, PERCollector())
 
 def get_occupancy( _model ):
     if not _model.user_data:
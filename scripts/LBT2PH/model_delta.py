@@ -0,0 +1,407 @@
+"""Finds what changed in a Honeybee Model since the last export, so only the PHPP rows it owns are built again
+
+A Fingerprint has a content hash for each room, exposed face, aperture and
+space in the model, by identifier. Comparing the Fingerprints of two models
+(ModelDelta) gives the entities which were added, removed or changed. A
+changed room counts as a change to all of its faces, apertures and spaces, and
+a changed face as a change to all of its apertures.
+
+Each face owns one row of the 'Areas' worksheet, each aperture one row of
+'Windows' and 'Shading' and each space one row of 'Additional Vent'. The row
+is set on the converted objects by the to_excel.build_* functions (ie:
+'Areas_Row'). While no entity is added, removed or moved, the rows stay where
+they are, so a DeltaExport keeps the converted objects and the Excel objects
+of the last export and only converts the changed entities and builds their
+rows again. Anything else (ie: a new face, or a renamed room) needs a full
+export, since the rows after it would move.
+
+Note: This module has no Rhino / Grasshopper / COM dependencies so that it can
+be used (and tested) outside of Rhino.
+"""
+
+from collections import OrderedDict
+import hashlib
+import json
+
+import LBT2PH.stage_cache
+
+try:
+    unicode
+except NameError:
+    unicode = str
+
+KINDS = ('room', 'face', 'aperture', 'space')
+ROW_KINDS = ('face', 'aperture', 'space')
+
+# The row each converted object's PHPP rows are in, set by the to_excel.build_* functions
+ROW_ATTRS = ('Areas_Row', 'Windows_Row', 'Shading_Row', 'Vent_Row')
+
+# The model identifier of each kind of converted object
+ENTITY_KEYS = {
+    'face': lambda surface: surface.lbt_srfc.identifier,
+    'aperture': lambda window: window.aperture.identifier,
+    'space': lambda space: space.id,
+}
+
+
+def _digest(_data):
+    text = json.dumps(_data, sort_keys=True, default=repr)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def _without(_dict, *_keys):
+    return dict((k, v) for k, v in _dict.items() if k not in _keys)
+
+
+def _room_data(_room):
+    """The room's dict, without its faces or spaces (they're hashed on their own) """
+
+    data = _without(_room.to_dict(), 'faces')
+    user_data = data.get('user_data') or {}
+    if 'phpp' in user_data:
+        data['user_data'] = dict(user_data, phpp=_without(user_data['phpp'] or {}, 'spaces'))
+    return data
+
+
+def _space_dicts(_model):
+    """Yields (room identifier, space dict) in the same order as lbt_to_phpp.get_spaces_from_model(_sort=True) """
+
+    spaces = []
+    for room in sorted(_model.rooms, key=lambda room: room.identifier):
+        if not room.user_data:
+            return []
+        for space_data in room.user_data.get('phpp', {}).get('spaces', {}).values():
+            spaces.append((room.identifier, space_data))
+    return spaces
+
+
+def _constructions(_room, _memo=None):
+    """The dicts of the constructions of the room's faces and apertures (the room's dict only has their names)
+
+    Args:
+        _room: The Honeybee Room
+        _memo (dict): Optional {identifier: dict} of the constructions already
+            seen on this run, so each one's to_dict() is only called once
+    """
+
+    memo = _memo if _memo is not None else {}
+    constructions = {}
+    for face in _room.faces:
+        for obj in [face] + list(face.apertures):
+            construction = obj.properties.energy.construction
+            if construction.identifier not in memo:
+                memo[construction.identifier] = construction.to_dict()
+            constructions[construction.identifier] = memo[construction.identifier]
+    return constructions
+
+
+def _energy(_obj):
+    """The energy properties, with only the names of the constructions, programs, ... """
+
+    return _obj.properties.energy.to_dict(abridged=True)
+
+
+def _vertices(_obj):
+    return [(pt.x, pt.y, pt.z) for pt in _obj.geometry.vertices]
+
+
+def room_hash(_room, _memo=None):
+    """The content hash of a whole room: its geometry, boundary conditions,
+    constructions and user_data (its own, and its faces' and apertures')
+
+    This is worked out for every room on every run, so it only takes what the
+    conversion uses, not the room's whole to_dict() (with its faces' planes,
+    radiance properties, ...)
+
+    Args:
+        _room: The Honeybee Room
+        _memo (dict): Optional. The constructions already seen on this run (see _constructions)
+    """
+
+    data = [_room.identifier, _room.display_name, _room.user_data, _energy(_room)]
+    for face in _room.faces:
+        data.append([face.identifier, face.display_name, unicode(face.type),
+                     face.boundary_condition.to_dict(), face.user_data, _vertices(face), _energy(face)])
+        for aperture in face.apertures:
+            data.append([aperture.identifier, aperture.display_name, aperture.is_operable,
+                         aperture.user_data, _vertices(aperture), _energy(aperture)])
+    data.append(_constructions(_room, _memo))
+    return _digest(data)
+
+
+def cells(_objects):
+    """Returns (worksheet, range, value) for each PHPP_XL_Obj, ie: for hashing """
+
+    return [(obj.Worksheet, obj.Range, obj.Value) for obj in _objects]
+
+
+class Fingerprint(object):
+    """A content hash for each room, exposed face, aperture and space in a Honeybee Model """
+
+    def __init__(self):
+        self.hashes = OrderedDict((kind, OrderedDict()) for kind in KINDS)  # {kind: {identifier: hash}}
+        self.parents = {}  # {(kind, identifier): parent identifier}
+        self.room_names = {}
+
+    def add(self, _kind, _identifier, _parent, _data):
+        """Adds an entity. The parent is part of its content, so moving it to another parent is a change """
+
+        self.hashes[_kind][_identifier] = _digest([_parent, _data])
+        self.parents[(_kind, _identifier)] = _parent
+
+    @classmethod
+    def from_model(cls, _model):
+        """Returns the Fingerprint of a Honeybee Model
+
+        Faces with a 'Surface' boundary condition (between two rooms) are left
+        out since they don't go to the PHPP.
+        """
+
+        fingerprint = cls()
+        for room in _model.rooms:
+            fingerprint.add('room', room.identifier, None, _room_data(room))
+            fingerprint.room_names[room.identifier] = room.display_name
+
+            for face in room.faces:
+                if str(face.boundary_condition) == 'Surface':
+                    continue
+                fingerprint.add('face', face.identifier, room.identifier, _without(face.to_dict(), 'apertures'))
+
+        for aperture in _model.apertures:
+            parent = aperture.parent.identifier if aperture.parent is not None else None
+            fingerprint.add('aperture', aperture.identifier, parent, aperture.to_dict())
+
+        for room_identifier, space_data in _space_dicts(_model):
+            fingerprint.add('space', space_data.get('id'), room_identifier, space_data)
+
+        return fingerprint
+
+    def ids(self, _kind):
+        return list(self.hashes[_kind].keys())
+
+    def __unicode__(self):
+        return u"Model Fingerprint | {}".format(
+            u'  '.join(u'{}s: {}'.format(kind, len(hashes)) for kind, hashes in self.hashes.items()))
+    def __str__(self):
+        return unicode(self).encode('utf-8')
+    def __repr__(self):
+        return "{}()".format(self.__class__.__name__)
+    def ToString(self):
+        return str(self)
+
+
+class ModelDelta(object):
+    """The entities added, removed and changed between two Fingerprints of a model """
+
+    def __init__(self, _old, _new):
+        self.new = _new
+        self.added = OrderedDict()  # {kind: [identifiers]}
+        self.removed = OrderedDict()
+        self.changed_ids = OrderedDict()
+        self.reordered = []
+
+        for kind in KINDS:
+            old_hashes, new_hashes = _old.hashes[kind], _new.hashes[kind]
+            self.added[kind] = [i for i in new_hashes if i not in old_hashes]
+            self.removed[kind] = [i for i in old_hashes if i not in new_hashes]
+            self.changed_ids[kind] = [i for i, h in new_hashes.items() if i in old_hashes and old_hashes[i] != h]
+            if not self.added[kind] and not self.removed[kind] and list(old_hashes) != list(new_hashes):
+                self.reordered.append(kind)
+
+        self.renamed = [i for i, name in _new.room_names.items() if _old.room_names.get(i, name) != name]
+
+    @property
+    def rows_shift(self):
+        """True if some rows would move (or a room name changed which rooms are included) """
+
+        return bool(self.reason)
+
+    @property
+    def reason(self):
+        """Why the model needs a full export, or '' if only the changed rows need building """
+
+        for kind in KINDS:
+            if self.added[kind] or self.removed[kind]:
+                return u'{}s added or removed'.format(kind)
+        if self.reordered:
+            return u'{}s in a new order'.format(self.reordered[0])
+        if self.renamed:
+            return u'rooms renamed'
+        return u''
+
+    def changed(self, _kind):
+        """Returns the set of identifiers of the changed entities, including those whose room (or face) changed """
+
+        changed = set(self.changed_ids[_kind])
+        if _kind == 'room':
+            return changed
+
+        parents = self.changed('face' if _kind == 'aperture' else 'room')
+        changed.update(i for i in self.new.ids(_kind) if self.new.parents[(_kind, i)] in parents)
+        return changed
+
+    @property
+    def count(self):
+        return sum(len(self.changed(kind)) for kind in KINDS)
+
+    def __unicode__(self):
+        if self.rows_shift:
+            return u"Model Delta | Full export needed: {}".format(self.reason)
+        return u"Model Delta | Changed: {}".format(
+            u'  '.join(u'{}s: {}'.format(kind, len(self.changed(kind))) for kind in KINDS))
+    def __str__(self):
+        return unicode(self).encode('utf-8')
+    def __repr__(self):
+        return "{}()".format(self.__class__.__name__)
+    def ToString(self):
+        return str(self)
+
+
+class DeltaExport(object):
+    """The converted objects and Excel objects from the last export of a model
+
+    Use:
+        delta = delta_export.start(Fingerprint.from_model(model), settings)
+        # Convert everything if delta is None, or else only delta.changed(kind)
+        surfaces = delta_export.update('face', surfaces)
+        if delta_export.can_patch('Areas', inputs):
+            # Build only the rows in delta_export.rows('face', 'Areas_Row', key)
+            objects, extra = delta_export.save('Areas', objects, True)
+        ...
+        delta_export.finish()
+    """
+
+    def __init__(self):
+        self.fingerprint = None
+        self.settings = None
+        self.delta = None
+        self.reason = u'first export'
+        self.entities = dict((kind, OrderedDict()) for kind in ROW_KINDS)  # {kind: {identifier: object}}
+        self.stages = {}  # {stage name: (input hash, objects, extra)}
+        self.last_run = OrderedDict()  # {stage name: rows built, or 'all'}
+        self._pending = None
+        self._inputs = {}
+
+    def start(self, _fingerprint, _settings):
+        """Returns the ModelDelta since the last export, or None if the whole model has to be converted
+
+        Args:
+            _fingerprint (Fingerprint): The model's fingerprint
+            _settings (list): Anything else which changes the rows (ie: the start rows, rooms included)
+        """
+
+        settings = LBT2PH.stage_cache.content_hash([_settings])
+        delta = None
+        if self.fingerprint is None:
+            self.reason = self.reason if self.settings is None else u'last export not finished'
+        elif settings != self.settings:
+            self.reason = u'settings changed'
+        else:
+            delta = ModelDelta(self.fingerprint, _fingerprint)
+            self.reason = delta.reason
+            if delta.rows_shift:
+                delta = None
+
+        # Until finish() is called, the next export can't rely on this one
+        self.fingerprint, self._pending = None, _fingerprint
+        self.settings, self.delta = settings, delta
+        self.last_run = OrderedDict()
+        self._inputs = {}
+        if delta is None:
+            self.entities = dict((kind, OrderedDict()) for kind in ROW_KINDS)
+            self.stages = {}
+        return delta
+
+    def finish(self):
+        self.fingerprint, self._pending = self._pending, None
+
+    def changed(self, _kind):
+        """Returns the identifiers to convert, or None for all of them """
+
+        return self.delta.changed(_kind) if self.delta is not None else None
+
+    def update(self, _kind, _objects):
+        """Keeps the newly converted objects and returns all of them, in model order
+
+        The new objects get the rows of the ones they replace.
+        """
+
+        key = ENTITY_KEYS[_kind]
+        if self.delta is None:
+            self.entities[_kind] = OrderedDict((key(obj), obj) for obj in _objects)
+            return list(self.entities[_kind].values())
+
+        entities = self.entities[_kind]
+        for obj in _objects:
+            old = entities.get(key(obj))
+            for attr in ROW_ATTRS:
+                if old is not None and hasattr(old, attr) and not hasattr(obj, attr):
+                    setattr(obj, attr, getattr(old, attr))
+            entities[key(obj)] = obj
+        return list(entities.values())
+
+    def changed_objects(self, _kind):
+        """Returns the converted objects of the changed entities, in model order """
+
+        changed = self.changed(_kind)
+        return [obj for i, obj in self.entities[_kind].items() if changed is None or i in changed]
+
+    def rows(self, _kind, _attr, _key):
+        """Returns {_key(object): row} for the changed objects which had a row
+
+        Args:
+            _kind (str): 'face', 'aperture' or 'space'
+            _attr (str): The row attribute (ie: 'Areas_Row')
+            _key (callable): Returns the identifier the stage's build function uses
+        """
+
+        return dict((_key(obj), getattr(obj, _attr)) for obj in self.changed_objects(_kind) if hasattr(obj, _attr))
+
+    def can_patch(self, _name, _inputs):
+        """True if only the changed rows need building: the stage's other inputs are the same as last time """
+
+        input_hash = LBT2PH.stage_cache.content_hash([_inputs])
+        self._inputs[_name] = input_hash
+        stage = self.stages.get(_name)
+        return self.delta is not None and stage is not None and stage[0] == input_hash
+
+    def save(self, _name, _objects, _patched=False, _extra=None):
+        """Keeps the stage's Excel objects and returns (all the objects, extra)
+
+        Args:
+            _name (str): The stage name
+            _objects (list): The stage's PHPP_XL_Objs. If _patched, these are only the
+                rows built again, which replace those rows in the last objects.
+            _patched (bool): True if only the changed rows were built
+            _extra: Any other output of the stage. If None when _patched, the last one is kept.
+        """
+
+        if _patched:
+            _, last_objects, last_extra = self.stages[_name]
+            rows = set((obj.Worksheet, obj.row) for obj in _objects)
+            objects = [obj for obj in last_objects if (obj.Worksheet, obj.row) not in rows] + list(_objects)
+            extra = last_extra if _extra is None else _extra
+            self.last_run[_name] = len(rows)
+        else:
+            objects, extra = list(_objects), _extra
+            self.last_run[_name] = 'all'
+
+        self.stages[_name] = (self._inputs.get(_name), objects, extra)
+        return objects, extra
+
+    def stats(self):
+        """Returns a line for each stage with the number of rows built """
+
+        return [u'{}: {} rows built'.format(name, rows) for name, rows in self.last_run.items()]
+
+    def __unicode__(self):
+        if self.delta is None:
+            return u"Delta Export | Full export ({})".format(self.reason)
+        return u"Delta Export | {} changed entities  |  Rows built: {}".format(
+            self.delta.count, sum(n for n in self.last_run.values() if n != 'all'))
+    def __str__(self):
+        return unicode(self).encode('utf-8')
+    def __repr__(self):
+        return "{}()".format(self.__class__.__name__)
+    def ToString(self):
+        return str(self)
@@ -0,0 +1,229 @@
+"""Walks a Honeybee Model once and hands each room, face and aperture to a set of Collectors
+
+Each of the lbt_to_phpp getters used to walk the whole model (model.rooms,
+model.faces or model.apertures) on its own, and look up the entity's
+user_data['phpp'] each time. A ModelVisitor walks the model once: rooms, then
+the faces of each room, then the apertures of each face (then any orphaned
+faces and apertures, so the order is the same as model.faces / model.apertures).
+Each entity is wrapped in an Entity, which looks up its user_data['phpp']
+once, and is handed to every registered Collector which wants that kind.
+
+Collectors can also share work on the same entity with Entity.shared(), ie:
+the PHPP Spaces of a room are only built from its user_data once, for both
+the Zones and the Spaces.
+
+Collectors which keep everything they build for a room in their .items can
+also be 'cached': with a RoomCache (see room_cache), the items of each room
+which hasn't changed since the last visit are re-used, and only the changed
+rooms are walked for those Collectors.
+
+Use:
+    visitor = ModelVisitor()
+    visitor.register('zones', ZonesCollector())
+    visitor.register('surfaces', SurfacesCollector(...))
+    results = visitor.visit(model)  # {'zones': [...], 'surfaces': [...]}
+
+Note: This module has no Rhino / Grasshopper / COM dependencies so that it can
+be used (and tested) outside of Rhino.
+"""
+
+from collections import OrderedDict
+import time
+
+try:
+    unicode
+except NameError:
+    unicode = str
+
+KINDS = ('room', 'face', 'aperture')
+
+
+class Entity(object):
+    """A room, face or aperture, with its user_data['phpp'] looked up once """
+
+    __slots__ = ('obj', 'parent', 'user_data', 'phpp', '_shared')
+
+    def __init__(self, _obj, _parent=None):
+        """
+        Args:
+            _obj: The Honeybee Room, Face or Aperture
+            _parent (Entity): The Entity of the room (for a face) or face (for an aperture), if any
+        """
+        self.obj = _obj
+        self.parent = _parent
+        self.user_data = _obj.user_data
+        self.phpp = (self.user_data or {}).get('phpp') or {}
+        self._shared = None
+
+    @property
+    def identifier(self):
+        return self.obj.identifier
+
+    def shared(self, _key, _build):
+        """Returns _build(self), only building it for the first Collector which asks """
+
+        if self._shared is None:
+            self._shared = {}
+        if _key not in self._shared:
+            self._shared[_key] = _build(self)
+        return self._shared[_key]
+
+    def __repr__(self):
+        return "{}(_obj={!r})".format(self.__class__.__name__, self.obj)
+
+
+class Collector(object):
+    """Collects something from the model. Override any of room(), face() and
+    aperture() (each is given an Entity), and result(). Only the kinds a
+    Collector overrides are handed to it.
+
+    A Collector which appends what it builds for each room (its faces and
+    apertures) to self.items can set 'cached' to have a RoomCache keep them.
+    To save them to the RoomCache file too, override dump() and load().
+    """
+
+    cached = False
+
+
+    def room(self, _room):
+        pass
+
+    def face(self, _face):
+        pass
+
+    def aperture(self, _aperture):
+        pass
+
+    def result(self):
+        return None
+
+    def dump(self, _item):
+        """Returns the item as JSON-able data for the RoomCache file, or None if it can't be saved """
+        return None
+
+    def load(self, _data, _room):
+        """Returns the item from the data given by dump(). _room is the room's Entity """
+        raise NotImplementedError
+
+
+def _function(_cls, _kind):
+    method = getattr(_cls, _kind)
+    return getattr(method, '__func__', method)  # Python 2 unbound methods are new each time
+
+
+def _wants(_collector, _kind):
+    return _function(type(_collector), _kind) is not _function(Collector, _kind)
+
+
+class ModelVisitor(object):
+    """Walks a model once for all the registered Collectors """
+
+    def __init__(self):
+        self.collectors = OrderedDict()
+        self.counts = OrderedDict((kind, 0) for kind in KINDS)
+        self.seconds = 0.0
+        self._room_handlers = []
+        self._face_handlers = []
+        self._aperture_handlers = []
+
+    def register(self, _name, _collector):
+        self.collectors[_name] = _collector
+        return _collector
+
+    def _handlers(self, _kind):
+        return [(name, getattr(c, _kind)) for name, c in self.collectors.items() if _wants(c, _kind)]
+
+    def visit(self, _model, _cache=None):
+        """Walks the model, and returns {name: collector.result()} in the order the collectors were registered
+
+        Args:
+            _model: The Honeybee Model
+            _cache (RoomCache): Optional. The cached Collectors re-use the items of the
+                rooms which haven't changed since they were kept in the cache.
+        """
+
+        start = time.time()
+        self._room_handlers = self._handlers('room')
+        self._face_handlers = self._handlers('face')
+        self._aperture_handlers = self._handlers('aperture')
+        cached = OrderedDict()
+        if _cache is not None:
+            cached = OrderedDict((name, c) for name, c in self.collectors.items() if c.cached)
+            _cache.start()
+
+        for room in _model.rooms:
+            entity = Entity(room)
+            restored = _cache.restore(entity, cached) if cached else {}
+            for name, items in restored.items():
+                cached[name].items.extend(items)
+
+            # The cached Collectors only build the items the cache didn't have
+            built = OrderedDict((name, len(c.items)) for name, c in cached.items() if name not in restored)
+            self._visit_room(entity, set(restored))
+            if cached:
+                _cache.store(entity, OrderedDict(
+                    (name, cached[name].items[count:]) for name, count in built.items()))
+
+        if self._face_handlers or self._aperture_handlers:
+            for face in getattr(_model, 'orphaned_faces', ()):
+                self._visit_face(face, None, self._face_handlers, self._aperture_handlers)
+        if self._aperture_handlers:
+            for aperture in getattr(_model, 'orphaned_apertures', ()):
+                self._visit_aperture(aperture, None, self._aperture_handlers)
+
+        if cached:
+            _cache.finish()
+        results = OrderedDict((name, c.result()) for name, c in self.collectors.items())
+        self.seconds += time.time() - start
+        return results
+
+    def _visit_room(self, _room, _skip):
+        """Visits the room and its faces and apertures, except for the Collectors in _skip """
+
+        def active(_handlers):
+            return [h for h in _handlers if h[0] not in _skip] if _skip else _handlers
+
+        self.counts['room'] += 1
+        for _, handler in active(self._room_handlers):
+            handler(_room)
+
+        face_handlers = active(self._face_handlers)
+        aperture_handlers = active(self._aperture_handlers)
+        if face_handlers or aperture_handlers:
+            for face in _room.obj.faces:
+                self._visit_face(face, _room, face_handlers, aperture_handlers)
+
+    def _visit_face(self, _face, _room, _face_handlers, _aperture_handlers):
+        entity = Entity(_face, _room)
+        self.counts['face'] += 1
+        for _, handler in _face_handlers:
+            handler(entity)
+
+        if _aperture_handlers:
+            for aperture in _face.apertures:
+                self._visit_aperture(aperture, entity, _aperture_handlers)
+
+    def _visit_aperture(self, _aperture, _face, _aperture_handlers):
+        entity = Entity(_aperture, _face)
+        self.counts['aperture'] += 1
+        for _, handler in _aperture_handlers:
+            handler(entity)
+
+    def __unicode__(self):
+        return u"Model Visitor | Collectors: {}  |  {}  |  {:.2f}s".format(
+            len(self.collectors), u'  '.join(u'{}s: {}'.format(k, v) for k, v in self.counts.items()),
+            self.seconds)
+    def __str__(self):
+        return unicode(self).encode('utf-8')
+    def __repr__(self):
+        return "{}()".format(self.__class__.__name__)
+    def ToString(self):
+        return str(self)
+
+
+def collect(_model, _collector):
+    """Walks the model for a single Collector and returns its result """
+
+    visitor = ModelVisitor()
+    visitor.register('result', _collector)
+    return visitor.visit(_model)['result']
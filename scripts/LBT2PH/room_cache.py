@@ -0,0 +1,262 @@
+"""Keeps what each room was converted to, and re-uses it while the room doesn't change
+
+Most edits to a model only touch one or two rooms, but each solve converts
+every room again. A RoomCache keeps each room's items from the cached
+Collectors of a ModelVisitor (see model_visitor): its PHPP Surfaces, Windows
+and Spaces, and its ventilation and ground objects. They're kept by the
+room's content hash (see model_delta.room_hash: the geometry, boundary
+conditions, constructions and user_data of the room and its faces and
+apertures). On the next visit, a room with the same hash re-uses its items,
+and only the rooms which changed are converted again.
+
+The cache is kept in memory (ie: in sc.sticky). Given a file path, it is also
+saved to a .json file, so it lasts after Rhino is closed. Only the items a
+Collector can dump() are saved: the PHPP Surfaces keep their Honeybee Face,
+so a room loaded from the file still has its Surfaces converted again.
+
+Any messages the converters add to the component are only added when a room
+is converted, not when its items are re-used.
+
+The to_excel.build_* functions set the PHPP rows and names on the items (ie:
+'Areas_Row', 'UD_Srfc_Name'), which depend on the other rooms and on which
+rooms are included. So re-used items have these set back to what they were
+just after the room was converted.
+
+Note: This module has no Rhino / Grasshopper / COM dependencies so that it can
+be used (and tested) outside of Rhino.
+"""
+
+import io
+import json
+import os
+
+import LBT2PH.model_delta
+import LBT2PH.stage_cache
+
+try:
+    unicode
+except NameError:
+    unicode = str
+
+FILE_SUFFIX = '.lbt2ph_rooms.json'
+FILE_VERSION = 1
+
+
+def export_attributes(_item):
+    """{name: value} of the attributes the to_excel.build_* functions set on an item:
+    its rows (see model_delta.ROW_ATTRS) and 'UD_' names """
+
+    return dict((name, getattr(_item, name)) for name in LBT2PH.stage_cache.attribute_names(_item)
+                if (name in LBT2PH.model_delta.ROW_ATTRS or name.startswith('UD_')) and hasattr(_item, name))
+
+
+def reset_export_attributes(_item, _converted):
+    """Sets the item's rows and 'UD_' names back to what they were when it was converted
+
+    Args:
+        _item: The item being re-used
+        _converted (dict): Its export_attributes() just after it was converted
+    """
+
+    for name in export_attributes(_item):
+        if name not in _converted:
+            delattr(_item, name)
+    for name, value in _converted.items():
+        setattr(_item, name, value)
+
+
+class RoomCache(object):
+    """Each room's items from the cached Collectors, by the room's content hash """
+
+    def __init__(self, _path=None):
+        """
+        Args:
+            _path (str): Optional. The .json file to save the cache to (and load it from).
+        """
+        self.path = _path
+        self.settings = None
+        self.rooms = {}  # {room identifier: (room hash, {collector name: items}, {collector name: [export attributes]})}
+        self.saved = {}  # {room identifier: (room hash, {collector name: [data]})}, as in the file
+        self.hits = 0  # Rooms with all their items re-used on the last visit
+        self.partial = 0  # Rooms with some of their items re-used (ie: loaded from the file)
+        self.misses = 0
+        self.total_hits = 0
+        self.total_rooms = 0
+        self._loaded = False
+        self._changed = False
+        self._visit = {}  # {room identifier: (room hash, {collector name: items re-used}, {collector name: [export attributes]})}
+        self._collectors = {}
+        self._constructions = {}  # See model_delta.room_hash
+
+    def check_settings(self, _settings):
+        """Forgets all the rooms if the settings the conversion depends on (ie: the north,
+        or the rooms included) changed
+
+        Args:
+            _settings (list): The other inputs to the conversion
+        """
+
+        settings = LBT2PH.stage_cache.content_hash([_settings])
+        if self.settings is not None and settings != self.settings:
+            self.rooms, self.saved = {}, {}
+            self._changed = True
+        self.settings = settings
+
+    def start(self):
+        """Called by the ModelVisitor before it walks the model """
+
+        self.hits = self.partial = self.misses = 0
+        self._visit = {}
+        self._constructions = {}
+        if self.path and not self._loaded:
+            self.load()
+
+    def restore(self, _room, _collectors):
+        """Returns {collector name: items} for each Collector with the room's items kept
+
+        Args:
+            _room (Entity): The room
+            _collectors (dict): {name: Collector} of the cached Collectors
+        """
+
+        room_hash = LBT2PH.model_delta.room_hash(_room.obj, self._constructions)
+        self._collectors = _collectors
+        restored = {}
+        converted = {}
+
+        entry = self.rooms.get(_room.identifier)
+        if entry is not None and entry[0] == room_hash:
+            restored = dict((name, items) for name, items in entry[1].items() if name in _collectors)
+            for name, items in restored.items():
+                converted[name] = entry[2][name]
+                for item, attributes in zip(items, converted[name]):
+                    reset_export_attributes(item, attributes)
+        else:
+            entry = self.saved.get(_room.identifier)
+            if entry is not None and entry[0] == room_hash:
+                for name, items in entry[1].items():
+                    if name in _collectors:
+                        try:
+                            restored[name] = [_collectors[name].load(data, _room) for data in items]
+                            converted[name] = [export_attributes(item) for item in restored[name]]
+                        except Exception as e:
+                            print('Could not load the < {} > of room < {} > from the room cache file: {}'.format(
+                                name, _room.identifier, e))
+
+        if len(restored) == len(_collectors):
+            self.hits += 1
+        elif restored:
+            self.partial += 1
+        else:
+            self.misses += 1
+
+        self._visit[_room.identifier] = (room_hash, restored, converted)
+        return restored
+
+    def store(self, _room, _items):
+        """Keeps the items built for the room by the Collectors which weren't restored """
+
+        room_hash, restored, converted = self._visit[_room.identifier]
+        items = dict(restored)
+        items.update(_items)
+        converted = dict(converted)
+        for name, built in _items.items():
+            converted[name] = [export_attributes(item) for item in built]
+        self.rooms[_room.identifier] = (room_hash, items, converted)
+        if not self.path or not _items:
+            return
+
+        saved = self.saved.get(_room.identifier)
+        data = dict(saved[1]) if saved is not None and saved[0] == room_hash else {}
+        for name, built in _items.items():
+            try:
+                dumped = [self._collectors[name].dump(item) for item in built]
+            except Exception as e:
+                print('Could not save the < {} > of room < {} > to the room cache file: {}'.format(
+                    name, _room.identifier, e))
+                continue
+            if all(d is not None for d in dumped):
+                data[name] = dumped
+        if saved != (room_hash, data):
+            self.saved[_room.identifier] = (room_hash, data)
+            self._changed = True
+
+    def finish(self):
+        """Called by the ModelVisitor after it walks the model. Forgets the rooms which
+        are gone and saves the file if anything changed.
+        """
+
+        for rooms in (self.rooms, self.saved):
+            for identifier in [i for i in rooms if i not in self._visit]:
+                del rooms[identifier]
+                self._changed = True
+
+        self.total_hits += self.hits
+        self.total_rooms += len(self._visit)
+        if self.path and self._changed:
+            self.save()
+
+    @property
+    def hit_rate(self):
+        """The share of the rooms on the last visit with all their items re-used """
+
+        rooms = self.hits + self.partial + self.misses
+        return float(self.hits) / rooms if rooms else 0.0
+
+    @property
+    def total_hit_rate(self):
+        return float(self.total_hits) / self.total_rooms if self.total_rooms else 0.0
+
+    def to_dict(self):
+        return {'version': FILE_VERSION,
+                'settings': self.settings,
+                'rooms': dict((i, [room_hash, data]) for i, (room_hash, data) in self.saved.items())}
+
+    def load(self):
+        """Reads the rooms saved in the file, if it was saved with the same settings """
+
+        self._loaded = True
+        if not os.path.isfile(self.path):
+            return
+
+        try:
+            with io.open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (IOError, OSError, ValueError) as e:
+            print('Could not read the room cache file "{}": {}'.format(self.path, e))
+            return
+
+        if data.get('version') == FILE_VERSION and data.get('settings') == self.settings:
+            self.saved = dict((i, (room_hash, items)) for i, (room_hash, items) in data.get('rooms', {}).items())
+
+    def save(self):
+        try:
+            text = json.dumps(self.to_dict(), sort_keys=True)
+            with io.open(self.path, 'w', encoding='utf-8') as f:
+                f.write(unicode(text))
+        except (IOError, OSError, TypeError, ValueError) as e:
+            print('Could not save the room cache file "{}": {}'.format(self.path, e))
+        self._changed = False
+
+    def stats(self):
+        """Returns a line with the rooms re-used and converted on the last visit """
+
+        return [u'Rooms: {} re-used, {} partly re-used, {} converted  |  Hit rate: {:.0%} ({:.0%} of all runs)'.format(
+            self.hits, self.partial, self.misses, self.hit_rate, self.total_hit_rate)]
+
+    def __unicode__(self):
+        return u"Room Cache | Rooms: {}  |  Hits: {}  |  Misses: {}  |  Hit rate: {:.0%}".format(
+            len(self.rooms), self.hits, self.partial + self.misses, self.hit_rate)
+    def __str__(self):
+        return unicode(self).encode('utf-8')
+    def __repr__(self):
+        return "{}(_path={!r})".format(self.__class__.__name__, self.path)
+    def ToString(self):
+        return str(self)
+
+
+def cache_path(_path):
+    """The room cache file for a file path given to the Convert component """
+
+    path = unicode(_path)
+    return path if path.endswith('.json') else path + FILE_SUFFIX
@@ -0,0 +1,249 @@
+"""Keeps the output of each to_excel.build_* stage and re-uses it while its inputs don't change
+
+Each stage's inputs get a content hash (see content_hash). If the hash is the
+same as on the last run, the last output is handed back without running the
+stage again. Only the last output of each stage is kept, along with its
+inputs (so that objects only matched by identity can't be replaced by new
+ones that happen to get the same id).
+
+The same objects are passed to several stages (ie: the surfaces go to Areas,
+Windows and Shading) so the hash of each object is only worked out once per
+run. Call StageCache.new_run() at the start of each run to forget them.
+
+Some stages also set attributes on their inputs for the later stages to use
+(ie: build_areas sets each surface's 'UD_Srfc_Name', which build_windows
+reads). These are kept with the output and set again on this run's inputs
+when the output is re-used.
+
+The output is only re-used while the stage's code is the same as well (see
+code_stamp): the components reload() to_excel on every solve, so editing it
+drops the cached outputs of its stages on the next solve.
+
+Note: This module has no Rhino / Grasshopper / COM dependencies so that it can
+be used (and tested) outside of Rhino.
+"""
+
+from collections import OrderedDict
+import hashlib
+import os
+import sys
+
+try:
+    unicode
+except NameError:
+    unicode = str
+
+try:
+    long
+except NameError:
+    long = int
+
+_PRIMITIVES = (type(None), bool, int, long, float, str, unicode)
+
+# Attributes which point back into Grasshopper, not at the model data
+_SKIP_ATTRS = ('ghenv', '_ghenv', 'ghdoc')
+
+
+def _canonical(_obj, _memo, _path):
+    """Returns a text form of the object which only depends on its content
+
+    Objects with a to_dict() use that. Other Python objects use their attributes.
+    Anything else (ie: .NET geometry) uses its ToString() if that shows any
+    content, or its identity if not, so it only matches the very same object.
+    """
+
+    if isinstance(_obj, _PRIMITIVES):
+        return repr(_obj)
+
+    obj_id = id(_obj)
+    if obj_id in _memo:
+        return _memo[obj_id][0]
+    if obj_id in _path:
+        return u'<cycle>'
+
+    _path.add(obj_id)
+    try:
+        if isinstance(_obj, dict):
+            items = sorted((_canonical(k, _memo, _path), _canonical(v, _memo, _path))
+                           for k, v in _obj.items())
+            text = u'{' + u','.join(u'{}:{}'.format(k, v) for k, v in items) + u'}'
+        elif isinstance(_obj, (list, tuple)):
+            text = u'[' + u','.join(_canonical(v, _memo, _path) for v in _obj) + u']'
+        elif isinstance(_obj, (set, frozenset)):
+            text = u'{' + u','.join(sorted(_canonical(v, _memo, _path) for v in _obj)) + u'}'
+        elif hasattr(_obj, 'to_dict'):
+            text = type(_obj).__name__ + _canonical(_obj.to_dict(), _memo, _path)
+        elif hasattr(_obj, '__dict__'):
+            attrs = dict((k, v) for k, v in vars(_obj).items() if k not in _SKIP_ATTRS)
+            text = type(_obj).__name__ + _canonical(attrs, _memo, _path)
+        else:
+            text = unicode(_obj)
+            if text.endswith(type(_obj).__name__) or ' at 0x' in text:
+                text = u'<{} {}>'.format(type(_obj).__name__, obj_id)
+    finally:
+        _path.discard(obj_id)
+
+    # The object is kept too, so its id can't be re-used by another object during the run
+    digest = hashlib.sha1(text.encode('utf-8')).hexdigest()
+    _memo[obj_id] = (digest, _obj)
+    return digest
+
+
+def _code_text(_code):
+    consts = [_code_text(c) if hasattr(c, 'co_code') else repr(c) for c in _code.co_consts]
+    return repr((_code.co_code, _code.co_names, consts))
+
+
+def code_stamp(_func):
+    """Returns what the stage's code is, so that its output isn't re-used once the code changed
+
+    That's the modified time and size of the function's module file, which also
+    covers any helpers in the module the function calls. If it has no file, it's
+    the function's byte code.
+    """
+
+    module_name = getattr(_func, '__module__', None)
+    name = getattr(_func, '__name__', None)
+
+    path = getattr(sys.modules.get(module_name), '__file__', None)
+    if path:
+        if path.endswith(('.pyc', '.pyo')) and os.path.isfile(path[:-1]):
+            path = path[:-1]
+        try:
+            stat = os.stat(path)
+            return (module_name, name, stat.st_mtime, stat.st_size)
+        except OSError:
+            pass
+
+    code = getattr(_func, '__code__', None)
+    if code is None:
+        return (module_name, name, id(_func))
+    return (module_name, name, hashlib.sha1(_code_text(code).encode('utf-8')).hexdigest())
+
+
+def attribute_names(_obj):
+    """The names of the object's attributes: those in its __dict__, and its classes' __slots__
+    (ie: PHPP_Window has no __dict__). Slots which aren't set are included too.
+    """
+
+    names = list(getattr(_obj, '__dict__', None) or {})
+    for cls in type(_obj).__mro__:
+        slots = getattr(cls, '__slots__', ())
+        for name in ([slots] if isinstance(slots, (str, unicode)) else slots):
+            if name not in ('__dict__', '__weakref__') and name not in names:
+                names.append(name)
+    return names
+
+
+def _object_attributes(_obj):
+    """{name: value} of the attributes set on the object """
+
+    return dict((name, getattr(_obj, name)) for name in attribute_names(_obj) if hasattr(_obj, name))
+
+
+def _input_objects(_args):
+    """Returns the Python objects passed to a stage, including those inside any lists """
+
+    objects = []
+    for arg in _args:
+        for obj in (arg if isinstance(arg, (list, tuple)) else [arg]):
+            if isinstance(obj, type):
+                continue
+            if hasattr(obj, '__dict__') or any(getattr(cls, '__slots__', ()) for cls in type(obj).__mro__):
+                objects.append(obj)
+    return objects
+
+
+def _attributes(_args):
+    return [_object_attributes(obj) for obj in _input_objects(_args)]
+
+
+def _attributes_set(_args, _before):
+    """Returns [(position, {name: value})] of the attributes the stage set on its inputs """
+
+    attributes_set = []
+    for i, (obj, before) in enumerate(zip(_input_objects(_args), _before)):
+        attrs = dict((k, v) for k, v in _object_attributes(obj).items() if k not in before or before[k] is not v)
+        if attrs:
+            attributes_set.append((i, attrs))
+    return attributes_set
+
+
+def content_hash(_args, _memo=None):
+    """Returns a SHA1 hex digest of the content of the arguments
+
+    Args:
+        _args (tuple): The objects to hash
+        _memo (dict): Optional {id: (digest, object)} of objects already hashed in this run
+    """
+
+    return _canonical(tuple(_args), _memo if _memo is not None else {}, set())
+
+
+class StageCache(object):
+    """The last output of each stage, by the hash of the stage's inputs """
+
+    def __init__(self):
+        self.entries = {}  # {stage name: ((code stamp, input hash), output, inputs, attributes set on the inputs)}
+        self.hits = OrderedDict()
+        self.misses = OrderedDict()
+        self.last_run = OrderedDict()  # {stage name: 'hit' or 'miss'}
+        self._memo = {}
+
+    def new_run(self):
+        """Forgets the object hashes from the last run, since the objects may have changed """
+
+        self._memo = {}
+        self.last_run = OrderedDict()
+
+    def run(self, _name, _func, *args):
+        """Returns _func(*args), or the output from the last run if the args have the same content
+
+        Args:
+            _name (str): The stage's name (ie: the output branch name)
+            _func (callable): The stage to run
+            *args: The stage's inputs
+        """
+
+        input_hash = (code_stamp(_func), content_hash(args, self._memo))
+        self.hits.setdefault(_name, 0)
+        self.misses.setdefault(_name, 0)
+
+        entry = self.entries.get(_name)
+        if entry is not None and entry[0] == input_hash:
+            # Same code, and the inputs have the same content, so they line up with the ones from the last run
+            objects = _input_objects(args)
+            for i, attrs in entry[3]:
+                for k, v in attrs.items():
+                    setattr(objects[i], k, v)
+
+            self.hits[_name] += 1
+            self.last_run[_name] = 'hit'
+            return entry[1]
+
+        before = _attributes(args)
+        output = _func(*args)
+        self.entries[_name] = (input_hash, output, args, _attributes_set(args, before))
+        self.misses[_name] += 1
+        self.last_run[_name] = 'miss'
+        return output
+
+    def clear(self):
+        self.entries = {}
+
+    def stats(self):
+        """Returns a line for each stage with its hit / miss counts """
+
+        return [u'{}: {} (hits: {}  misses: {})'.format(name, result, self.hits[name], self.misses[name])
+                for name, result in self.last_run.items()]
+
+    def __unicode__(self):
+        return u"Stage Cache | Stages: {}  |  Reused this run: {}  |  Hits: {}  Misses: {}".format(
+            len(self.entries), list(self.last_run.values()).count('hit'),
+            sum(self.hits.values()), sum(self.misses.values()))
+    def __str__(self):
+        return unicode(self).encode('utf-8')
+    def __repr__(self):
+        return "{}()".format(self.__class__.__name__)
+    def ToString(self):
+        return str(self)
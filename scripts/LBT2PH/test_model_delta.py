@@ -0,0 +1,89 @@
+import unittest
+import model_delta
+import xl_obj
+
+class _Entity(object):
+    def __init__(self, identifier, data, parent=None, boundary_condition='Outdoors'):
+        self.identifier = identifier
+        self.display_name = identifier
+        self.data = data
+        self.parent = parent
+        self.boundary_condition = boundary_condition
+        self.user_data = {'phpp': {'spaces': {}}}
+        self.faces = []
+
+    def to_dict(self):
+        return {'identifier': self.identifier, 'data': self.data, 'user_data': self.user_data}
+
+class _Model(object):
+    def __init__(self, window_x=0.0):
+        self.rooms = []
+        self.apertures = []
+        for r in range(3):
+            room = _Entity('Room_{}'.format(r), 'room')
+            room.user_data['phpp']['spaces'] = {'s{}'.format(r): {'id': 's{}'.format(r), 'name': 'Space'}}
+            for f in range(4):
+                face = _Entity('Face_{}_{}'.format(r, f), [f], room, 'Surface' if f == 3 else 'Outdoors')
+                room.faces.append(face)
+            self.rooms.append(room)
+            self.apertures.append(_Entity('Window_{}'.format(r), [window_x if r == 1 else 0.0], room.faces[0]))
+
+class _Window(object):
+    def __init__(self, identifier):
+        self.aperture = _Entity(identifier, None)
+
+class Test_model_delta(unittest.TestCase):
+    def test_delta(self):
+        old = model_delta.Fingerprint.from_model(_Model())
+        self.assertEqual(len(old.ids('face')), 9)
+
+        delta = model_delta.ModelDelta(old, model_delta.Fingerprint.from_model(_Model(window_x=1.0)))
+        self.assertFalse(delta.rows_shift)
+        self.assertEqual(delta.changed('aperture'), set(['Window_1']))
+        self.assertEqual(delta.changed('face'), set())
+
+        # A changed room counts as a change to everything in it
+        model = _Model()
+        model.rooms[0].data = 'new room'
+        delta = model_delta.ModelDelta(old, model_delta.Fingerprint.from_model(model))
+        self.assertEqual(delta.changed('face'), set(['Face_0_0', 'Face_0_1', 'Face_0_2']))
+        self.assertEqual((delta.changed('aperture'), delta.changed('space')), (set(['Window_0']), set(['s0'])))
+
+        # A new exposed face moves the rows after it
+        model = _Model()
+        model.rooms[0].faces[3].boundary_condition = 'Outdoors'
+        delta = model_delta.ModelDelta(old, model_delta.Fingerprint.from_model(model))
+        self.assertTrue(delta.rows_shift)
+        self.assertEqual(delta.reason, 'faces added or removed')
+
+    def test_delta_export(self):
+        export = model_delta.DeltaExport()
+        self.assertIsNone(export.start(model_delta.Fingerprint.from_model(_Model()), [41]))
+        windows = export.update('aperture', [_Window('Window_{}'.format(i)) for i in range(3)])
+        objects = []
+        for row, window in enumerate(windows, 24):
+            window.Windows_Row = row
+            objects += [xl_obj.PHPP_XL_Obj('Windows', ('M', row), window.aperture.identifier),
+                        xl_obj.PHPP_XL_Obj('Windows', ('Q', row), 1.0)]
+        self.assertFalse(export.can_patch('Windows', [24]))
+        export.save('Windows', objects)
+        export.finish()
+
+        delta = export.start(model_delta.Fingerprint.from_model(_Model(window_x=1.0)), [41])
+        self.assertEqual(export.changed('aperture'), set(['Window_1']))
+        windows = export.update('aperture', [_Window('Window_1')])
+        self.assertEqual(len(windows), 3)
+        self.assertEqual(export.rows('aperture', 'Windows_Row', lambda w: w.aperture.identifier), {'Window_1': 25})
+
+        self.assertTrue(export.can_patch('Windows', [24]))
+        objects, _ = export.save('Windows', [xl_obj.PHPP_XL_Obj('Windows', ('Q', 25), 2.0)], True)
+        self.assertEqual(sorted((o.Range, o.Value) for o in objects if o.row == 25), [('Q25', 2.0)])
+        self.assertEqual(len(objects), 5)
+        self.assertEqual(export.stats(), ['Windows: 1 rows built'])
+
+        # If the export isn't finished, the next one can't rely on it
+        self.assertIsNone(export.start(model_delta.Fingerprint.from_model(_Model()), [41]))
+        self.assertEqual(export.reason, 'last export not finished')
+
+if __name__ == '__main__':
+    unittest.main()
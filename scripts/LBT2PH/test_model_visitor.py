@@ -0,0 +1,80 @@
+import unittest
+import model_visitor
+
+class _Entity(object):
+    def __init__(self, identifier, user_data=None):
+        self.identifier = identifier
+        self.user_data = user_data
+        self.faces = []
+        self.apertures = []
+
+class _Model(object):
+    def __init__(self):
+        self.rooms = []
+        for r in range(2):
+            room = _Entity('Room_{}'.format(r), {'phpp': {'spaces': {'s': r}}} if r else None)
+            for f in range(2):
+                face = _Entity('Face_{}_{}'.format(r, f))
+                face.apertures.append(_Entity('Window_{}_{}'.format(r, f), {'phpp': {'id': f}}))
+                room.faces.append(face)
+            self.rooms.append(room)
+        self.orphaned_faces = [_Entity('Shade_Face')]
+        self.orphaned_apertures = [_Entity('Window_Orphan')]
+
+class _Order(model_visitor.Collector):
+    def __init__(self):
+        self.visited = []
+
+    def room(self, _room):
+        self.visited.append(_room.identifier)
+
+    def face(self, _face):
+        self.visited.append(_face.identifier)
+
+    def aperture(self, _aperture):
+        self.visited.append(_aperture.identifier)
+
+    def result(self):
+        return self.visited
+
+class _Spaces(model_visitor.Collector):
+    def __init__(self, _builds):
+        self.builds = _builds
+        self.spaces = []
+
+    def room(self, _room):
+        self.spaces.append(_room.shared('spaces', self._build))
+
+    def _build(self, _room):
+        self.builds.append(_room.identifier)
+        return _room.phpp.get('spaces', {})
+
+    def result(self):
+        return self.spaces
+
+class Test_model_visitor(unittest.TestCase):
+    def test_visit(self):
+        visitor = model_visitor.ModelVisitor()
+        visitor.register('order', _Order())
+        builds = []
+        visitor.register('spaces', _Spaces(builds))
+        visitor.register('other_spaces', _Spaces(builds))
+        results = visitor.visit(_Model())
+
+        self.assertEqual(results['order'], ['Room_0', 'Face_0_0', 'Window_0_0', 'Face_0_1', 'Window_0_1',
+            'Room_1', 'Face_1_0', 'Window_1_0', 'Face_1_1', 'Window_1_1', 'Shade_Face', 'Window_Orphan'])
+        self.assertEqual(results['spaces'], [{}, {'s': 1}])
+        self.assertEqual(results['other_spaces'], results['spaces'])
+        self.assertEqual(builds, ['Room_0', 'Room_1'])
+        self.assertEqual(list(visitor.counts.values()), [2, 5, 5])
+
+    def test_only_rooms(self):
+        # A Collector which only wants rooms doesn't walk the faces at all
+        visitor = model_visitor.ModelVisitor()
+        visitor.register('spaces', _Spaces([]))
+        visitor.visit(_Model())
+        self.assertEqual(list(visitor.counts.values()), [2, 0, 0])
+        self.assertEqual(model_visitor.collect(_Model(), _Order())[-1], 'Window_Orphan')
+
+if __name__ == '__main__':
+    unittest.main()
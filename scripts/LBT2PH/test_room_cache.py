@@ -0,0 +1,170 @@
+import os
+import shutil
+import tempfile
+import unittest
+import model_visitor
+import room_cache
+
+class _Construction(object):
+    identifier = 'Wall'
+
+    def to_dict(self):
+        return {'identifier': self.identifier, 'layers': ['Brick']}
+
+class _Energy(object):
+    construction = _Construction()
+
+    def to_dict(self, abridged=False):
+        return {'construction': self.construction.identifier}
+
+class _Properties(object):
+    energy = _Energy()
+
+class _Point(object):
+    def __init__(self, x, y, z):
+        self.x, self.y, self.z = x, y, z
+
+class _Geometry(object):
+    vertices = [_Point(0, 0, 0), _Point(1, 0, 0), _Point(1, 0, 1)]
+
+class _BoundaryCondition(object):
+    def to_dict(self):
+        return {'type': 'Outdoors'}
+
+class _Entity(object):
+    properties = _Properties()
+    geometry = _Geometry()
+    boundary_condition = _BoundaryCondition()
+    type = 'Wall'
+    is_operable = False
+
+    def __init__(self, identifier, data=None):
+        self.identifier = identifier
+        self.display_name = identifier
+        self.user_data = {'phpp': {'data': data}}
+        self.faces = []
+        self.apertures = []
+
+class _Model(object):
+    def __init__(self, data=0):
+        self.rooms = []
+        for r in range(3):
+            room = _Entity('Room_{}'.format(r), data if r == 1 else 0)
+            face = _Entity('Face_{}'.format(r))
+            face.apertures.append(_Entity('Window_{}'.format(r)))
+            room.faces.append(face)
+            self.rooms.append(room)
+
+class _Face(object):
+    pass
+
+class _Faces(model_visitor.Collector):
+    ''' Like the PHPP Surfaces, these can't be saved to the file '''
+    cached = True
+
+    def __init__(self):
+        self.items = []
+
+    def face(self, _face):
+        self.items.append(_Face())
+
+    def result(self):
+        return self.items
+
+class _Window(object):
+    ''' Like a PHPP_Window, with its names in slots '''
+    __slots__ = ('identifier', 'UD_glass_Name', 'Windows_Row')
+
+    def __init__(self, _identifier):
+        self.identifier = _identifier
+
+class _Windows(_Faces):
+    def aperture(self, _aperture):
+        self.items.append(_Window(_aperture.identifier))
+
+    def face(self, _face):
+        pass
+
+    def dump(self, _item):
+        return _item.identifier
+
+    def load(self, _data, _room):
+        return _Window(_data)
+
+def _visit(_model, _cache):
+    visitor = model_visitor.ModelVisitor()
+    visitor.register('faces', _Faces())
+    visitor.register('windows', _Windows())
+    results = visitor.visit(_model, _cache)
+    return visitor, results
+
+class Test_room_cache(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_cache(self):
+        cache = room_cache.RoomCache()
+        cache.check_settings([0])
+        _, first = _visit(_Model(), cache)
+        self.assertEqual((cache.hits, cache.misses), (0, 3))
+
+        visitor, results = _visit(_Model(), cache)
+        self.assertEqual((cache.hits, cache.misses), (3, 0))
+        self.assertEqual(results['faces'], first['faces'])
+        self.assertEqual([w.identifier for w in results['windows']], ['Window_0', 'Window_1', 'Window_2'])
+        self.assertEqual(visitor.counts['face'], 0)
+
+        # Only the changed room is converted again, and the order is the same
+        visitor, results = _visit(_Model(data=1), cache)
+        self.assertEqual((cache.hits, cache.misses), (2, 1))
+        self.assertEqual(visitor.counts['face'], 1)
+        self.assertEqual([results['faces'][i] is first['faces'][i] for i in range(3)], [True, False, True])
+        self.assertEqual(cache.stats(), ['Rooms: 2 re-used, 0 partly re-used, 1 converted  |  Hit rate: 67% (56% of all runs)'])
+
+        cache.check_settings([90])
+        _visit(_Model(data=1), cache)
+        self.assertEqual(cache.misses, 3)
+
+    def test_file(self):
+        path = room_cache.cache_path(os.path.join(self.folder, 'model'))
+        cache = room_cache.RoomCache(path)
+        cache.check_settings([0])
+        _visit(_Model(), cache)
+        self.assertTrue(os.path.isfile(path))
+
+        # Only the windows can be saved, so the faces are converted again
+        cache = room_cache.RoomCache(path)
+        cache.check_settings([0])
+        visitor, results = _visit(_Model(data=1), cache)
+        self.assertEqual((cache.hits, cache.partial, cache.misses), (0, 2, 1))
+        self.assertEqual([w.identifier for w in results['windows']], ['Window_0', 'Window_1', 'Window_2'])
+        self.assertEqual((visitor.counts['face'], visitor.counts['aperture']), (3, 1))
+
+    def test_inclusion_change_clears_rows(self):
+        cache = room_cache.RoomCache()
+        cache.check_settings([0, ['Room_0', 'Room_1', 'Room_2'], None, None])
+        _, results = _visit(_Model(), cache)
+        # As the to_excel.build_* functions do, after the rooms are converted
+        for row, window in enumerate(results['windows'], 10):
+            window.Windows_Row = row
+            window.UD_glass_Name = 'Glass'
+        results['faces'][0].Areas_Row = 41
+        results['faces'][0].UD_Srfc_Name = 'Wall'
+
+        # A re-used item has its rows and names back as they were when converted
+        _, results = _visit(_Model(), cache)
+        self.assertEqual(cache.hits, 3)
+        self.assertFalse(any(hasattr(w, 'Windows_Row') or hasattr(w, 'UD_glass_Name') for w in results['windows']))
+        self.assertFalse(hasattr(results['faces'][0], 'Areas_Row'))
+        self.assertFalse(hasattr(results['faces'][0], 'UD_Srfc_Name'))
+
+        # A room left out changes the other rooms' rows, so they're all converted again
+        cache.check_settings([0, ['Room_0', 'Room_2'], None, None])
+        _visit(_Model(), cache)
+        self.assertEqual((cache.hits, cache.misses), (0, 3))
+
+if __name__ == '__main__':
+    unittest.main()
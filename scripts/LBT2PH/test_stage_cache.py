@@ -0,0 +1,106 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+import stage_cache
+
+class _Surface(object):
+    def __init__(self, name, area):
+        self.name = name
+        self.area = area
+        self.ghenv = object()
+
+class _Window(object):
+    ''' Like a PHPP_Window, with no __dict__ '''
+    __slots__ = ('name', 'UD_glass_Name', 'UD_frame_Name')
+
+    def __init__(self, name):
+        self.name = name
+        self.UD_glass_Name = None
+        self.UD_frame_Name = None
+
+class Test_stage_cache(unittest.TestCase):
+    def test_content_hash(self):
+        a = stage_cache.content_hash(([_Surface('N', 1.0)], {'x': 1, 'y': [2]}))
+        b = stage_cache.content_hash(([_Surface('N', 1.0)], {'y': [2], 'x': 1}))
+        c = stage_cache.content_hash(([_Surface('N', 2.0)], {'x': 1, 'y': [2]}))
+
+        self.assertEqual(a, b)
+        self.assertNotEqual(a, c)
+
+    def test_run_reuses_output(self):
+        cache = stage_cache.StageCache()
+        calls = []
+        def build(surfaces):
+            calls.append(1)
+            return [s.area for s in surfaces]
+
+        for area in (1.0, 1.0, 3.0):
+            cache.new_run()
+            output = cache.run('Areas', build, [_Surface('N', area)])
+
+        self.assertEqual(output, [3.0])
+        self.assertEqual(len(calls), 2)
+        self.assertEqual((cache.hits['Areas'], cache.misses['Areas']), (1, 2))
+
+    def test_run_sets_attributes_again(self):
+        cache = stage_cache.StageCache()
+        def build(surfaces):
+            for i, s in enumerate(surfaces):
+                s.UD_Srfc_Name = '{}-{}'.format(i + 1, s.name)
+            return len(surfaces)
+
+        cache.run('Areas', build, [_Surface('N', 1.0), _Surface('S', 2.0)])
+        surfaces = [_Surface('N', 1.0), _Surface('S', 2.0)]
+        cache.new_run()
+        cache.run('Areas', build, surfaces)
+
+        self.assertEqual(cache.last_run['Areas'], 'hit')
+        self.assertEqual([s.UD_Srfc_Name for s in surfaces], ['1-N', '2-S'])
+
+    def test_run_sets_slot_attributes_again(self):
+        cache = stage_cache.StageCache()
+        def build(windows):
+            for w in windows:
+                w.UD_glass_Name, w.UD_frame_Name = 'Glass-' + w.name, 'Frame-' + w.name
+            return len(windows)
+
+        windows = [_Window('N')]
+        cache.run('Components', build, windows)
+        # ie: the room cache sets the re-used windows back to how they were converted
+        windows[0].UD_glass_Name = windows[0].UD_frame_Name = None
+        cache.new_run()
+        cache.run('Components', build, windows)
+
+        self.assertEqual(cache.last_run['Components'], 'hit')
+        self.assertEqual([windows[0].UD_glass_Name, windows[0].UD_frame_Name], ['Glass-N', 'Frame-N'])
+
+    def test_run_again_after_the_code_changed(self):
+        folder = tempfile.mkdtemp()
+        sys.path.insert(0, folder)
+        try:
+            path = os.path.join(folder, 'stage_cache_build.py')
+            with open(path, 'w') as f:
+                f.write('def build(surfaces):\n    return 1\n')
+            import stage_cache_build
+
+            cache = stage_cache.StageCache()
+            cache.run('Areas', stage_cache_build.build, [_Surface('N', 1.0)])
+
+            # ie: to_excel was edited, and reload()ed by the component
+            with open(path, 'w') as f:
+                f.write('def build(surfaces):\n    return 2 * 1\n')
+            if os.path.exists(path + 'c'):
+                os.remove(path + 'c')
+            cache.new_run()
+            cache.run('Areas', stage_cache_build.build, [_Surface('N', 1.0)])
+
+            self.assertEqual(cache.last_run['Areas'], 'miss')
+        finally:
+            sys.path.remove(folder)
+            sys.modules.pop('stage_cache_build', None)
+            shutil.rmtree(folder)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,47 @@
+import ast
+import io
+import os
 import unittest
 import to_excel
 
+def _window_slots():
+    ''' PHPP_Window's __slots__, read from windows.py (which needs Rhino to import) '''
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'windows.py')
+    with io.open(path, encoding='utf-8') as f:
+        tree = ast.parse(f.read())
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ClassDef) and node.name == 'PHPP_Window':
+            for item in node.body:
+                if isinstance(item, ast.Assign) and item.targets[0].id == '__slots__':
+                    return ast.literal_eval(item.value)
+
+class _Aperture(object):
+    def __init__(self, identifier):
+        self.identifier = identifier
+
+class _Window(object):
+    ''' Like a PHPP_Window: it has no __dict__, so only its slots can be set '''
+    __slots__ = _window_slots()
+
+    def __init__(self, identifier):
+        self.aperture = _Aperture(identifier)
+        self.quantity = 1
+        self.name = identifier
+        self.glazing = self.frame = None
+        self.UD_glass_Name = 'Glass'
+        self.UD_frame_Name = 'Frame'
+        self.variant_type = 'a'
+        self.installs = [1, 1, 1, 1]
+        self.shading_dimensions = None
+
+    host_surface = 'Face_0'
+    width = height = 1.0
+    shading_factor_winter = shading_factor_summer = 0.75
+
+class _Surface(object):
+    identifier = 'Face_0'
+    UD_Srfc_Name = '1-Wall'
+
 class Test_to_excel(unittest.TestCase):
     def test_conversion(self):
         worksheet = 'worksheet name'
@@ -13,5 +54,14 @@ class Test_to_excel(unittest.TestCase):
 
         self.assertEqual(new_excel_obj.getWorksheet, worksheet)
 
+    def test_windows_rows_on_slotted_windows(self):
+        windows = [_Window('Window_0'), _Window('Window_1')]
+
+        to_excel.build_windows(windows, ['Face_0'], [_Surface()])
+        to_excel.build_shading(windows, ['Face_0'])
+
+        self.assertEqual([w.Windows_Row for w in windows], [24, 25])
+        self.assertEqual([w.Shading_Row for w in windows], [17, 18])
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,72 @@
+import ast
+import os
+import unittest
+import units
+import xl_formula
+import xl_obj
+
+class Test_units(unittest.TestCase):
+    def test_matches_schema_expressions(self):
+        for unit_si, targets in units.TO_IP_SCHEMA.items():
+            for unit_ip, expression in targets.items():
+                expected = eval('12.5' + expression)
+                result = units.convert(12.5, unit_si, unit_ip)
+                self.assertAlmostEqual(result, expected, places=9)
+
+    def test_affine_and_inverse(self):
+        self.assertAlmostEqual(units.convert(20, 'C', 'F'), 68.0)
+        self.assertAlmostEqual(units.convert('0.5', 'W/M2K', 'HR-FT2-F/BTU'), 11.356528268)
+        self.assertAlmostEqual(units.get_metric_conversion('F', 'C')(212), 100.0)
+
+    def test_passthrough_and_batch(self):
+        self.assertEqual(units.convert('12', 'M', 'SI'), '12')
+        self.assertEqual(units.convert('=D17', 'M', 'FT'), '=D17')
+        self.assertEqual(units.convert_many([0, [100, None]], 'C', 'F'), [32.0, [212.0, None]])
+
+    def test_same_unit_and_si_are_never_converted(self):
+        self.assertEqual(units.convert(3.0, 'KM/S', 'SI'), 3.0)
+        self.assertEqual(units.convert(3.0, 'KM/S', 'KM/S'), 3.0)
+        self.assertEqual(units.convert('Auto', 'M', 'SI'), 'Auto')
+
+    def test_ground_objects(self):
+        wind = xl_obj.PHPP_XL_Obj('Ground', 'B40', 3.0, 'M/S', 'M/H')
+        floor = xl_obj.PHPP_XL_Obj('Ground', 'C17', 0.5, 'W/M2K', 'HR-FT2-F/BTU')
+        soil = xl_obj.PHPP_XL_Obj('Ground', 'B9', 2.0, 'W/MK', 'HR-FT2-F/BTU-IN')
+
+        self.assertEqual(wind.getValue('SI'), 3.0)
+        self.assertAlmostEqual(wind.getValue('IP'), 6.710808876)
+        self.assertAlmostEqual(floor.getValue('IP'), 11.356528268)
+        self.assertAlmostEqual(soil.getValue('IP'), 0.072113955)
+
+    def test_unconverted_values_are_still_written(self):
+        warnings = []
+        obj = xl_obj.PHPP_XL_Obj('Ground', 'B40', 3.0, 'M/S', 'KNOTS')
+
+        self.assertEqual(obj.getValueOrRaw('IP', warnings), 3.0)
+        self.assertEqual(len(warnings), 1)
+        self.assertEqual(xl_formula.cells_from_objects([obj], 'IP'), {'Ground': {(40, 2): 3.0}})
+
+    def test_to_excel_units_are_in_the_schema(self):
+        # Every (SI unit, IP unit) pair the PHPP_XL_Obj are made with has a conversion
+        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'to_excel.py')) as f:
+            tree = ast.parse(f.read())
+
+        pairs = set()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Call) and getattr(node.func, 'id', None) == 'PHPP_XL_Obj' and len(node.args) == 5:
+                unit_si, unit_ip = [getattr(arg, 'value', getattr(arg, 's', None)) for arg in node.args[3:]]
+                if isinstance(unit_si, str) and isinstance(unit_ip, str):
+                    pairs.add((unit_si, unit_ip))
+
+        self.assertIn(('M/S', 'M/H'), pairs)
+        for unit_si, unit_ip in pairs:
+            units.get_conversion(unit_si, unit_ip)
+
+    def test_errors(self):
+        self.assertRaises(units.UnknownUnitError, units.convert, 1, 'M', 'GALLON')
+        self.assertRaises(units.UnitValueError, units.convert, 'Auto', 'M', 'FT')
+        self.assertRaises(units.UnitValueError, units.convert, 0, 'W/M2K', 'HR-FT2-F/BTU')
+        self.assertRaises(units.UnitError, units.Conversion.compile, '*x')
+
+if __name__ == '__main__':
+    unittest.main()
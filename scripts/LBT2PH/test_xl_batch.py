@@ -0,0 +1,80 @@
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+import xl_batch
+import xl_headless
+import xl_obj
+import xl_planfile
+
+SHEET_XML = (u'<?xml version="1.0" encoding="UTF-8"?><worksheet><sheetData>{}</sheetData></worksheet>')
+WORKBOOK_XML = (u'<?xml version="1.0" encoding="UTF-8"?><workbook><sheets>'
+                u'<sheet name="Areas" sheetId="1" r:id="rId1"/><sheet name="Ground" sheetId="2" r:id="rId2"/>'
+                u'</sheets></workbook>')
+RELS_XML = (u'<?xml version="1.0" encoding="UTF-8"?><Relationships>'
+            u'<Relationship Id="rId1" Type="x/worksheet" Target="worksheets/sheet1.xml"/>'
+            u'<Relationship Id="rId2" Type="x/worksheet" Target="worksheets/sheet2.xml"/>'
+            u'</Relationships>')
+
+
+class Test_xl_batch(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.template = os.path.join(self.folder, 'PHPP.xlsx')
+        with zipfile.ZipFile(self.template, 'w') as z:
+            z.writestr('[Content_Types].xml', u'<Types/>')
+            z.writestr('xl/workbook.xml', WORKBOOK_XML)
+            z.writestr('xl/_rels/workbook.xml.rels', RELS_XML)
+            z.writestr('xl/worksheets/sheet1.xml', SHEET_XML.format(u'<row r="1"><c r="A1"><v>0</v></c></row>'))
+            z.writestr('xl/worksheets/sheet2.xml', SHEET_XML.format(u''))
+
+        self.jobs = []
+        for i in range(3):
+            plan = os.path.join(self.folder, 'Building_{}{}'.format(i, xl_planfile.FILE_EXTENSION))
+            xl_planfile.write_plan(plan, [xl_obj.PHPP_XL_Obj('Areas', 'A1', float(i)),
+                                          xl_obj.PHPP_XL_Obj('Areas', 'B2', 'Building {}'.format(i))])
+            self.jobs.append((plan, self.template, os.path.join(self.folder, 'out', 'Building_{}.xlsx'.format(i))))
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_export(self):
+        # A job which fails doesn't stop the others
+        self.jobs[1] = (self.jobs[1][0], os.path.join(self.folder, 'missing.xlsx'), self.jobs[1][2])
+
+        for processes in (1, 2):
+            table = xl_batch.export(self.jobs, processes, 'SI')
+            self.assertEqual(table.columns, ['Target', 'Plan', 'Template', 'Cells', 'Seconds', 'Error'])
+            self.assertEqual([values[2] for _, values, _ in table.rows], [2, 0, 2])
+            self.assertEqual([target for target, _ in table.errors], [self.jobs[1][2]])
+
+            with xl_headless.XlsxPackage(self.jobs[2][2]) as package:
+                self.assertEqual(package.read_value('Areas', 'A1'), 2.0)
+                self.assertEqual(package.read_value('Areas', 'B2'), 'Building 2')
+
+    def test_export_ground(self):
+        # The ground objects as to_excel.build_ground makes them, with units not all in the schema
+        plan = os.path.join(self.folder, 'Ground' + xl_planfile.FILE_EXTENSION)
+        xl_planfile.write_plan(plan, [xl_obj.PHPP_XL_Obj('Ground', 'E9', 2.0, 'W/MK', 'HR-FT2-F/BTU-IN'),
+                                      xl_obj.PHPP_XL_Obj('Ground', 'E18', 100.0, 'M2', 'FT2'),
+                                      xl_obj.PHPP_XL_Obj('Ground', 'H17', 0.5, 'W/M2K', 'HR-FT2-F/BTU'),
+                                      xl_obj.PHPP_XL_Obj('Ground', 'E50', 0.05, 'M/DAY', 'FT/DAY'),
+                                      xl_obj.PHPP_XL_Obj('Ground', 'B24', 'x')])
+        targets = dict((units, os.path.join(self.folder, 'out', 'Ground_{}.xlsx'.format(units)))
+                       for units in ('SI', 'IP'))
+
+        for units, target in targets.items():
+            table = xl_batch.export([(plan, self.template, target)], 2, units)
+            self.assertFalse(table.errors)
+            self.assertEqual([values[2] for _, values, _ in table.rows], [5])
+
+        with xl_headless.XlsxPackage(targets['SI']) as package:
+            self.assertEqual(package.read_value('Ground', 'E9'), 2.0)
+            self.assertEqual(package.read_value('Ground', 'B24'), 'x')
+        with xl_headless.XlsxPackage(targets['IP']) as package:
+            self.assertAlmostEqual(package.read_value('Ground', 'E18'), 1076.391042)
+            self.assertAlmostEqual(package.read_value('Ground', 'H17'), 11.356528268)
+
+if __name__ == '__main__':
+    unittest.main()
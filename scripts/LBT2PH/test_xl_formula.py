@@ -0,0 +1,72 @@
+import unittest
+import xl_formula
+
+class Test_xl_formula(unittest.TestCase):
+    def setUp(self):
+        sheets = {
+            'Areas': {(1, 1): (2.0, None), (2, 1): (3.0, None), (3, 1): (4.0, None),
+                      (1, 2): (9.0, '=SUM(A1:A3)'), (2, 2): (18.0, '=B1*A1')},
+            'Verification': {(1, 1): (19.0, '=Areas!B2+1'), (2, 1): ('ok', '=IF(A1>20,"bad","ok")'),
+                             (3, 1): (3.0, '=VLOOKUP(3,Areas!A1:B3,1,FALSE)'),
+                             (4, 1): (27.0, '=IFERROR(1/0,0)+TFA*3'), (5, 1): (5.0, None)},
+        }
+        self.engine = xl_formula.FormulaEngine(sheets, {'TFA': 'Areas!$B$1'})
+        self.engine.add_targets([['Heating', 'Verification', 'A1'], ['Check', 'Verification', 'A2'],
+                                 ['Lookup', 'Verification', 'A3'], ['Named', 'Verification', 'A4']])
+
+    def test_parse(self):
+        self.assertEqual(xl_formula.parse("='Additional Vent'!$A$1:B2"),
+                         ('ref', 'Additional Vent', 1, 1, 2, 2, True))
+        tree = xl_formula.parse('=-2^2+LOG10(100)')
+        self.assertEqual(xl_formula.FormulaEngine({'S': {(1, 1): (None, '=-2^2+LOG10(100)')}}
+                                                  ).calculate_cell(('S', 1, 1)), 6.0)
+        self.assertEqual(tree[0], 'bin')
+        self.assertRaises(xl_formula.FormulaError, xl_formula.parse, '=SUM(A1')
+
+    def test_graph(self):
+        # Only the formulas which feed the results, not the unused Verification!A5
+        self.assertEqual(len(self.engine.graph), 6)
+        self.assertTrue(self.engine.validate().ok)
+
+    def test_incremental(self):
+        self.engine.set_value('Areas', 'A3', 14)
+        results = self.engine.results()
+        self.assertEqual(results['Heating'], 39.0)
+        self.assertEqual(results['Check'], 'bad')
+        self.assertEqual(results['Named'], 57.0)
+        self.assertEqual(self.engine.calculations, 6)
+
+        # Nothing reads Verification!A5, so there's nothing to recalculate
+        self.engine.set_value('Verification', 'A5', 1)
+        self.assertEqual(self.engine.recalculate(), 0)
+        self.assertEqual(self.engine.calculations, 6)
+
+        self.engine.set_value('Areas', 'A1:A2', [[1], [1]])
+        self.assertEqual(self.engine.get_value('Verification', 'A3'), xl_formula.XlError('#N/A'))
+
+    def test_loops_and_unsupported(self):
+        sheets = {'S': {(1, 1): (0, '=B1*0.5+1'), (1, 2): (0, '=A1*0.5'), (1, 3): (0, '=A1+INDIRECT("D1")')}}
+        engine = xl_formula.FormulaEngine(sheets)
+        engine.add_targets([['Loop', 'S', 'B1'], ['Dynamic', 'S', 'C1']])
+        engine.set_value('S', 'A1', '=B1*0.5+1')
+        self.assertAlmostEqual(engine.results()['Loop'], 2.0 / 3.0, 2)
+        self.assertIn(('S', 1, 3), engine.unsupported)
+
+    def test_value_over_a_formula(self):
+        sheets = {'S': {(1, 1): (1.0, None), (1, 2): (2.0, '=A1*2'), (1, 3): (3.0, '=B1+1'),
+                        (1, 4): (3.0, '=SUM(A1:B1)')}}
+        engine = xl_formula.FormulaEngine(sheets)
+        engine.add_targets([['C', 'S', 'C1'], ['D', 'S', 'D1']])
+
+        # B1 is no longer a formula, so it doesn't change with A1
+        engine.set_value('S', 'B1', 5)
+        engine.set_value('S', 'A1', 3)
+        self.assertEqual(engine.results(), {'C': 6.0, 'D': 8.0})
+
+        # ... until it's a formula again, reading other cells
+        engine.set_value('S', 'B1', '=A1*10')
+        engine.set_value('S', 'A1', 1)
+        self.assertEqual(engine.results(), {'C': 11.0, 'D': 11.0})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+import xl_harvest
+
+SHEET_XML = (u'<?xml version="1.0" encoding="UTF-8"?><worksheet><sheetData>{}</sheetData></worksheet>')
+WORKBOOK_XML = (u'<?xml version="1.0" encoding="UTF-8"?><workbook><sheets>'
+                u'<sheet name="Verification" sheetId="1" r:id="rId1"/></sheets></workbook>')
+RELS_XML = (u'<?xml version="1.0" encoding="UTF-8"?><Relationships>'
+            u'<Relationship Id="rId1" Type="x/worksheet" Target="worksheets/sheet1.xml"/>'
+            u'</Relationships>')
+
+
+class Test_xl_harvest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def _write_phpp(self, _name, _tfa):
+        """A finished PHPP: the heating demand is a formula, with the value Excel saved """
+
+        path = os.path.join(self.folder, _name)
+        with zipfile.ZipFile(path, 'w') as z:
+            z.writestr('[Content_Types].xml', u'<Types/>')
+            z.writestr('xl/workbook.xml', WORKBOOK_XML)
+            z.writestr('xl/_rels/workbook.xml.rels', RELS_XML)
+            z.writestr('xl/worksheets/sheet1.xml', SHEET_XML.format(
+                u'<row r="34"><c r="I34"><v>{}</v></c></row>'
+                u'<row r="35"><c r="I35"><f>1500/I34</f><v>{}</v></c></row>'.format(_tfa, 1500.0 / _tfa)))
+        return path
+
+    def test_bad_field(self):
+        values, error = xl_harvest.read_file('not_read.xlsx', [['TFA', 'Verification', 'I34:I35']])
+        self.assertEqual(values, [None])
+        self.assertIn('I34:I35', error)
+
+    def test_missing_file_is_an_error_row(self):
+        table = xl_harvest.harvest(['not_a_file.xlsx'], [['TFA', 'Verification', 'I34']], 1)
+        self.assertEqual(table.columns, ['File', 'TFA', 'Error'])
+        self.assertEqual(len(table.errors), 1)
+        self.assertEqual(table.to_dicts()[0]['TFA'], None)
+
+    def test_harvest_xlsx_files(self):
+        paths = [self._write_phpp('A.xlsx', 100.0), self._write_phpp('B.xlsx', 150.0)]
+        fields = [['TFA', 'Verification', 'I34'], ['Heating', 'Verification', 'I35']]
+
+        for processes in (1, 2):
+            table = xl_harvest.harvest([self.folder], fields, processes)
+            self.assertEqual([row[0] for row in table.rows], paths)
+            self.assertEqual([values for _, values, _ in table.rows], [[100.0, 15.0], [150.0, 10.0]])
+            self.assertFalse(table.errors)
+        self.assertIn('Files: 2', str(table))
+
+    def test_read_fields_file(self):
+        path = os.path.join(self.folder, 'fields.csv')
+        with io.open(path, 'w', encoding='utf-8') as f:
+            f.write(u'# label, worksheet, cell\n\nTFA, Verification, I34\n"Heat, net", "Heating, monthly", M22\n')
+
+        self.assertEqual(xl_harvest.read_fields_file(path),
+                         [['TFA', 'Verification', 'I34'], ['Heat, net', 'Heating, monthly', 'M22']])
+
+if __name__ == '__main__':
+    unittest.main()
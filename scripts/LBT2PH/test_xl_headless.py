@@ -0,0 +1,94 @@
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+import xl_headless
+import xl_obj
+
+CONTENT_TYPES_XML = u'<?xml version="1.0" encoding="UTF-8"?><Types/>'
+WORKBOOK_XML = (u'<?xml version="1.0" encoding="UTF-8"?><workbook><sheets>'
+                u'<sheet name="Areas" sheetId="1" r:id="rId1"/>'
+                u'<sheet name="Data" sheetId="2" r:id="rId2"/></sheets>'
+                u'<definedNames><definedName name="Surface_Block">Areas!$B$10:$C$11</definedName>'
+                u'<definedName name="Version">\'Data\'!$B$3</definedName></definedNames>'
+                u'<calcPr calcId="1"/></workbook>')
+RELS_XML = (u'<?xml version="1.0" encoding="UTF-8"?><Relationships>'
+            u'<Relationship Id="rId1" Type="x/worksheet" Target="worksheets/sheet1.xml"/>'
+            u'<Relationship Id="rId2" Type="x/worksheet" Target="worksheets/sheet2.xml"/>'
+            u'<Relationship Id="rId3" Type="x/sharedStrings" Target="sharedStrings.xml"/>'
+            u'</Relationships>')
+SHARED_STRINGS_XML = (u'<?xml version="1.0" encoding="UTF-8"?><sst count="2" uniqueCount="2">'
+                      u'<si><t>Surface</t></si><si><t>PHPP 9.6 SI</t></si></sst>')
+SHEET_XML = u'<?xml version="1.0" encoding="UTF-8"?><worksheet><sheetData>{}</sheetData></worksheet>'
+AREAS_ROWS = (u'<row r="1"><c r="A1" t="s"><v>0</v></c><c r="B1"><v>2</v></c></row>'
+              u'<row r="2"><c r="B2"><f>B1*2</f><v>4</v></c></row>')
+DATA_ROWS = u'<row r="3"><c r="B3" t="s"><v>1</v></c></row>'
+
+class Test_xl_headless(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.source = os.path.join(self.folder, 'PHPP.xlsx')
+        self.target = os.path.join(self.folder, 'Building.xlsx')
+        with zipfile.ZipFile(self.source, 'w') as z:
+            z.writestr('[Content_Types].xml', CONTENT_TYPES_XML)
+            z.writestr('xl/workbook.xml', WORKBOOK_XML)
+            z.writestr('xl/_rels/workbook.xml.rels', RELS_XML)
+            z.writestr('xl/sharedStrings.xml', SHARED_STRINGS_XML)
+            z.writestr('xl/worksheets/sheet1.xml', SHEET_XML.format(AREAS_ROWS))
+            z.writestr('xl/worksheets/sheet2.xml', SHEET_XML.format(DATA_ROWS))
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_write_and_read_cells(self):
+        cells = {'Areas': {(1, 2): 3.5, (5, 1): u'North Wall', (5, 2): u'=B1+1', (6, 3): u'12'}}
+
+        count = xl_headless.write_cells(self.source, self.target, cells)
+
+        self.assertEqual(count, 4)
+        with xl_headless.XlsxPackage(self.target) as package:
+            values = package.read_cells('Areas', [(1, 1), (1, 2), (5, 1), (6, 3), (7, 1)])
+            self.assertEqual(values, {(1, 1): u'Surface', (1, 2): 3.5, (5, 1): u'North Wall',
+                                      (6, 3): 12.0, (7, 1): None})
+            self.assertEqual(package.read_sheet('Areas')[(5, 2)][1], u'=B1+1')
+            self.assertEqual(package.read_sheet('Areas')[(2, 2)], (4.0, u'=B1*2'))
+            self.assertIn(u'fullCalcOnLoad="1"', package.read_part('xl/workbook.xml'))
+
+    def test_blocks_and_named_ranges(self):
+        shutil.copyfile(self.source, self.target)
+        excel = xl_headless.HeadlessInstance()
+        excel.start_new_instance(self.target)
+        excel.open_workbook()
+        excel.load_sheets()
+
+        areas = excel.sheets_dict['Areas']
+        areas.Range['A20:B21'].Value2 = ((1.0, 2.0), (3.0, 4.0))
+        areas.Range['Surface_Block'].Value2 = u'x'
+        areas.Range['Version'].Value2 = u'PHPP 9.6 IP'
+
+        # Pending writes are read back before they are saved
+        self.assertEqual(areas.Range['A20:B21'].Value2, ((1.0, 2.0), (3.0, 4.0)))
+        excel.save_and_quit()
+
+        excel = xl_headless.HeadlessInstance()
+        excel.start_new_instance(self.target)
+        excel.open_workbook()
+        excel.load_sheets()
+        self.assertEqual(excel.read_range('Areas', 'A20:B21'), [[1.0, 2.0], [3.0, 4.0]])
+        self.assertEqual(excel.read_range('Areas', 'Surface_Block'), [[u'x', u'x'], [u'x', u'x']])
+        self.assertEqual(excel.read_range('Data', 'B3'), [[u'PHPP 9.6 IP']])
+        self.assertEqual(xl_headless.get_unit_type(excel.package), 'IP')
+
+    def test_write_xl_objects(self):
+        objects = [xl_obj.PHPP_XL_Obj('Areas', 'D4', 10.0),
+                   xl_obj.PHPP_XL_Obj('Areas', 'Surface_Block', [[1, 2], [3, 4]])]
+
+        xl_headless.write_xl_objects(self.source, self.target, objects)
+
+        with xl_headless.XlsxPackage(self.target) as package:
+            values = package.read_cells('Areas', [(4, 4), (10, 2), (10, 3), (11, 2), (11, 3)])
+            self.assertEqual([values[k] for k in sorted(values)], [10.0, 1.0, 2.0, 3.0, 4.0])
+
+if __name__ == '__main__':
+    unittest.main()
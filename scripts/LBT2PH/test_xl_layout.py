@@ -0,0 +1,103 @@
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+import xl_layout
+import xl_ranges
+
+SHEETS = ['Areas', 'Shading', 'Electricity non-res']
+WORKBOOK_XML = (u'<?xml version="1.0" encoding="UTF-8"?><workbook><sheets>{}</sheets></workbook>'.format(
+    u''.join(u'<sheet name="{}" sheetId="{}" r:id="rId{}"/>'.format(name, i, i)
+             for i, name in enumerate(SHEETS, 1))))
+RELS_XML = (u'<?xml version="1.0" encoding="UTF-8"?><Relationships>{}</Relationships>'.format(
+    u''.join(u'<Relationship Id="rId{0}" Type="x/worksheet" Target="worksheets/sheet{0}.xml"/>'.format(i)
+             for i in range(1, len(SHEETS) + 1))))
+
+# Like the English PHPP, with 4 rows added above the Areas surfaces and the
+# headings, notes and labels around them which must not be taken for anchors
+PHPP_CELLS = {
+    'Areas': {
+        'B1': u'Areas', 'B4': u'Building:', 'E4': u'Area input is in the table below',
+        'B10': u'Summary', 'B20': u'Area input for the building assembly list',
+        'M30': u'Area input', 'B41': u'Area input ', 'C44': u'Area group',
+        'B149': u'Thermal bridge inputs:', 'B153': u'North wall / roof', 'E160': u'Thermal bridge inputs'},
+    # 'Shading' is the sheet's title too, so the heading is found on two rows
+    'Shading': {
+        'B2': u'Shading', 'B10': u'Shading', 'C17': u'Orientation'},
+    # The heading is there, but much too far from where the table should be
+    'Electricity non-res': {
+        'B16': u'Lighting', 'B59': u'Office equipment', 'B900': u'Kitchen'},
+}
+
+
+def _sheet_xml(_cells):
+    rows = {}
+    for address, text in _cells.items():
+        row, col = xl_ranges.parse_address(address)
+        rows.setdefault(row, []).append((col, address, text))
+
+    xml = []
+    for row in sorted(rows):
+        xml.append(u'<row r="{}">{}</row>'.format(row, u''.join(
+            u'<c r="{}" t="inlineStr"><is><t>{}</t></is></c>'.format(address, text)
+            for _, address, text in sorted(rows[row]))))
+    return u'<?xml version="1.0" encoding="UTF-8"?><worksheet><sheetData>{}</sheetData></worksheet>'.format(
+        u''.join(xml))
+
+
+class Test_xl_layout(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.template = os.path.join(self.folder, 'PHPP.xlsx')
+        with zipfile.ZipFile(self.template, 'w') as z:
+            z.writestr('[Content_Types].xml', u'<?xml version="1.0" encoding="UTF-8"?><Types/>')
+            z.writestr('xl/workbook.xml', WORKBOOK_XML)
+            z.writestr('xl/_rels/workbook.xml.rels', RELS_XML)
+            for i, name in enumerate(SHEETS, 1):
+                z.writestr('xl/worksheets/sheet{}.xml'.format(i), _sheet_xml(PHPP_CELLS[name]))
+
+        self.cache_folder = xl_layout.CACHE_FOLDER
+        xl_layout.CACHE_FOLDER = os.path.join(self.folder, 'cache')
+
+    def tearDown(self):
+        xl_layout.CACHE_FOLDER = self.cache_folder
+        shutil.rmtree(self.folder)
+
+    def test_find_anchor(self):
+        anchor = xl_layout.Anchor('Areas', 'Surfaces', 41, ('Area input',), ('B', 'C'), 4)
+        self.assertEqual(anchor.find({(40, 2): ('Area  input:', None), (45, 4): ('Area input', None)}), 44)
+        self.assertIsNone(anchor.find({(40, 2): ('Area input list', None)}))
+        self.assertIsNone(anchor.find({(37, 2): ('Area input', None), (50, 3): ('Area input', None)}))
+        self.assertIsNone(anchor.find({(1000, 2): ('Area input', None)}))
+
+    def test_scan_realistic_layout(self):
+        layout = xl_layout.LayoutIndex.scan(self.template)
+
+        self.assertEqual(layout.get('Areas'), {'Surfaces': 45, 'TB': 152})
+        self.assertEqual(layout.get('Shading'), {'Windows': 17})
+        self.assertEqual(layout.get('Electricity non-res'), {'Lighting': 19, 'Office Equip': 62, 'Kitchen': 77})
+        self.assertEqual(layout.ambiguous, [('Shading', 'Windows')])
+        self.assertEqual(layout.found_rows(), {'Areas': {'Surfaces': 45, 'TB': 152},
+                                               'Electricity non-res': {'Lighting': 19, 'Office Equip': 62}})
+
+    def test_load_layout_saves_in_the_cache_folder(self):
+        layout = xl_layout.load_layout(self.template)
+        loaded = xl_layout.load_layout(self.template)
+
+        self.assertEqual(sorted(os.listdir(self.folder)), ['PHPP.xlsx', 'cache'])
+        self.assertTrue(os.path.isfile(xl_layout.layout_path(layout.template_hash)))
+        self.assertEqual(loaded.start_rows, layout.start_rows)
+        self.assertEqual(loaded.ambiguous, layout.ambiguous)
+
+    def test_layout_is_like_start_rows(self):
+        layout = xl_layout.LayoutIndex.defaults()
+        self.assertEqual(layout.get('Areas').get('Surfaces'), 41)
+        self.assertEqual(layout.get('Not A Sheet', {}), {})
+
+        loaded = xl_layout.LayoutIndex.from_dict(layout.to_dict())
+        self.assertEqual(loaded.start_rows, layout.start_rows)
+        self.assertEqual(loaded.missing, layout.missing)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import os
+import shutil
+import tempfile
+import unittest
+import xl_ledger
+
+class _Color(object):
+    def __str__(self):
+        return 'Red'
+
+class Test_xl_ledger(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.workbook = os.path.join(self.folder, 'PHPP.xlsx')
+        with open(self.workbook, 'wb') as f:
+            f.write(b'PHPP')
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def _write(self, ledger, cells, saved=True):
+        changes = ledger.diff(cells)
+        ledger.commit()
+        ledger.save()
+        if saved:  # ie: by save_and_quit
+            xl_ledger.DiffLedger.record_saved(self.workbook)
+        return changes
+
+    def test_values_are_not_written_again_after_loading(self):
+        cells = {('Areas', 'A1'): (1.0, 2.0), ('Areas', 'A2'): [[1, 2], [3, 4]],
+                 ('Areas', 'A3'): _Color(), ('Areas', 'A4'): u'North', ('Areas', 'A5'): None}
+        self.assertEqual(len(self._write(xl_ledger.DiffLedger(self.workbook), cells)), 5)
+
+        ledger = xl_ledger.DiffLedger.load(self.workbook)
+
+        self.assertFalse(ledger.workbook_changed)
+        self.assertEqual(ledger.diff(cells), [])
+        cells[('Areas', 'A1')] = (1.0, 3.0)
+        self.assertEqual(ledger.diff(cells), [('Areas', 'A1', (1.0, 3.0))])
+
+    def test_workbook_changed(self):
+        self._write(xl_ledger.DiffLedger(self.workbook), {('Areas', 'A1'): 1.0})
+        with open(self.workbook, 'ab') as f:
+            f.write(b' edited')
+
+        ledger = xl_ledger.DiffLedger.load(self.workbook)
+
+        self.assertTrue(ledger.workbook_changed)
+        self.assertEqual(ledger.cells, {('Areas', 'A1'): 1.0})
+
+    def test_workbook_not_saved_after_the_write(self):
+        ledgers = {}
+        ledger = ledgers[xl_ledger.DiffLedger.key(self.workbook)] = xl_ledger.DiffLedger(self.workbook)
+        self._write(ledger, {('Areas', 'A1'): 1.0})
+        # ie: Excel closed without saving the second write
+        self._write(ledger, {('Areas', 'A1'): 2.0}, saved=False)
+        self.assertTrue(xl_ledger.DiffLedger.load(self.workbook).workbook_changed)
+
+        # Nothing new written, so the ledger still waits for the workbook to be saved
+        self._write(ledger, {('Areas', 'A1'): 2.0}, saved=False)
+        self.assertTrue(xl_ledger.DiffLedger.load(self.workbook).workbook_changed)
+
+        xl_ledger.DiffLedger.record_saved(self.workbook, ledgers)
+        self.assertFalse(xl_ledger.DiffLedger.load(self.workbook).workbook_changed)
+        self.assertIsNotNone(ledger.fingerprint)
+
+    def test_checksum(self):
+        self._write(xl_ledger.DiffLedger(self.workbook), {('Areas', 'A1'): 1.0})
+        path = xl_ledger.DiffLedger.ledger_path(self.workbook)
+        with open(path) as f:
+            text = f.read()
+        with open(path, 'w') as f:
+            f.write(text.replace('1.0', '2.0'))
+
+        self.assertEqual(xl_ledger.DiffLedger.load(self.workbook).cells, {})
+
+    def test_verify_checks_every_cell(self):
+        ledger = xl_ledger.DiffLedger(self.workbook)
+        cells = dict((('Areas', 'A{}'.format(row)), float(row)) for row in range(1, 101))
+        cells[('Areas', 'B1:C2')] = 5
+        cells[('Areas', 'D1')] = '=A1*2'
+        self._write(ledger, cells)
+        workbook = dict(((sheet, rng), val) for (sheet, rng), val in cells.items())
+        workbook[('Areas', 'B1:C2')] = ((5.0, 5.0), (5.0, 5.0))
+        reads = []
+
+        def read_values(fields):
+            reads.append(len(fields))
+            return [workbook[field] for field in fields]
+
+        self.assertTrue(ledger.verify(read_values))
+        self.assertEqual(reads, [101])
+
+        workbook[('Areas', 'A77')] = 0.0
+        self.assertFalse(ledger.verify(read_values))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+import xl_obj
+
+class Test_xl_obj(unittest.TestCase):
+    def test_addresses(self):
+        cell = xl_obj.PHPP_XL_Obj('Areas', '$AJ$41', 12.5)
+        column_row = xl_obj.PHPP_XL_Obj('Areas', ('AJ', '41'), 12.5)
+        named = xl_obj.PHPP_XL_Obj('Areas', 'Surface_Block', 12.5)
+        multi_cell = xl_obj.PHPP_XL_Obj('Areas', 'A1:B2', 12.5)
+
+        self.assertEqual((cell.row, cell.col, cell.Range), (41, 36, 'AJ41'))
+        self.assertEqual((column_row.row, column_row.col, column_row.Range), (41, 36, 'AJ41'))
+        self.assertEqual([o.is_single_cell for o in (cell, named, multi_cell)], [True, False, False])
+        self.assertEqual((named.Range, multi_cell.Range), ('Surface_Block', 'A1:B2'))
+
+        cell.Range = 'A1:B2'
+        self.assertEqual((cell.is_single_cell, cell.Range), (False, 'A1:B2'))
+
+    def test_from_cell_matches_init(self):
+        obj = xl_obj.PHPP_XL_Obj('Ground', 'B9', 2.0, 'W/MK', 'HR-FT2-F/BTU-IN')
+        loaded = xl_obj.PHPP_XL_Obj.from_cell('Ground', 9, 2, 2.0, 'W/MK', 'HR-FT2-F/BTU-IN')
+
+        self.assertEqual(repr(loaded), repr(obj))
+        self.assertEqual(loaded.getValue('IP'), obj.getValue('IP'))
+
+    def test_worksheets_are_shared(self):
+        a = xl_obj.PHPP_XL_Obj('U-Values', 'M12', 0.5)
+        b = xl_obj.PHPP_XL_Obj('U-Values', 'M13', 0.6)
+
+        self.assertEqual(a.sheet_id, b.sheet_id)
+        self.assertEqual(a.getWorksheet('IP'), 'R-Values')
+        self.assertEqual(xl_obj.PHPP_XL_Obj('Additional Vent', 'A1', 1).getWorksheet('IP'), 'Addl vent')
+
+        b.Worksheet = 'Areas'
+        self.assertEqual((a.Worksheet, b.Worksheet, b.getWorksheet('IP')), ('U-Values', 'Areas', 'Areas'))
+
+    def test_values(self):
+        self.assertAlmostEqual(xl_obj.PHPP_XL_Obj('Areas', 'A1', 1.0, 'M', 'FT').getValue('IP'), 3.280839895)
+        self.assertEqual(xl_obj.PHPP_XL_Obj('Areas', 'A1', 1.0, 'M', 'FT').getValue('SI'), 1.0)
+        self.assertEqual(xl_obj.PHPP_XL_Obj('Areas', 'A1', '=B1', 'M', 'FT').getValue('IP'), '=B1')
+        self.assertEqual(xl_obj.PHPP_XL_Obj('Areas', 'A1', 'North').getValue('IP'), 'North')
+        self.assertEqual(xl_obj.PHPP_XL_Obj('Areas', 'A1', 'North', 'M', 'FT').getValueOrRaw('IP', []), 'North')
+
+    def test_slots(self):
+        obj = xl_obj.PHPP_XL_Obj('Areas', 'A1', 1.0)
+        self.assertFalse(hasattr(obj, '__dict__'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+import xl_plan
+
+class _Defaults(object):
+    def __init__(self, cells):
+        self.cells = cells
+    def is_default(self, sheet, address, value):
+        return self.cells.get((sheet, address)) == value
+
+class Test_xl_plan(unittest.TestCase):
+    def test_last_write_wins_and_sorted(self):
+        items = [('Verification', 'R78', 'a'), ('Areas', 'AK41', 2), ('Areas', '$AJ$41', 1),
+                 ('Verification', 'R78', 'b'), ('Areas', 'AJ41', 3)]
+
+        plan = xl_plan.compile_plan(items)
+
+        self.assertEqual(list(plan.cells.items()),
+                         [(('Areas', 'AJ41'), 3), (('Areas', 'AK41'), 2), (('Verification', 'R78'), 'b')])
+        self.assertEqual(plan.overwritten, {'Areas': 1, 'Verification': 1})
+
+    def test_ranges_expanded_or_kept_in_order(self):
+        items = [('Areas', 'A1:B1', [[1, 2]]), ('Areas', 'B1', 5),
+                 ('Areas', 'Some_Name', 'x'), ('Areas', 'C1:C2', '=A1')]
+
+        plan = xl_plan.compile_plan(items)
+
+        self.assertEqual(list(plan.cells.items()),
+                         [(('Areas', 'A1'), 1), (('Areas', 'B1'), 5),
+                          (('Areas', 'Some_Name'), 'x'), (('Areas', 'C1:C2'), '=A1')])
+
+    def test_cell_after_an_overlapping_range(self):
+        items = [('Areas', 'B1', 1), ('Areas', 'A1', 1), ('Areas', 'A1:B2', '=0'),
+                 ('Areas', 'B2', 2), ('Areas', 'A1', 3), ('Areas', 'C1', 4)]
+
+        plan = xl_plan.compile_plan(items)
+
+        # A1 is written after the range, so it keeps its last value
+        self.assertEqual(list(plan.cells.items()),
+                         [(('Areas', 'B1'), 1), (('Areas', 'A1:B2'), '=0'),
+                          (('Areas', 'A1'), 3), (('Areas', 'C1'), 4), (('Areas', 'B2'), 2)])
+        self.assertEqual(plan.overwritten, {'Areas': 1})
+
+    def test_prune_defaults_keeps_owned_and_reset(self):
+        plan = xl_plan.compile_plan([('Areas', 'A1', 0), ('Areas', 'A2', 0),
+                                     ('Areas', 'A3', 1), ('Data', 'A1', 0)])
+        defaults = _Defaults({('Areas', 'A1'): 0, ('Areas', 'A2'): 0, ('Data', 'A1'): 0})
+
+        count = plan.prune_defaults(defaults, _owned={('Areas', 'A2'): 7}, _skip_sheets=['Data'])
+
+        self.assertEqual(count, 1)
+        self.assertEqual(list(plan.cells), [('Areas', 'A2'), ('Areas', 'A3'), ('Data', 'A1')])
+
+    def test_content_key_with_unhashable_values(self):
+        items = [('Areas', 'Some_Name', [[1, 2], [3, 4]]), ('Areas', 'A1', 1)]
+
+        key = xl_plan.compile_plan(items).content_key()
+
+        self.assertEqual(key, xl_plan.compile_plan(list(items)).content_key())
+        self.assertNotEqual(key, xl_plan.compile_plan([('Areas', 'Some_Name', [[1, 2], [3, 5]])]).content_key())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import os
+import shutil
+import tempfile
+import unittest
+import xl_obj
+import xl_planfile
+
+class Test_xl_planfile(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, 'test' + xl_planfile.FILE_EXTENSION)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_round_trip(self):
+        objects = [xl_obj.PHPP_XL_Obj('Areas', ('AJ', 41), 12.5, 'M2', 'FT2'),
+                   xl_obj.PHPP_XL_Obj('Areas', 'AK41', 'Wall\tNorth\\1\n'),
+                   xl_obj.PHPP_XL_Obj('Verification', 'A1:B1', [[1, 2]]),
+                   xl_obj.PHPP_XL_Obj('Data', 'B4', None),
+                   xl_obj.PHPP_XL_Obj('Data', 'B5', True),
+                   xl_obj.PHPP_XL_Obj('Data', 'B6', 7)]
+
+        header = xl_planfile.write_plan(self.path, [objects[:2], objects[2:]], 'abc123')
+        loaded = list(xl_planfile.iter_objects([self.path]))
+
+        self.assertEqual(header['objects'], 6)
+        self.assertEqual(xl_planfile.read_header(self.path)['model_hash'], 'abc123')
+        fields = lambda obj: (obj.Worksheet, obj.Range, obj.Value, obj.Unit_SI, obj.Unit_IP)
+        self.assertEqual([fields(obj) for obj in loaded], [fields(obj) for obj in objects])
+        self.assertIs(type(loaded[5].Value), int)
+
+    def test_not_a_plan(self):
+        with open(self.path, 'w') as f:
+            f.write('Some other file\n')
+
+        self.assertRaises(xl_planfile.PlanFileError, xl_planfile.read_header, self.path)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+import xl_profile
+
+class FakeRange(object):
+    def __init__(self):
+        self.Value2 = None
+
+class FakeSheet(object):
+    def __init__(self, _name):
+        self.Name = _name
+        self.Range = {'A1': FakeRange()}
+
+    def Unprotect(self):
+        pass
+
+class FakeApp(object):
+    Calculation = -4105
+
+    def Calculate(self):
+        pass
+
+class FakeExcel(object):
+    def __init__(self):
+        self.excel_app = FakeApp()
+        self.active_workbook = object()
+        self.sheets_dict = {'Areas': FakeSheet('Areas')}
+
+class Test_xl_profile(unittest.TestCase):
+    def test_counts_calls(self):
+        excel = FakeExcel()
+        xl_profile.instrument(excel)
+        stats = xl_profile.start(excel)
+
+        sheet = excel.sheets_dict['Areas']
+        sheet.Unprotect()
+        sheet.Range['A1'].Value2 = 12.5
+        self.assertEqual(sheet.Range['A1'].Value2, 12.5)
+        excel.excel_app.Calculate()
+
+        self.assertEqual(stats.categories['write'].calls, 1)
+        self.assertEqual(stats.categories['read'].calls, 1)
+        self.assertEqual(stats.categories['unprotect'].calls, 1)
+        self.assertEqual(stats.categories['recalc'].calls, 1)
+        self.assertEqual(stats.sheets['Areas'].calls, 5)
+        self.assertTrue(stats.summary_lines())
+
+    def test_uninstrument(self):
+        excel = FakeExcel()
+        app = excel.excel_app
+        xl_profile.instrument(excel)
+        xl_profile.uninstrument(excel)
+
+        self.assertIs(excel.excel_app, app)
+        self.assertIsNone(xl_profile.start(excel))
+
+if __name__ == '__main__':
+    unittest.main()
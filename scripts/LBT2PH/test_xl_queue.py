@@ -0,0 +1,85 @@
+import threading
+import unittest
+import xl_queue
+
+class Test_xl_queue(unittest.TestCase):
+    def test_newest_job_wins(self):
+        queue = xl_queue.WriteQueue('test')
+        started, release = threading.Event(), threading.Event()
+        written = []
+
+        def _slow():
+            started.set()
+            release.wait(5)
+            written.append('first')
+
+        queue.submit('first', _slow)
+        started.wait(5)
+        queue.submit('second', lambda: written.append('second'))
+        queue.submit('third', lambda: written.append('third'))
+        release.set()
+
+        self.assertTrue(queue.wait(5))
+        self.assertEqual(written, ['first', 'third'])
+        self.assertEqual(queue.jobs_dropped, 1)
+
+    def test_same_key_is_not_queued_again(self):
+        queue = xl_queue.WriteQueue()
+        self.assertTrue(queue.submit('state', lambda: 1))
+        queue.wait(5)
+
+        self.assertFalse(queue.submit('state', lambda: 2))
+        self.assertEqual(queue.last_result, 1)
+
+    def test_errors_cleared_by_a_successful_job(self):
+        queue = xl_queue.WriteQueue()
+
+        def _fail():
+            raise ValueError('Write failed')
+
+        queue.submit('bad', _fail)
+        queue.wait(5)
+        self.assertEqual(len(queue.status()['errors']), 1)
+
+        queue.submit('good', lambda: 'ok')
+        queue.wait(5)
+        self.assertEqual(queue.status()['errors'], [])
+        self.assertEqual(queue.last_result, 'ok')
+
+    def test_jobs_run_on_the_invoked_thread(self):
+        # Stands in for Rhino's UI thread: runs whatever is posted to it
+        posted = []
+        ui_thread = []
+
+        def _ui_loop():
+            ui_thread.append(threading.current_thread())
+            while True:
+                call = posted.pop(0) if posted else None
+                if call is None:
+                    if stop.wait(0.01):
+                        return
+                    continue
+                call()
+
+        stop = threading.Event()
+        loop = threading.Thread(target=_ui_loop)
+        loop.start()
+        try:
+            queue = xl_queue.WriteQueue()
+            queue.invoke = lambda call: xl_queue.call_on(posted.append, call)
+            queue.submit('state', lambda: threading.current_thread())
+            queue.wait(5)
+        finally:
+            stop.set()
+            loop.join(5)
+
+        self.assertIs(queue.last_result, ui_thread[0])
+
+    def test_call_on_raises_the_error(self):
+        def _fail():
+            raise ValueError('Write failed')
+
+        self.assertRaises(ValueError, xl_queue.call_on, lambda call: call(), _fail)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+import xl_ranges
+
+class Test_xl_ranges(unittest.TestCase):
+    def test_address_round_trip(self):
+        for address in ['A1', 'Z9', 'AA10', 'AL41', 'JB15', 'XFD1048576']:
+            row, col = xl_ranges.parse_address(address)
+            self.assertEqual(xl_ranges.format_address(row, col), address)
+
+    def test_parse_not_single_cell(self):
+        self.assertEqual(xl_ranges.parse_address('$AC$41'), (41, 29))
+        self.assertIsNone(xl_ranges.parse_address('A1:B2'))
+        self.assertIsNone(xl_ranges.parse_address('Some_Name'))
+
+    def test_coalesce_stacks_rows(self):
+        data = []
+        for row in range(41, 44):
+            data.append(('Areas', 'AJ{}'.format(row), 1))
+            data.append(('Areas', 'AK{}'.format(row), 2))
+            data.append(('Areas', 'AL{}'.format(row), 3))
+            data.append(('Areas', 'V{}'.format(row), 4))
+
+        blocks, leftovers = xl_ranges.coalesce(data)
+
+        self.assertEqual(leftovers, [])
+        self.assertEqual([b.address for b in blocks], ['V41:V43', 'AJ41:AL43'])
+        self.assertEqual(blocks[1].values, [[1, 2, 3]] * 3)
+
+    def test_coalesce_last_write_wins(self):
+        data = [('Verification', 'R78', 'a'), ('Verification', 'R78', 'b'),
+                ('Verification', 'A1:B2', 'c')]
+
+        blocks, leftovers = xl_ranges.coalesce(data)
+
+        self.assertEqual(len(blocks), 1)
+        self.assertEqual(blocks[0].values, [['b']])
+        self.assertEqual(leftovers, [('Verification', 'A1:B2', 'c')])
+
+    def test_coalesce_in_order(self):
+        data = [('Areas', 'A1', 'a'), ('Areas', 'A1:A2', 'b'), ('Areas', 'A2', 'c'),
+                ('Areas', 'B1', 'd')]
+
+        ordered = xl_ranges.coalesce_in_order(data)
+
+        # The range overwrites 'a' and is then partly overwritten by 'c'
+        self.assertEqual([getattr(o, 'address', o) for o in ordered],
+                         ['A1', ('Areas', 'A1:A2', 'b'), 'B1', 'A2'])
+        self.assertEqual(ordered[3].values, [['c']])
+
+    def test_join_addresses_max_length(self):
+        addresses = ['AJ{}:AL{}'.format(row, row + 1) for row in range(41, 141, 2)]
+
+        joined = xl_ranges.join_addresses(addresses)
+
+        self.assertTrue(all(len(j) <= xl_ranges.MAX_ADDRESS_LENGTH for j in joined))
+        self.assertEqual(','.join(joined).split(','), addresses)
+
+if __name__ == '__main__':
+    unittest.main()
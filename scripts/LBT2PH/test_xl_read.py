@@ -0,0 +1,49 @@
+import unittest
+import xl_read
+
+class _Excel(object):
+    """Reads '<sheet>!<address>#<n>' for each cell, n being the count of the user's edits """
+
+    def __init__(self):
+        self.sheets_dict = {'Areas': None}
+        self.calc_generation = 0
+        self.edits = 0
+        self.reads = []
+
+    def read_range(self, _sheet, _address):
+        self.reads.append((_sheet, _address))
+        value = '{}!{}#{}'.format(_sheet, _address, self.edits)
+        return [[value, value], [value, value]]
+
+class TestBlockCache(unittest.TestCase):
+    fields = [('Areas', 'A1'), ('Areas', 'B1'), ('Areas', 'A2'), ('Areas', 'B2')]
+
+    def test_reuses_blocks(self):
+        excel, cache = _Excel(), xl_read.BlockCache()
+        first = xl_read.read_fields(excel, self.fields, cache)
+        second = xl_read.read_fields(excel, self.fields, cache)
+
+        self.assertEqual(first, second)
+        self.assertEqual(len(excel.reads), 1)
+        self.assertEqual(cache.hits, 1)
+
+    def test_clear_drops_blocks(self):
+        excel, cache = _Excel(), xl_read.BlockCache()
+        xl_read.read_fields(excel, self.fields, cache)
+        excel.edits += 1
+        cache.clear()     # ie: at the end of the Grasshopper solution
+        values = xl_read.read_fields(excel, self.fields, cache)
+
+        self.assertEqual(len(excel.reads), 2)
+        self.assertTrue(all(v.endswith('#1') for v in values))
+
+    def test_recalculation_drops_blocks(self):
+        excel, cache = _Excel(), xl_read.BlockCache()
+        xl_read.read_fields(excel, self.fields, cache)
+        excel.calc_generation += 1
+        xl_read.read_fields(excel, self.fields, cache)
+
+        self.assertEqual(len(excel.reads), 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,28 @@
+import unittest
+import xl_recalc
+
+class Test_xl_recalc(unittest.TestCase):
+    def setUp(self):
+        self.dep_map = xl_recalc.DependencyMap()
+        self.dep_map.precedents = {'Data': set(), 'Climate': set(), 'Areas': set(),
+                                   'Verification': set(), 'Additional Vent': set()}
+        self.dep_map.add_formula('Areas', '=Data!B3*2')
+        self.dep_map.add_formula('Verification', "='Additional Vent'!A1+Areas!A1+\"Climate!A1\"")
+
+    def test_references(self):
+        self.assertEqual(self.dep_map.precedents['Verification'], set(['Additional Vent', 'Areas']))
+
+    def test_calculation_order(self):
+        self.assertEqual(self.dep_map.calculation_order(['Data']), ['Data', 'Areas', 'Verification'])
+        self.assertEqual(self.dep_map.calculation_order(['Climate']), ['Climate'])
+
+    def test_falls_back_to_full(self):
+        self.dep_map.add_formula('Data', '=Verification!A1')
+        self.assertIsNone(self.dep_map.calculation_order(['Data']))
+
+        self.dep_map.add_formula('Climate', '=INDIRECT(A1)')
+        self.assertIsNone(self.dep_map.calculation_order(['Climate']))
+        self.assertIsNone(self.dep_map.calculation_order(['Not A Sheet']))
+
+if __name__ == '__main__':
+    unittest.main()
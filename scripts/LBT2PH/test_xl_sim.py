@@ -0,0 +1,46 @@
+import unittest
+import xl_sim
+import xl_write
+
+class Test_xl_sim(unittest.TestCase):
+    def setUp(self):
+        self.data = [('Areas', 'A{}'.format(row), float(row)) for row in range(1, 101)]
+        self.data += [('Areas', 'B{}'.format(row), 'Wall {}'.format(row)) for row in range(1, 101)]
+
+    def make_sim(self):
+        sim = xl_sim.SimExcelInstance(xl_sim.LatencyModel(0.001, 0.00001), ['Areas', 'Windows'])
+        sim.excel_app.Calculation = -4135
+        sim.require_sheets(['Areas'])
+        return sim
+
+    def test_values_and_ranges(self):
+        sim = self.make_sim()
+        sheet = sim.sheets_dict['Areas']
+        sheet.Range['A1:B2'].Value2 = [[1, 'a'], [2]]
+        self.assertEqual(sheet.Range['A1:B2'].Value2, ((1.0, 'a'), (2.0, '#N/A')))
+        self.assertEqual(sheet.Range['B1'].Value2, 'a')
+
+        sheet.Range['A1,C3:C4'].Interior.ColorIndex = 8
+        self.assertEqual(sorted(sheet.colors), [(1, 1), (3, 3), (4, 3)])
+
+    def test_protected_sheet(self):
+        sim = self.make_sim()
+        with self.assertRaises(xl_sim.SimError):
+            sim.active_workbook.Worksheets['Windows'].Range['A1'].Value2 = 1
+
+        # Like ExcelInstance, the sheets_dict unprotects a sheet when it is first used
+        sim.sheets_dict['Windows'].Range['A1'].Value2 = 1
+        sim.sheets_dict['Windows'].Range['A2'].Value2 = 2
+        self.assertEqual(sim.calls['Unprotect'], 2)
+        self.assertEqual(sim.sheets_dict['Windows'].values, {(1, 1): 1.0, (2, 1): 2.0})
+
+    def test_block_writer_is_faster(self):
+        by_cell, by_block = self.make_sim(), self.make_sim()
+        xl_write.write_cells(by_cell, self.data)
+        xl_write.write_blocks(by_block, self.data)
+
+        self.assertEqual(by_cell.sheets_dict['Areas'].values, by_block.sheets_dict['Areas'].values)
+        self.assertLess(by_block.clock, by_cell.clock / 10)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+import xl_obj
+import xl_sweep
+
+SHEET_XML = (u'<?xml version="1.0" encoding="UTF-8"?><worksheet><sheetData>{}</sheetData></worksheet>')
+WORKBOOK_XML = (u'<?xml version="1.0" encoding="UTF-8"?><workbook><sheets>'
+                u'<sheet name="Data" sheetId="1" r:id="rId1"/><sheet name="Verification" sheetId="2" r:id="rId2"/>'
+                u'</sheets></workbook>')
+RELS_XML = (u'<?xml version="1.0" encoding="UTF-8"?><Relationships>'
+            u'<Relationship Id="rId1" Type="x/worksheet" Target="worksheets/sheet1.xml"/>'
+            u'<Relationship Id="rId2" Type="x/worksheet" Target="worksheets/sheet2.xml"/>'
+            u'</Relationships>')
+
+
+class Test_xl_sweep(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.template = os.path.join(self.folder, 'PHPP.xlsx')
+        with zipfile.ZipFile(self.template, 'w') as z:
+            z.writestr('[Content_Types].xml', u'<Types/>')
+            z.writestr('xl/workbook.xml', WORKBOOK_XML)
+            z.writestr('xl/_rels/workbook.xml.rels', RELS_XML)
+            z.writestr('xl/worksheets/sheet1.xml', SHEET_XML.format(
+                u'<row r="1"><c r="A1"><v>1</v></c></row><row r="2"><c r="A2"><v>1</v></c></row>'))
+            z.writestr('xl/worksheets/sheet2.xml', SHEET_XML.format(
+                u'<row r="1"><c r="A1"><f>Data!A1*Data!A2</f><v>1</v></c>'
+                u'<c r="B1"><f>INDIRECT("Data!A1")+Data!A2</f><v>2</v></c>'
+                u'<c r="C1"><f>A1+Data!A2</f><v>2</v></c></row>'))
+
+        self.base = [xl_obj.PHPP_XL_Obj('Data', 'A1', 2.0, 'M', 'FT')]
+        self.parameters = [xl_sweep.Parameter.from_text('Size: Data!A1 = 1 | 3'),
+                           xl_sweep.Parameter('Factor', ['Data!A2'], [10, 100])]
+        self.sweep = xl_sweep.Sweep(self.template, self.base, self.parameters,
+                                    [['Result', 'Verification', 'A1']], 'SI')
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_write_plan(self):
+        variant = self.sweep.variants()[3]
+        self.assertEqual(variant.values, [3.0, 100])
+
+        plan = self.sweep.write_plan(variant)
+        self.assertEqual([(o.Worksheet, o.Range, o.Value) for o in plan], [('Data', 'A1', 3.0), ('Data', 'A2', 100)])
+        self.assertEqual(plan[0].Unit_IP, 'FT')
+        self.assertEqual(self.base[0].Value, 2.0)
+
+    def test_run(self):
+        table = self.sweep.run(1, self.folder)
+        self.assertEqual(table.columns, ['Variant', 'Size', 'Factor', 'Result', 'Error'])
+        self.assertEqual([values[-1] for _, values, _ in table.rows], [10.0, 100.0, 30.0, 300.0])
+        self.assertFalse(table.errors)
+        self.assertTrue(os.path.isfile(os.path.join(self.folder, 'PHPP_0003.xlsx')))
+
+        table = self.sweep.run(2)
+        self.assertEqual([values[-1] for _, values, _ in table.rows], [10.0, 100.0, 30.0, 300.0])
+
+    def test_unsupported_formulas(self):
+        sweep = xl_sweep.Sweep(self.template, self.base, self.parameters,
+                               [['Result', 'Verification', 'A1'], ['Other', 'Verification', 'B1']], 'SI')
+
+        for processes in (1, 2):
+            table = sweep.run(processes)
+            self.assertEqual(list(table.unsupported), [('Verification', 1, 2)])
+            self.assertEqual([values[-2] for _, values, _ in table.rows], [10.0, 100.0, 30.0, 300.0])
+
+    def test_base_value_over_a_formula(self):
+        # The base plan writes a value over Verification!A1, which C1 reads
+        runner = xl_sweep.VariantRunner(self.template, {'Verification': {(1, 1): 5}},
+                                        [['Result', 'Verification', 'C1']])
+        self.assertEqual(runner.run(('v1', {'Data': {(2, 1): 10}})), ([15.0], None))
+        self.assertEqual(runner.run(('v2', {'Data': {(1, 1): 10}})), ([6.0], None))
+
+    def test_duplicate_names(self):
+        self.assertRaises(ValueError, xl_sweep.SweepTable, ['Size', 'Result'], ['Result'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import os
+import shutil
+import tempfile
+import unittest
+import xl_template
+
+class Test_xl_template(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.template = os.path.join(self.folder, 'template.xlsx')
+        with open(self.template, 'wb') as f:
+            f.write(b'PHPP' * 1000)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_make_copy(self):
+        store = xl_template.TemplateStore()
+        target = os.path.join(self.folder, 'new.xlsx')
+        store.make_copy(self.template, target)
+        store.make_copy(self.template, os.path.join(self.folder, 'new_2.xlsx'))
+
+        with open(target, 'rb') as f:
+            self.assertEqual(f.read(), b'PHPP' * 1000)
+        self.assertTrue(store.is_loaded(target))
+        self.assertEqual(store.disk_reads, 1)
+
+    def test_clone_does_not_read_the_template(self):
+        clone_functions = xl_template._clone_functions
+        xl_template._clone_functions = lambda: [('test clone', shutil.copyfile)]
+        try:
+            store = xl_template.TemplateStore()
+            target = os.path.join(self.folder, 'new.xlsx')
+            self.assertEqual(store.make_copy(self.template, target), 'test clone')
+            self.assertEqual(store.disk_reads, 0)
+            self.assertFalse(store.is_loaded(target))
+
+            # Once the template is in memory, the clones are known to be the same
+            store.content_hash(self.template)
+            store.make_copy(self.template, target)
+            self.assertTrue(store.is_loaded(target))
+            self.assertEqual(store.disk_reads, 1)
+        finally:
+            xl_template._clone_functions = clone_functions
+
+    def test_same_content_is_stored_once(self):
+        store = xl_template.TemplateStore()
+        other = os.path.join(self.folder, 'other.xlsx')
+        shutil.copyfile(self.template, other)
+
+        self.assertEqual(store.content_hash(self.template), store.content_hash(other))
+        self.assertEqual(len(store.blobs), 1)
+        self.assertEqual(store.open_file(other).read(), b'PHPP' * 1000)
+
+if __name__ == '__main__':
+    unittest.main()
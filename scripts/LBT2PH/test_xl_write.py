@@ -0,0 +1,78 @@
+import unittest
+import xl_write
+
+class _Interior(object):
+    def __init__(self, sheet, address):
+        self.__dict__.update(sheet=sheet, address=address)
+
+    def __setattr__(self, name, value):
+        fail = self.sheet.fail_highlight
+        if fail is True or (callable(fail) and fail(self.address)):
+            raise Exception('Highlight failed')
+        self.sheet.colored.append(self.address)
+
+class _Range(object):
+    def __init__(self, sheet, address):
+        self.__dict__.update(sheet=sheet, address=address, Interior=_Interior(sheet, address))
+
+    def __setattr__(self, name, value):
+        self.sheet.writes.append((self.address, value))
+
+class _Sheet(object):
+    def __init__(self, fail_highlight=False):
+        self.writes = []
+        self.colored = []
+        self.fail_highlight = fail_highlight
+
+    @property
+    def Range(self):
+        return _Ranges(self)
+
+class _Ranges(object):
+    def __init__(self, sheet):
+        self.sheet = sheet
+
+    def __getitem__(self, address):
+        return _Range(self.sheet, address)
+
+class _Excel(object):
+    def __init__(self, fail_highlight=False):
+        self.sheets_dict = {'Areas': _Sheet(fail_highlight)}
+
+    @staticmethod
+    def to_2d_array(_rows):
+        return _rows
+
+class Test_xl_write(unittest.TestCase):
+    def test_write_blocks_in_order(self):
+        excel = _Excel()
+        data = [('Areas', 'A1', 'a'), ('Areas', 'A2', 'b'), ('Areas', 'Name', 'c'), ('Areas', 'B1', 'd')]
+
+        report = xl_write.write_blocks(excel, data)
+
+        self.assertEqual(excel.sheets_dict['Areas'].writes,
+                         [('A1:A2', [['a'], ['b']]), ('Name', 'c'), ('B1', [['d']])])
+        self.assertEqual(report.cells, 4)
+        self.assertEqual(report.warnings, [])
+
+    def test_highlight_failure_does_not_write_again(self):
+        excel = _Excel(fail_highlight=True)
+        data = [('Areas', 'A1', 'a'), ('Areas', 'B1', 'b')]
+
+        report = xl_write.write_blocks(excel, data)
+
+        self.assertEqual(excel.sheets_dict['Areas'].writes, [('A1:B1', [['a', 'b']])])
+        self.assertTrue(report.warnings)
+
+    def test_highlight_colors_each_area_after_a_failure(self):
+        # The joined address and one of its areas fail, the other areas are still colored
+        excel = _Excel(fail_highlight=lambda address: ',' in address or address == 'C3')
+        report = xl_write.WriteReport()
+
+        xl_write.highlight(excel, [('Areas', 'A1'), ('Areas', 'C3'), ('Areas', 'E5')], report)
+
+        self.assertEqual(excel.sheets_dict['Areas'].colored, ['A1', 'E5'])
+        self.assertEqual(len(report.warnings), 1)
+
+if __name__ == '__main__':
+    unittest.main()
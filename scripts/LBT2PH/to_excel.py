@@ -8,106 +8,13 @@ from System import Object
 
 import LBT2PH
 import LBT2PH.dhw
+import LBT2PH.xl_obj
 
 reload( LBT2PH )
 reload( LBT2PH.dhw )
+reload( LBT2PH.xl_obj )
 
-class PHPP_XL_Obj:
-    """ A holder for an Excel writable datapoint with a worksheet, range and value """
-    
-    # {Unit You have: {Unit you Want}, {...}, ...}
-    conversionSchema = {
-            'C'    : {'SI':'*1', 'C':'*1', 'F':'*1.8+32'},
-            'LITER': {'SI':'*1', 'LITER':'*1', 'GALLON':'*0.264172'},
-            'MM'   : {'SI':'*1', 'MM':'*1', 'FT':'*0.00328084', 'IN':'*0.0394'},
-            'M'    : {'SI':'*1', 'M':'*1', 'FT':'*3.280839895', 'IN':'*39.3701'},
-            'M/DAY': {'SI':'*1', 'M/DAY':'*1', 'FT/DAY':'*3.280839895'},
-            'M2'   : {'SI':'*1', 'M2':'*1', 'FT2':'*10.76391042'},
-            'M3'   : {'SI':'*1', 'M3':'*1', 'FT3':'*35.31466672'},
-            'M3/H' : {'SI':'*1', 'M3/H':'*1', 'CFM':'*0.588577779'},
-            'WH/M3': {'SI':'*1', 'WH/M3':'*1', 'W/CFM':'*1.699010796'},
-            'WH/KM2':{'SI':'*1', 'WH/KM2':'*1', 'BTU/FT2':'*0.176110159'},
-            'MJ/M3K':{'SI':'*1', 'MJ/M3K':'*1', 'BTU/FT3-F':'*14.91066014'},
-            'W/M2K': {'SI':'*1', 'W/M2K':'*1', 'BTU/HR-FT2-F':'*0.176110159','HR-FT2-F/BTU':'**-1*5.678264134' },
-            'M2K/W': {'SI':'*1', 'M2K/W':'*1', 'HR-FT2-F/BTU':'*5.678264134'},
-            'W/MK' : {'SI':'*1', 'W/MK':'*1', 'HR-FT2-F/BTU-IN':'**-1*0.144227909', 'BTU/HR-FT-F':'*0.577789236'},
-            'W/K'  : {'SI':'*1', 'W/K':'*1', 'BTU/HR-F':'*1.895633976'},
-            'KW'   : {'SI':'*1', 'KW':'*1','BTU/H':'*3412.141156', 'KBTU/H':'*3.412141156'},
-            'W/W'  : {'SI':'*1', 'W/W':'*1', 'BTU/HW':'*3.412141156'} # SEER
-            }
-    
-    def __init__(self, _shtNm, _rangeAddress, _val, _unitSI=None, _unitIP='SI'):
-        """
-        Args:
-            _shtNm (str): The Name of the Worksheet to write to
-            _rangeAddress (str): The Cell Range (A1, B12, etc...) to write to on the Worksheet
-            _val (str): The Value to write to the Cell Range (Value2)
-            _unitSI: (str) The SI unit for the item
-            _unitIP: (str) The IP unit for the item
-        """
-        self.Worksheet = _shtNm
-        self.Range = _rangeAddress
-        self.Value = _val
-        self.Unit_SI = _unitSI
-        self.Unit_IP = _unitIP
-    
-    def getWorksheet(self, _units='SI'):
-        if _units == 'SI':
-            return self.Worksheet
-        
-        if self.Worksheet == 'U-Values':
-            return 'R-Values'
-        elif self.Worksheet == 'Additional Vent':
-            return 'Addl vent'
-        else:
-            return self.Worksheet
-    
-    def getValue(self, _targetUnit='SI'):
-        """ Get the Item Value properly. Allows for unit conversion.
-        
-        For instance calling "obj.getValue(obj.Unit_IP)" will return the 
-        converted value into Inch-Pound units. Pass 'SI' or leave 
-        input blank for no conversion (return = self.Value x 1.0)
-        
-        Args:
-            _targetUnit: (str) The unit to convert the value to. 'SI' or 'IP'
-        Returns:
-            value converted into the right units
-        """
-        
-        if not self.Unit_SI:
-            return self.Value
-        
-        if _targetUnit == 'IP':
-            targetUnit = self.Unit_IP
-        elif _targetUnit == 'SI':
-            targetUnit = self.Unit_SI
-        else:
-            targetUnit = _targetUnit
-        
-        try:
-            schema = self.conversionSchema.get(self.Unit_SI, {'SI':1})
-            conversionFactor = schema.get(targetUnit, 1)
-
-            expression = str(self.Value)+str(conversionFactor)
-            result = eval( expression )
-
-            return result
-        except:
-            return self.Value
-    
-    def __unicode__(self):
-        return u"PHPP Obj | Worksheet: {self.Worksheet}  |  Cell: {self.Range}  |  Value: {self.Value}".format(self=self)
-    def __str__(self):
-        return unicode(self).encode('utf-8')
-    def __repr__(self):
-       return "{}( _shtNm={!r}, _rangeAddress={!r}, _val={!r}, _unitSI={!r}, _unitIP={!r}".format(
-               self.__class__.__name__,
-               self.Worksheet,
-               self.Range,
-               self.Value,
-               self.Unit_SI,
-               self.Unit_IP)
+PHPP_XL_Obj = LBT2PH.xl_obj.PHPP_XL_Obj
 
 def include_rooms(_hb_rooms, _rooms_to_include, _rooms_to_exclude, _ghenv ):
     hb_room_names = None
@@ -126,28 +33,37 @@ def include_rooms(_hb_rooms, _rooms_to_include, _rooms_to_exclude, _ghenv ):
     
     return hb_room_names
 
-def start_rows( _udIn, _ghenv ):
+def start_rows( _udIn, _ghenv, _layout=None ):
     """Takes in the dictionary of start rows and any user-determined inputs
     modifies the dict values based on iputs. This is useful if the user has
     modified the PHPP for some reason and the start rows no longer align with 
     the normal ones. This happens esp. if the user adds more rows for an XXL
-    size PHPP. (more rooms, more areas, etc...)"""
+    size PHPP. (more rooms, more areas, etc...)
+    
+    If a LayoutIndex (see xl_layout) is passed in, the rows it found in the
+    template are used in place of the defaults, or of the 'bldgtyp_standard'
+    ones: they are where the tables really are in that file. User inputs still win."""
 
     default_start_rows = {'Additional Ventilation': 
                 {'Rooms':56,
                 'Vent Unit Selection':97,
                 'Vent Ducts':127 },
             'Components':
-                {'Ventilator':15},
+                {'Ventilator':15, 'Glazing':15, 'Frames':15},
             'Areas':
                 {'TB':145, 'Surfaces':41},
             'Electricity non-res':
                 {'Lighting': 19,
                 'Office Equip': 62,
                 'Kitchen':77},
+            'U-Values':
+                {'Constructions':10},
+            'Windows':
+                {'Windows':24},
+            'Shading':
+                {'Windows':17},
             }
     
-
     # For the 'normal' long format BLDGTYP PHPP files. Only works if you 
     # work for BLDGTYP and have one of our PHPPs. Sorry.
     bldgtyp_standard = {'Additional Ventilation': 
@@ -155,20 +71,33 @@ def start_rows( _udIn, _ghenv ):
                 'Vent Unit Selection':141,
                 'Vent Ducts':171 },
             'Components':
-                {'Ventilator':15},
+                {'Ventilator':15, 'Glazing':15, 'Frames':15},
             'Areas':
                 {'TB':145, 'Surfaces':41},
             'Electricity non-res':
                 {'Lighting': 19,
                 'Office Equip': 62,
                 'Kitchen':77},
+            'U-Values':
+                {'Constructions':10},
+            'Windows':
+                {'Windows':24},
+            'Shading':
+                {'Windows':17},
             }
 
+    if _udIn and any(str(each) == 'bldgtyp_standard' for each in _udIn):
+        default_start_rows = bldgtyp_standard
+    
+    if _layout:
+        for worksheet, rows in _layout.found_rows().items():
+            default_start_rows.setdefault(worksheet, {}).update(rows)
+    
     if _udIn:
         try:
             for each in _udIn:
                 if str(each) == 'bldgtyp_standard':
-                    return bldgtyp_standard
+                    continue
                 
                 parsed = each.split(':')
                 newRowStart = int(parsed[1])
@@ -182,7 +111,14 @@ def start_rows( _udIn, _ghenv ):
     else:
         return default_start_rows
 
-def build_u_values(_constructions_opaque, _materials_opaque):
+def _get_start_row(_start_rows, _worksheet, _table, _default):
+    """The table's first row from the start rows dict (or LayoutIndex), if it's in there """
+
+    if not _start_rows:
+        return _default
+    return (_start_rows.get(_worksheet) or {}).get(_table, _default)
+
+def build_u_values(_constructions_opaque, _materials_opaque, _start_rows=None):
     def is_window( _opaque_material_names, _const ):
         # Check if any of the materials are NOT in the opaque mat list
         layer_names = (layer.layer_name for layer in _const.Layers)
@@ -195,7 +131,7 @@ def build_u_values(_constructions_opaque, _materials_opaque):
     
     uID_Count = 1
     uValueUID_Names = {}
-    uValuesConstructorStartRow = 10
+    uValuesConstructorStartRow = _get_start_row(_start_rows, 'U-Values', 'Constructions', 10)
     uValuesList = []
 
     # Get all the Opaque Construction Material Names
@@ -211,10 +147,10 @@ def build_u_values(_constructions_opaque, _materials_opaque):
         uValueUID_Names[eachConst.hb_display_name] = '{:02d}ud-{}'.format(uID_Count, eachConst.phpp_name)
         
         # Create the Objects for the Header Piece (Name, Rsi, Rse)
-        nameAddress = '{}{}'.format('M', uValuesConstructorStartRow + 1) # Construction Name
-        rSi = '{}{}'.format('M', uValuesConstructorStartRow + 3) # R-surface-int
-        rSe = '{}{}'.format('M', uValuesConstructorStartRow + 4) # R-surface-ext
-        intIns = '{}{}'.format('S', uValuesConstructorStartRow + 1) # Interior Insulation Flag
+        nameAddress = ('M', uValuesConstructorStartRow + 1) # Construction Name
+        rSi = ('M', uValuesConstructorStartRow + 3) # R-surface-int
+        rSe = ('M', uValuesConstructorStartRow + 4) # R-surface-ext
+        intIns = ('S', uValuesConstructorStartRow + 1) # Interior Insulation Flag
         
         uValuesList.append( PHPP_XL_Obj('U-Values', nameAddress, eachConst.phpp_name))
         uValuesList.append( PHPP_XL_Obj('U-Values', rSi, 0, 'M2K/W', 'HR-FT2-F/BTU'))
@@ -234,9 +170,9 @@ def build_u_values(_constructions_opaque, _materials_opaque):
                     layerThickness = layer_material.LayerThickness * 1000 # Cus PHPP uses mm for thickness
                     
                     # Set up the Range tagets
-                    layer1Address_L = '{}{}'.format('L', uValuesConstructorStartRow + 7 + layerCount) # Material Name
-                    layer1Address_M = '{}{}'.format('M', uValuesConstructorStartRow + 7 + layerCount) # Conductivity
-                    layer1Address_S = '{}{}'.format('S', uValuesConstructorStartRow + 7 + layerCount) # Thickness
+                    layer1Address_L = ('L', uValuesConstructorStartRow + 7 + layerCount) # Material Name
+                    layer1Address_M = ('M', uValuesConstructorStartRow + 7 + layerCount) # Conductivity
+                    layer1Address_S = ('S', uValuesConstructorStartRow + 7 + layerCount) # Thickness
                     
                     # Create the Layer Objects
                     uValuesList.append( PHPP_XL_Obj('U-Values', layer1Address_L, layer_material.phpp_name))# Material Name
@@ -250,8 +186,9 @@ def build_u_values(_constructions_opaque, _materials_opaque):
     
     return uValuesList, uValueUID_Names
 
-def build_components(_inputBranch):
-    winComponentStartRow = 15
+def build_components(_inputBranch, _start_rows=None):
+    winComponentStartRow = _get_start_row(_start_rows, 'Components', 'Glazing', 15)
+    frameComponentStartRow = _get_start_row(_start_rows, 'Components', 'Frames', 15)
     frame_Count = 0
     glass_Count = 0
     winComponentsList = []
@@ -273,9 +210,9 @@ def build_components(_inputBranch):
             glassNameDict[gNm] = '{:02d}ud-{}'.format(glass_Count+1, gNm)
             
             # Set the glass range addresses
-            Address_Gname = '{}{}'.format('IE', winComponentStartRow + glass_Count) # Name
-            Address_Gvalue = '{}{}'.format('IF', winComponentStartRow + glass_Count) # g-Value
-            Address_Uvalue = '{}{}'.format('IG', winComponentStartRow + glass_Count) # U-Value
+            Address_Gname = ('IE', winComponentStartRow + glass_Count) # Name
+            Address_Gvalue = ('IF', winComponentStartRow + glass_Count) # g-Value
+            Address_Uvalue = ('IG', winComponentStartRow + glass_Count) # U-Value
             
             # Create the PHPP write Objects
             winComponentsList.append( PHPP_XL_Obj('Components', Address_Gname, gNm))# Glass Type Name
@@ -301,23 +238,23 @@ def build_components(_inputBranch):
             frameNameDict[fNm] = '{:02d}ud-{}'.format(frame_Count+1, fNm) # was glass_count????
             
             # Set the frame range address
-            Address_Fname = '{}{}'.format('IL', winComponentStartRow + frame_Count)
-            Address_Uf_Left = '{}{}'.format('IM', winComponentStartRow + frame_Count)
-            Address_Uf_Right = '{}{}'.format('IN', winComponentStartRow + frame_Count)
-            Address_Uf_Bottom = '{}{}'.format('IO', winComponentStartRow + frame_Count)
-            Address_Uf_Top = '{}{}'.format('IP', winComponentStartRow + frame_Count)
-            Address_W_Left = '{}{}'.format('IQ', winComponentStartRow + frame_Count)
-            Address_W_Right = '{}{}'.format('IR', winComponentStartRow + frame_Count)
-            Address_W_Bottom = '{}{}'.format('IS', winComponentStartRow + frame_Count)
-            Address_W_Top = '{}{}'.format('IT', winComponentStartRow + frame_Count)
-            Address_Psi_g_Left = '{}{}'.format('IU', winComponentStartRow + frame_Count)
-            Address_Psi_g_Right = '{}{}'.format('IV', winComponentStartRow + frame_Count)
-            Address_Psi_g_Bottom = '{}{}'.format('IW', winComponentStartRow + frame_Count)
-            Address_Psi_g_Top = '{}{}'.format('IX', winComponentStartRow + frame_Count)
-            Address_Psi_I_Left = '{}{}'.format('IY', winComponentStartRow + frame_Count)
-            Address_Psi_I_Right = '{}{}'.format('IZ', winComponentStartRow + frame_Count)
-            Address_Psi_I_Bottom = '{}{}'.format('JA', winComponentStartRow + frame_Count)
-            Address_Psi_I_Top = '{}{}'.format('JB', winComponentStartRow + frame_Count)
+            Address_Fname = ('IL', frameComponentStartRow + frame_Count)
+            Address_Uf_Left = ('IM', frameComponentStartRow + frame_Count)
+            Address_Uf_Right = ('IN', frameComponentStartRow + frame_Count)
+            Address_Uf_Bottom = ('IO', frameComponentStartRow + frame_Count)
+            Address_Uf_Top = ('IP', frameComponentStartRow + frame_Count)
+            Address_W_Left = ('IQ', frameComponentStartRow + frame_Count)
+            Address_W_Right = ('IR', frameComponentStartRow + frame_Count)
+            Address_W_Bottom = ('IS', frameComponentStartRow + frame_Count)
+            Address_W_Top = ('IT', frameComponentStartRow + frame_Count)
+            Address_Psi_g_Left = ('IU', frameComponentStartRow + frame_Count)
+            Address_Psi_g_Right = ('IV', frameComponentStartRow + frame_Count)
+            Address_Psi_g_Bottom = ('IW', frameComponentStartRow + frame_Count)
+            Address_Psi_g_Top = ('IX', frameComponentStartRow + frame_Count)
+            Address_Psi_I_Left = ('IY', frameComponentStartRow + frame_Count)
+            Address_Psi_I_Right = ('IZ', frameComponentStartRow + frame_Count)
+            Address_Psi_I_Bottom = ('JA', frameComponentStartRow + frame_Count)
+            Address_Psi_I_Top = ('JB', frameComponentStartRow + frame_Count)
             
             # Create the PHPP Objects for the Frames
             winComponentsList.append( PHPP_XL_Obj('Components', Address_Fname, fNm))# Frame Type Name
@@ -349,9 +286,12 @@ def build_components(_inputBranch):
     
     return winComponentsList
 
-def build_areas(_surfaces, _hb_room_names, _uValueUIDs):
+def build_areas(_surfaces, _hb_room_names, _uValueUIDs, _start_rows=None, _rows=None):
+    # _rows: Optional {surface identifier: row} to only build those surfaces, each
+    # in the row it had before (see LBT2PH.model_delta). The row is kept on each
+    # surface as 'Areas_Row', along with its 'UD_Srfc_Name'.
        
-    areasRowStart = 41
+    areasRowStart = _get_start_row(_start_rows, 'Areas', 'Surfaces', 41)
     areaCount = 0
     uID_Count = 1
     areasList = []
@@ -362,6 +302,12 @@ def build_areas(_surfaces, _hb_room_names, _uValueUIDs):
         if surface.HostZoneName not in _hb_room_names:
             continue
 
+        if _rows is not None:
+            if surface.identifier not in _rows:
+                continue
+            areaCount = _rows[surface.identifier] - areasRowStart
+            uID_Count = areaCount + 1
+
         # Get the Surface Parameters
         nm = surface.Name
         identifier = surface.identifier
@@ -377,16 +323,16 @@ def build_areas(_surfaces, _hb_room_names, _uValueUIDs):
         assemblyName = _uValueUIDs.get( surface.AssemblyName )
         
         # Setup the Excel Address Locations
-        Address_Name = '{}{}'.format('L', areasRowStart + areaCount)
-        Address_GroupNum = '{}{}'.format('M', areasRowStart + areaCount)
-        Address_Quantity = '{}{}'.format('P', areasRowStart + areaCount)
-        Address_Area = '{}{}'.format('V', areasRowStart + areaCount)
-        Address_Assembly = '{}{}'.format('AC', areasRowStart + areaCount)
-        Address_AngleNorth = '{}{}'.format('AG', areasRowStart + areaCount)
-        Address_AngleHoriz = '{}{}'.format('AH', areasRowStart + areaCount)
-        Address_ShadingFac = '{}{}'.format('AJ', areasRowStart + areaCount)
-        Address_Abs = '{}{}'.format('AK', areasRowStart + areaCount)
-        Address_Emmis = '{}{}'.format('AL', areasRowStart + areaCount)
+        Address_Name = ('L', areasRowStart + areaCount)
+        Address_GroupNum = ('M', areasRowStart + areaCount)
+        Address_Quantity = ('P', areasRowStart + areaCount)
+        Address_Area = ('V', areasRowStart + areaCount)
+        Address_Assembly = ('AC', areasRowStart + areaCount)
+        Address_AngleNorth = ('AG', areasRowStart + areaCount)
+        Address_AngleHoriz = ('AH', areasRowStart + areaCount)
+        Address_ShadingFac = ('AJ', areasRowStart + areaCount)
+        Address_Abs = ('AK', areasRowStart + areaCount)
+        Address_Emmis = ('AL', areasRowStart + areaCount)
         
         areasList.append( PHPP_XL_Obj('Areas', Address_Name, nm))# Surface Name
         areasList.append( PHPP_XL_Obj('Areas', Address_GroupNum, groupNum))# Surface Group Number
@@ -401,6 +347,7 @@ def build_areas(_surfaces, _hb_room_names, _uValueUIDs):
         
         # Add the PHPP UD Surface Name to the Surface Object
         setattr(surface, 'UD_Srfc_Name', '{:d}-{}'.format(uID_Count, nm) )
+        setattr(surface, 'Areas_Row', areasRowStart + areaCount )
         
         # Keep track of which Surfaces are included in the output
         surfacesIncluded.append(identifier)
@@ -411,11 +358,13 @@ def build_areas(_surfaces, _hb_room_names, _uValueUIDs):
     areasList.append( PHPP_XL_Obj('Areas', 'L19', 'Suspended Floor') )
     return areasList, surfacesIncluded
 
-def build_windows(_inputBranch, _surfacesIncluded, _srfcBranch):
+def build_windows(_inputBranch, _surfacesIncluded, _srfcBranch, _start_rows=None, _rows=None):
+    # _rows: Optional {aperture identifier: row} to only build those windows, each
+    # in the row it had before. The row is kept on each window as 'Windows_Row'
     print('inside windows!')
 
     
-    windowsRowStart = 24
+    windowsRowStart = _get_start_row(_start_rows, 'Windows', 'Windows', 24)
     windowsCount = 0
     winSurfacesList = []
 
@@ -444,6 +393,11 @@ def build_windows(_inputBranch, _surfacesIncluded, _srfcBranch):
             else:
                 includeWindow = False
         
+        if includeWindow and _rows is not None:
+            includeWindow = window.aperture.identifier in _rows
+            if includeWindow:
+                windowsCount = _rows[window.aperture.identifier] - windowsRowStart
+        
         if includeWindow:
             # Find the Window's Host Surface UD
             for srfc in _srfcBranch:
@@ -451,18 +405,18 @@ def build_windows(_inputBranch, _surfacesIncluded, _srfcBranch):
                     hostUD = srfc.UD_Srfc_Name
            
            # Get the Window Range Addresses
-            Address_varType = '{}{}'.format('F', windowsRowStart + windowsCount)
-            Address_winQuantity = '{}{}'.format('L', windowsRowStart + windowsCount)
-            Address_winName = '{}{}'.format('M', windowsRowStart + windowsCount)
-            Address_w = '{}{}'.format('Q', windowsRowStart + windowsCount)
-            Address_h = '{}{}'.format('R', windowsRowStart + windowsCount)
-            Address_hostName = '{}{}'.format('S', windowsRowStart + windowsCount)
-            Address_glassType = '{}{}'.format('T', windowsRowStart + windowsCount)
-            Address_frameType = '{}{}'.format('U', windowsRowStart + windowsCount)
-            Address_install_Left = '{}{}'.format('AA', windowsRowStart + windowsCount)
-            Address_install_Right = '{}{}'.format('AB', windowsRowStart + windowsCount)
-            Address_install_Bottom = '{}{}'.format('AC', windowsRowStart + windowsCount)
-            Address_install_Top = '{}{}'.format('AD', windowsRowStart + windowsCount)
+            Address_varType = ('F', windowsRowStart + windowsCount)
+            Address_winQuantity = ('L', windowsRowStart + windowsCount)
+            Address_winName = ('M', windowsRowStart + windowsCount)
+            Address_w = ('Q', windowsRowStart + windowsCount)
+            Address_h = ('R', windowsRowStart + windowsCount)
+            Address_hostName = ('S', windowsRowStart + windowsCount)
+            Address_glassType = ('T', windowsRowStart + windowsCount)
+            Address_frameType = ('U', windowsRowStart + windowsCount)
+            Address_install_Left = ('AA', windowsRowStart + windowsCount)
+            Address_install_Right = ('AB', windowsRowStart + windowsCount)
+            Address_install_Bottom = ('AC', windowsRowStart + windowsCount)
+            Address_install_Top = ('AD', windowsRowStart + windowsCount)
             
             # Create the PHPP Window Object
             winSurfacesList.append( PHPP_XL_Obj('Windows', Address_varType, variantType)) # Quantity
@@ -478,13 +432,17 @@ def build_windows(_inputBranch, _surfacesIncluded, _srfcBranch):
             winSurfacesList.append( PHPP_XL_Obj('Windows', Address_install_Bottom, Inst_B)) # Install Condition Bottom
             winSurfacesList.append( PHPP_XL_Obj('Windows', Address_install_Top, Inst_T)) # Install Condition Top
             
+            setattr(window, 'Windows_Row', windowsRowStart + windowsCount)
             windowsCount += 1
             
     return winSurfacesList
 
-def build_shading(_inputBranch, _surfacesIncluded):
+def build_shading(_inputBranch, _surfacesIncluded, _start_rows=None, _rows=None):
+    # _rows: Optional {aperture identifier: row} to only build those windows, each
+    # in the row it had before. The row is kept on each window as 'Shading_Row'
+
     print("Creating the 'Shading' Objects...")
-    row_start = 17
+    row_start = _get_start_row(_start_rows, 'Shading', 'Windows', 17)
     row_count = 0
     shading_list = []
     
@@ -500,22 +458,28 @@ def build_shading(_inputBranch, _surfacesIncluded):
         row = row_start + row_count
         row_count += 1
         
+        if _rows is not None:
+            if window.aperture.identifier not in _rows:
+                continue
+            row = _rows[window.aperture.identifier]
+        setattr(window, 'Shading_Row', row)
+        
         #-----------------------------------------------------------------------
         shading_dims = window.shading_dimensions        
         if shading_dims:
             try:
-                shading_list.append( PHPP_XL_Obj( 'Shading', '{}{}'.format('Z', row),  shading_dims.horizon.h_hori))
-                shading_list.append( PHPP_XL_Obj( 'Shading', '{}{}'.format('AA', row), shading_dims.horizon.d_hori))
-                shading_list.append( PHPP_XL_Obj( 'Shading', '{}{}'.format('AB', row), shading_dims.reveal.o_reveal))
-                shading_list.append( PHPP_XL_Obj( 'Shading', '{}{}'.format('AC', row), shading_dims.reveal.d_reveal))
-                shading_list.append( PHPP_XL_Obj( 'Shading', '{}{}'.format('AD', row), shading_dims.overhang.o_over))
-                shading_list.append( PHPP_XL_Obj( 'Shading', '{}{}'.format('AE', row), shading_dims.overhang.d_over))
+                shading_list.append( PHPP_XL_Obj( 'Shading', ('Z', row),  shading_dims.horizon.h_hori))
+                shading_list.append( PHPP_XL_Obj( 'Shading', ('AA', row), shading_dims.horizon.d_hori))
+                shading_list.append( PHPP_XL_Obj( 'Shading', ('AB', row), shading_dims.reveal.o_reveal))
+                shading_list.append( PHPP_XL_Obj( 'Shading', ('AC', row), shading_dims.reveal.d_reveal))
+                shading_list.append( PHPP_XL_Obj( 'Shading', ('AD', row), shading_dims.overhang.o_over))
+                shading_list.append( PHPP_XL_Obj( 'Shading', ('AE', row), shading_dims.overhang.d_over))
             except Exception as e:
                 print('Something went wrong getting the Shading Dimension values?')
                 print(e)
         else:
-            shading_list.append( PHPP_XL_Obj( 'Shading', '{}{}'.format('AF', row), window.shading_factor_winter))
-            shading_list.append( PHPP_XL_Obj( 'Shading', '{}{}'.format('AG', row), window.shading_factor_summer))
+            shading_list.append( PHPP_XL_Obj( 'Shading', ('AF', row), window.shading_factor_winter))
+            shading_list.append( PHPP_XL_Obj( 'Shading', ('AG', row), window.shading_factor_summer))
         
     return shading_list
 
@@ -544,7 +508,11 @@ def build_TFA( spaces_branch, _hb_room_names, _use_estimated, _model):
         
     return tfa
 
-def build_addnl_vent_rooms(_inputBranch, _vent_systems, _zones, _startRows):
+def build_addnl_vent_rooms(_inputBranch, _vent_systems, _zones, _startRows, _rows=None):
+    # _rows: Optional {space id: row} to only build the rows for those spaces. All
+    # the spaces are still needed, for the list of the vent units used. The row is
+    # kept on each space as 'Vent_Row'
+
     print("Creating 'Additional Ventilation' Rooms... ")
     addnlVentRooms = []
     ventUnitsUsed = []
@@ -575,6 +543,11 @@ def build_addnl_vent_rooms(_inputBranch, _vent_systems, _zones, _startRows):
             ventUnitName = vent_system.vent_unit.name
             ventSystemName = vent_system.system_name
             
+            if _rows is not None and phpp_space.id not in _rows:
+                ventUnitsUsed.append( ventUnitName )
+                continue
+            setattr(phpp_space, 'Vent_Row', roomRowStart + i)
+            
             # ------------------------------------------------------------------
             # Get the Ventilation Schedule from the room if it has any
             try:
@@ -594,24 +567,24 @@ def build_addnl_vent_rooms(_inputBranch, _vent_systems, _zones, _startRows):
             
             # ------------------------------------------------------------------
             # Build the Excel Objects
-            address_Amount = '{}{}'.format('D', roomRowStart + i)
-            address_Name = '{}{}'.format('E', roomRowStart + i)
-            address_VentAllocation = '{}{}'.format('F', roomRowStart + i)
-            address_Area = '{}{}'.format('G', roomRowStart + i)
-            address_RoomHeight = '{}{}'.format('H', roomRowStart + i)
-            address_SupplyAirFlow = '{}{}'.format('J', roomRowStart + i)
-            address_ExractAirFlow = '{}{}'.format('K', roomRowStart + i)
-            address_TransferAirFlow = '{}{}'.format('L', roomRowStart + i)
-            address_Util_hrs = '{}{}'.format('N', roomRowStart + i)
-            address_Util_days = '{}{}'.format('O', roomRowStart + i)
-            address_Holidays = '{}{}'.format('P', roomRowStart + i)
+            address_Amount = ('D', roomRowStart + i)
+            address_Name = ('E', roomRowStart + i)
+            address_VentAllocation = ('F', roomRowStart + i)
+            address_Area = ('G', roomRowStart + i)
+            address_RoomHeight = ('H', roomRowStart + i)
+            address_SupplyAirFlow = ('J', roomRowStart + i)
+            address_ExractAirFlow = ('K', roomRowStart + i)
+            address_TransferAirFlow = ('L', roomRowStart + i)
+            address_Util_hrs = ('N', roomRowStart + i)
+            address_Util_days = ('O', roomRowStart + i)
+            address_Holidays = ('P', roomRowStart + i)
             
-            address_ventSpeed_high = '{}{}'.format('Q', roomRowStart + i)
-            address_ventTime_high = '{}{}'.format('R', roomRowStart + i) 
-            address_ventSpeed_med = '{}{}'.format('S', roomRowStart + i)
-            address_ventTime_med = '{}{}'.format('T', roomRowStart + i)
-            address_ventSpeed_low = '{}{}'.format('U', roomRowStart + i)
-            address_ventTime_low = '{}{}'.format('V', roomRowStart + i)
+            address_ventSpeed_high = ('Q', roomRowStart + i)
+            address_ventTime_high = ('R', roomRowStart + i) 
+            address_ventSpeed_med = ('S', roomRowStart + i)
+            address_ventTime_med = ('T', roomRowStart + i)
+            address_ventSpeed_low = ('U', roomRowStart + i)
+            address_ventTime_low = ('V', roomRowStart + i)
             
             ventMatchFormula = '=MATCH("{}",E{}:E{},0)'.format(ventSystemName, ventUnitRowStart, ventUnitRowStart+9)
             
@@ -639,6 +612,9 @@ def build_addnl_vent_rooms(_inputBranch, _vent_systems, _zones, _startRows):
             # Keep track of the names of the Vent units used
             ventUnitsUsed.append( ventUnitName )
     
+    if _rows is not None:
+        return addnlVentRooms, ventUnitsUsed
+    
     # --------------------------------------------------------------------------
     # Include any Exhaust Ventilation Objects that are found in any of the included Vent Systems
     rowCount = i+1
@@ -648,24 +624,24 @@ def build_addnl_vent_rooms(_inputBranch, _vent_systems, _zones, _startRows):
         
         for exhaust_vent_obj in vent_system.exhaust_vent_objs:
             for mode in ['on', 'off']:
-                address_Amount = '{}{}'.format('D', roomRowStart + rowCount)
-                address_Name = '{}{}'.format('E', roomRowStart + rowCount)
-                address_VentAllocation = '{}{}'.format('F', roomRowStart + rowCount)
-                address_Area = '{}{}'.format('G', roomRowStart + rowCount)
-                address_RoomHeight = '{}{}'.format('H', roomRowStart + rowCount)
-                address_SupplyAirFlow = '{}{}'.format('J', roomRowStart + rowCount)
-                address_ExractAirFlow = '{}{}'.format('K', roomRowStart + rowCount)
-                address_TransferAirFlow = '{}{}'.format('L', roomRowStart + rowCount)
-                address_Util_hrs = '{}{}'.format('N', roomRowStart + rowCount)
-                address_Util_days = '{}{}'.format('O', roomRowStart + rowCount)
-                address_Holidays = '{}{}'.format('P', roomRowStart + rowCount)
+                address_Amount = ('D', roomRowStart + rowCount)
+                address_Name = ('E', roomRowStart + rowCount)
+                address_VentAllocation = ('F', roomRowStart + rowCount)
+                address_Area = ('G', roomRowStart + rowCount)
+                address_RoomHeight = ('H', roomRowStart + rowCount)
+                address_SupplyAirFlow = ('J', roomRowStart + rowCount)
+                address_ExractAirFlow = ('K', roomRowStart + rowCount)
+                address_TransferAirFlow = ('L', roomRowStart + rowCount)
+                address_Util_hrs = ('N', roomRowStart + rowCount)
+                address_Util_days = ('O', roomRowStart + rowCount)
+                address_Holidays = ('P', roomRowStart + rowCount)
                     
-                address_ventSpeed_high = '{}{}'.format('Q', roomRowStart + rowCount)
-                address_ventTime_high = '{}{}'.format('R', roomRowStart + rowCount) 
-                address_ventSpeed_med = '{}{}'.format('S', roomRowStart + rowCount)
-                address_ventTime_med = '{}{}'.format('T', roomRowStart + rowCount)
-                address_ventSpeed_low = '{}{}'.format('U', roomRowStart + rowCount)
-                address_ventTime_low = '{}{}'.format('V', roomRowStart + rowCount)
+                address_ventSpeed_high = ('Q', roomRowStart + rowCount)
+                address_ventTime_high = ('R', roomRowStart + rowCount) 
+                address_ventSpeed_med = ('S', roomRowStart + rowCount)
+                address_ventTime_med = ('T', roomRowStart + rowCount)
+                address_ventSpeed_low = ('U', roomRowStart + rowCount)
+                address_ventTime_low = ('V', roomRowStart + rowCount)
                 
                 ventMatchFormula = '=MATCH("{}",E{}:E{},0)'.format(exhaust_vent_obj.name, ventUnitRowStart, ventUnitRowStart+9)
                 
@@ -712,7 +688,7 @@ def build_addnl_vent_systems(_inputBranch, _ventUnitsUsed, _startRows):
     print("Creating 'Additional Ventilation' Systems...")
     vent.append( PHPP_XL_Obj('SummVent', 'L20', "='Additional Vent'!T24"))
     vent.append( PHPP_XL_Obj('Ventilation', 'H42', 'x') ) # Turn on Additional Vent
-    vent.append( PHPP_XL_Obj('Additional Vent', 'F'+str(ventDuctsRowStart-11) , "=AVERAGE(Climate!E24, Climate!F24, Climate!N24, Climate!O24, Climate!P24") ) # External Average Temp
+    vent.append( PHPP_XL_Obj('Additional Vent', ('F', ventDuctsRowStart-11) , "=AVERAGE(Climate!E24, Climate!F24, Climate!N24, Climate!O24, Climate!P24") ) # External Average Temp
     
     #---------------------------------------------------------------------------
     #for key in _inputBranch[0].keys():
@@ -728,43 +704,43 @@ def build_addnl_vent_systems(_inputBranch, _ventUnitsUsed, _startRows):
         row = ventCompoRowStart + ventCount
         vent_system.phpp_ud_name = '{:02d}ud-{}'.format(ventCount+1, vent_system.vent_unit.name)
         
-        vent.append( PHPP_XL_Obj('Components', 'JH{}'.format(row), vent_system.vent_unit.name ))
-        vent.append( PHPP_XL_Obj('Components', 'JI{}'.format(row), vent_system.vent_unit.HR_eff ))
-        vent.append( PHPP_XL_Obj('Components', 'JJ{}'.format(row), vent_system.vent_unit.MR_eff ))
-        vent.append( PHPP_XL_Obj('Components', 'JK{}'.format(row), vent_system.vent_unit.elec_eff, 'WH/M3', 'W/CFM'))
-        vent.append( PHPP_XL_Obj('Components', 'JL{}'.format(row), 1, 'M3/H', 'CFM'))
-        vent.append( PHPP_XL_Obj('Components', 'JM{}'.format(row), 10000, 'M3/H', 'CFM' ))
+        vent.append( PHPP_XL_Obj('Components', ('JH', row), vent_system.vent_unit.name ))
+        vent.append( PHPP_XL_Obj('Components', ('JI', row), vent_system.vent_unit.HR_eff ))
+        vent.append( PHPP_XL_Obj('Components', ('JJ', row), vent_system.vent_unit.MR_eff ))
+        vent.append( PHPP_XL_Obj('Components', ('JK', row), vent_system.vent_unit.elec_eff, 'WH/M3', 'W/CFM'))
+        vent.append( PHPP_XL_Obj('Components', ('JL', row), 1, 'M3/H', 'CFM'))
+        vent.append( PHPP_XL_Obj('Components', ('JM', row), 10000, 'M3/H', 'CFM' ))
         vent.append( PHPP_XL_Obj('Ventilation', 'L12', vent_system.system_type) ) 
         
         # Build the Vent Unit
         row = ventUnitRowStart + ventCount
-        vent.append(  PHPP_XL_Obj('Additional Vent',  'D{}'.format(row),  1) ) # Quantity
-        vent.append(  PHPP_XL_Obj('Additional Vent',  'E{}'.format(row),  vent_system.system_name) )
-        vent.append(  PHPP_XL_Obj('Additional Vent',  'F{}'.format(row),  vent_system.phpp_ud_name) )
-        vent.append(  PHPP_XL_Obj('Additional Vent',  'Q{}'.format(row),  vent_system.vent_unit.exterior) )
-        vent.append(  PHPP_XL_Obj('Additional Vent',  'X{}'.format(row),  '2-Elec.') )
-        vent.append(  PHPP_XL_Obj('Additional Vent',  'Y{}'.format(row),  vent_system.vent_unit.frost_temp, 'C', 'F') )
+        vent.append(  PHPP_XL_Obj('Additional Vent',  ('D', row),  1) ) # Quantity
+        vent.append(  PHPP_XL_Obj('Additional Vent',  ('E', row),  vent_system.system_name) )
+        vent.append(  PHPP_XL_Obj('Additional Vent',  ('F', row),  vent_system.phpp_ud_name) )
+        vent.append(  PHPP_XL_Obj('Additional Vent',  ('Q', row),  vent_system.vent_unit.exterior) )
+        vent.append(  PHPP_XL_Obj('Additional Vent',  ('X', row),  '2-Elec.') )
+        vent.append(  PHPP_XL_Obj('Additional Vent',  ('Y', row),  vent_system.vent_unit.frost_temp, 'C', 'F') )
         
         # Build the Vent Unit Ducting
         row_ducts = ventDuctsRowStart + ductsCount
-        vent.append( PHPP_XL_Obj('Additional Vent',  'D{}'.format(row_ducts), 1)) # Quantity
-        vent.append( PHPP_XL_Obj('Additional Vent',  'E{}'.format(row_ducts), vent_system.duct_01.duct_width, 'MM', 'IN'))
-        vent.append( PHPP_XL_Obj('Additional Vent',  'H{}'.format(row_ducts), vent_system.duct_01.insulation_thickness, 'MM', 'IN'))
-        vent.append( PHPP_XL_Obj('Additional Vent',  'I{}'.format(row_ducts), vent_system.duct_01.insulation_lambda, 'W/MK', 'HR-FT2-F/BTU-IN'))
-        vent.append( PHPP_XL_Obj('Additional Vent',  'J{}'.format(row_ducts), 'x' ))# Reflective
-        vent.append( PHPP_XL_Obj('Additional Vent',  'L{}'.format(row_ducts), vent_system.duct_01.duct_length, 'M', 'FT' ))
-        vent.append( PHPP_XL_Obj('Additional Vent',  'M{}'.format(row_ducts), '1'))
-        
-        vent.append( PHPP_XL_Obj('Additional Vent',  'D{}'.format(row_ducts+1), 1)) # Quantity
-        vent.append( PHPP_XL_Obj('Additional Vent',  'E{}'.format(row_ducts+1), vent_system.duct_02.duct_width, 'MM', 'IN'))
-        vent.append( PHPP_XL_Obj('Additional Vent',  'H{}'.format(row_ducts+1), vent_system.duct_02.insulation_thickness, 'MM', 'IN'))
-        vent.append( PHPP_XL_Obj('Additional Vent',  'I{}'.format(row_ducts+1), vent_system.duct_02.insulation_lambda, 'W/MK', 'HR-FT2-F/BTU-IN'))
-        vent.append( PHPP_XL_Obj('Additional Vent',  'J{}'.format(row_ducts+1), 'x' ))# Reflective
-        vent.append( PHPP_XL_Obj('Additional Vent',  'L{}'.format(row_ducts+1), vent_system.duct_02.duct_length, 'M', 'FT'))
-        vent.append( PHPP_XL_Obj('Additional Vent',  'N{}'.format(row_ducts+1), '1'))
-        
-        vent.append( PHPP_XL_Obj('Additional Vent',  '{}{}'.format(chr(ductColCount), row_ducts) , 1)) # Assign Duct to Vent
-        vent.append( PHPP_XL_Obj('Additional Vent',  '{}{}'.format(chr(ductColCount), row_ducts+1) , 1)) # Assign Duct to Vent
+        vent.append( PHPP_XL_Obj('Additional Vent',  ('D', row_ducts), 1)) # Quantity
+        vent.append( PHPP_XL_Obj('Additional Vent',  ('E', row_ducts), vent_system.duct_01.duct_width, 'MM', 'IN'))
+        vent.append( PHPP_XL_Obj('Additional Vent',  ('H', row_ducts), vent_system.duct_01.insulation_thickness, 'MM', 'IN'))
+        vent.append( PHPP_XL_Obj('Additional Vent',  ('I', row_ducts), vent_system.duct_01.insulation_lambda, 'W/MK', 'HR-FT2-F/BTU-IN'))
+        vent.append( PHPP_XL_Obj('Additional Vent',  ('J', row_ducts), 'x' ))# Reflective
+        vent.append( PHPP_XL_Obj('Additional Vent',  ('L', row_ducts), vent_system.duct_01.duct_length, 'M', 'FT' ))
+        vent.append( PHPP_XL_Obj('Additional Vent',  ('M', row_ducts), '1'))
+        
+        vent.append( PHPP_XL_Obj('Additional Vent',  ('D', row_ducts+1), 1)) # Quantity
+        vent.append( PHPP_XL_Obj('Additional Vent',  ('E', row_ducts+1), vent_system.duct_02.duct_width, 'MM', 'IN'))
+        vent.append( PHPP_XL_Obj('Additional Vent',  ('H', row_ducts+1), vent_system.duct_02.insulation_thickness, 'MM', 'IN'))
+        vent.append( PHPP_XL_Obj('Additional Vent',  ('I', row_ducts+1), vent_system.duct_02.insulation_lambda, 'W/MK', 'HR-FT2-F/BTU-IN'))
+        vent.append( PHPP_XL_Obj('Additional Vent',  ('J', row_ducts+1), 'x' ))# Reflective
+        vent.append( PHPP_XL_Obj('Additional Vent',  ('L', row_ducts+1), vent_system.duct_02.duct_length, 'M', 'FT'))
+        vent.append( PHPP_XL_Obj('Additional Vent',  ('N', row_ducts+1), '1'))
+        
+        vent.append( PHPP_XL_Obj('Additional Vent',  (chr(ductColCount), row_ducts) , 1)) # Assign Duct to Vent
+        vent.append( PHPP_XL_Obj('Additional Vent',  (chr(ductColCount), row_ducts+1) , 1)) # Assign Duct to Vent
         
         ductColCount+=1
         ductsCount+=2
@@ -778,42 +754,42 @@ def build_addnl_vent_systems(_inputBranch, _ventUnitsUsed, _startRows):
             
             # Build the Vent in the Components Worksheet
             row = ventCompoRowStart + ventCount
-            vent.append( PHPP_XL_Obj('Components', 'JH{}'.format(row), exhaust_system.name ))
-            vent.append( PHPP_XL_Obj('Components', 'JI{}'.format(row), 0 )) #  Vent Heat Recovery
-            vent.append( PHPP_XL_Obj('Components', 'JJ{}'.format(row), 0 )) #  Vent Moisture Recovery
-            vent.append( PHPP_XL_Obj('Components', 'JK{}'.format(row), 0.25, 'WH/M3', 'W/CFM' )) #  Vent Elec Efficiency
-            vent.append( PHPP_XL_Obj('Components', 'JL{}'.format(row), 1, 'M3/H', 'CFM')) #  DEFAULT MIN FLOW
-            vent.append( PHPP_XL_Obj('Components', 'JM{}'.format(row), 10000, 'M3/H', 'CFM' )) #  DEFAULT MAX FLOW
+            vent.append( PHPP_XL_Obj('Components', ('JH', row), exhaust_system.name ))
+            vent.append( PHPP_XL_Obj('Components', ('JI', row), 0 )) #  Vent Heat Recovery
+            vent.append( PHPP_XL_Obj('Components', ('JJ', row), 0 )) #  Vent Moisture Recovery
+            vent.append( PHPP_XL_Obj('Components', ('JK', row), 0.25, 'WH/M3', 'W/CFM' )) #  Vent Elec Efficiency
+            vent.append( PHPP_XL_Obj('Components', ('JL', row), 1, 'M3/H', 'CFM')) #  DEFAULT MIN FLOW
+            vent.append( PHPP_XL_Obj('Components', ('JM', row), 10000, 'M3/H', 'CFM' )) #  DEFAULT MAX FLOW
             
             # Build the Vent Unit
             row = ventUnitRowStart + ventCount
-            vent.append(  PHPP_XL_Obj('Additional Vent',  'D{}'.format(row),  1) ) # Quantity
-            vent.append(  PHPP_XL_Obj('Additional Vent',  'E{}'.format(row),  exhaust_system.name ) )
-            vent.append(  PHPP_XL_Obj('Additional Vent',  'F{}'.format(row),  exhaust_system.phpp_ud_name ) )
-            vent.append(  PHPP_XL_Obj('Additional Vent',  'Q{}'.format(row),  '') ) # Exterior Installation?
-            vent.append(  PHPP_XL_Obj('Additional Vent',  'X{}'.format(row),  '1-No') ) # Frost Protection Type
-            vent.append(  PHPP_XL_Obj('Additional Vent',  'Y{}'.format(row),  '-5', 'C', 'F') ) # Frost Protection Temp
+            vent.append(  PHPP_XL_Obj('Additional Vent',  ('D', row),  1) ) # Quantity
+            vent.append(  PHPP_XL_Obj('Additional Vent',  ('E', row),  exhaust_system.name ) )
+            vent.append(  PHPP_XL_Obj('Additional Vent',  ('F', row),  exhaust_system.phpp_ud_name ) )
+            vent.append(  PHPP_XL_Obj('Additional Vent',  ('Q', row),  '') ) # Exterior Installation?
+            vent.append(  PHPP_XL_Obj('Additional Vent',  ('X', row),  '1-No') ) # Frost Protection Type
+            vent.append(  PHPP_XL_Obj('Additional Vent',  ('Y', row),  '-5', 'C', 'F') ) # Frost Protection Temp
             
             # Build the Vent Unit Ducting
             row = ventDuctsRowStart + ductsCount
-            vent.append( PHPP_XL_Obj('Additional Vent',  'D{}'.format(row), 1)) # Quantity
-            vent.append( PHPP_XL_Obj('Additional Vent',  'E{}'.format(row), exhaust_system.duct_01.duct_width, 'MM', 'IN'))
-            vent.append( PHPP_XL_Obj('Additional Vent',  'H{}'.format(row), exhaust_system.duct_01.insulation_thickness, 'MM', 'IN'))
-            vent.append( PHPP_XL_Obj('Additional Vent',  'I{}'.format(row), exhaust_system.duct_01.insulation_lambda, 'W/MK', 'HR-FT2-F/BTU-IN'))
-            vent.append( PHPP_XL_Obj('Additional Vent',  'J{}'.format(row), 'x' ))# Reflective
-            vent.append( PHPP_XL_Obj('Additional Vent',  'L{}'.format(row), exhaust_system.duct_01.duct_length if exhaust_system else 5, 'M', 'FT'))
-            vent.append( PHPP_XL_Obj('Additional Vent',  'M{}'.format(row), '1'))
+            vent.append( PHPP_XL_Obj('Additional Vent',  ('D', row), 1)) # Quantity
+            vent.append( PHPP_XL_Obj('Additional Vent',  ('E', row), exhaust_system.duct_01.duct_width, 'MM', 'IN'))
+            vent.append( PHPP_XL_Obj('Additional Vent',  ('H', row), exhaust_system.duct_01.insulation_thickness, 'MM', 'IN'))
+            vent.append( PHPP_XL_Obj('Additional Vent',  ('I', row), exhaust_system.duct_01.insulation_lambda, 'W/MK', 'HR-FT2-F/BTU-IN'))
+            vent.append( PHPP_XL_Obj('Additional Vent',  ('J', row), 'x' ))# Reflective
+            vent.append( PHPP_XL_Obj('Additional Vent',  ('L', row), exhaust_system.duct_01.duct_length if exhaust_system else 5, 'M', 'FT'))
+            vent.append( PHPP_XL_Obj('Additional Vent',  ('M', row), '1'))
             
-            vent.append( PHPP_XL_Obj('Additional Vent',  'D{}'.format(row+1), 1)) # Quantity
-            vent.append( PHPP_XL_Obj('Additional Vent',  'E{}'.format(row+1), exhaust_system.duct_02.duct_width, 'MM', 'IN'))
-            vent.append( PHPP_XL_Obj('Additional Vent',  'H{}'.format(row+1), exhaust_system.duct_02.insulation_thickness, 'MM', 'IN'))
-            vent.append( PHPP_XL_Obj('Additional Vent',  'I{}'.format(row+1), exhaust_system.duct_02.insulation_lambda, 'W/MK', 'HR-FT2-F/BTU-IN'))
-            vent.append( PHPP_XL_Obj('Additional Vent',  'J{}'.format(row+1), 'x' ))# Reflective
-            vent.append( PHPP_XL_Obj('Additional Vent',  'L{}'.format(row+1), exhaust_system.duct_02.duct_length, 'M', 'FT'))
-            vent.append( PHPP_XL_Obj('Additional Vent',  'N{}'.format(row+1), '1'))
+            vent.append( PHPP_XL_Obj('Additional Vent',  ('D', row+1), 1)) # Quantity
+            vent.append( PHPP_XL_Obj('Additional Vent',  ('E', row+1), exhaust_system.duct_02.duct_width, 'MM', 'IN'))
+            vent.append( PHPP_XL_Obj('Additional Vent',  ('H', row+1), exhaust_system.duct_02.insulation_thickness, 'MM', 'IN'))
+            vent.append( PHPP_XL_Obj('Additional Vent',  ('I', row+1), exhaust_system.duct_02.insulation_lambda, 'W/MK', 'HR-FT2-F/BTU-IN'))
+            vent.append( PHPP_XL_Obj('Additional Vent',  ('J', row+1), 'x' ))# Reflective
+            vent.append( PHPP_XL_Obj('Additional Vent',  ('L', row+1), exhaust_system.duct_02.duct_length, 'M', 'FT'))
+            vent.append( PHPP_XL_Obj('Additional Vent',  ('N', row+1), '1'))
             
-            vent.append( PHPP_XL_Obj('Additional Vent',  '{}{}'.format(chr(ductColCount), row) , 1)) # Assign Duct to Vent
-            vent.append( PHPP_XL_Obj('Additional Vent',  '{}{}'.format(chr(ductColCount), row+1) , 1)) # Assign Duct to Vent
+            vent.append( PHPP_XL_Obj('Additional Vent',  (chr(ductColCount), row) , 1)) # Assign Duct to Vent
+            vent.append( PHPP_XL_Obj('Additional Vent',  (chr(ductColCount), row+1) , 1)) # Assign Duct to Vent
             
             
             
@@ -897,63 +873,63 @@ def build_ground(_ground_objs, _zones, _ghenv):
         col1 = colLetter[i]['col1']
         col2 = colLetter[i]['col2']
         
-        ground.append(PHPP_XL_Obj('Ground', col1+'9', ground_obj.soilThermalConductivity, 'W/MK', 'HR-FT2-F/BTU-IN' ))
-        ground.append(PHPP_XL_Obj('Ground', col1+'10', ground_obj.soilHeatCapacity, 'MJ/M3K', 'BTU/FT3-F' ))
-        ground.append(PHPP_XL_Obj('Ground', col1+'18', ground_obj.floor_area, 'M2', 'FT2' ))
-        ground.append(PHPP_XL_Obj('Ground', col1+'19', ground_obj.perim_len, 'M', 'FT' ))
-        ground.append(PHPP_XL_Obj('Ground', col2+'17', ground_obj.floor_U_value, 'W/MK', 'HR-FT2-F/BTU' ))
-        ground.append(PHPP_XL_Obj('Ground', col2+'18', ground_obj.perim_psi_X_len, 'W/K', 'BTU/HR-F' ))
-        ground.append(PHPP_XL_Obj('Ground', col1+'49', ground_obj.groundWaterDepth, 'M', 'FT' ))
-        ground.append(PHPP_XL_Obj('Ground', col1+'50', ground_obj.groundWaterFlowrate, 'M/DAY', 'FT/DAY' ))
+        ground.append(PHPP_XL_Obj('Ground', (col1, 9), ground_obj.soilThermalConductivity, 'W/MK', 'HR-FT2-F/BTU-IN' ))
+        ground.append(PHPP_XL_Obj('Ground', (col1, 10), ground_obj.soilHeatCapacity, 'MJ/M3K', 'BTU/FT3-F' ))
+        ground.append(PHPP_XL_Obj('Ground', (col1, 18), ground_obj.floor_area, 'M2', 'FT2' ))
+        ground.append(PHPP_XL_Obj('Ground', (col1, 19), ground_obj.perim_len, 'M', 'FT' ))
+        ground.append(PHPP_XL_Obj('Ground', (col2, 17), ground_obj.floor_U_value, 'W/M2K', 'HR-FT2-F/BTU' ))
+        ground.append(PHPP_XL_Obj('Ground', (col2, 18), ground_obj.perim_psi_X_len, 'W/K', 'BTU/HR-F' ))
+        ground.append(PHPP_XL_Obj('Ground', (col1, 49), ground_obj.groundWaterDepth, 'M', 'FT' ))
+        ground.append(PHPP_XL_Obj('Ground', (col1, 50), ground_obj.groundWaterFlowrate, 'M/DAY', 'FT/DAY' ))
         
         if '1' in ground_obj.Type:
             # Slab on Grade Type
-            ground.append(PHPP_XL_Obj('Ground', col0+'24', 'x' ))
-            ground.append(PHPP_XL_Obj('Ground', col0+'29', '' ))
-            ground.append(PHPP_XL_Obj('Ground', col0+'32', '' ))
-            ground.append(PHPP_XL_Obj('Ground', col0+'38', '' ))
-            ground.append(PHPP_XL_Obj('Ground', col1+'25', ground_obj.perimInsulDepth, 'M', 'IN' ))
-            ground.append(PHPP_XL_Obj('Ground', col1+'26', ground_obj.perimInsulThick, 'M', 'IN' ))
-            ground.append(PHPP_XL_Obj('Ground', col1+'27', ground_obj.perimInsulConductivity, 'W/MK', 'HR-FT2-F/BTU-IN' ))
+            ground.append(PHPP_XL_Obj('Ground', (col0, 24), 'x' ))
+            ground.append(PHPP_XL_Obj('Ground', (col0, 29), '' ))
+            ground.append(PHPP_XL_Obj('Ground', (col0, 32), '' ))
+            ground.append(PHPP_XL_Obj('Ground', (col0, 38), '' ))
+            ground.append(PHPP_XL_Obj('Ground', (col1, 25), ground_obj.perimInsulDepth, 'M', 'IN' ))
+            ground.append(PHPP_XL_Obj('Ground', (col1, 26), ground_obj.perimInsulThick, 'M', 'IN' ))
+            ground.append(PHPP_XL_Obj('Ground', (col1, 27), ground_obj.perimInsulConductivity, 'W/MK', 'HR-FT2-F/BTU-IN' ))
             if 'V' in ground_obj.perimInsulOrientation.upper():
-                ground.append(PHPP_XL_Obj('Ground', col2+'25', '' ))
+                ground.append(PHPP_XL_Obj('Ground', (col2, 25), '' ))
             else:
-                ground.append(PHPP_XL_Obj('Ground', col2+'25', 'x' ))
+                ground.append(PHPP_XL_Obj('Ground', (col2, 25), 'x' ))
         elif '2' in ground_obj.Type:
             # Heated Basement
-            ground.append(PHPP_XL_Obj('Ground', col0+'24', '' ))
-            ground.append(PHPP_XL_Obj('Ground', col0+'29', 'x' ))
-            ground.append(PHPP_XL_Obj('Ground', col0+'32', '' ))
-            ground.append(PHPP_XL_Obj('Ground', col0+'38', '' ))
-            ground.append(PHPP_XL_Obj('Ground', col1+'30', ground_obj.WallHeight_BG, 'M', 'FT' ))
-            ground.append(PHPP_XL_Obj('Ground', col2+'30', ground_obj.WallU_BG, 'W/M2K', 'HR-FT2-F/BTU'))
+            ground.append(PHPP_XL_Obj('Ground', (col0, 24), '' ))
+            ground.append(PHPP_XL_Obj('Ground', (col0, 29), 'x' ))
+            ground.append(PHPP_XL_Obj('Ground', (col0, 32), '' ))
+            ground.append(PHPP_XL_Obj('Ground', (col0, 38), '' ))
+            ground.append(PHPP_XL_Obj('Ground', (col1, 30), ground_obj.WallHeight_BG, 'M', 'FT' ))
+            ground.append(PHPP_XL_Obj('Ground', (col2, 30), ground_obj.WallU_BG, 'W/M2K', 'HR-FT2-F/BTU'))
             
         elif '3' in ground_obj.Type:
             # Unheated Basement
-            ground.append(PHPP_XL_Obj('Ground', col0+'24', '' ))
-            ground.append(PHPP_XL_Obj('Ground', col0+'29', '' ))
-            ground.append(PHPP_XL_Obj('Ground', col0+'32', 'x' ))
-            ground.append(PHPP_XL_Obj('Ground', col0+'38', '' ))
-            ground.append(PHPP_XL_Obj('Ground', col1+'33', ground_obj.WallHeight_AG, 'M', 'FT' ))
-            ground.append(PHPP_XL_Obj('Ground', col2+'33', ground_obj.WallU_AG, 'W/M2K', 'HR-FT2-F/BTU' ))
-            ground.append(PHPP_XL_Obj('Ground', col1+'34', ground_obj.WallHeight_BG, 'M', 'FT' ))
-            ground.append(PHPP_XL_Obj('Ground', col2+'34', ground_obj.WallU_BG, 'W/M2K', 'HR-FT2-F/BTU'  ))
-            ground.append(PHPP_XL_Obj('Ground', col2+'35', ground_obj.FloorU, 'W/M2K', 'HR-FT2-F/BTU' ))
-            ground.append(PHPP_XL_Obj('Ground', col1+'35', ground_obj.ACH ))
-            ground.append(PHPP_XL_Obj('Ground', col1+'36', ground_obj.Volume, 'M3', 'FT3' ))
+            ground.append(PHPP_XL_Obj('Ground', (col0, 24), '' ))
+            ground.append(PHPP_XL_Obj('Ground', (col0, 29), '' ))
+            ground.append(PHPP_XL_Obj('Ground', (col0, 32), 'x' ))
+            ground.append(PHPP_XL_Obj('Ground', (col0, 38), '' ))
+            ground.append(PHPP_XL_Obj('Ground', (col1, 33), ground_obj.WallHeight_AG, 'M', 'FT' ))
+            ground.append(PHPP_XL_Obj('Ground', (col2, 33), ground_obj.WallU_AG, 'W/M2K', 'HR-FT2-F/BTU' ))
+            ground.append(PHPP_XL_Obj('Ground', (col1, 34), ground_obj.WallHeight_BG, 'M', 'FT' ))
+            ground.append(PHPP_XL_Obj('Ground', (col2, 34), ground_obj.WallU_BG, 'W/M2K', 'HR-FT2-F/BTU'  ))
+            ground.append(PHPP_XL_Obj('Ground', (col2, 35), ground_obj.FloorU, 'W/M2K', 'HR-FT2-F/BTU' ))
+            ground.append(PHPP_XL_Obj('Ground', (col1, 35), ground_obj.ACH ))
+            ground.append(PHPP_XL_Obj('Ground', (col1, 36), ground_obj.Volume, 'M3', 'FT3' ))
             
         elif '4' in ground_obj.Type:
             # Suspended Floor overCrawlspace
-            ground.append(PHPP_XL_Obj('Ground', col0+'24', '' ))
-            ground.append(PHPP_XL_Obj('Ground', col0+'29', '' ))
-            ground.append(PHPP_XL_Obj('Ground', col0+'32', '' ))
-            ground.append(PHPP_XL_Obj('Ground', col0+'38', 'x' ))
-            ground.append(PHPP_XL_Obj('Ground', col1+'39', ground_obj.CrawlU, 'W/M2K', 'HR-FT2-F/BTU'  ))
-            ground.append(PHPP_XL_Obj('Ground', col1+'40', ground_obj.WallHeight, 'M', 'FT' ))
-            ground.append(PHPP_XL_Obj('Ground', col1+'41', ground_obj.WallU, 'W/M2K', 'HR-FT2-F/BTU'  ))
-            ground.append(PHPP_XL_Obj('Ground', col2+'39', ground_obj.VentOpeningArea, 'M2', 'FT2' ))
-            ground.append(PHPP_XL_Obj('Ground', col2+'40', ground_obj.windVelocity, 'M/S', 'M/H' ))
-            ground.append(PHPP_XL_Obj('Ground', col2+'41', ground_obj.windFactor ))
+            ground.append(PHPP_XL_Obj('Ground', (col0, 24), '' ))
+            ground.append(PHPP_XL_Obj('Ground', (col0, 29), '' ))
+            ground.append(PHPP_XL_Obj('Ground', (col0, 32), '' ))
+            ground.append(PHPP_XL_Obj('Ground', (col0, 38), 'x' ))
+            ground.append(PHPP_XL_Obj('Ground', (col1, 39), ground_obj.CrawlU, 'W/M2K', 'HR-FT2-F/BTU'  ))
+            ground.append(PHPP_XL_Obj('Ground', (col1, 40), ground_obj.WallHeight, 'M', 'FT' ))
+            ground.append(PHPP_XL_Obj('Ground', (col1, 41), ground_obj.WallU, 'W/M2K', 'HR-FT2-F/BTU'  ))
+            ground.append(PHPP_XL_Obj('Ground', (col2, 39), ground_obj.VentOpeningArea, 'M2', 'FT2' ))
+            ground.append(PHPP_XL_Obj('Ground', (col2, 40), ground_obj.windVelocity, 'M/S', 'M/H' ))
+            ground.append(PHPP_XL_Obj('Ground', (col2, 41), ground_obj.windFactor ))
             
     return ground
 
@@ -1028,13 +1004,13 @@ def build_DHW_system(_list_of_dhw_systems, _hb_rooms, _ghenv):
             col = chr(ord('J') + colNum)
 
             if ord(col) <= ord('N'):
-                dhwSystem.append( PHPP_XL_Obj('DHW+Distribution', '{}{}'.format(col, 149), recirc_pipe_set.length , 'M', 'FT'))
-                dhwSystem.append( PHPP_XL_Obj('DHW+Distribution', '{}{}'.format(col, 150), recirc_pipe_set.diameter, 'MM','IN') )
-                dhwSystem.append( PHPP_XL_Obj('DHW+Distribution', '{}{}'.format(col, 151), recirc_pipe_set.insulation_thickness, 'MM', 'IN' ) )
-                dhwSystem.append( PHPP_XL_Obj('DHW+Distribution', '{}{}'.format(col, 152), recirc_pipe_set.insulation_reflective ) )
-                dhwSystem.append( PHPP_XL_Obj('DHW+Distribution', '{}{}'.format(col, 153), recirc_pipe_set.insulation_conductivity, 'W/MK', 'HR-FT2-F/BTU-IN' ) )
-                dhwSystem.append( PHPP_XL_Obj('DHW+Distribution', '{}{}'.format(col, 155), recirc_pipe_set.insulation_quality ) )
-                dhwSystem.append( PHPP_XL_Obj('DHW+Distribution', '{}{}'.format(col, 159), recirc_pipe_set.daily_period ) )
+                dhwSystem.append( PHPP_XL_Obj('DHW+Distribution', (col, 149), recirc_pipe_set.length , 'M', 'FT'))
+                dhwSystem.append( PHPP_XL_Obj('DHW+Distribution', (col, 150), recirc_pipe_set.diameter, 'MM','IN') )
+                dhwSystem.append( PHPP_XL_Obj('DHW+Distribution', (col, 151), recirc_pipe_set.insulation_thickness, 'MM', 'IN' ) )
+                dhwSystem.append( PHPP_XL_Obj('DHW+Distribution', (col, 152), recirc_pipe_set.insulation_reflective ) )
+                dhwSystem.append( PHPP_XL_Obj('DHW+Distribution', (col, 153), recirc_pipe_set.insulation_conductivity, 'W/MK', 'HR-FT2-F/BTU-IN' ) )
+                dhwSystem.append( PHPP_XL_Obj('DHW+Distribution', (col, 155), recirc_pipe_set.insulation_quality ) )
+                dhwSystem.append( PHPP_XL_Obj('DHW+Distribution', (col, 159), recirc_pipe_set.daily_period ) )
             else:
                 dhwRecircWarning = "Too many recirculation loops. PHPP only allows up to 5 loops to be entered.\nConsolidate the loops before moving forward"
                 _ghenv.Component.AddRuntimeMessage(ghK.GH_RuntimeMessageLevel.Warning, dhwRecircWarning)
@@ -1045,11 +1021,11 @@ def build_DHW_system(_list_of_dhw_systems, _hb_rooms, _ghenv):
             col = chr(ord('J') + colNum)
             
             if ord(col) <= ord('N'):
-                dhwSystem.append( PHPP_XL_Obj('DHW+Distribution', '{}{}'.format(col, 167), branch_line.diameter, 'M', 'IN'))
-                dhwSystem.append( PHPP_XL_Obj('DHW+Distribution', '{}{}'.format(col, 168), branch_line.length, 'M', 'FT'))
-                dhwSystem.append( PHPP_XL_Obj('DHW+Distribution', '{}{}'.format(col, 169), dhw_.number_of_tap_points))
-                dhwSystem.append( PHPP_XL_Obj('DHW+Distribution', '{}{}'.format(col, 171), dhw_.tap_openings_per_day))
-                dhwSystem.append( PHPP_XL_Obj('DHW+Distribution', '{}{}'.format(col, 172), dhw_.tap_utilisation_days))
+                dhwSystem.append( PHPP_XL_Obj('DHW+Distribution', (col, 167), branch_line.diameter, 'M', 'IN'))
+                dhwSystem.append( PHPP_XL_Obj('DHW+Distribution', (col, 168), branch_line.length, 'M', 'FT'))
+                dhwSystem.append( PHPP_XL_Obj('DHW+Distribution', (col, 169), dhw_.number_of_tap_points))
+                dhwSystem.append( PHPP_XL_Obj('DHW+Distribution', (col, 171), dhw_.tap_openings_per_day))
+                dhwSystem.append( PHPP_XL_Obj('DHW+Distribution', (col, 172), dhw_.tap_utilisation_days))
             else:
                 dhwRecircWarning = "Too many branch piping sets. PHPP only allows up to 5 sets to be entered.\nConsolidate the piping sets before moving forward"
                 _ghenv.Component.AddRuntimeMessage(ghK.GH_RuntimeMessageLevel.Warning, dhwRecircWarning)
@@ -1111,7 +1087,7 @@ def build_appliances(_appliances, _hb_room_names, _ghenv):
     # First, turn all the appliances 'off'
     useRows = [14, 16, 18, 21, 22, 23, 24, 31, 32, 33]
     for rowNum in useRows:
-        apps.append( PHPP_XL_Obj('Electricity', 'F{}'.format(rowNum), 0) )
+        apps.append( PHPP_XL_Obj('Electricity', ('F', rowNum), 0) )
     
     #---------------------------------------------------------------------------
     for appliance in _appliances:
@@ -1161,10 +1137,10 @@ def build_appliances(_appliances, _hb_room_names, _ghenv):
             apps.append( PHPP_XL_Obj('Electricity', 'J27', appliance.nominal_demand) )
         else:
             # Other
-            apps.append( PHPP_XL_Obj('Electricity', 'D{}'.format(other_count+31), appliance.name) )
-            apps.append( PHPP_XL_Obj('Electricity', 'F{}'.format(other_count+31), appliance.include) )
-            apps.append( PHPP_XL_Obj('Electricity', 'H{}'.format(other_count+31), 1) )
-            apps.append( PHPP_XL_Obj('Electricity', 'J{}'.format(other_count+31), appliance.nominal_demand) )
+            apps.append( PHPP_XL_Obj('Electricity', ('D', other_count+31), appliance.name) )
+            apps.append( PHPP_XL_Obj('Electricity', ('F', other_count+31), appliance.include) )
+            apps.append( PHPP_XL_Obj('Electricity', ('H', other_count+31), 1) )
+            apps.append( PHPP_XL_Obj('Electricity', ('J', other_count+31), appliance.nominal_demand) )
             other_count +=1
     
     return apps
@@ -1203,26 +1179,26 @@ def build_non_res_space_info(_spaces, _hb_room_names, _start_rows ):
             break
 
         if space.non_res_usage != '-':
-            elecNonRes.append( PHPP_XL_Obj('Electricity non-res', 'F{}'.format(row), space.non_res_usage))
+            elecNonRes.append( PHPP_XL_Obj('Electricity non-res', ('F', row), space.non_res_usage))
 
         if space.non_res_motion != '-' and  space.non_res_motion != 'No':
-            elecNonRes.append( PHPP_XL_Obj('Electricity non-res', 'X{}'.format(row), 'x' ))
+            elecNonRes.append( PHPP_XL_Obj('Electricity non-res', ('X', row), 'x' ))
         
         if space.non_res_lighting != '-':
             roomID = '{}-{}'.format(space.space_number, space.space_name )
-            elecNonRes.append( PHPP_XL_Obj('Electricity non-res', 'C{}'.format(row), roomID))
+            elecNonRes.append( PHPP_XL_Obj('Electricity non-res', ('C', row), roomID))
             
-            elecNonRes.append( PHPP_XL_Obj('Electricity non-res', 'D{}'.format(row), space.area_gross, 'M2', 'FT2'))
-            elecNonRes.append( PHPP_XL_Obj('Electricity non-res', 'H{}'.format(row), 0))                                # Deviation From North=0
-            elecNonRes.append( PHPP_XL_Obj('Electricity non-res', 'J{}'.format(row), 0.69))                             # Triple Glazing
-            elecNonRes.append( PHPP_XL_Obj('Electricity non-res', 'M{}'.format(row), space.depth, 'M', 'FT'))
-            elecNonRes.append( PHPP_XL_Obj('Electricity non-res', 'N{}'.format(row), '=D{}/M{}'.format(row, row)  ))
-            elecNonRes.append( PHPP_XL_Obj('Electricity non-res', 'O{}'.format(row), space.space_avg_clear_ceiling_height, 'M', 'FT'))
-            elecNonRes.append( PHPP_XL_Obj('Electricity non-res', 'P{}'.format(row), 1, 'M', 'FT'  ))                   # Lintel Height
-            elecNonRes.append( PHPP_XL_Obj('Electricity non-res', 'Q{}'.format(row), 0, 'M', 'FT'  ))                   # Window Width                
+            elecNonRes.append( PHPP_XL_Obj('Electricity non-res', ('D', row), space.area_gross, 'M2', 'FT2'))
+            elecNonRes.append( PHPP_XL_Obj('Electricity non-res', ('H', row), 0))                                # Deviation From North=0
+            elecNonRes.append( PHPP_XL_Obj('Electricity non-res', ('J', row), 0.69))                             # Triple Glazing
+            elecNonRes.append( PHPP_XL_Obj('Electricity non-res', ('M', row), space.depth, 'M', 'FT'))
+            elecNonRes.append( PHPP_XL_Obj('Electricity non-res', ('N', row), '=D{}/M{}'.format(row, row)  ))
+            elecNonRes.append( PHPP_XL_Obj('Electricity non-res', ('O', row), space.space_avg_clear_ceiling_height, 'M', 'FT'))
+            elecNonRes.append( PHPP_XL_Obj('Electricity non-res', ('P', row), 1, 'M', 'FT'  ))                   # Lintel Height
+            elecNonRes.append( PHPP_XL_Obj('Electricity non-res', ('Q', row), 0, 'M', 'FT'  ))                   # Window Width                
             
             lightingControlNum = space.non_res_lighting.split('-')[0]
-            elecNonRes.append( PHPP_XL_Obj('Electricity non-res', 'W{}'.format(row), lightingControlNum ))
+            elecNonRes.append( PHPP_XL_Obj('Electricity non-res', ('W', row), lightingControlNum ))
             
     return elecNonRes
 
@@ -1267,11 +1243,11 @@ def build_thermal_bridges(_tb_objects, _start_rows):
             i = i+1
         
         # Setup the Excel Address Locations
-        Address_Name = '{}{}'.format('L', tb_RowStart + i)
-        Address_GroupNo = '{}{}'.format('M', tb_RowStart + i)
-        Address_Quantity = '{}{}'.format('P', tb_RowStart + i)
-        Address_Length = '{}{}'.format('R', tb_RowStart + i)
-        Address_PsiValue = '{}{}'.format('X', tb_RowStart + i)
+        Address_Name = ('L', tb_RowStart + i)
+        Address_GroupNo = ('M', tb_RowStart + i)
+        Address_Quantity = ('P', tb_RowStart + i)
+        Address_Length = ('R', tb_RowStart + i)
+        Address_PsiValue = ('X', tb_RowStart + i)
         
         tb_List.append( PHPP_XL_Obj('Areas', Address_Name, tb.typename))
         tb_List.append( PHPP_XL_Obj('Areas', Address_GroupNo, tb.group_number))
@@ -1371,13 +1347,13 @@ def build_heating_cooling( _heating_cooling_objs, _hb_room_names ):
             hc_equip.append( PHPP_XL_Obj('HP', 'I635', hp_heating.name)) 
             hc_equip.append( PHPP_XL_Obj('HP', 'I637', hp_heating.source)) 
             for i, item in enumerate(hp_heating.temps_sources):
-                hc_equip.append( PHPP_XL_Obj('HP', 'K{}'.format(i+640), item, 'C', 'F')) 
+                hc_equip.append( PHPP_XL_Obj('HP', ('K', i+640), item, 'C', 'F')) 
             for i, item in enumerate(hp_heating.temps_sinks):
-                hc_equip.append( PHPP_XL_Obj('HP', 'L{}'.format(i+640), item, 'C', 'F')) 
+                hc_equip.append( PHPP_XL_Obj('HP', ('L', i+640), item, 'C', 'F')) 
             for i, item in enumerate(hp_heating.heating_capacities):
-                hc_equip.append( PHPP_XL_Obj('HP', 'M{}'.format(i+640), item, 'KW', 'KBTU/H')) 
+                hc_equip.append( PHPP_XL_Obj('HP', ('M', i+640), item, 'KW', 'KBTU/H')) 
             for i, item in enumerate(hp_heating.cops):
-                hc_equip.append( PHPP_XL_Obj('HP', 'N{}'.format(i+640), item)) 
+                hc_equip.append( PHPP_XL_Obj('HP', ('N', i+640), item)) 
             hc_equip.append( PHPP_XL_Obj('HP', 'M658', hp_heating.sink_dt))   
 
         #-----------------------------------------------------------------------
@@ -1402,13 +1378,13 @@ def build_heating_cooling( _heating_cooling_objs, _hb_room_names ):
             hc_equip.append( PHPP_XL_Obj('HP', 'I665', dhw_hp.name))
             hc_equip.append( PHPP_XL_Obj('HP', 'I667', dhw_hp.source)) 
             for i, item in enumerate(dhw_hp.temps_sources):
-                hc_equip.append( PHPP_XL_Obj('HP', 'K{}'.format(i+670), item, 'C', 'F')) 
+                hc_equip.append( PHPP_XL_Obj('HP', ('K', i+670), item, 'C', 'F')) 
             for i, item in enumerate(dhw_hp.temps_sinks):
-                hc_equip.append( PHPP_XL_Obj('HP', 'L{}'.format(i+670), item, 'C', 'F')) 
+                hc_equip.append( PHPP_XL_Obj('HP', ('L', i+670), item, 'C', 'F')) 
             for i, item in enumerate(dhw_hp.heating_capacities):
-                hc_equip.append( PHPP_XL_Obj('HP', 'M{}'.format(i+670), item, 'KW', 'KBTU/H')) 
+                hc_equip.append( PHPP_XL_Obj('HP', ('M', i+670), item, 'KW', 'KBTU/H')) 
             for i, item in enumerate(dhw_hp.cops):
-                hc_equip.append( PHPP_XL_Obj('HP', 'N{}'.format(i+670), item)) 
+                hc_equip.append( PHPP_XL_Obj('HP', ('N', i+670), item)) 
             hc_equip.append( PHPP_XL_Obj('HP', 'M688', dhw_hp.sink_dt)) 
         
         if hp_units['heating'] and hp_units['dhw']:
@@ -1528,8 +1504,8 @@ def build_variants( _var_obj ):
 
     if _var_obj.windows:
         for i in range(24, 175):
-            variants.append( PHPP_XL_Obj('Windows', 'T{}'.format(i), '=G{}'.format(i) ))
-            variants.append( PHPP_XL_Obj('Windows', 'U{}'.format(i), '=H{}'.format(i) ))
+            variants.append( PHPP_XL_Obj('Windows', ('T', i), '=G{}'.format(i) ))
+            variants.append( PHPP_XL_Obj('Windows', ('U', i), '=H{}'.format(i) ))
     
     if _var_obj.u_values:
         for i in range(0, 15):
@@ -1537,15 +1513,15 @@ def build_variants( _var_obj ):
             row_Variant = 410+i*2
             row_Compo = 15+i
             
-            variants.append( PHPP_XL_Obj('U-Values', 'M'+str(row_Uval), '=F'+str(row_Uval) ))
-            variants.append( PHPP_XL_Obj('U-Values', 'S'+str(row_Uval), '=G'+str(row_Uval) ))
-            variants.append( PHPP_XL_Obj('Variants', 'B'+str(row_Variant), '=Components!D'+str(row_Compo) ))
+            variants.append( PHPP_XL_Obj('U-Values', ('M', row_Uval), '=F'+str(row_Uval) ))
+            variants.append( PHPP_XL_Obj('U-Values', ('S', row_Uval), '=G'+str(row_Uval) ))
+            variants.append( PHPP_XL_Obj('Variants', ('B', row_Variant), '=Components!D'+str(row_Compo) ))
 
             # Zero out all the other U-Value inputs to avoid any double-counting
             # when using standard multi-layer Honeybee-Materials
             for k in range(1,8):
                 row_number = row_Uval + k
-                variants.append( PHPP_XL_Obj('U-Values', 'S'+str(row_number), 0 ))
+                variants.append( PHPP_XL_Obj('U-Values', ('S', row_number), 0 ))
 
     if _var_obj.airtightness:
         variants.append( PHPP_XL_Obj('Ventilation', 'N27', '=D27' ))
@@ -0,0 +1,407 @@
+"""Unit conversions for the values LBT2PH writes to (and reads from the user for) PHPP
+
+The conversions in the schemas below are written the same way as always, as a
+bit of arithmetic to tack onto the value (ie: '*1.8+32' or '**-1*5.678264134').
+Each one is compiled once, on import, into a simple Conversion object so that
+converting a value is just a multiply and an add, with no eval() involved.
+
+Note: This module has no Rhino / Grasshopper / COM dependencies so that it can
+be used (and tested) outside of Rhino.
+"""
+
+import re
+
+try:
+    unicode
+except NameError:
+    unicode = str
+
+
+# {Unit You have: {Unit you Want}, {...}, ...}
+TO_IP_SCHEMA = {
+        'C'    : {'SI':'*1', 'C':'*1', 'F':'*1.8+32'},
+        'LITER': {'SI':'*1', 'LITER':'*1', 'GALLON':'*0.264172'},
+        'MM'   : {'SI':'*1', 'MM':'*1', 'FT':'*0.00328084', 'IN':'*0.0394'},
+        'M'    : {'SI':'*1', 'M':'*1', 'FT':'*3.280839895', 'IN':'*39.3701'},
+        'M/DAY': {'SI':'*1', 'M/DAY':'*1', 'FT/DAY':'*3.280839895'},
+        'M/S'  : {'SI':'*1', 'M/S':'*1', 'M/H':'*2.236936292', 'FT/MIN':'*196.8503937'}, # M/H = miles/hour
+        'M2'   : {'SI':'*1', 'M2':'*1', 'FT2':'*10.76391042'},
+        'M3'   : {'SI':'*1', 'M3':'*1', 'FT3':'*35.31466672'},
+        'M3/H' : {'SI':'*1', 'M3/H':'*1', 'CFM':'*0.588577779'},
+        'WH/M3': {'SI':'*1', 'WH/M3':'*1', 'W/CFM':'*1.699010796'},
+        'WH/KM2':{'SI':'*1', 'WH/KM2':'*1', 'BTU/FT2':'*0.176110159'},
+        'MJ/M3K':{'SI':'*1', 'MJ/M3K':'*1', 'BTU/FT3-F':'*14.91066014'},
+        'W/M2K': {'SI':'*1', 'W/M2K':'*1', 'BTU/HR-FT2-F':'*0.176110159','HR-FT2-F/BTU':'**-1*5.678264134' },
+        'M2K/W': {'SI':'*1', 'M2K/W':'*1', 'HR-FT2-F/BTU':'*5.678264134'},
+        'W/MK' : {'SI':'*1', 'W/MK':'*1', 'HR-FT2-F/BTU-IN':'**-1*0.144227909', 'BTU/HR-FT-F':'*0.577789236'},
+        'W/K'  : {'SI':'*1', 'W/K':'*1', 'BTU/HR-F':'*1.895633976'},
+        'KW'   : {'SI':'*1', 'KW':'*1','BTU/H':'*3412.141156', 'KBTU/H':'*3.412141156'},
+        'W/W'  : {'SI':'*1', 'W/W':'*1', 'BTU/HW':'*3.412141156'} # SEER
+        }
+
+# {Unit you want: {unit user input}, {..}, ...}
+TO_METRIC_SCHEMA = {
+    'F':    {'SI': '*(9.0/5.0)+32.0', 'C': '*(9.0/5.0)+32.0', 'F': 1, 'IP': 1},
+    'C':    {'SI': 1, 'C': 1, 'K': 1, 'F': '-32.0)*(5.0/9.0', 'IP': '-32.0)*(5.0/9.0'},
+    'M':    {'SI': 1, 'M': 1, 'CM': 0.01, 'MM': 0.001, 'FT': 0.3048, "'": 0.3048, 'IN': 0.0254, '"': 0.0254},
+    'CM':   {'SI': 1, 'M': 100, 'CM': 1, 'MM': 0.1, 'FT': 30.48, "'": 30.48, 'IN': 2.54, '"': 2.54},
+    'MM':   {'SI': 1, 'M': 1000, 'CM': 10, 'MM': 1, 'FT': 304.8, "'": 304.8, 'IN': 25.4, '"': 25.4},
+    'W/M2K': {'SI': 1, 'W/M2K': 1, 'IP': 5.678264134, 'BTU/HR-FT2-F': 5.678264134, 'HR-FT2-F/BTU': '**-1*5.678264134'},
+    'W/MK': {'SI': 1, 'W/MK': 1, 'IP': 1.730734908, 'BTU/HR-FT-F': 1.730734908, 'R/IN': '**-1*0.144227909'},
+    'W/K':  {'SI': 1, 'W/K': 1, 'BTU/HR-F': 1.895633976, 'IP': 1.895633976},
+    'M3':   {'SI': 1, 'FT3': 0.028316847},
+    '-':   {'SI': 1, '-': 1},
+    'M3/H': {'SI': 1, 'CFM': 1.699010796, 'IP': 1.699010796, 'CFH': 101.9406477},
+    'L':    {'SI': 1, 'L': 1, 'GALLON': 3.78541, "GA": 3.78541, "GAL": 3.78541},
+    'KW':   {'SI': 1, 'KW': 1, 'W': 1000, 'BTUH': 3412.141156, 'KBTUH': 3.412141156, 'TON': 0.284345096},
+    'W':    {'SI': 1, 'W': 1, 'KW': 0.001, 'BTUH': 3.412141156, 'KBTUH': 0.003412141, 'TON': 0.000284345},
+    'W/W':  {'SI': 1, 'BTU/WH': 0.293071111, 'IP': 0.293071111}
+}
+
+
+class UnitError(ValueError):
+    """Base for all the unit conversion errors """
+
+class UnknownUnitError(UnitError):
+    """There is no conversion between the two units """
+
+class UnitValueError(UnitError):
+    """The value can't be converted (not a number, or 1/0 for an inverse conversion) """
+
+
+class Conversion(object):
+    """A compiled conversion: y = g(x + shift) * factor + offset, where g(x) is
+    either x, or 1/x for the 'inverse' conversions such as U-Value to R-Value.
+    """
+
+    __slots__ = ('factor', 'offset', 'shift', 'inverse')
+
+    def __init__(self, _factor=1.0, _offset=0.0, _shift=0.0, _inverse=False):
+        self.factor = _factor
+        self.offset = _offset
+        self.shift = _shift
+        self.inverse = _inverse
+
+    @property
+    def is_identity(self):
+        return (self.factor == 1 and self.offset == 0 and self.shift == 0
+                and not self.inverse)
+
+    @classmethod
+    def compile(cls, _expression):
+        """Builds the Conversion from a number or a schema expression string
+
+        Args:
+            _expression (str | float): A plain factor (ie: 0.3048) or the bit
+                of arithmetic to add after the value (ie: '*1.8+32')
+        Returns:
+            (Conversion)
+        """
+
+        if isinstance(_expression, (int, float)) and not isinstance(_expression, bool):
+            return cls(_factor=_expression)
+
+        # Same as the old "(value" + expression + ")" text which was eval'd
+        return _ExpressionParser('(x{})'.format(_expression)).parse()
+
+    def __call__(self, _value):
+        """Converts a number. Identity conversions hand back the value as is, even if it's not a number """
+
+        if self.is_identity:
+            return _value
+        number = to_number(_value)
+
+        x = number + self.shift
+        if self.inverse:
+            if x == 0:
+                raise UnitValueError('Cannot take the inverse of 0 (value: {!r})'.format(_value))
+            x = x ** -1
+        return x * self.factor + self.offset
+
+    def __eq__(self, other):
+        return isinstance(other, Conversion) and all(
+            getattr(self, k) == getattr(other, k) for k in self.__slots__)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __unicode__(self):
+        return u"Conversion | y = {}(x{:+}) * {} {:+}".format(
+            '1/' if self.inverse else '', self.shift, self.factor, self.offset)
+    def __str__(self):
+        return unicode(self).encode('utf-8')
+    def __repr__(self):
+        return "{}(_factor={!r}, _offset={!r}, _shift={!r}, _inverse={!r})".format(
+               self.__class__.__name__,
+               self.factor,
+               self.offset,
+               self.shift,
+               self.inverse)
+
+
+_re_token = re.compile(r'\s*(?:(\d+\.?\d*(?:[eE][-+]?\d+)?|\.\d+)|(\*\*|[-+*/()x]))')
+
+
+class _ExpressionParser(object):
+    """Small recursive-descent parser for the schema expressions
+
+    Only handles what the schemas need: numbers, the value 'x', + - * / ** and
+    brackets. The value 'x' is carried along as a Conversion, numbers as floats.
+    Anything that isn't a linear conversion of x (or 1/x) raises a UnitError.
+    """
+
+    def __init__(self, _text):
+        self.text = _text
+        self.tokens = self._tokenize(_text)
+        self.pos = 0
+
+    def _tokenize(self, _text):
+        tokens, pos, text = [], 0, _text.rstrip()
+        while pos < len(text):
+            match = _re_token.match(text, pos)
+            if not match:
+                raise UnitError('Bad conversion expression: "{}"'.format(_text))
+            number, op = match.groups()
+            tokens.append(float(number) if number is not None else op)
+            pos = match.end()
+        return tokens
+
+    def _peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def _take(self, _expected=None):
+        token = self._peek()
+        if token is None or (_expected is not None and token != _expected):
+            raise UnitError('Bad conversion expression: "{}"'.format(self.text))
+        self.pos += 1
+        return token
+
+    def parse(self):
+        result = self._sum()
+        if self._peek() is not None or not isinstance(result, Conversion):
+            raise UnitError('Bad conversion expression: "{}"'.format(self.text))
+        return result
+
+    def _sum(self):
+        left = self._product()
+        while self._peek() in ('+', '-'):
+            op = self._take()
+            right = self._product()
+            left = self._add(left, right if op == '+' else self._mul(right, -1.0))
+        return left
+
+    def _product(self):
+        left = self._unary()
+        while self._peek() in ('*', '/'):
+            op = self._take()
+            right = self._unary()
+            if op == '/':
+                if isinstance(right, Conversion) or right == 0:
+                    raise UnitError('Bad conversion expression: "{}"'.format(self.text))
+                right = 1.0 / right
+            left = self._mul(left, right)
+        return left
+
+    def _unary(self):
+        if self._peek() == '-':
+            self._take()
+            return self._mul(self._unary(), -1.0)
+        if self._peek() == '+':
+            self._take()
+            return self._unary()
+        return self._power()
+
+    def _power(self):
+        base = self._atom()
+        if self._peek() == '**':
+            self._take()
+            exponent = self._unary()
+            if isinstance(exponent, Conversion):
+                raise UnitError('Bad conversion expression: "{}"'.format(self.text))
+            if not isinstance(base, Conversion):
+                return base ** exponent
+            if exponent == 1:
+                return base
+            if exponent != -1 or base.offset != 0 or base.factor == 0:
+                raise UnitError('Unsupported conversion expression: "{}"'.format(self.text))
+            return Conversion(1.0 / base.factor, 0.0, base.shift, not base.inverse)
+        return base
+
+    def _atom(self):
+        token = self._take()
+        if token == '(':
+            value = self._sum()
+            self._take(')')
+            return value
+        if token == 'x':
+            return Conversion()
+        if isinstance(token, float):
+            return token
+        raise UnitError('Bad conversion expression: "{}"'.format(self.text))
+
+    def _add(self, _a, _b):
+        if isinstance(_a, Conversion) and isinstance(_b, Conversion):
+            raise UnitError('Unsupported conversion expression: "{}"'.format(self.text))
+        if not isinstance(_a, Conversion) and not isinstance(_b, Conversion):
+            return _a + _b
+
+        conv, num = (_a, _b) if isinstance(_a, Conversion) else (_b, _a)
+        if conv.factor == 1 and conv.offset == 0 and not conv.inverse:
+            # Nothing applied to x yet, so the number is added to x itself (ie: 'x-32.0')
+            return Conversion(conv.factor, conv.offset, conv.shift + num, conv.inverse)
+        return Conversion(conv.factor, conv.offset + num, conv.shift, conv.inverse)
+
+    def _mul(self, _a, _b):
+        if isinstance(_a, Conversion) and isinstance(_b, Conversion):
+            raise UnitError('Unsupported conversion expression: "{}"'.format(self.text))
+        if not isinstance(_a, Conversion) and not isinstance(_b, Conversion):
+            return _a * _b
+
+        conv, num = (_a, _b) if isinstance(_a, Conversion) else (_b, _a)
+        return Conversion(conv.factor * num, conv.offset * num, conv.shift, conv.inverse)
+
+
+def _compile_schema(_schema, _key_order):
+    """Compiles a {unit: {unit: expression}} schema into {(from, to): Conversion} """
+
+    table = {}
+    for outer, inner in _schema.items():
+        for unit, expression in inner.items():
+            key = (outer, unit) if _key_order == 'outer_first' else (unit, outer)
+            table[key] = Conversion.compile(expression)
+    return table
+
+# {(unit you have, unit you want): Conversion}
+_TO_IP = _compile_schema(TO_IP_SCHEMA, 'outer_first')
+# {(unit user input, unit you want): Conversion}
+_TO_METRIC = _compile_schema(TO_METRIC_SCHEMA, 'inner_first')
+# No conversion: the value as is
+_IDENTITY = Conversion()
+
+
+def to_number(_value):
+    """Returns the value as an int or float. Numeric text is parsed as well
+
+    Raises:
+        UnitValueError: If the value is not a number
+    """
+
+    if isinstance(_value, bool):
+        raise UnitValueError('Not a number: {!r}'.format(_value))
+    if isinstance(_value, (int, float)):
+        return _value
+    try:
+        text = unicode(_value).strip()
+        try:
+            return int(text)
+        except ValueError:
+            return float(text)
+    except (TypeError, ValueError, UnicodeError):
+        raise UnitValueError('Not a number: {!r}'.format(_value))
+
+
+def is_passthrough(_value):
+    """True for the cell values that are never converted: blanks and formulas """
+
+    if _value is None:
+        return True
+    if isinstance(_value, (str, unicode)):
+        text = _value.strip()
+        return text == '' or text.startswith('=')
+    return False
+
+
+def get_conversion(_from_unit, _to_unit):
+    """Returns the compiled Conversion to go from an SI unit to the target unit
+
+    Converting a unit to itself, or to 'SI', is never a conversion, so works for
+    any unit (even ones which aren't in the TO_IP_SCHEMA).
+
+    Args:
+        _from_unit (str): The SI unit the value is in (ie: 'M', 'W/M2K')
+        _to_unit (str): The unit to convert to (ie: 'FT'). Use 'SI' for no conversion.
+    Returns:
+        (Conversion)
+    Raises:
+        UnknownUnitError: If there is no conversion between the two units
+    """
+
+    if _to_unit == 'SI' or _to_unit == _from_unit:
+        return _IDENTITY
+
+    try:
+        return _TO_IP[(_from_unit, _to_unit)]
+    except KeyError:
+        raise UnknownUnitError('No conversion from "{}" to "{}"'.format(_from_unit, _to_unit))
+
+
+def get_metric_conversion(_input_unit, _output_unit):
+    """Returns the compiled Conversion to go from a user's input unit to metric
+
+    Inputs without a known unit are taken to already be in the output unit,
+    same as always.
+
+    Args:
+        _input_unit (str): The unit code from helpers.find_input_string() (ie: 'FT', 'IP')
+        _output_unit (str): The metric unit wanted (ie: 'M', 'W/M2K')
+    Returns:
+        (Conversion)
+    Raises:
+        UnknownUnitError: If the output unit is not in the TO_METRIC_SCHEMA
+    """
+
+    if _output_unit not in TO_METRIC_SCHEMA:
+        raise UnknownUnitError('No conversions to "{}"'.format(_output_unit))
+    return _TO_METRIC.get((_input_unit, _output_unit), _IDENTITY)
+
+
+def convert(_value, _from_unit, _to_unit):
+    """Converts a single value from the SI unit to the target unit
+
+    Blank cells (None, '') and formulas ('=D17') are handed back unchanged.
+
+    Raises:
+        UnknownUnitError: If there is no conversion between the two units
+        UnitValueError: If the value is not a number
+    """
+
+    conversion = get_conversion(_from_unit, _to_unit)
+    if is_passthrough(_value):
+        return _value
+    return conversion(_value)
+
+
+def convert_many(_values, _from_unit, _to_unit):
+    """Converts a whole list, list of lists, or DataTree of values in one go
+
+    The conversion is looked up once for all the values. Blanks and formulas
+    are handed back unchanged, same as convert().
+
+    Args:
+        _values: A list (or tuple) of values, nested lists, or a DataTree
+        _from_unit (str): The SI unit the values are in
+        _to_unit (str): The unit to convert to
+    Returns:
+        (list): The converted values, in the same nested shape. For a DataTree
+            this is a list with one list for each branch.
+    Raises:
+        UnknownUnitError: If there is no conversion between the two units
+        UnitValueError: If any value is not a number
+    """
+
+    conversion = get_conversion(_from_unit, _to_unit)
+
+    def _convert(_items):
+        out = []
+        for item in _items:
+            if isinstance(item, (list, tuple)):
+                out.append(_convert(item))
+            elif is_passthrough(item):
+                out.append(item)
+            else:
+                out.append(conversion(item))
+        return out
+
+    if hasattr(_values, 'Branches'):
+        return [_convert(branch) for branch in _values.Branches]
+    return _convert(_values)
@@ -52,12 +52,14 @@ class PHPP_Window(Object):
         * 'glazing'
         * 'installs'
         * 'install_depth' 
+        * 'Windows_Row' (set by to_excel.build_windows)
+        * 'Shading_Row' (set by to_excel.build_shading)
     '''
     __slots__ = ('quantity', 'aperture',
         '_tolerance', '_glazing_edge_lengths', '_window_edges', '_glazing_surface',
         '_shading_factor_winter', '_shading_factor_summer', 'shading_dimensions',
         'name', 'frame', 'glazing', 'installs', 'install_depth', 'UD_glass_Name',
-        'UD_frame_Name', 'variant_type' )
+        'UD_frame_Name', 'variant_type', 'Windows_Row', 'Shading_Row' )
     
     Output = namedtuple('Output', ['Left', 'Right', 'Bottom', 'Top'])
 
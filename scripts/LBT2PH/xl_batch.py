@@ -0,0 +1,184 @@
+"""Writes the PHPP for many buildings at once, without Excel
+
+Campus projects have a PHPP for each building. A batch is a list of jobs,
+one per building: (write-plan, template, target). Each job writes its plan's
+PHPP_XL_Obj to a new copy of its template, with the headless .xlsx writer
+(see xl_headless). The jobs are shared out over a pool of processes, one
+job at a time, like xl_harvest. The templates are read through the
+xl_template.TemplateStore, so each process only reads each template once.
+
+Each job is timed on its own, and a job which fails (ie: a missing template
+or worksheet) only gives an error in its own row of the BatchTable; the
+other jobs still run.
+
+The conversion from the Honeybee Model (lbt_to_phpp and to_excel) needs
+Rhino, so each building is converted by its own Convert component (or in a
+loop) with a plan_file_, and the batch writes the plans. The process pool
+needs CPython. In IronPython (Rhino) the jobs run one after the other. From
+the command line:
+
+    python -m LBT2PH.xl_batch jobs.csv -o batch.csv
+
+where each line of the jobs .csv is: plan, template, target. Or, with the
+same template for every plan (each target is saved next to its plan):
+
+    python -m LBT2PH.xl_batch -t PHPP.xlsx buildings/*.lbt2ph_plan
+
+Note: This module has no Rhino / Grasshopper / COM dependencies so that it can
+be used (and tested) outside of Rhino.
+"""
+
+import os
+import time
+
+import LBT2PH.xl_harvest
+import LBT2PH.xl_headless
+import LBT2PH.xl_planfile
+import LBT2PH.xl_template
+
+try:
+    unicode
+except NameError:
+    unicode = str
+
+TARGET_COLUMN = 'Target'
+BATCH_LABELS = ['Plan', 'Template', 'Cells', 'Seconds']
+
+
+def target_for_plan(_plan, _extension='.xlsx'):
+    """The .xlsx path next to a write-plan file, with the same name """
+
+    return os.path.splitext(_plan)[0] + _extension
+
+
+def write_job(_plan, _template, _target, _unit_type=None):
+    """Writes one building's PHPP
+
+    Args:
+        _plan: The write-plan file, or the PHPP_XL_Obj themselves (a list or DataTree)
+        _template (str): The PHPP .xlsx file to start from
+        _target (str): The path to save the new PHPP .xlsx file to
+        _unit_type (str): 'SI' or 'IP'. If None, will be read from the template.
+    Returns:
+        (tuple): (the number of cells written, seconds taken, the error message or None)
+    """
+
+    start = time.time()
+    try:
+        target_dir = os.path.dirname(os.path.abspath(_target))
+        if not os.path.isdir(target_dir):
+            os.makedirs(target_dir)
+
+        count = LBT2PH.xl_headless.write_xl_objects(
+            LBT2PH.xl_template.open_file(_template), _target, _plan, _unit_type)
+    except Exception as e:
+        return 0, time.time() - start, '{}: {}'.format(type(e).__name__, e)
+    return count, time.time() - start, None
+
+
+def _write_job(_job):
+    """For the process pool, which can only pass one (pickle-able) argument """
+
+    return write_job(*_job)
+
+
+class BatchTable(LBT2PH.xl_harvest.HarvestTable):
+    """The results: a row for each job, with its cell count, time taken and any error """
+
+    def __init__(self):
+        super(BatchTable, self).__init__(BATCH_LABELS)
+
+    @property
+    def columns(self):
+        return [TARGET_COLUMN] + self.labels + [LBT2PH.xl_harvest.ERROR_COLUMN]
+
+    @property
+    def cells_written(self):
+        return sum(values[2] for _, values, _ in self.rows)
+
+    @property
+    def job_seconds(self):
+        """The total time of the jobs. More than .seconds when they ran side by side """
+
+        return sum(values[3] for _, values, _ in self.rows)
+
+    def __unicode__(self):
+        return u"Batch | Jobs: {}  |  Cells: {}  |  Errors: {}  |  {:.1f}s ({:.1f}s of jobs) on {} process(es)".format(
+            len(self.rows), self.cells_written, len(self.errors), self.seconds, self.job_seconds, self.processes)
+    def __repr__(self):
+        return "{}()".format(self.__class__.__name__)
+
+
+def _label(_plan):
+    return _plan if isinstance(_plan, (str, unicode)) else u'<{} objects>'.format(
+        len(list(LBT2PH.xl_planfile.iter_objects(_plan))))
+
+
+def export(_jobs, _processes=None, _unit_type=None):
+    """Writes the PHPP for each job
+
+    Args:
+        _jobs (list): [(plan, template, target), ...]. The plan is a write-plan file
+            or, for jobs run in this process, the PHPP_XL_Obj themselves.
+        _processes (int): The number of processes to use. Default is one per core.
+            Set to 1 to run the jobs one after the other, in this process.
+        _unit_type (str): 'SI' or 'IP'. If None, will be read from each template.
+    Returns:
+        (BatchTable): A row for each job, in the same order as the _jobs
+    """
+
+    jobs = [(plan, template, target, _unit_type) for plan, template, target in _jobs]
+    table = BatchTable()
+    start = time.time()
+
+    processes = LBT2PH.xl_harvest.process_count(_processes, len(jobs))
+    if not all(LBT2PH.xl_planfile.is_plan_file(job[0]) for job in jobs):
+        processes = 1  # Objects in memory can't be sent to another process
+
+    # One job at a time, so a few big buildings don't hold up one process
+    results = LBT2PH.xl_harvest.run_jobs(_write_job, jobs, processes, 1)
+
+    for (plan, template, target, _), (count, seconds, error) in zip(jobs, results):
+        table.rows.append((target, [_label(plan), template, count, round(seconds, 3)], error))
+
+    table.seconds = time.time() - start
+    table.processes = processes
+    return table
+
+
+def read_jobs_file(_path):
+    """Reads the jobs from a .csv file with the columns: plan, template, target
+
+    Relative paths are taken from the folder the jobs file is in.
+    """
+
+    folder = os.path.dirname(os.path.abspath(_path))
+    return [tuple(os.path.join(folder, v) for v in row) for row in LBT2PH.xl_harvest.read_csv_file(_path)]
+
+
+def main(_args=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Write the PHPP .xlsx files for many buildings, without Excel.')
+    parser.add_argument('paths', nargs='+', help='A .csv file of jobs (plan, template, target), or '
+                        'with --template, the write-plan files (' + LBT2PH.xl_planfile.FILE_EXTENSION + ')')
+    parser.add_argument('-t', '--template', help='The PHPP .xlsx file to use for all the plans')
+    parser.add_argument('-o', '--output', default='phpp_batch.csv', help='The .csv report to write')
+    parser.add_argument('-p', '--processes', type=int, help='Number of processes. Default is one per core')
+    args = parser.parse_args(_args)
+
+    if args.template:
+        jobs = [(plan, args.template, target_for_plan(plan)) for plan in args.paths]
+    else:
+        jobs = [job for path in args.paths for job in read_jobs_file(path)]
+
+    table = export(jobs, args.processes)
+    table.write_csv(args.output)
+
+    print(table.__unicode__())
+    for target, error in table.errors:
+        print('  {}: {}'.format(target, error))
+
+
+if __name__ == '__main__':
+    main()
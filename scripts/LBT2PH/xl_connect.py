@@ -1,13 +1,20 @@
 import os
-from shutil import copyfile
+import Grasshopper
 import Grasshopper.Kernel as ghK
 import scriptcontext as sc
 
 import clr
 clr.AddReferenceByName('Microsoft.Office.Interop.Excel')
+from System import Array, Object
 from System.Runtime.InteropServices import Marshal
 from Microsoft.Office.Interop import Excel
 
+import LBT2PH.xl_ledger
+import LBT2PH.xl_headless
+import LBT2PH.xl_profile
+import LBT2PH.xl_sheets
+import LBT2PH.xl_template
+
 class FileManager:
     """Methods used to create, copy and clean the PHPP files and paths """
     @staticmethod
@@ -60,7 +67,11 @@ class FileManager:
 
     @staticmethod
     def make_target_file(_source_path, _target_path, _ghenv):
-        """Copies file from source to target path. Makes a new dir if needed"""
+        """Copies file from source to target path. Makes a new dir if needed
+        
+        The copy is a copy-on-write clone where the file system supports it, and
+        the source is read from disk at most once per session (see xl_template).
+        """
         
         if not _source_path and _target_path:
             return None
@@ -71,7 +82,9 @@ class FileManager:
             os.mkdir( target_dir )
         
         if not os.path.isfile( _target_path ):
-            copyfile(_source_path, _target_path)
+            method = LBT2PH.xl_template.get_store().make_copy(_source_path, _target_path)
+            print('Made the new PHPP file "{}" ({})'.format(_target_path, method))
+            LBT2PH.xl_ledger.DiffLedger.delete(_target_path)
 
         if not os.path.isfile( _target_path ):
             msg = 'Something went wrong copying the source file < {} > into the target\n'\
@@ -88,6 +101,8 @@ class ExcelInstance:
         self.active_workbook = None
         self.active_workbook_name = ''
         self.sheets_dict = {}
+        self.calc_generation = 0
+        self.profiler = None    # See xl_profile.instrument()
     
     def start_new_instance(self, _filename):
         self.excel_app = Excel.ApplicationClass()
@@ -101,24 +116,120 @@ class ExcelInstance:
         self.active_workbook_name = self.filename
         self.active_workbook = self.excel_app.Workbooks.Open(self.filename)
     
+    def is_alive(self):
+        """False if the Excel application was shut down (ie: closed by the user) """
+        
+        try:
+            self.excel_app.Workbooks.Count
+            return True
+        except Exception:
+            return False
+    
+    def workbook_is_open(self):
+        """False if the workbook was closed in Excel since it was opened """
+        
+        key = ExcelSessions.key(self.filename)
+        try:
+            for workbook in self.excel_app.Workbooks:
+                if ExcelSessions.key(workbook.FullName) == key:
+                    return True
+        except Exception:
+            pass
+        return False
+    
+    def reopen_workbook(self):
+        """Opens the workbook again in the running Excel, after it was closed """
+        
+        self.sheets_dict = {}
+        self.open_workbook()
+        self.load_sheets()
+        self.calc_generation += 1
+    
     def load_sheets(self):
+        """Sets up the sheets_dict. The sheets themselves are loaded as they are used """
+        
+        self.sheets_dict = LBT2PH.xl_sheets.LazySheets(self.active_workbook)
+    
+    def require_sheets(self, _sheet_names):
+        """Unprotects the named sheets ahead of a write, in one go
+        
+        Returns:
+            (list): The names of any sheets which are not in the workbook
+        """
+        
+        screen_updating = self.excel_app.ScreenUpdating
         self.excel_app.ScreenUpdating = False
+        try:
+            return self.sheets_dict.preload(_sheet_names)
+        finally:
+            self.excel_app.ScreenUpdating = screen_updating
+
+    @staticmethod
+    def to_2d_array(_rows):
+        """Packs a list of row-lists into an Object[,] so a whole Range.Value2 can be set at once """
+        
+        num_rows = len(_rows)
+        num_cols = len(_rows[0]) if num_rows else 0
+        
+        arr = Array.CreateInstance(Object, num_rows, num_cols)
+        for i, row in enumerate(_rows):
+            for j, val in enumerate(row):
+                arr[i, j] = val
+        
+        return arr
 
-        for sheet in self.active_workbook.Worksheets:
-            sheet.Unprotect()
-            self.sheets_dict[sheet.Name] = sheet
+    @staticmethod
+    def from_2d_array(_value):
+        """Unpacks the Range.Value2 of a multi-cell range (a 1-based Object[,]) into a list of row-lists """
         
-        self.excel_app.ScreenUpdating = True
+        if not isinstance(_value, Array):
+            return [[_value]]
+        
+        first_row, last_row = _value.GetLowerBound(0), _value.GetUpperBound(0)
+        first_col, last_col = _value.GetLowerBound(1), _value.GetUpperBound(1)
+        
+        return [[_value[i, j] for j in range(first_col, last_col + 1)]
+                for i in range(first_row, last_row + 1)]
+
+    def read_range(self, _sheet_name, _address):
+        """Reads a whole range with one Value2 call. Returns a list of row-lists """
+        
+        return self.from_2d_array(self.sheets_dict[_sheet_name].Range[_address].Value2)
+
+    def calculate(self):
+        """Recalculates the workbook. Anything read before is out of date after this """
+        
+        self.excel_app.Calculate()
+        self.calc_generation += 1
 
     def save_and_quit(self):
+        workbook = self.active_workbook
         self.active_workbook = None
         self.active_workbook_name = ''
         
         if self.excel_app:
-            self.excel_app.activeWorkbook.Save()
-            self.excel_app.activeWorkbook.Close()
-            self.excel_app.Quit()
-            self.excel = None
+            try:
+                if workbook is not None and self.workbook_is_open():
+                    # Don't leave the file in manual calculation (see xl_recalc)
+                    self.excel_app.Calculation = -4105
+                    workbook.Save()
+                    LBT2PH.xl_ledger.DiffLedger.record_saved(self.filename, sc.sticky.get('lbt2ph_ledgers'))
+                    workbook.Close()
+                self.excel_app.Quit()
+            except Exception as e:
+                print('Excel was already closed: {}'.format(e))
+            
+            # Let go of all the COM objects so the EXCEL.EXE process can exit
+            unwrap = LBT2PH.xl_profile.unwrap
+            if isinstance(self.sheets_dict, LBT2PH.xl_sheets.LazySheets):
+                for sheet in self.sheets_dict.handles():
+                    Marshal.FinalReleaseComObject(unwrap(sheet))
+            if workbook is not None:
+                Marshal.FinalReleaseComObject(unwrap(workbook))
+            Marshal.FinalReleaseComObject(unwrap(self.excel_app))
+            
+            self.sheets_dict = {}
+            self.excel_app = None
     
     def __unicode__(self):
         return u"Excel Instance | Active Worksheet: {}".format(self.active_workbook_name)
@@ -129,3 +240,125 @@ class ExcelInstance:
                self.__class__.__name__ )
     def ToString(self):
         return str(self)
+
+
+class ExcelSessions:
+    """Keeps the open workbooks running in between Grasshopper solves, one per PHPP file
+
+    Opening a large PHPP takes a long time, so the running instances are kept
+    in sc.sticky, keyed by the file's absolute path, and handed back on the next
+    solve. Each one is saved and closed when the last Grasshopper document which
+    used it closes.
+    """
+    
+    STICKY_KEY = 'lbt2ph_excel_sessions'
+    OWNERS_KEY = 'lbt2ph_excel_session_owners'
+    
+    @staticmethod
+    def key(_filepath):
+        return os.path.normcase(os.path.abspath(unicode(_filepath)))
+    
+    @staticmethod
+    def sessions():
+        return sc.sticky.setdefault(ExcelSessions.STICKY_KEY, {})
+    
+    @staticmethod
+    def owners():
+        """{session key: set of the Grasshopper document IDs using it} """
+        
+        return sc.sticky.setdefault(ExcelSessions.OWNERS_KEY, {})
+    
+    @staticmethod
+    def get(_filepath, _headless=False, _document=None):
+        """Returns the running instance for the file, starting or reopening it if needed
+        
+        Args:
+            _filepath (str): The PHPP file to open
+            _headless (bool): True for a HeadlessInstance, False for Excel
+            _document (GH_Document): Optional. The Grasshopper document using the
+                file. The instance is closed when the last of its documents closes.
+        Returns:
+            (ExcelInstance | HeadlessInstance)
+        """
+        
+        sessions = ExcelSessions.sessions()
+        key = ExcelSessions.key(_filepath)
+        if _document is not None:
+            ExcelSessions.owners().setdefault(key, set()).add(str(_document.DocumentID))
+        instance_type = LBT2PH.xl_headless.HeadlessInstance if _headless else ExcelInstance
+        
+        excel = sessions.get(key)
+        if excel is not None and (excel.__class__.__name__ != instance_type.__name__ or not excel.is_alive()):
+            ExcelSessions.release(_filepath)
+            excel = None
+        
+        if excel is None:
+            excel = instance_type()
+            excel.start_new_instance(_filepath)
+            excel.open_workbook()
+            excel.load_sheets()
+            sessions[key] = excel
+            ExcelSessions._watch_document_close()
+        elif not excel.workbook_is_open():
+            print('The workbook "{}" was closed. Opening it again.'.format(_filepath))
+            excel.reopen_workbook()
+            
+            # It may not have been saved, so the diff ledger has to be loaded (and checked) again
+            sc.sticky.get('lbt2ph_ledgers', {}).pop(LBT2PH.xl_ledger.DiffLedger.key(_filepath), None)
+        
+        return excel
+    
+    @staticmethod
+    def release(_filepath):
+        """Saves and closes the file's instance. Returns False if there wasn't one """
+        
+        key = ExcelSessions.key(_filepath)
+        ExcelSessions.owners().pop(key, None)
+        excel = ExcelSessions.sessions().pop(key, None)
+        if excel is None:
+            return False
+        
+        excel.save_and_quit()
+        return True
+    
+    @staticmethod
+    def release_all():
+        for key in list(ExcelSessions.sessions().keys()):
+            ExcelSessions.release(key)
+    
+    @staticmethod
+    def _watch_document_close():
+        """Closes the sessions of a Grasshopper document when it is closed. Only hooked up once
+        
+        Sessions used by other documents which are still open are kept. Sessions
+        opened without a document are closed when any document closes.
+        """
+        
+        if sc.sticky.get(ExcelSessions.STICKY_KEY + '_watching'):
+            return
+        
+        def _on_document_removed(sender, e):
+            # Only uses sc.sticky, so this still works after the module is reload()ed
+            sessions = sc.sticky.get(ExcelSessions.STICKY_KEY, {})
+            owners = sc.sticky.get(ExcelSessions.OWNERS_KEY, {})
+            try:
+                document_id = str(e.Document.DocumentID)
+            except Exception:
+                document_id = None
+            
+            for key in list(sessions.keys()):
+                documents = owners.get(key)
+                if documents:
+                    if document_id not in documents:
+                        continue
+                    documents.discard(document_id)
+                    if documents:
+                        continue
+                owners.pop(key, None)
+                try:
+                    sessions.pop(key).save_and_quit()
+                except Exception as ex:
+                    print('Could not close "{}": {}'.format(key, ex))
+        
+        Grasshopper.Instances.DocumentServer.DocumentRemoved += _on_document_removed
+        sc.sticky[ExcelSessions.STICKY_KEY + '_watching'] = True
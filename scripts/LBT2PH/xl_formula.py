@@ -0,0 +1,1883 @@
+"""Calculates the PHPP's results in Python, from the .xlsx file, without Excel
+
+The FormulaEngine loads every cell of the workbook (the values Excel saved
+with it, and the formula text), then follows the formulas back from the
+result cells (by default the Verification cells in xl_read.DEFAULT_FIELDS) to
+find the ones which feed them. Only those formulas are parsed, and they make
+up the dependency graph.
+
+Input cells can then be patched with set_value() / set_cells(). The next
+read (or recalculate()) calculates only the formulas downstream of the
+patched cells, precedents first. Formulas which reference each other in a
+loop are iterated, like Excel's iterative calculation. Everything else keeps
+the value Excel saved.
+
+Only the functions the PHPP uses are supported (see FUNCTIONS). A formula
+which uses anything else (or INDIRECT / OFFSET, whose precedents can't be
+known before they are calculated) is recorded in 'unsupported' and keeps its
+saved value, so its results are only as good as that. validate() calculates
+every formula of the graph from the saved values and compares the results to
+what Excel saved, which shows how far the engine can be trusted for a given
+PHPP version.
+
+Note: This module has no Rhino / Grasshopper / COM dependencies so that it can
+be used (and tested) outside of Rhino.
+"""
+
+import bisect
+from collections import OrderedDict
+import datetime
+import math
+import re
+
+import LBT2PH.xl_headless
+import LBT2PH.xl_planfile
+import LBT2PH.xl_ranges
+import LBT2PH.xl_read
+import LBT2PH.xl_template
+
+try:
+    unicode
+except NameError:
+    unicode = str
+
+MAX_ROWS = 1048576
+MAX_COLS = 16384
+
+# Excel's defaults for iterative calculation (File > Options > Formulas)
+MAX_ITERATIONS = 100
+MAX_CHANGE = 0.001
+
+ERROR_CODES = ('#NULL!', '#DIV/0!', '#VALUE!', '#REF!', '#NAME?', '#NUM!', '#N/A', '#GETTING_DATA')
+
+
+class FormulaError(Exception):
+    """The formula text can't be parsed """
+
+
+class Unsupported(Exception):
+    """The formula uses something which can't be calculated here """
+
+
+class XlError(Exception):
+    """An Excel error value (#N/A, #DIV/0!, ...)
+
+    Raised while a formula is calculated, and kept as the value of the cell.
+    """
+
+    def __init__(self, _code):
+        Exception.__init__(self, _code)
+        self.code = _code
+
+    def __eq__(self, _other):
+        return isinstance(_other, XlError) and _other.code == self.code
+
+    def __ne__(self, _other):
+        return not self == _other
+
+    def __hash__(self):
+        return hash(self.code)
+
+    def __repr__(self):
+        return "{}({!r})".format(self.__class__.__name__, self.code)
+
+
+# ------------------------------------------------------------------------------
+# Parsing
+
+_re_token = re.compile(r'''
+    \s+
+  | (?P<string>"(?:[^"]|"")*")
+  | (?P<error>\#(?:NULL!|DIV/0!|VALUE!|REF!|NAME\?|NUM!|N/A|GETTING_DATA))
+  | (?P<sheet>'(?:[^']|'')+'!|[^\W\d][\w.]*!)
+  | (?P<ref>\$?[A-Za-z]{1,3}\$?\d+(?::\$?[A-Za-z]{1,3}\$?\d+)?(?![\w.(])
+      | \$?[A-Za-z]{1,3}:\$?[A-Za-z]{1,3}(?![\w.(])
+      | \$?\d+:\$?\d+(?![\w.(]))
+  | (?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)
+  | (?P<func>[^\W\d][\w.]*(?=\())
+  | (?P<name>[^\W\d][\w.]*|\\[\w.]*)
+  | (?P<op><=|>=|<>|[-+*/^&=<>%(),;:{}])
+''', re.X | re.U)
+_re_a1 = re.compile(r'^([A-Z]{1,3})(\d+)$')
+
+_FUNCTION_PREFIXES = ('_xlfn.', '_xlws.')
+_COMPARISONS = ('=', '<>', '<', '>', '<=', '>=')
+MISSING = ('missing',)
+
+
+def tokenize(_formula):
+    """Splits the formula text (with or without the leading '=') into [(kind, text), ...] """
+
+    text = _formula[1:] if _formula.startswith('=') else _formula
+    tokens = []
+    pos = 0
+    while pos < len(text):
+        match = _re_token.match(text, pos)
+        if not match:
+            raise FormulaError('Unexpected "{}" in: {}'.format(text[pos:pos + 10], _formula))
+        pos = match.end()
+        if match.lastgroup:
+            tokens.append((match.lastgroup, match.group(match.lastgroup)))
+    return tokens
+
+
+def _parse_ref(_text, _sheet):
+    """'$A$1:B2' -> ('ref', sheet, first row, first col, last row, last col, is a range) """
+
+    parts = _text.replace('$', '').upper().split(':')
+    cells = [_re_a1.match(part) for part in parts]
+    if all(cells):
+        rows = [int(m.group(2)) for m in cells]
+        cols = [LBT2PH.xl_ranges.col_to_index(m.group(1)) for m in cells]
+    elif all(part.isalpha() for part in parts):
+        rows = [1, MAX_ROWS]
+        cols = [LBT2PH.xl_ranges.col_to_index(part) for part in parts]
+    elif all(part.isdigit() for part in parts):
+        rows = [int(part) for part in parts]
+        cols = [1, MAX_COLS]
+    else:
+        raise FormulaError('Bad reference: {}'.format(_text))
+
+    return ('ref', _sheet, min(rows), min(cols), max(rows), max(cols), len(parts) > 1)
+
+
+class _Parser(object):
+    """Recursive descent, with Excel's operator precedence (lowest first):
+    comparisons, &, + -, * /, ^, unary minus, %
+    """
+
+    def __init__(self, _formula):
+        self.formula = _formula
+        self.tokens = tokenize(_formula)
+        self.pos = 0
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def next(self):
+        token = self.peek()
+        if token[0] is None:
+            raise FormulaError('Unexpected end of: {}'.format(self.formula))
+        self.pos += 1
+        return token
+
+    def expect(self, _op):
+        kind, text = self.next()
+        if kind != 'op' or text != _op:
+            raise FormulaError('Expected "{}" not "{}" in: {}'.format(_op, text, self.formula))
+
+    def parse(self):
+        node = self.comparison()
+        if self.pos != len(self.tokens):
+            raise FormulaError('Unexpected "{}" in: {}'.format(self.peek()[1], self.formula))
+        return node
+
+    def _binary(self, _ops, _operand):
+        node = _operand()
+        while self.peek()[0] == 'op' and self.peek()[1] in _ops:
+            op = self.next()[1]
+            node = ('bin', op, node, _operand())
+        return node
+
+    def comparison(self):
+        return self._binary(_COMPARISONS, self.concat)
+
+    def concat(self):
+        return self._binary(('&',), self.additive)
+
+    def additive(self):
+        return self._binary(('+', '-'), self.term)
+
+    def term(self):
+        return self._binary(('*', '/'), self.power)
+
+    def power(self):
+        return self._binary(('^',), self.unary)
+
+    def unary(self):
+        kind, text = self.peek()
+        if kind == 'op' and text in ('-', '+'):
+            self.next()
+            operand = self.unary()
+            return ('neg', operand) if text == '-' else operand
+
+        node = self.primary()
+        while self.peek() == ('op', '%'):
+            self.next()
+            node = ('pct', node)
+        return node
+
+    def primary(self):
+        kind, text = self.next()
+
+        if kind == 'number':
+            return ('num', float(text))
+        elif kind == 'string':
+            return ('str', text[1:-1].replace('""', '"'))
+        elif kind == 'error':
+            return ('err', text)
+        elif kind == 'ref':
+            return _parse_ref(text, None)
+        elif kind == 'sheet':
+            sheet = text[:-1]
+            if sheet.startswith("'"):
+                sheet = sheet[1:-1].replace("''", "'")
+            kind, text = self.next()
+            if kind == 'ref':
+                return _parse_ref(text, sheet)
+            elif kind == 'name':
+                return ('name', text.upper())
+            raise FormulaError('Expected a reference after "{}!" in: {}'.format(sheet, self.formula))
+        elif kind == 'func':
+            return self.function(text)
+        elif kind == 'name':
+            if text.upper() in ('TRUE', 'FALSE'):
+                return ('bool', text.upper() == 'TRUE')
+            return ('name', text.upper())
+        elif kind == 'op' and text == '(':
+            node = self.comparison()
+            self.expect(')')
+            return node
+        elif kind == 'op' and text == '{':
+            return self.array()
+        raise FormulaError('Unexpected "{}" in: {}'.format(text, self.formula))
+
+    def function(self, _name):
+        name = _name.upper()
+        for prefix in _FUNCTION_PREFIXES:
+            if name.startswith(prefix.upper()):
+                name = name[len(prefix):]
+
+        self.expect('(')
+        args = []
+        if self.peek() == ('op', ')'):
+            self.next()
+            return ('fn', name, args)
+
+        while True:
+            if self.peek()[0] == 'op' and self.peek()[1] in (',', ')'):
+                args.append(MISSING)
+            else:
+                args.append(self.comparison())
+            kind, text = self.next()
+            if kind == 'op' and text == ')':
+                return ('fn', name, args)
+            if kind != 'op' or text != ',':
+                raise FormulaError('Expected "," or ")" not "{}" in: {}'.format(text, self.formula))
+
+    def array(self):
+        rows = [[]]
+        while True:
+            sign = 1.0
+            kind, text = self.next()
+            if kind == 'op' and text == '-':
+                sign = -1.0
+                kind, text = self.next()
+
+            if kind == 'number':
+                rows[-1].append(sign * float(text))
+            elif kind == 'string':
+                rows[-1].append(text[1:-1].replace('""', '"'))
+            elif kind == 'error':
+                rows[-1].append(XlError(text))
+            elif kind == 'name' and text.upper() in ('TRUE', 'FALSE'):
+                rows[-1].append(text.upper() == 'TRUE')
+            else:
+                raise FormulaError('Bad array constant in: {}'.format(self.formula))
+
+            kind, text = self.next()
+            if text == '}':
+                return ('arr', rows)
+            elif text == ';':
+                rows.append([])
+            elif text != ',':
+                raise FormulaError('Bad array constant in: {}'.format(self.formula))
+
+
+def parse(_formula):
+    """Parses the formula text into a tree of tuples. ie: '=A1+1' ->
+    ('bin', '+', ('ref', None, 1, 1, 1, 1, False), ('num', 1.0))
+    """
+
+    return _Parser(_formula).parse()
+
+
+def _walk(_node):
+    """Yields every node of the tree """
+
+    stack = [_node]
+    while stack:
+        node = stack.pop()
+        yield node
+        kind = node[0]
+        if kind == 'bin':
+            stack.extend(node[2:])
+        elif kind in ('neg', 'pct'):
+            stack.append(node[1])
+        elif kind == 'fn':
+            stack.extend(node[2])
+
+
+# ------------------------------------------------------------------------------
+# Values
+
+class _Array(object):
+    """A 2D array of values: the result of an array constant or an array operation """
+
+    def __init__(self, _rows):
+        self.rows = _rows
+
+    @property
+    def n_rows(self):
+        return len(self.rows)
+
+    @property
+    def n_cols(self):
+        return len(self.rows[0]) if self.rows else 0
+
+    def value(self, _i, _j):
+        if _i < len(self.rows) and _j < len(self.rows[_i]):
+            return self.rows[_i][_j]
+        return XlError('#N/A')
+
+    def values(self):
+        for row in self.rows:
+            for v in row:
+                yield v
+
+    def vector(self):
+        """The values of a single row or column, or all of them row by row """
+
+        return list(self.values())
+
+
+class _Range(_Array):
+    """A rectangle of cells. The values are read from the engine when needed,
+    and only over the used part of the sheet (so 'A:A' is not a million cells).
+    """
+
+    def __init__(self, _engine, _sheet, _row, _col, _last_row, _last_col):
+        self.engine = _engine
+        self.sheet = _sheet
+        self.row = _row
+        self.col = _col
+        self.last_row = _last_row
+        self.last_col = _last_col
+
+    @property
+    def n_rows(self):
+        return self.last_row - self.row + 1
+
+    @property
+    def n_cols(self):
+        return self.last_col - self.col + 1
+
+    def value(self, _i, _j):
+        if _i < self.n_rows and _j < self.n_cols:
+            return self.engine.values.get((self.sheet, self.row + _i, self.col + _j))
+        return XlError('#N/A')
+
+    @property
+    def rows(self):
+        last_row = min(self.last_row, self.engine.used_rows.get(self.sheet, 0))
+        last_col = min(self.last_col, self.engine.used_cols.get(self.sheet, 0))
+        values = self.engine.values
+        return [[values.get((self.sheet, r, c)) for c in range(self.col, last_col + 1)]
+                for r in range(self.row, last_row + 1)]
+
+
+def _is_number(_value):
+    return isinstance(_value, (int, float)) and not isinstance(_value, bool)
+
+
+def _to_number(_value):
+    if isinstance(_value, XlError):
+        raise _value
+    elif _value is None:
+        return 0.0
+    elif isinstance(_value, (bool, int, float)):
+        return float(_value)
+    elif isinstance(_value, (str, unicode)) and LBT2PH.xl_ranges.re_number.match(_value):
+        return float(_value)
+    raise XlError('#VALUE!')
+
+
+def _to_text(_value):
+    if isinstance(_value, XlError):
+        raise _value
+    elif _value is None:
+        return u''
+    elif isinstance(_value, bool):
+        return u'TRUE' if _value else u'FALSE'
+    elif _is_number(_value):
+        if float(_value).is_integer() and abs(_value) < 1e15:
+            return u'{}'.format(int(_value))
+        return u'{:.15g}'.format(_value)
+    return unicode(_value)
+
+
+def _to_bool(_value):
+    if isinstance(_value, XlError):
+        raise _value
+    elif _value is None:
+        return False
+    elif isinstance(_value, (bool, int, float)):
+        return bool(_value)
+    elif _value.upper() in ('TRUE', 'FALSE'):
+        return _value.upper() == 'TRUE'
+    raise XlError('#VALUE!')
+
+
+def _to_int(_value):
+    return int(math.floor(_to_number(_value)))
+
+
+def _sort_key(_value, _other=None):
+    """Excel orders numbers < text < TRUE / FALSE. Text is not case sensitive """
+
+    if _value is None:
+        if isinstance(_other, (str, unicode)):
+            _value = u''
+        elif isinstance(_other, bool):
+            _value = False
+        else:
+            _value = 0.0
+    if isinstance(_value, bool):
+        return (2, _value)
+    elif isinstance(_value, (str, unicode)):
+        return (1, _value.lower())
+    return (0, float(_value))
+
+
+def _compare(_a, _b):
+    for v in (_a, _b):
+        if isinstance(v, XlError):
+            raise v
+    a, b = _sort_key(_a, _b), _sort_key(_b, _a)
+    return (a > b) - (a < b)
+
+
+def _apply(_op, _a, _b):
+    """One binary operator, on two single values """
+
+    if _op in _COMPARISONS:
+        result = _compare(_a, _b)
+        return {'=': result == 0, '<>': result != 0, '<': result < 0, '>': result > 0,
+                '<=': result <= 0, '>=': result >= 0}[_op]
+    elif _op == '&':
+        return _to_text(_a) + _to_text(_b)
+
+    a, b = _to_number(_a), _to_number(_b)
+    if _op == '+':
+        return a + b
+    elif _op == '-':
+        return a - b
+    elif _op == '*':
+        return a * b
+    elif _op == '/':
+        if b == 0:
+            raise XlError('#DIV/0!')
+        return a / b
+    elif _op == '^':
+        if a == 0 and b < 0:
+            raise XlError('#DIV/0!')
+        try:
+            result = a ** b
+        except (OverflowError, ValueError):
+            raise XlError('#NUM!')
+        if isinstance(result, complex):
+            raise XlError('#NUM!')
+        return result
+    raise FormulaError('Unknown operator: {}'.format(_op))
+
+
+def _broadcast(_func, *args):
+    """Applies the function to each element of the array arguments, like an
+    array formula. Single rows / columns are repeated to fit.
+    """
+
+    arrays = [a for a in args if isinstance(a, _Array)]
+    n_rows = max(a.n_rows for a in arrays)
+    n_cols = max(a.n_cols for a in arrays)
+
+    def _get(a, i, j):
+        if not isinstance(a, _Array):
+            return a
+        return a.value(0 if a.n_rows == 1 else i, 0 if a.n_cols == 1 else j)
+
+    rows = []
+    for i in range(n_rows):
+        row = []
+        for j in range(n_cols):
+            try:
+                row.append(_func(*[_get(a, i, j) for a in args]))
+            except XlError as e:
+                row.append(e)
+        rows.append(row)
+    return _Array(rows)
+
+
+# ------------------------------------------------------------------------------
+# Functions
+#
+# Each gets the values of its arguments. 'Range' functions get ranges / arrays
+# as they are. The others get single values: in an array formula (ie: inside
+# SUMPRODUCT) they are applied to each element of an array argument.
+
+def _numbers(_args):
+    """The numbers to SUM / MIN / MAX / ...: in ranges only numbers count, other
+    arguments are converted (so "1" and TRUE are numbers, "x" is an error).
+    """
+
+    for arg in _args:
+        if arg is MISSING:
+            continue
+        elif isinstance(arg, _Array):
+            for v in arg.values():
+                if isinstance(v, XlError):
+                    raise v
+                elif _is_number(v):
+                    yield float(v)
+        else:
+            yield _to_number(arg)
+
+
+def _fn_sum(*args):
+    return sum(_numbers(args))
+
+
+def _fn_product(*args):
+    result = 1.0
+    for v in _numbers(args):
+        result *= v
+    return result
+
+
+def _fn_min(*args):
+    values = list(_numbers(args))
+    return min(values) if values else 0.0
+
+
+def _fn_max(*args):
+    values = list(_numbers(args))
+    return max(values) if values else 0.0
+
+
+def _fn_average(*args):
+    values = list(_numbers(args))
+    if not values:
+        raise XlError('#DIV/0!')
+    return sum(values) / len(values)
+
+
+def _fn_large(_array, _k):
+    values = sorted(_numbers([_array]), reverse=True)
+    k = _to_int(_k)
+    if k < 1 or k > len(values):
+        raise XlError('#NUM!')
+    return values[k - 1]
+
+
+def _fn_small(_array, _k):
+    values = sorted(_numbers([_array]))
+    k = _to_int(_k)
+    if k < 1 or k > len(values):
+        raise XlError('#NUM!')
+    return values[k - 1]
+
+
+def _fn_count(*args):
+    count = 0
+    for arg in args:
+        if isinstance(arg, _Array):
+            count += sum(1 for v in arg.values() if _is_number(v))
+        elif arg is not MISSING and not isinstance(arg, XlError):
+            try:
+                _to_number(arg)
+                count += 1
+            except XlError:
+                pass
+    return float(count)
+
+
+def _fn_counta(*args):
+    count = 0
+    for arg in args:
+        if isinstance(arg, _Array):
+            count += sum(1 for v in arg.values() if v is not None)
+        elif arg is not MISSING:
+            count += 1
+    return float(count)
+
+
+def _fn_countblank(_range):
+    return float(_range.n_rows * _range.n_cols - _fn_counta(_range) +
+                 sum(1 for v in _range.values() if v == u''))
+
+
+def _as_array(_value):
+    return _value if isinstance(_value, _Array) else _Array([[_value]])
+
+
+def _fn_sumproduct(*args):
+    arrays = [_as_array(a) for a in args]
+    n_rows, n_cols = arrays[0].n_rows, arrays[0].n_cols
+    if any(a.n_rows != n_rows or a.n_cols != n_cols for a in arrays):
+        raise XlError('#VALUE!')
+
+    total = 0.0
+    for i in range(n_rows):
+        for j in range(n_cols):
+            product = 1.0
+            for a in arrays:
+                v = a.value(i, j)
+                if isinstance(v, XlError):
+                    raise v
+                product *= float(v) if _is_number(v) else 0.0
+            total += product
+    return total
+
+
+def _wildcard(_pattern):
+    """Excel's * ? and ~ wildcards as a regex """
+
+    out = []
+    chars = iter(_pattern)
+    for char in chars:
+        if char == '~':
+            out.append(re.escape(next(chars, '~')))
+        elif char == '*':
+            out.append('.*')
+        elif char == '?':
+            out.append('.')
+        else:
+            out.append(re.escape(char))
+    return re.compile(u'^' + u''.join(out) + u'$', re.I | re.S | re.U)
+
+
+def _criterion(_criteria):
+    """Turns a COUNTIF / SUMIF criteria (5, ">0", "<>x", "a*", ...) into a test function """
+
+    if isinstance(_criteria, XlError):
+        raise _criteria
+    elif _criteria is None or _is_number(_criteria) or isinstance(_criteria, bool):
+        target = 0.0 if _criteria is None else _criteria
+        return lambda v: v is not None and _sort_key(v) == _sort_key(target)
+
+    match = re.match(r'^(<=|>=|<>|<|>|=)?(.*)$', _criteria, re.S)
+    op, rest = match.group(1) or '=', match.group(2)
+
+    if LBT2PH.xl_ranges.re_number.match(rest):
+        number = float(rest)
+
+        def _test_number(v):
+            if not _is_number(v):
+                return op == '<>'
+            return _apply(op, float(v), number)
+        return _test_number
+
+    if op in ('=', '<>'):
+        if rest == u'':
+            is_blank = lambda v: v is None or v == u''
+            return is_blank if op == '=' else (lambda v: not is_blank(v))
+        if rest.upper() in ('TRUE', 'FALSE'):
+            target = rest.upper() == 'TRUE'
+            test = lambda v: isinstance(v, bool) and v == target
+        else:
+            pattern = _wildcard(rest)
+            test = lambda v: isinstance(v, (str, unicode)) and bool(pattern.match(v))
+        return test if op == '=' else (lambda v: not test(v))
+
+    return lambda v: isinstance(v, (str, unicode)) and _apply(op, v, rest)
+
+
+def _pairs(_args):
+    """(range, criteria) pairs for the ...IFS functions """
+
+    if len(_args) % 2:
+        raise XlError('#VALUE!')
+    return [(_as_array(_args[i]), _criterion(_args[i + 1])) for i in range(0, len(_args), 2)]
+
+
+def _matching(_shape, _pairs):
+    """The (i, j) positions where every range meets its criteria """
+
+    for i in range(_shape.n_rows):
+        for j in range(_shape.n_cols):
+            if all(test(rng.value(i, j)) for rng, test in _pairs):
+                yield i, j
+
+
+def _fn_countif(_range, _criteria):
+    return _fn_countifs(_range, _criteria)
+
+
+def _fn_countifs(*args):
+    pairs = _pairs(args)
+    return float(sum(1 for _ in _matching(pairs[0][0], pairs)))
+
+
+def _sum_at(_sum_range, _positions):
+    total = 0.0
+    for i, j in _positions:
+        v = _sum_range.value(i, j)
+        if isinstance(v, XlError):
+            raise v
+        elif _is_number(v):
+            total += v
+    return total
+
+
+def _fn_sumif(_range, _criteria, _sum_range=MISSING):
+    rng = _as_array(_range)
+    sum_range = rng if _sum_range is MISSING else _as_array(_sum_range)
+    return _sum_at(sum_range, _matching(rng, [(rng, _criterion(_criteria))]))
+
+
+def _fn_sumifs(_sum_range, *args):
+    pairs = _pairs(args)
+    return _sum_at(_as_array(_sum_range), _matching(pairs[0][0], pairs))
+
+
+def _fn_averageif(_range, _criteria, _average_range=MISSING):
+    rng = _as_array(_range)
+    avg_range = rng if _average_range is MISSING else _as_array(_average_range)
+    values = [avg_range.value(i, j) for i, j in _matching(rng, [(rng, _criterion(_criteria))])]
+    values = [v for v in values if _is_number(v)]
+    if not values:
+        raise XlError('#DIV/0!')
+    return sum(values) / len(values)
+
+
+def _fn_and(*args):
+    values = list(_logicals(args))
+    if not values:
+        raise XlError('#VALUE!')
+    return all(values)
+
+
+def _fn_or(*args):
+    values = list(_logicals(args))
+    if not values:
+        raise XlError('#VALUE!')
+    return any(values)
+
+
+def _logicals(_args):
+    for arg in _args:
+        if isinstance(arg, _Array):
+            for v in arg.values():
+                if isinstance(v, XlError):
+                    raise v
+                elif isinstance(v, (bool, int, float)):
+                    yield bool(v)
+        elif arg is not MISSING:
+            yield _to_bool(arg)
+
+
+def _lookup_position(_value, _vector, _match_type):
+    """The 0-based position of the value in the list, as MATCH finds it. None if not found """
+
+    if isinstance(_value, XlError):
+        raise _value
+
+    if _match_type == 0:
+        if isinstance(_value, (str, unicode)):
+            pattern = _wildcard(_value)
+            for i, v in enumerate(_vector):
+                if isinstance(v, (str, unicode)) and pattern.match(v):
+                    return i
+            return None
+        key = _sort_key(_value)
+        for i, v in enumerate(_vector):
+            if v is not None and _sort_key(v) == key:
+                return i
+        return None
+
+    key = _sort_key(_value)
+    found = None
+    for i, v in enumerate(_vector):
+        if v is None or isinstance(v, XlError):
+            continue
+        v_key = _sort_key(v)
+        if v_key[0] != key[0]:
+            continue
+        if (v_key <= key) if _match_type > 0 else (v_key >= key):
+            found = i
+        else:
+            break
+    return found
+
+
+def _fn_match(_value, _lookup, _match_type=1.0):
+    array = _as_array(_lookup)
+    if array.n_rows > 1 and array.n_cols > 1:
+        raise XlError('#N/A')
+
+    match_type = 1 if _match_type is MISSING else _to_int(_match_type)
+    position = _lookup_position(_value, array.vector(), max(-1, min(1, match_type)))
+    if position is None:
+        raise XlError('#N/A')
+    return float(position + 1)
+
+
+def _table_lookup(_value, _table, _index, _approximate, _by_row):
+    table = _as_array(_table)
+    index = _to_int(_index)
+    size = table.n_rows if _by_row else table.n_cols
+    if index < 1:
+        raise XlError('#VALUE!')
+    if index > size:
+        raise XlError('#REF!')
+
+    approximate = True if _approximate is MISSING else _to_bool(_approximate)
+    if _by_row:
+        keys = [table.value(0, j) for j in range(table.n_cols)]
+    else:
+        keys = [table.value(i, 0) for i in range(table.n_rows)]
+
+    position = _lookup_position(_value, keys, 1 if approximate else 0)
+    if position is None:
+        raise XlError('#N/A')
+
+    result = table.value(index - 1, position) if _by_row else table.value(position, index - 1)
+    return 0.0 if result is None else result
+
+
+def _fn_vlookup(_value, _table, _col, _approximate=MISSING):
+    return _table_lookup(_value, _table, _col, _approximate, False)
+
+
+def _fn_hlookup(_value, _table, _row, _approximate=MISSING):
+    return _table_lookup(_value, _table, _row, _approximate, True)
+
+
+def _fn_lookup(_value, _lookup, _result=MISSING):
+    lookup = _as_array(_lookup)
+    if _result is MISSING:
+        if lookup.n_cols > lookup.n_rows:
+            keys = [lookup.value(0, j) for j in range(lookup.n_cols)]
+            results = [lookup.value(lookup.n_rows - 1, j) for j in range(lookup.n_cols)]
+        else:
+            keys = [lookup.value(i, 0) for i in range(lookup.n_rows)]
+            results = [lookup.value(i, lookup.n_cols - 1) for i in range(lookup.n_rows)]
+    else:
+        keys, results = lookup.vector(), _as_array(_result).vector()
+
+    position = _lookup_position(_value, keys, 1)
+    if position is None or position >= len(results):
+        raise XlError('#N/A')
+    return results[position]
+
+
+def _fn_index(_array, _row, _col=MISSING):
+    array = _as_array(_array)
+    row = 0 if _row is MISSING else _to_int(_row)
+    col = None if _col is MISSING else _to_int(_col)
+    if col is None:
+        if array.n_rows == 1:
+            row, col = 1, row  # INDEX(A1:E1, 3) is the 3rd column
+        else:
+            col = 1 if array.n_cols == 1 else 0
+
+    if row < 0 or col < 0 or row > array.n_rows or col > array.n_cols:
+        raise XlError('#REF!')
+    if row == 0 and col == 0:
+        return array
+    elif row == 0:
+        return _Array([[array.value(i, col - 1)] for i in range(array.n_rows)])
+    elif col == 0:
+        return _Array([[array.value(row - 1, j) for j in range(array.n_cols)]])
+    return array.value(row - 1, col - 1)
+
+
+def _fn_rows(_array):
+    return float(_as_array(_array).n_rows)
+
+
+def _fn_columns(_array):
+    return float(_as_array(_array).n_cols)
+
+
+def _round(_value, _digits, _how):
+    x = _to_number(_value)
+    digits = _to_int(_digits) if _digits is not MISSING else 0
+    factor = 10.0 ** digits
+    # Excel rounds what it shows (15 significant digits), so 2.675 rounds to 2.68
+    scaled = float('{:.15g}'.format(abs(x) * factor))
+    if _how == 'up':
+        scaled = math.ceil(scaled)
+    elif _how == 'down':
+        scaled = math.floor(scaled)
+    else:
+        scaled = math.floor(scaled + 0.5)
+    return math.copysign(scaled / factor, x) if scaled else 0.0
+
+
+def _fn_round(_value, _digits=MISSING):
+    return _round(_value, _digits, 'half')
+
+
+def _fn_roundup(_value, _digits=MISSING):
+    return _round(_value, _digits, 'up')
+
+
+def _fn_rounddown(_value, _digits=MISSING):
+    return _round(_value, _digits, 'down')
+
+
+def _fn_mod(_number, _divisor):
+    n, d = _to_number(_number), _to_number(_divisor)
+    if d == 0:
+        raise XlError('#DIV/0!')
+    return n - d * math.floor(n / d)
+
+
+def _fn_ceiling(_value, _significance=1.0):
+    x = _to_number(_value)
+    s = 1.0 if _significance is MISSING else _to_number(_significance)
+    if s == 0:
+        return 0.0
+    if x > 0 and s < 0:
+        raise XlError('#NUM!')
+    return math.ceil(x / s) * s
+
+
+def _fn_floor(_value, _significance=1.0):
+    x = _to_number(_value)
+    s = 1.0 if _significance is MISSING else _to_number(_significance)
+    if s == 0:
+        raise XlError('#DIV/0!')
+    if x > 0 and s < 0:
+        raise XlError('#NUM!')
+    return math.floor(x / s) * s
+
+
+def _math(_func, _valid=None):
+    """Wraps a one-argument math function: #NUM! when it's out of the domain """
+
+    def _fn(_value):
+        x = _to_number(_value)
+        if _valid is not None and not _valid(x):
+            raise XlError('#NUM!')
+        try:
+            return _func(x)
+        except (ValueError, OverflowError):
+            raise XlError('#NUM!')
+    return _fn
+
+
+def _fn_log(_value, _base=10.0):
+    x = _to_number(_value)
+    base = 10.0 if _base is MISSING else _to_number(_base)
+    if x <= 0 or base <= 0:
+        raise XlError('#NUM!')
+    if base == 1:
+        raise XlError('#DIV/0!')
+    return math.log(x) / math.log(base)
+
+
+def _fn_power(_value, _power):
+    return _apply('^', _value, _power)
+
+
+def _fn_atan2(_x, _y):
+    x, y = _to_number(_x), _to_number(_y)
+    if x == 0 and y == 0:
+        raise XlError('#DIV/0!')
+    return math.atan2(y, x)
+
+
+def _fn_sign(_value):
+    x = _to_number(_value)
+    return float((x > 0) - (x < 0))
+
+
+def _fn_trunc(_value, _digits=MISSING):
+    return _round(_value, _digits, 'down')
+
+
+def _fn_not(_value):
+    return not _to_bool(_value)
+
+
+def _fn_na():
+    raise XlError('#N/A')
+
+
+def _fn_n(_value):
+    if isinstance(_value, XlError):
+        raise _value
+    return float(_value) if isinstance(_value, (bool, int, float)) else 0.0
+
+
+def _fn_iserror(_value):
+    return isinstance(_value, XlError)
+
+
+def _fn_iserr(_value):
+    return isinstance(_value, XlError) and _value.code != '#N/A'
+
+
+def _fn_isna(_value):
+    return isinstance(_value, XlError) and _value.code == '#N/A'
+
+
+def _fn_isnumber(_value):
+    return _is_number(_value)
+
+
+def _fn_istext(_value):
+    return isinstance(_value, (str, unicode))
+
+
+def _fn_isnontext(_value):
+    return not isinstance(_value, (str, unicode))
+
+
+def _fn_islogical(_value):
+    return isinstance(_value, bool)
+
+
+def _fn_isblank(_value):
+    return _value is None
+
+
+def _fn_len(_text):
+    return float(len(_to_text(_text)))
+
+
+def _fn_left(_text, _n=MISSING):
+    n = 1 if _n is MISSING else _to_int(_n)
+    if n < 0:
+        raise XlError('#VALUE!')
+    return _to_text(_text)[:n]
+
+
+def _fn_right(_text, _n=MISSING):
+    n = 1 if _n is MISSING else _to_int(_n)
+    if n < 0:
+        raise XlError('#VALUE!')
+    text = _to_text(_text)
+    return text[len(text) - n:] if n else u''
+
+
+def _fn_mid(_text, _start, _n):
+    start, n = _to_int(_start), _to_int(_n)
+    if start < 1 or n < 0:
+        raise XlError('#VALUE!')
+    return _to_text(_text)[start - 1:start - 1 + n]
+
+
+def _fn_find(_find, _within, _start=MISSING, _ignore_case=False):
+    start = 1 if _start is MISSING else _to_int(_start)
+    find, within = _to_text(_find), _to_text(_within)
+    if _ignore_case:
+        find, within = find.lower(), within.lower()
+    if start < 1 or start > len(within) + 1:
+        raise XlError('#VALUE!')
+    position = within.find(find, start - 1)
+    if position < 0:
+        raise XlError('#VALUE!')
+    return float(position + 1)
+
+
+def _fn_search(_find, _within, _start=MISSING):
+    return _fn_find(_find, _within, _start, True)
+
+
+def _fn_substitute(_text, _old, _new, _instance=MISSING):
+    text, old, new = _to_text(_text), _to_text(_old), _to_text(_new)
+    if not old:
+        return text
+    if _instance is MISSING:
+        return text.replace(old, new)
+
+    instance = _to_int(_instance)
+    if instance < 1:
+        raise XlError('#VALUE!')
+    position = -1
+    for _ in range(instance):
+        position = text.find(old, position + 1)
+        if position < 0:
+            return text
+    return text[:position] + new + text[position + len(old):]
+
+
+def _fn_concatenate(*args):
+    return u''.join(_to_text(a) for a in args if a is not MISSING)
+
+
+def _fn_trim(_text):
+    return re.sub(u' +', u' ', _to_text(_text).strip(u' '))
+
+
+def _fn_value(_text):
+    if _is_number(_text):
+        return float(_text)
+    text = _to_text(_text).strip()
+    if text.endswith(u'%') and LBT2PH.xl_ranges.re_number.match(text[:-1]):
+        return float(text[:-1]) / 100.0
+    if not LBT2PH.xl_ranges.re_number.match(text):
+        raise XlError('#VALUE!')
+    return float(text)
+
+
+def _fn_rept(_text, _times):
+    times = _to_int(_times)
+    if times < 0:
+        raise XlError('#VALUE!')
+    return _to_text(_text) * times
+
+
+_EPOCH = datetime.date(1899, 12, 30)
+
+
+def _fn_date(_year, _month, _day):
+    year, month = _to_int(_year), _to_int(_month)
+    if year < 1900:
+        year += 1900
+    year, month = year + (month - 1) // 12, (month - 1) % 12 + 1
+    try:
+        first = datetime.date(year, month, 1)
+    except ValueError:
+        raise XlError('#NUM!')
+    return float((first - _EPOCH).days + _to_int(_day) - 1)
+
+
+def _date_of(_serial):
+    return _EPOCH + datetime.timedelta(days=_to_int(_serial))
+
+
+def _fn_year(_serial):
+    return float(_date_of(_serial).year)
+
+
+def _fn_month(_serial):
+    return float(_date_of(_serial).month)
+
+
+def _fn_day(_serial):
+    return float(_date_of(_serial).day)
+
+
+def _constant(_value):
+    return lambda: _value
+
+
+# {NAME: (function, True if it takes ranges / arrays as they are)}
+FUNCTIONS = {
+    'SUM': (_fn_sum, True), 'PRODUCT': (_fn_product, True), 'SUMPRODUCT': (_fn_sumproduct, True),
+    'SUMIF': (_fn_sumif, True), 'SUMIFS': (_fn_sumifs, True),
+    'COUNT': (_fn_count, True), 'COUNTA': (_fn_counta, True), 'COUNTBLANK': (_fn_countblank, True),
+    'COUNTIF': (_fn_countif, True), 'COUNTIFS': (_fn_countifs, True),
+    'AVERAGE': (_fn_average, True), 'AVERAGEIF': (_fn_averageif, True),
+    'MIN': (_fn_min, True), 'MAX': (_fn_max, True), 'LARGE': (_fn_large, True), 'SMALL': (_fn_small, True),
+    'AND': (_fn_and, True), 'OR': (_fn_or, True),
+    'INDEX': (_fn_index, True), 'MATCH': (_fn_match, True), 'LOOKUP': (_fn_lookup, True),
+    'VLOOKUP': (_fn_vlookup, True), 'HLOOKUP': (_fn_hlookup, True),
+    'ROWS': (_fn_rows, True), 'COLUMNS': (_fn_columns, True),
+
+    'ABS': (_math(abs), False), 'SQRT': (_math(math.sqrt, lambda x: x >= 0), False),
+    'EXP': (_math(math.exp), False), 'LN': (_math(math.log, lambda x: x > 0), False),
+    'LOG10': (_math(math.log10, lambda x: x > 0), False), 'LOG': (_fn_log, False),
+    'SIN': (_math(math.sin), False), 'COS': (_math(math.cos), False), 'TAN': (_math(math.tan), False),
+    'ASIN': (_math(math.asin), False), 'ACOS': (_math(math.acos), False),
+    'ATAN': (_math(math.atan), False), 'ATAN2': (_fn_atan2, False),
+    'RADIANS': (_math(math.radians), False), 'DEGREES': (_math(math.degrees), False),
+    'INT': (_math(lambda x: float(math.floor(x))), False), 'TRUNC': (_fn_trunc, False),
+    'ROUND': (_fn_round, False), 'ROUNDUP': (_fn_roundup, False), 'ROUNDDOWN': (_fn_rounddown, False),
+    'CEILING': (_fn_ceiling, False), 'FLOOR': (_fn_floor, False), 'MOD': (_fn_mod, False),
+    'POWER': (_fn_power, False), 'SIGN': (_fn_sign, False), 'PI': (_constant(math.pi), False),
+    'NOT': (_fn_not, False), 'TRUE': (_constant(True), False), 'FALSE': (_constant(False), False),
+    'NA': (_fn_na, False), 'N': (_fn_n, False),
+    'ISERROR': (_fn_iserror, False), 'ISERR': (_fn_iserr, False), 'ISNA': (_fn_isna, False),
+    'ISNUMBER': (_fn_isnumber, False), 'ISTEXT': (_fn_istext, False), 'ISNONTEXT': (_fn_isnontext, False),
+    'ISLOGICAL': (_fn_islogical, False), 'ISBLANK': (_fn_isblank, False),
+    'LEN': (_fn_len, False), 'LEFT': (_fn_left, False), 'RIGHT': (_fn_right, False), 'MID': (_fn_mid, False),
+    'FIND': (_fn_find, False), 'SEARCH': (_fn_search, False), 'SUBSTITUTE': (_fn_substitute, False),
+    'CONCATENATE': (_fn_concatenate, False), 'CONCAT': (_fn_concatenate, False),
+    'UPPER': (lambda t: _to_text(t).upper(), False), 'LOWER': (lambda t: _to_text(t).lower(), False),
+    'TRIM': (_fn_trim, False), 'VALUE': (_fn_value, False), 'REPT': (_fn_rept, False),
+    'EXACT': (lambda a, b: _to_text(a) == _to_text(b), False),
+    'DATE': (_fn_date, False), 'YEAR': (_fn_year, False), 'MONTH': (_fn_month, False), 'DAY': (_fn_day, False),
+}
+
+# These are worked out by the _Context itself: they don't calculate all their
+# arguments, or they need the reference rather than the value.
+SPECIAL_FUNCTIONS = ('IF', 'IFERROR', 'IFNA', 'CHOOSE', 'ROW', 'COLUMN')
+
+# Their precedents are only known once they are calculated
+DYNAMIC_FUNCTIONS = ('INDIRECT', 'OFFSET')
+
+# These get an error as their argument's value, instead of passing it on
+_ERROR_ARGUMENTS = ('ISERROR', 'ISERR', 'ISNA', 'ISNUMBER', 'ISTEXT', 'ISNONTEXT', 'ISLOGICAL', 'ISBLANK')
+
+
+class _Context(object):
+    """Calculates one formula, for the cell it is in """
+
+    def __init__(self, _engine, _key):
+        self.engine = _engine
+        self.sheet, self.row, self.col = _key
+        self.array_depth = 0  # > 0 inside an array function (SUMPRODUCT)
+
+    def scalar(self, _value):
+        """A single value from a range, by 'implicit intersection' with the formula's row / column """
+
+        if not isinstance(_value, _Array):
+            return _value
+        elif not isinstance(_value, _Range) or (_value.n_rows == 1 and _value.n_cols == 1):
+            return _value.value(0, 0)
+
+        rng = _value
+        if rng.n_cols == 1 and rng.row <= self.row <= rng.last_row:
+            return rng.value(self.row - rng.row, 0)
+        if rng.n_rows == 1 and rng.col <= self.col <= rng.last_col:
+            return rng.value(0, self.col - rng.col)
+        raise XlError('#VALUE!')
+
+    def result(self, _value):
+        """The value to keep in the cell """
+
+        value = self.scalar(_value)
+        return 0.0 if value is None else value
+
+    def eval(self, _node):
+        kind = _node[0]
+        if kind == 'num' or kind == 'str' or kind == 'bool':
+            return _node[1]
+        elif kind == 'ref':
+            return self.reference(_node)
+        elif kind == 'bin':
+            return self.binary(_node[1], self.eval(_node[2]), self.eval(_node[3]))
+        elif kind == 'fn':
+            return self.call(_node[1], _node[2])
+        elif kind == 'neg':
+            return self.unary(lambda v: -_to_number(v), self.eval(_node[1]))
+        elif kind == 'pct':
+            return self.unary(lambda v: _to_number(v) / 100.0, self.eval(_node[1]))
+        elif kind == 'name':
+            return self.eval(self.engine.name_tree(_node[1]))
+        elif kind == 'err':
+            raise XlError(_node[1])
+        elif kind == 'arr':
+            return _Array(_node[1])
+        raise FormulaError('Unknown node: {}'.format(kind))
+
+    def reference(self, _node):
+        _, sheet, row, col, last_row, last_col, is_range = _node
+        sheet = sheet or self.sheet
+        if sheet not in self.engine.sheet_names:
+            raise Unsupported('Reference to an unknown worksheet: {}'.format(sheet))
+        if not is_range:
+            return self.engine.values.get((sheet, row, col))
+        return _Range(self.engine, sheet, row, col, last_row, last_col)
+
+    def binary(self, _op, _a, _b):
+        if not self.array_depth:
+            _a, _b = self.scalar(_a), self.scalar(_b)
+        if isinstance(_a, _Array) or isinstance(_b, _Array):
+            return _broadcast(lambda a, b: _apply(_op, a, b), _a, _b)
+        return _apply(_op, _a, _b)
+
+    def unary(self, _func, _value):
+        if not self.array_depth:
+            _value = self.scalar(_value)
+        if isinstance(_value, _Array):
+            return _broadcast(_func, _value)
+        return _func(_value)
+
+    def eval_catching(self, _node):
+        """The argument's value, with an error as the value rather than raised """
+
+        try:
+            return self.eval(_node)
+        except XlError as e:
+            return e
+
+    def call(self, _name, _args):
+        if _name in SPECIAL_FUNCTIONS:
+            return getattr(self, 'fn_' + _name.lower())(_args)
+        elif _name in DYNAMIC_FUNCTIONS or _name not in FUNCTIONS:
+            raise Unsupported('The function {}() is not supported'.format(_name))
+
+        func, takes_ranges = FUNCTIONS[_name]
+        array_function = _name == 'SUMPRODUCT'
+        self.array_depth += array_function
+        try:
+            evaluate = self.eval_catching if _name in _ERROR_ARGUMENTS else self.eval
+            args = [MISSING if node is MISSING else evaluate(node) for node in _args]
+        finally:
+            self.array_depth -= array_function
+
+        if takes_ranges:
+            return func(*args)
+        if self.array_depth and any(isinstance(a, _Array) for a in args):
+            return _broadcast(func, *args)
+        return func(*[self.scalar(a) for a in args])
+
+    def condition(self, _node):
+        return _to_bool(self.scalar(self.eval(_node)))
+
+    def fn_if(self, _args):
+        if not 1 < len(_args) < 4:
+            raise XlError('#VALUE!')
+        condition = self.eval(_args[0])
+        if self.array_depth and isinstance(condition, _Array):
+            values = [self.eval(a) if a is not MISSING else False for a in (_args[1:] + [MISSING])[:2]]
+            return _broadcast(lambda c, a, b: a if _to_bool(c) else b, condition, *values)
+
+        branch = _args[1] if _to_bool(self.scalar(condition)) else (_args[2] if len(_args) > 2 else None)
+        if branch is None:
+            return False
+        elif branch is MISSING:
+            return 0.0
+        return self.eval(branch)
+
+    def fn_iferror(self, _args, _codes=None):
+        value = self.eval_catching(_args[0])
+        if not self.array_depth:
+            value = self.scalar(value)
+        if isinstance(value, _Array):
+            fallback = self.eval(_args[1])
+            return _broadcast(lambda v, f: f if isinstance(v, XlError) and (
+                _codes is None or v.code in _codes) else v, value, fallback)
+        if isinstance(value, XlError) and (_codes is None or value.code in _codes):
+            return self.eval(_args[1])
+        return value
+
+    def fn_ifna(self, _args):
+        return self.fn_iferror(_args, ('#N/A',))
+
+    def fn_choose(self, _args):
+        index = _to_int(self.scalar(self.eval(_args[0])))
+        if index < 1 or index >= len(_args):
+            raise XlError('#VALUE!')
+        return self.eval(_args[index])
+
+    def _ref_position(self, _args, _index):
+        if not _args:
+            return float(self.row if _index == 0 else self.col)
+        node = _args[0]
+        if node[0] == 'name':
+            node = self.engine.name_tree(node[1])
+        if node[0] != 'ref':
+            raise XlError('#VALUE!')
+        return float(node[2] if _index == 0 else node[3])
+
+    def fn_row(self, _args):
+        return self._ref_position(_args, 0)
+
+    def fn_column(self, _args):
+        return self._ref_position(_args, 1)
+
+
+# ------------------------------------------------------------------------------
+# The engine
+
+def _cell_key(_sheet, _address):
+    row_col = LBT2PH.xl_ranges.parse_address(_address)
+    if row_col is None:
+        raise FormulaError('Not a single cell: "{}"!{}'.format(_sheet, _address))
+    return (_sheet, row_col[0], row_col[1])
+
+
+def format_key(_key):
+    """(sheet, row, col) -> 'Sheet'!A1 """
+
+    sheet, row, col = _key
+    return u"'{}'!{}".format(sheet, LBT2PH.xl_ranges.format_address(row, col))
+
+
+def _spread(_cells, _sheet, _address, _value):
+    """Adds the value to {sheet: {(row, col): value}} (see xl_ranges.spread) """
+
+    try:
+        LBT2PH.xl_ranges.spread(_cells, _sheet, _address, _value)
+    except ValueError as e:
+        raise FormulaError(unicode(e))
+
+
+def cells_from_objects(_objects, _unit_type='SI'):
+    """The PHPP_XL_Obj as {sheet: {(row, col): value}}, for set_cells() / xl_headless.write_cells()
+
+    Args:
+        _objects: A list, DataTree or write-plan file of PHPP_XL_Obj (see xl_planfile)
+        _unit_type (str): 'SI' or 'IP', the units of the PHPP
+    """
+
+    cells = OrderedDict()
+    for obj in LBT2PH.xl_planfile.iter_objects(_objects):
+        _spread(cells, obj.getWorksheet(_unit_type), obj.Range, obj.getValueOrRaw(_unit_type))
+    return cells
+
+
+def _input_value(_value):
+    """Same conversions as writing to Range.Value2: numeric text becomes a number """
+
+    if isinstance(_value, (str, unicode)):
+        if _value in ERROR_CODES:
+            return XlError(_value)
+        elif LBT2PH.xl_ranges.re_number.match(_value):
+            return float(_value)
+        elif _value == u'':
+            return None
+    elif isinstance(_value, int) and not isinstance(_value, bool):
+        return float(_value)
+    return _value
+
+
+def same_value(_a, _b, _tolerance=1e-6):
+    """True if the two cell values are the same, with a relative tolerance for numbers """
+
+    if _a is None or _b is None:
+        return (_a or _b) in (None, 0, u'', False)
+    if _is_number(_a) and _is_number(_b):
+        return abs(_a - _b) <= _tolerance * max(1.0, abs(_a), abs(_b))
+    if isinstance(_a, (str, unicode)) and isinstance(_b, (str, unicode)):
+        return _a == _b
+    return type(_a) == type(_b) and _a == _b
+
+
+class ValidationReport(object):
+    """The formulas calculated from Excel's saved values, compared to Excel's results """
+
+    def __init__(self):
+        self.checked = 0
+        self.matched = 0
+        self.mismatches = []  # [(key, Excel's value, calculated value), ...]
+        self.unsupported = []  # [(key, reason), ...]
+
+    @property
+    def ok(self):
+        return not self.mismatches and not self.unsupported
+
+    def summary_lines(self, _limit=20):
+        lines = [self.__unicode__()]
+        for key, expected, got in self.mismatches[:_limit]:
+            lines.append(u'  {}: Excel {!r}, calculated {!r}'.format(format_key(key), expected, got))
+        for key, reason in self.unsupported[:_limit]:
+            lines.append(u'  {}: {}'.format(format_key(key), reason))
+        return lines
+
+    def __unicode__(self):
+        return u"Validation | Formulas: {}  |  Matched: {}  |  Mismatched: {}  |  Unsupported: {}".format(
+            self.checked, self.matched, len(self.mismatches), len(self.unsupported))
+    def __str__(self):
+        return unicode(self).encode('utf-8')
+    def __repr__(self):
+        return "{}()".format(self.__class__.__name__)
+    def ToString(self):
+        return str(self)
+
+
+class FormulaEngine(object):
+    """The cells of a PHPP workbook, and the graph of the formulas which feed the results """
+
+    def __init__(self, _sheets=None, _names=None, _source=None):
+        """
+        Args:
+            _sheets (dict): {sheet name: {(row, col): (value, formula)}}, as
+                XlsxPackage.read_sheet() returns them
+            _names (dict): {defined name: the reference / formula it stands for}
+            _source (str): The file the cells came from, if any
+        """
+
+        self.source = _source
+        self.sheet_names = []
+        self.values = {}  # {(sheet, row, col): value}
+        self.formulas = {}  # {(sheet, row, col): formula text}
+        self.names = {}  # {NAME: formula text}
+        self.used_rows = {}  # {sheet: last row with anything in}
+        self.used_cols = {}
+
+        self.targets = OrderedDict()  # {label: (sheet, row, col)}
+        self.graph = set()  # The formula cells which feed the targets
+        self.unsupported = {}  # {(sheet, row, col): reason}
+        self.calculations = 0  # Formulas calculated, in total
+
+        self._trees = {}
+        self._name_trees = {}
+        self._formula_rows = {}  # {(sheet, col): sorted rows of the formula cells}
+        self._dependents = {}  # {(sheet, row, col): set of formula cells which read it}
+        self._range_dependents = {}  # {(sheet, col): [(first row, last row, formula cell), ...]}
+        self._precedents = {}  # {formula cell: (cells, (sheet, col) columns) it's a dependent of}
+        self._changed = set()
+
+        for sheet, cells in (_sheets or {}).items():
+            self.add_sheet(sheet, cells)
+        for name, text in (_names or {}).items():
+            self.names[name.upper()] = text
+
+    @classmethod
+    def from_xlsx(cls, _path, _fields=None):
+        """Loads the workbook, and builds the graph for the fields
+
+        Args:
+            _path (str): The PHPP .xlsx file
+            _fields (list): The results: [[label, worksheet, cell], ...].
+                Default is xl_read.DEFAULT_FIELDS
+        """
+
+        engine = cls(_source=_path)
+        with LBT2PH.xl_headless.XlsxPackage(LBT2PH.xl_template.open_file(_path)) as package:
+            for sheet in package.sheet_names:
+                engine.add_sheet(sheet, package.read_sheet(sheet))
+
+            engine.names.update(package.defined_names)
+
+        engine.add_targets(_fields)
+        return engine
+
+    def add_sheet(self, _sheet, _cells):
+        self.sheet_names.append(_sheet)
+        for (row, col), (value, formula) in _cells.items():
+            key = (_sheet, row, col)
+            self.values[key] = _input_value(value)
+            if formula:
+                self.formulas[key] = formula
+                self._formula_rows.setdefault((_sheet, col), []).append(row)
+        for rows in self._formula_rows.values():
+            rows.sort()
+
+        self.used_rows[_sheet] = max([row for row, _ in _cells] or [0])
+        self.used_cols[_sheet] = max([col for _, col in _cells] or [0])
+
+    # --------------------------------------------------------------------------
+    # The graph
+
+    def tree(self, _key):
+        """The parsed formula of the cell """
+
+        tree = self._trees.get(_key)
+        if tree is None:
+            try:
+                tree = parse(self.formulas[_key])
+            except FormulaError as e:
+                raise Unsupported(unicode(e))
+            self._trees[_key] = tree
+        return tree
+
+    def name_tree(self, _name):
+        """The parsed formula a defined name stands for """
+
+        tree = self._name_trees.get(_name)
+        if tree is None:
+            if _name not in self.names:
+                raise XlError('#NAME?')
+            try:
+                tree = parse(self.names[_name])
+            except FormulaError as e:
+                raise Unsupported(unicode(e))
+            self._name_trees[_name] = tree
+        return tree
+
+    def _references(self, _tree, _sheet, _names_seen=()):
+        """Yields (sheet, first row, first col, last row, last col) for every reference in the formula """
+
+        for node in _walk(_tree):
+            if node[0] == 'ref':
+                yield (node[1] or _sheet,) + node[2:6]
+            elif node[0] == 'name' and node[1] in self.names and node[1] not in _names_seen:
+                for ref in self._references(self.name_tree(node[1]), _sheet, _names_seen + (node[1],)):
+                    yield ref
+            elif node[0] == 'fn' and node[1] in DYNAMIC_FUNCTIONS:
+                raise Unsupported('The function {}() is not supported'.format(node[1]))
+
+    def add_targets(self, _fields=None):
+        """Adds the result cells, and the formulas which feed them, to the graph
+
+        Args:
+            _fields (list): [[label, worksheet, cell], ...]. Default is xl_read.DEFAULT_FIELDS
+        """
+
+        keys = []
+        for label, sheet, address in (_fields or LBT2PH.xl_read.DEFAULT_FIELDS):
+            key = _cell_key(sheet.strip(), address.strip())
+            self.targets[label.strip()] = key
+            keys.append(key)
+        self._add_to_graph(keys)
+
+    def _add_to_graph(self, _keys):
+        stack = [key for key in _keys if key in self.formulas]
+        while stack:
+            key = stack.pop()
+            if key in self.graph:
+                continue
+            self.graph.add(key)
+
+            try:
+                refs = list(self._references(self.tree(key), key[0]))
+            except Unsupported as e:
+                self.unsupported[key] = unicode(e)
+                continue
+
+            cells, columns = self._precedents.setdefault(key, (set(), set()))
+            for sheet, row, col, last_row, last_col in refs:
+                if sheet not in self.sheet_names:
+                    continue
+                if row == last_row and col == last_col:
+                    cell = (sheet, row, col)
+                    self._dependents.setdefault(cell, set()).add(key)
+                    cells.add(cell)
+                    if cell in self.formulas and cell not in self.graph:
+                        stack.append(cell)
+                    continue
+
+                last_col = min(last_col, max(self.used_cols[sheet], col))
+                for c in range(col, last_col + 1):
+                    self._range_dependents.setdefault((sheet, c), []).append((row, last_row, key))
+                    columns.add((sheet, c))
+                    rows = self._formula_rows.get((sheet, c), [])
+                    for r in rows[bisect.bisect_left(rows, row):bisect.bisect_right(rows, last_row)]:
+                        if (sheet, r, c) not in self.graph:
+                            stack.append((sheet, r, c))
+
+    def _remove_from_graph(self, _key):
+        """Takes a formula cell out of the graph, along with its edges from the cells it read """
+
+        self.graph.discard(_key)
+        cells, columns = self._precedents.pop(_key, ((), ()))
+        for cell in cells:
+            self._dependents[cell].discard(_key)
+        for column in columns:
+            self._range_dependents[column] = [entry for entry in self._range_dependents[column] if entry[2] != _key]
+
+    def dependents(self, _key):
+        """The formula cells of the graph which read the cell directly """
+
+        found = set(self._dependents.get(_key, ()))
+        sheet, row, col = _key
+        for first, last, key in self._range_dependents.get((sheet, col), ()):
+            if first <= row <= last:
+                found.add(key)
+        return found
+
+    def _downstream(self, _keys):
+        dirty = set(key for key in _keys if key in self.graph)
+        stack = list(_keys)
+        while stack:
+            for key in self.dependents(stack.pop()):
+                if key not in dirty:
+                    dirty.add(key)
+                    stack.append(key)
+        return dirty
+
+    def _calculation_order(self, _dirty):
+        """Groups the cells by strongly connected component (Tarjan's), precedents first.
+        A group with more than one cell (or one which reads itself) is a loop.
+        """
+
+        index, low = {}, {}
+        stack, on_stack, groups = [], set(), []
+
+        def _next(key):
+            return iter(sorted(k for k in self.dependents(key) if k in _dirty))
+
+        for root in sorted(_dirty):
+            if root in index:
+                continue
+            index[root] = low[root] = len(index)
+            stack.append(root)
+            on_stack.add(root)
+            work = [(root, _next(root))]
+            while work:
+                key, successors = work[-1]
+                for successor in successors:
+                    if successor not in index:
+                        index[successor] = low[successor] = len(index)
+                        stack.append(successor)
+                        on_stack.add(successor)
+                        work.append((successor, _next(successor)))
+                        break
+                    elif successor in on_stack:
+                        low[key] = min(low[key], index[successor])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        low[parent] = min(low[parent], low[key])
+                    if low[key] == index[key]:
+                        group = []
+                        while True:
+                            member = stack.pop()
+                            on_stack.discard(member)
+                            group.append(member)
+                            if member == key:
+                                break
+                        groups.append(group)
+
+        groups.reverse()
+        return groups
+
+    # --------------------------------------------------------------------------
+    # Calculating
+
+    def calculate_cell(self, _key):
+        """Calculates the cell's formula from the current values. Does not store the result
+
+        Raises:
+            Unsupported: If the formula can't be calculated here
+        """
+
+        context = _Context(self, _key)
+        try:
+            return context.result(context.eval(self.tree(_key)))
+        except XlError as e:
+            return e
+        except RuntimeError:  # ie: a very deeply nested formula
+            raise Unsupported('The formula is too deeply nested')
+
+    def _update(self, _key):
+        """Calculates and stores the cell's value. Returns the change """
+
+        old = self.values.get(_key)
+        if _key in self.unsupported:
+            return 0.0
+        try:
+            value = self.calculate_cell(_key)
+        except Unsupported as e:
+            self.unsupported[_key] = unicode(e)
+            return 0.0
+
+        self.values[_key] = value
+        self.calculations += 1
+        if _is_number(old) and _is_number(value):
+            return abs(value - old)
+        return 0.0 if same_value(old, value, 0.0) else float('inf')
+
+    def recalculate(self):
+        """Calculates the formulas downstream of the cells set since the last time
+
+        Returns:
+            (int): The number of formula cells which were calculated
+        """
+
+        if not self._changed:
+            return 0
+
+        dirty = self._downstream(self._changed)
+        self._changed = set()
+        for group in self._calculation_order(dirty):
+            key = group[0]
+            if len(group) == 1 and key not in self.dependents(key):
+                self._update(key)
+                continue
+
+            for _ in range(MAX_ITERATIONS):
+                if max(self._update(key) for key in sorted(group)) < MAX_CHANGE:
+                    break
+        return len(dirty)
+
+    def set_value(self, _sheet, _address, _value):
+        """Sets a cell, or a range of cells ('A1:B2') to a value / list of rows,
+        like Range.Value2 = ... Text starting with '=' is a formula.
+        """
+
+        cells = {}
+        _spread(cells, _sheet, _address, _value)
+        self.set_cells(cells)
+
+    def set_cells(self, _cells):
+        """Sets many cells at once
+
+        Args:
+            _cells (dict): {sheet: {(row, col): value}}
+        """
+
+        new_formulas = []
+        for sheet, cells in _cells.items():
+            for (row, col), value in cells.items():
+                key = (sheet, row, col)
+                self._trees.pop(key, None)
+                self.unsupported.pop(key, None)
+                if isinstance(value, (str, unicode)) and value.startswith('='):
+                    if key not in self.formulas:
+                        bisect.insort(self._formula_rows.setdefault((sheet, col), []), row)
+                    self.formulas[key] = value
+                    new_formulas.append(key)
+                else:
+                    if key in self.formulas:
+                        del self.formulas[key]
+                        self._formula_rows[(sheet, col)].remove(row)
+                        self._remove_from_graph(key)
+                    self.values[key] = _input_value(value)
+                self._changed.add(key)
+                self.used_rows[sheet] = max(self.used_rows.get(sheet, 0), row)
+                self.used_cols[sheet] = max(self.used_cols.get(sheet, 0), col)
+
+        # A new formula joins the graph (with its own precedents) if something in it reads the cell
+        joining = [key for key in new_formulas if key in self.graph or self.dependents(key)]
+        for key in joining:
+            self._remove_from_graph(key)
+        self._add_to_graph(joining)
+
+    def set_xl_objects(self, _objects, _unit_type='SI'):
+        """Sets the cells of the PHPP_XL_Obj (a list, DataTree or write-plan file, see xl_planfile) """
+
+        self.set_cells(cells_from_objects(_objects, _unit_type))
+
+    def get_value(self, _sheet, _address):
+        """The cell's value, with any formulas it depends on calculated first """
+
+        self.recalculate()
+        return self.values.get(_cell_key(_sheet, _address))
+
+    def results(self):
+        """{label: value} for the target fields, recalculated """
+
+        self.recalculate()
+        return OrderedDict((label, self.values.get(key)) for label, key in self.targets.items())
+
+    def validate(self, _tolerance=1e-6):
+        """Calculates every formula of the graph from the current values and compares
+        the result to the value the cell has now. Run it before any cells are set, to
+        check the engine against the results Excel saved in the file.
+
+        Returns:
+            (ValidationReport)
+        """
+
+        self.recalculate()
+        report = ValidationReport()
+        for key in sorted(self.graph):
+            report.checked += 1
+            try:
+                value = self.calculate_cell(key)
+            except Unsupported as e:
+                report.unsupported.append((key, unicode(e)))
+                continue
+
+            if same_value(self.values.get(key), value, _tolerance):
+                report.matched += 1
+            else:
+                report.mismatches.append((key, self.values.get(key), value))
+        return report
+
+    def __unicode__(self):
+        return u"Formula Engine | Cells: {}  |  Formulas in graph: {} of {}  |  Unsupported: {}".format(
+            len(self.values), len(self.graph), len(self.formulas), len(self.unsupported))
+    def __str__(self):
+        return unicode(self).encode('utf-8')
+    def __repr__(self):
+        return "{}(_source={!r})".format(self.__class__.__name__, self.source)
+    def ToString(self):
+        return str(self)
+
+
+def calculate(_path, _cells, _fields=None):
+    """Calculates the results of the PHPP file with some cells changed, without Excel
+
+    Args:
+        _path (str): The PHPP .xlsx file
+        _cells (dict): The cells to change: {sheet: {(row, col): value}}
+        _fields (list): The results: [[label, worksheet, cell], ...].
+            Default is xl_read.DEFAULT_FIELDS
+    Returns:
+        (OrderedDict): {label: value}
+    """
+
+    engine = FormulaEngine.from_xlsx(_path, _fields)
+    engine.set_cells(_cells)
+    return engine.results()
@@ -0,0 +1,273 @@
+"""Reads the results out of many finished PHPP files at once, without Excel
+
+Each .xlsx file is opened as a zip and only the cells asked for are read,
+using the values Excel saved with the file (the last calculated results).
+The files are shared out over a pool of processes, one file at a time, so
+the time taken goes down with the number of cores.
+
+The fields are the same [label, worksheet, cell] lists as the 'XL Read from
+Workbook' component uses (see xl_read.DEFAULT_FIELDS).
+
+The process pool needs CPython. In IronPython (Rhino) the files are read one
+after the other instead. On Windows a script which calls harvest() must only
+do so under an 'if __name__ == "__main__":' guard, since the pool re-imports
+it in each process. The pool is set up by run_jobs, which xl_sweep and
+xl_batch use as well. From the command line:
+
+    python -m LBT2PH.xl_harvest -o results.csv path/to/projects/*.xlsx
+
+Note: This module has no Rhino / Grasshopper / COM dependencies so that it can
+be used (and tested) outside of Rhino.
+"""
+
+import csv
+from collections import OrderedDict
+import io
+import os
+import sys
+import time
+
+import LBT2PH.xl_headless
+import LBT2PH.xl_ranges
+import LBT2PH.xl_read
+
+try:
+    import multiprocessing
+except ImportError:
+    multiprocessing = None  # IronPython
+
+try:
+    unicode
+except NameError:
+    unicode = str
+
+FILE_COLUMN = 'File'
+ERROR_COLUMN = 'Error'
+
+
+def find_files(_paths, _extension='.xlsx'):
+    """Returns the files, with any folders swapped for the files in them (and their sub-folders)
+
+    Excel's lock files ('~$...') are skipped.
+    """
+
+    files = []
+    for path in _paths:
+        if os.path.isdir(path):
+            for folder, _, names in sorted(os.walk(path)):
+                files.extend(os.path.join(folder, name) for name in sorted(names)
+                             if name.lower().endswith(_extension) and not name.startswith('~$'))
+        else:
+            files.append(path)
+    return files
+
+
+def read_file(_path, _fields):
+    """Reads the fields from one PHPP file
+
+    Args:
+        _path (str): The .xlsx file
+        _fields (list): [[label, worksheet, cell], ...]
+    Returns:
+        (tuple): (the values in the same order as the _fields, the error message or None)
+    """
+
+    values = [None] * len(_fields)
+    by_sheet = OrderedDict()
+    for i, (_, sheet, address) in enumerate(_fields):
+        row_col = LBT2PH.xl_ranges.parse_address(address.strip())
+        if row_col is None:
+            return values, 'Only single cells can be read, not "{}"'.format(address)
+        by_sheet.setdefault(sheet.strip(), []).append((i, row_col))
+
+    try:
+        with LBT2PH.xl_headless.XlsxPackage(_path) as package:
+            missing = [sheet for sheet in by_sheet if sheet not in package.sheet_paths]
+            for sheet, cells in by_sheet.items():
+                if sheet in missing:
+                    continue
+                read = package.read_cells(sheet, [row_col for _, row_col in cells])
+                for i, row_col in cells:
+                    values[i] = read[row_col]
+    except Exception as e:
+        return values, '{}: {}'.format(type(e).__name__, e)
+
+    if missing:
+        return values, 'Worksheets not found: {}'.format(', '.join(missing))
+    return values, None
+
+
+def _read_job(_job):
+    """For the process pool, which can only pass one (pickle-able) argument """
+
+    return read_file(*_job)
+
+
+def process_count(_processes, _job_count):
+    """The number of processes to run the jobs on
+
+    Args:
+        _processes (int): The number asked for. None or 0 for one per core.
+        _job_count (int): The number of jobs. There's never more processes than jobs.
+    Returns:
+        (int): 1 if there's no multiprocessing (IronPython)
+    """
+
+    processes = _processes
+    if multiprocessing is None:
+        processes = 1
+    elif not processes:
+        processes = multiprocessing.cpu_count()
+    return max(1, min(processes, _job_count))
+
+
+def run_jobs(_func, _jobs, _processes=1, _chunksize=1, _initializer=None, _initargs=()):
+    """Returns [_func(job) for job in _jobs], run on a pool of processes if there's more than 1
+
+    Args:
+        _func (callable): A module level function (so the pool can pickle it) of one job
+        _jobs (list): The jobs, each pickle-able
+        _processes (int): The number of processes, ie: from process_count()
+        _chunksize (int): The number of jobs to hand to a process at a time
+        _initializer (callable): Optional f(*_initargs), run once in each process
+            before its jobs (or in this process, with only 1)
+        _initargs (tuple): The arguments to the _initializer
+    Returns:
+        (list): The results, in the same order as the _jobs
+    """
+
+    if _processes <= 1:
+        if _initializer is not None:
+            _initializer(*_initargs)
+        return [_func(job) for job in _jobs]
+
+    pool = multiprocessing.Pool(_processes, _initializer, _initargs)
+    try:
+        return pool.map(_func, _jobs, chunksize=_chunksize)
+    finally:
+        pool.close()
+        pool.join()
+
+
+class HarvestTable(object):
+    """The results: a row for each file, with a column for each field """
+
+    def __init__(self, _labels):
+        self.labels = list(_labels)
+        self.rows = []  # [(file, [values], error), ...]
+        self.seconds = 0.0
+        self.processes = 1
+
+    @property
+    def columns(self):
+        return [FILE_COLUMN] + self.labels + [ERROR_COLUMN]
+
+    @property
+    def errors(self):
+        return [(path, error) for path, _, error in self.rows if error]
+
+    def to_dicts(self):
+        """Returns a dict for each row, {column: value} """
+
+        return [dict(zip(self.columns, [path] + values + [error])) for path, values, error in self.rows]
+
+    def write_csv(self, _path):
+        """Saves the table as a UTF-8 .csv file """
+
+        rows = [self.columns] + [[path] + values + [error or ''] for path, values, error in self.rows]
+        if sys.version_info[0] < 3:
+            # Python 2's csv only writes bytes
+            rows = [[unicode(v).encode('utf-8') if v is not None else '' for v in row] for row in rows]
+            with open(_path, 'wb') as f:
+                csv.writer(f).writerows(rows)
+        else:
+            with io.open(_path, 'w', encoding='utf-8', newline='') as f:
+                csv.writer(f).writerows(rows)
+
+    def __unicode__(self):
+        return u"Harvest | Files: {}  |  Fields: {}  |  Errors: {}  |  {:.1f}s on {} process(es)".format(
+            len(self.rows), len(self.labels), len(self.errors), self.seconds, self.processes)
+    def __str__(self):
+        # Also run from the command line, where 'unicode' may be Python 3's str
+        text = self.__unicode__()
+        return text if str is unicode else text.encode('utf-8')
+    def __repr__(self):
+        return "{}(_labels={!r})".format(self.__class__.__name__, self.labels)
+    def ToString(self):
+        return str(self)
+
+
+def harvest(_paths, _fields=None, _processes=None):
+    """Reads the fields from all the PHPP files
+
+    Args:
+        _paths (list): The .xlsx files and / or folders of them
+        _fields (list): [[label, worksheet, cell], ...]. Default is xl_read.DEFAULT_FIELDS
+        _processes (int): The number of processes to use. Default is one per core.
+            Set to 1 to read the files one after the other, in this process.
+    Returns:
+        (HarvestTable): A row for each file, in the same order as the _paths
+    """
+
+    fields = [list(field) for field in (_fields or LBT2PH.xl_read.DEFAULT_FIELDS)]
+    files = find_files(_paths)
+    table = HarvestTable(field[0].strip() for field in fields)
+    start = time.time()
+
+    processes = process_count(_processes, len(files))
+    jobs = [(path, fields) for path in files]
+    # One file at a time, so a few big files don't hold up one process
+    results = run_jobs(_read_job, jobs, processes, 1)
+
+    for path, (values, error) in zip(files, results):
+        table.rows.append((path, values, error))
+
+    table.seconds = time.time() - start
+    table.processes = processes
+    return table
+
+
+def read_csv_file(_path):
+    """Reads the rows of a UTF-8 .csv file, skipping blank lines and '#' comments.
+    Values can be quoted, ie: for a worksheet name with a comma in it.
+    """
+
+    if sys.version_info[0] < 3:
+        # Python 2's csv only reads bytes
+        with open(_path, 'rb') as f:
+            rows = [[v.decode('utf-8-sig') for v in row] for row in csv.reader(f, skipinitialspace=True)]
+    else:
+        with io.open(_path, 'r', encoding='utf-8-sig', newline='') as f:
+            rows = list(csv.reader(f, skipinitialspace=True))
+
+    return [[v.strip() for v in row] for row in rows
+            if any(v.strip() for v in row) and not row[0].lstrip().startswith('#')]
+
+
+def read_fields_file(_path):
+    """Reads the fields from a .csv file with the columns: label, worksheet, cell """
+
+    return read_csv_file(_path)
+
+
+def main(_args=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Read the results from many PHPP .xlsx files.')
+    parser.add_argument('paths', nargs='+', help='The .xlsx files and / or folders of them')
+    parser.add_argument('-o', '--output', default='phpp_results.csv', help='The .csv file to write')
+    parser.add_argument('-f', '--fields', help='A .csv file of fields to read: label, worksheet, cell')
+    parser.add_argument('-p', '--processes', type=int, help='Number of processes. Default is one per core')
+    args = parser.parse_args(_args)
+
+    fields = read_fields_file(args.fields) if args.fields else None
+    table = harvest(args.paths, fields, args.processes)
+    table.write_csv(args.output)
+
+    print(table.__unicode__())
+    for path, error in table.errors:
+        print('  {}: {}'.format(path, error))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,835 @@
+"""Read and write PHPP .xlsx files directly, without Excel or Rhino.
+
+The .xlsx file is just a zip archive of XML parts. Writing patches the <c> cell
+elements of the worksheet XML in a single streaming pass over each sheet which
+is written to, and copies everything else (formulas, styles, other sheets, ...)
+through untouched. Since there is no calculation engine, the workbook is flagged
+so that Excel does a full recalculation the next time it is opened.
+
+HeadlessInstance can be used anywhere an xl_connect.ExcelInstance is used.
+"""
+
+import os
+import re
+import zipfile
+from collections import OrderedDict
+from xml.sax.saxutils import escape
+
+import LBT2PH.xl_ledger
+import LBT2PH.xl_planfile
+import LBT2PH.xl_ranges
+import LBT2PH.xl_template
+
+try:
+    unicode
+except NameError:
+    unicode = str
+
+
+class XlsxError(Exception):
+    """Raised when the .xlsx file is missing parts, or has parts we can't handle"""
+
+
+# ------------------------------------------------------------------------------
+# XML Helpers
+
+_re_attr = re.compile(r'([\w:]+)\s*=\s*"([^"]*)"')
+_re_sheet_tag = re.compile(r'<sheet\b[^>]*>')
+_re_rel_tag = re.compile(r'<Relationship\b[^>]*>')
+_re_row = re.compile(r'<row\b[^>]*?(?:/>|>.*?</row>)', re.S)
+_re_cell = re.compile(r'<c\b[^>]*?(?:/>|>.*?</c>)', re.S)
+_re_formula = re.compile(r'<f\b([^>]*?)(?:/>|>(.*?)</f>)', re.S)
+_re_value = re.compile(r'<v>(.*?)</v>', re.S)
+_re_text = re.compile(r'<t\b[^>]*?(?:/>|>(.*?)</t>)', re.S)
+_re_phonetic = re.compile(r'<rPh\b.*?</rPh>', re.S)
+_re_sst_item = re.compile(r'<si>(.*?)</si>|<si/>', re.S)
+_re_sheet_data = re.compile(r'<sheetData\s*/>|<sheetData>(.*?)</sheetData>', re.S)
+_re_col_tag = re.compile(r'<col\b[^>]*>')
+_re_char_ref = re.compile(r'&(#x[0-9a-fA-F]+|#[0-9]+|lt|gt|amp|quot|apos);')
+_re_invalid_xml = re.compile(u'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+_re_defined_name = re.compile(r'<definedName\b([^>]*)>(.*?)</definedName>', re.S)
+_re_reference = re.compile(r"^=?(?:'((?:[^']|'')+)'|([^'!:]+))!(\$?[A-Za-z]{1,3}\$?[0-9]+(?::\$?[A-Za-z]{1,3}\$?[0-9]+)?)$")
+
+_entities = {'lt': u'<', 'gt': u'>', 'amp': u'&', 'quot': u'"', 'apos': u"'"}
+
+
+def _unescape(_text):
+    """Reverses the XML escaping of attribute and element text """
+
+    def _replace(match):
+        ref = match.group(1)
+        if ref.startswith('#x'):
+            return unichr_(int(ref[2:], 16))
+        if ref.startswith('#'):
+            return unichr_(int(ref[1:]))
+        return _entities[ref]
+
+    return _re_char_ref.sub(_replace, _text)
+
+
+def unichr_(_code):
+    try:
+        return unichr(_code)
+    except NameError:
+        return chr(_code)
+
+
+def _attrs(_tag):
+    """Returns an OrderedDict of the attributes found in an XML start-tag """
+
+    return OrderedDict((k, _unescape(v)) for k, v in _re_attr.findall(_tag))
+
+
+def _open_tag(_xml):
+    """Returns just the start-tag of an element """
+
+    return _xml[:_xml.index('>') + 1]
+
+
+def _escape_text(_text):
+    return escape(_re_invalid_xml.sub(u'', unicode(_text)))
+
+
+def _escape_attr(_text):
+    return escape(unicode(_text), {'"': '&quot;'})
+
+
+# ------------------------------------------------------------------------------
+# Reading
+
+class XlsxPackage(object):
+    """Read-only access to the worksheets and cell values of an .xlsx file """
+
+    REL_WORKSHEET = 'worksheet'
+
+    def __init__(self, _filepath_or_file):
+        """
+        Args:
+            _filepath_or_file: The path to the .xlsx file, or an open file-like object
+        """
+        self.filepath = _filepath_or_file if isinstance(_filepath_or_file, (str, unicode)) else None
+        self.zip = zipfile.ZipFile(_filepath_or_file, 'r')
+        self.names = set(self.zip.namelist())
+        self.sheet_paths = self._find_sheet_paths()
+        self._shared_strings = None
+        self._defined_names = None
+        self._sheet_cache = {}
+
+    def close(self):
+        self.zip.close()
+
+    def read_part(self, _name):
+        """Returns the decoded text of a part of the package """
+
+        if _name not in self.names:
+            raise XlsxError('Part "{}" not found in the .xlsx file.'.format(_name))
+        return self.zip.read(_name).decode('utf-8')
+
+    def _find_sheet_paths(self):
+        """Returns an OrderedDict of {sheet name: worksheet part name} in workbook order """
+
+        rels = {}
+        for tag in _re_rel_tag.findall(self.read_part('xl/_rels/workbook.xml.rels')):
+            attrs = _attrs(tag)
+            target = attrs.get('Target', '')
+            if target.startswith('/'):
+                target = target[1:]
+            else:
+                target = 'xl/' + target
+            rels[attrs.get('Id')] = (attrs.get('Type', ''), target)
+
+        sheets = OrderedDict()
+        for tag in _re_sheet_tag.findall(self.read_part('xl/workbook.xml')):
+            attrs = _attrs(tag)
+            rel_id = [v for k, v in attrs.items() if k.endswith(':id')]
+            rel_type, target = rels.get(rel_id[0] if rel_id else None, ('', None))
+            if target and rel_type.endswith('/' + self.REL_WORKSHEET):
+                sheets[attrs.get('name')] = target
+        return sheets
+
+    @property
+    def sheet_names(self):
+        return list(self.sheet_paths.keys())
+
+    @property
+    def shared_strings(self):
+        if self._shared_strings is None:
+            self._shared_strings = []
+            if 'xl/sharedStrings.xml' in self.names:
+                for match in _re_sst_item.finditer(self.read_part('xl/sharedStrings.xml')):
+                    self._shared_strings.append(_text_content(match.group(1) or u''))
+        return self._shared_strings
+
+    @property
+    def defined_names(self):
+        """{NAME: the reference / formula it stands for}. A name local to one
+        worksheet doesn't replace the workbook's one.
+        """
+
+        if self._defined_names is None:
+            self._defined_names = {}
+            for attrs, text in _re_defined_name.findall(self.read_part('xl/workbook.xml')):
+                name = _attrs(u'<definedName {}>'.format(attrs)).get('name')
+                if name and ('localSheetId' not in attrs or name.upper() not in self._defined_names):
+                    self._defined_names[name.upper()] = _unescape(text)
+        return self._defined_names
+
+    def resolve(self, _sheet_name, _address):
+        """Returns the (worksheet, 'A1' or 'A1:B2' address) of a range, following
+        defined names to the cells they refer to. Other addresses are returned as is.
+        """
+
+        reference = self.defined_names.get(unicode(_address).upper())
+        match = _re_reference.match(reference.strip()) if reference else None
+        if not match:
+            return _sheet_name, _address
+
+        sheet = match.group(1).replace(u"''", u"'") if match.group(1) else match.group(2)
+        return sheet, match.group(3).replace(u'$', u'')
+
+    def sheet_xml(self, _sheet_name):
+        path = self.sheet_paths.get(_sheet_name)
+        if not path:
+            raise XlsxError('Worksheet "{}" not found in the .xlsx file.'.format(_sheet_name))
+        return self.read_part(path)
+
+    def read_sheet(self, _sheet_name):
+        """Returns all the cells of a worksheet
+
+        Returns:
+            (dict): {(row, col): (value, formula)} where 'value' is the value cached
+                in the file (last calculated by Excel) and 'formula' is the formula
+                text starting with '=', or None.
+        """
+
+        if _sheet_name not in self._sheet_cache:
+            self._sheet_cache[_sheet_name] = parse_cells(self.sheet_xml(_sheet_name), self.shared_strings)
+        return self._sheet_cache[_sheet_name]
+
+    def read_value(self, _sheet_name, _address):
+        """Returns the cached value for a single cell, like Range.Value2 """
+
+        row_col = LBT2PH.xl_ranges.parse_address(_address)
+        return self.read_sheet(_sheet_name).get(row_col, (None, None))[0]
+
+    def read_cells(self, _sheet_name, _row_cols):
+        """Returns the cached values of just the given cells, like Range.Value2
+
+        Quicker than read_sheet() when only a few cells are needed: only the rows
+        with one of the cells in are parsed, and the shared strings are only read
+        if one of the cells is text.
+
+        Args:
+            _sheet_name (str): The worksheet
+            _row_cols (iterable): The (row, col) of each cell
+        Returns:
+            (dict): {(row, col): value}. Empty cells are None
+        """
+
+        values = dict.fromkeys(_row_cols)
+        if _sheet_name in self._sheet_cache:
+            cells = self._sheet_cache[_sheet_name]
+            for row_col in values:
+                values[row_col] = cells.get(row_col, (None, None))[0]
+            return values
+
+        wanted = {}
+        for row, col in values:
+            wanted.setdefault(row, set()).add(col)
+
+        sheet_data = _re_sheet_data.search(self.sheet_xml(_sheet_name))
+        if not wanted or not sheet_data or not sheet_data.group(1):
+            return values
+
+        last_row = max(wanted)
+        row_num = 0
+        for row_match in _re_row.finditer(sheet_data.group(1)):
+            row_xml = row_match.group(0)
+            row_attrs = _attrs(_open_tag(row_xml))
+            row_num = int(row_attrs['r']) if 'r' in row_attrs else row_num + 1
+            if row_num > last_row:
+                break
+            cols = wanted.get(row_num)
+            if not cols:
+                continue
+
+            col_num = 0
+            for cell_match in _re_cell.finditer(row_xml):
+                cell_xml = cell_match.group(0)
+                cell_attrs = _attrs(_open_tag(cell_xml))
+                row_col = LBT2PH.xl_ranges.parse_address(cell_attrs.get('r', ''))
+                col_num = row_col[1] if row_col else col_num + 1
+                if col_num in cols:
+                    cell_type = cell_attrs.get('t')
+                    shared_strings = self.shared_strings if cell_type == 's' else None
+                    values[(row_num, col_num)] = _cell_value(cell_xml, cell_type, shared_strings)
+
+        return values
+
+    def __enter__(self):
+        return self
+    def __exit__(self, *args):
+        self.close()
+
+
+def _text_content(_xml):
+    """Joins all the <t> text in an <si> or <is> element, ignoring phonetic runs """
+
+    _xml = _re_phonetic.sub(u'', _xml)
+    return u''.join(_unescape(m.group(1) or u'') for m in _re_text.finditer(_xml))
+
+
+def _cell_value(_cell_xml, _cell_type, _shared_strings):
+    """Converts the cell's XML into a Python value, the way Range.Value2 would """
+
+    if _cell_type == 'inlineStr':
+        return _text_content(_cell_xml)
+
+    match = _re_value.search(_cell_xml)
+    if not match:
+        return None
+    text = _unescape(match.group(1))
+
+    if _cell_type == 's':
+        return _shared_strings[int(text)]
+    elif _cell_type == 'b':
+        return text == '1'
+    elif _cell_type in ('str', 'e'):
+        return text
+    try:
+        return float(text)
+    except ValueError:
+        return text
+
+
+def parse_cells(_sheet_xml, _shared_strings):
+    """Returns {(row, col): (value, formula)} for every <c> in the worksheet XML
+
+    'Shared' formulas are expanded so that each cell gets its own formula text.
+    """
+
+    cells = {}
+    shared_masters = {}  # {si: (row, col, formula text)}
+    sheet_data = _re_sheet_data.search(_sheet_xml)
+    if not sheet_data or not sheet_data.group(1):
+        return cells
+
+    row_num = 0
+    for row_match in _re_row.finditer(sheet_data.group(1)):
+        row_xml = row_match.group(0)
+        row_attrs = _attrs(_open_tag(row_xml))
+        row_num = int(row_attrs['r']) if 'r' in row_attrs else row_num + 1
+
+        col_num = 0
+        for cell_match in _re_cell.finditer(row_xml):
+            cell_xml = cell_match.group(0)
+            cell_attrs = _attrs(_open_tag(cell_xml))
+            row_col = LBT2PH.xl_ranges.parse_address(cell_attrs.get('r', ''))
+            col_num = row_col[1] if row_col else col_num + 1
+
+            formula = None
+            f_match = _re_formula.search(cell_xml)
+            if f_match:
+                f_attrs = _attrs(f_match.group(1))
+                f_text = _unescape(f_match.group(2) or u'')
+                if f_attrs.get('t') == 'shared':
+                    si = f_attrs.get('si')
+                    if f_text:
+                        shared_masters[si] = (row_num, col_num, f_text)
+                    elif si in shared_masters:
+                        m_row, m_col, m_text = shared_masters[si]
+                        f_text = LBT2PH.xl_ranges.shift_formula(m_text, row_num - m_row, col_num - m_col)
+                if f_text:
+                    formula = u'=' + f_text
+
+            value = _cell_value(cell_xml, cell_attrs.get('t'), _shared_strings)
+            cells[(row_num, col_num)] = (value, formula)
+
+    return cells
+
+
+# ------------------------------------------------------------------------------
+# Writing
+
+def _cell_xml(_ref, _style, _value):
+    """Builds the <c> element for a new value. Same conversions as Range.Value2:
+    text starting with '=' is a formula and numeric-looking text becomes a number.
+    """
+
+    style = u' s="{}"'.format(_style) if _style is not None else u''
+
+    if _value is None or _value == '':
+        return u'<c r="{}"{}/>'.format(_ref, style)
+
+    if isinstance(_value, bool):
+        return u'<c r="{}"{} t="b"><v>{}</v></c>'.format(_ref, style, int(_value))
+
+    if isinstance(_value, (int, float)) or (hasattr(_value, '__float__') and not isinstance(_value, (str, unicode))):
+        number = float(_value)
+        if number != number or number in (float('inf'), float('-inf')):
+            return u'<c r="{}"{} t="e"><v>#NUM!</v></c>'.format(_ref, style)
+        text = repr(int(number)) if number.is_integer() and abs(number) < 1e15 else repr(number)
+        return u'<c r="{}"{}><v>{}</v></c>'.format(_ref, style, text.rstrip('L'))
+
+    text = unicode(_value)
+    if text.startswith(u'=') and len(text) > 1:
+        return u'<c r="{}"{}><f>{}</f></c>'.format(_ref, style, _escape_text(text[1:]))
+
+    if LBT2PH.xl_ranges.re_number.match(text):
+        return _cell_xml(_ref, _style, float(text))
+
+    return u'<c r="{}"{} t="inlineStr"><is><t xml:space="preserve">{}</t></is></c>'.format(
+        _ref, style, _escape_text(text))
+
+
+class _SheetPatcher(object):
+    """Applies a dict of new cell values to a worksheet's XML in one pass """
+
+    def __init__(self, _sheet_xml, _cells):
+        """
+        Args:
+            _sheet_xml (unicode): The original worksheet XML
+            _cells (dict): {(row, col): value} to write
+        """
+        self.xml = _sheet_xml
+        self.rows = {}
+        for (row, col), value in _cells.items():
+            self.rows.setdefault(row, {})[col] = value
+        self.col_styles = self._find_col_styles()
+        self.orphans = {}  # Shared formula groups whose first cell was overwritten
+
+    def _find_col_styles(self):
+        styles = []
+        for tag in _re_col_tag.findall(self.xml):
+            attrs = _attrs(tag)
+            if 'style' in attrs:
+                styles.append((int(attrs.get('min', 0)), int(attrs.get('max', 0)), attrs['style']))
+        return styles
+
+    def _default_style(self, _row_attrs, _col):
+        if _row_attrs.get('customFormat') in ('1', 'true') and 's' in _row_attrs:
+            return _row_attrs['s']
+        for first, last, style in self.col_styles:
+            if first <= _col <= last:
+                return style
+        return None
+
+    def patch(self):
+        match = _re_sheet_data.search(self.xml)
+        if not match:
+            raise XlsxError('No <sheetData> found in the worksheet XML?')
+
+        body = match.group(1) or u''
+        new_body = self._patch_rows(body)
+        return u''.join([self.xml[:match.start()], u'<sheetData>', new_body,
+                         u'</sheetData>', self.xml[match.end():]])
+
+    def _patch_rows(self, _body):
+        out = []
+        pending = sorted(self.rows.keys())
+        i = 0
+        pos = 0
+        row_num = 0
+
+        for row_match in _re_row.finditer(_body):
+            out.append(_body[pos:row_match.start()])
+            pos = row_match.end()
+
+            row_xml = row_match.group(0)
+            row_attrs = _attrs(_open_tag(row_xml))
+            row_num = int(row_attrs['r']) if 'r' in row_attrs else row_num + 1
+
+            while i < len(pending) and pending[i] < row_num:
+                out.append(self._new_row(pending[i]))
+                i += 1
+
+            if i < len(pending) and pending[i] == row_num:
+                out.append(self._patch_row(row_xml, row_num, row_attrs, self.rows[row_num]))
+                i += 1
+            elif self.orphans:
+                out.append(self._patch_row(row_xml, row_num, row_attrs, {}))
+            else:
+                out.append(row_xml)
+
+        out.append(_body[pos:])
+        while i < len(pending):
+            out.append(self._new_row(pending[i]))
+            i += 1
+
+        return u''.join(out)
+
+    def _new_row(self, _row_num):
+        cells = self.rows[_row_num]
+        return u'<row r="{}">{}</row>'.format(_row_num, u''.join(
+            _cell_xml(LBT2PH.xl_ranges.format_address(_row_num, col), self._default_style({}, col), cells[col])
+            for col in sorted(cells.keys())))
+
+    def _patch_row(self, _row_xml, _row_num, _row_attrs, _new_cells):
+        open_tag = _open_tag(_row_xml)
+        cells = []  # [(col, xml)]
+        col_num = 0
+        for cell_match in _re_cell.finditer(_row_xml, len(open_tag)):
+            cell_xml = cell_match.group(0)
+            cell_attrs = _attrs(_open_tag(cell_xml))
+            row_col = LBT2PH.xl_ranges.parse_address(cell_attrs.get('r', ''))
+            col_num = row_col[1] if row_col else col_num + 1
+
+            if col_num in _new_cells:
+                self._check_shared_master(cell_xml, _row_num, col_num)
+                cell_xml = _cell_xml(LBT2PH.xl_ranges.format_address(_row_num, col_num),
+                                     cell_attrs.get('s'), _new_cells[col_num])
+            elif self.orphans:
+                cell_xml = self._fix_orphan(cell_xml, _row_num, col_num)
+            cells.append((col_num, cell_xml))
+
+        existing = set(col for col, _ in cells)
+        for col, value in _new_cells.items():
+            if col not in existing:
+                cells.append((col, _cell_xml(LBT2PH.xl_ranges.format_address(_row_num, col),
+                                             self._default_style(_row_attrs, col), value)))
+        cells.sort(key=lambda c: c[0])
+
+        # 'spans' is only an optimization hint, and may be wrong after adding cells
+        row_attrs = u''.join(u' {}="{}"'.format(k, _escape_attr(v))
+                             for k, v in _row_attrs.items() if k != 'spans')
+        return u'<row{}>{}</row>'.format(row_attrs, u''.join(c[1] for c in cells))
+
+    def _check_shared_master(self, _cell_xml, _row, _col):
+        """If the cell is the first cell of a 'shared' formula group, the other cells
+        in the group are about to lose their formula text. Remember it so they can
+        be given their own copy.
+        """
+
+        f_match = _re_formula.search(_cell_xml)
+        if not f_match or not f_match.group(2):
+            return
+
+        f_attrs = _attrs(f_match.group(1))
+        if f_attrs.get('t') == 'shared':
+            self.orphans[f_attrs.get('si')] = (_row, _col, _unescape(f_match.group(2)))
+
+    def _fix_orphan(self, _cell_xml, _row, _col):
+        f_match = _re_formula.search(_cell_xml)
+        if not f_match or f_match.group(2):
+            return _cell_xml
+
+        f_attrs = _attrs(f_match.group(1))
+        if f_attrs.get('t') != 'shared' or f_attrs.get('si') not in self.orphans:
+            return _cell_xml
+
+        m_row, m_col, m_text = self.orphans[f_attrs.get('si')]
+        formula = LBT2PH.xl_ranges.shift_formula(m_text, _row - m_row, _col - m_col)
+        return u''.join([_cell_xml[:f_match.start()], u'<f>', _escape_text(formula), u'</f>',
+                         _cell_xml[f_match.end():]])
+
+
+def _remove_calc_chain(_parts):
+    """The calcChain lists every formula cell. It must be dropped (Excel rebuilds it)
+    since formula cells may have been added or removed.
+    """
+
+    _parts.pop('xl/calcChain.xml', None)
+
+    for name, pattern in (
+            ('[Content_Types].xml', r'<Override\b[^>]*?PartName="/xl/calcChain\.xml"[^>]*?/>'),
+            ('xl/_rels/workbook.xml.rels', r'<Relationship\b[^>]*?Target="[^"]*calcChain\.xml"[^>]*?/>')):
+        if name in _parts:
+            _parts[name] = re.sub(pattern, u'', _parts[name])
+
+
+def _set_full_calc_on_load(_workbook_xml):
+    """Makes Excel recalculate the whole workbook the next time its opened """
+
+    match = re.search(r'<calcPr\b[^>]*?/?>', _workbook_xml)
+    if match:
+        tag = match.group(0)
+        new_tag = re.sub(r'\s+fullCalcOnLoad="[^"]*"', u'', tag)
+        new_tag = new_tag.replace(u'<calcPr', u'<calcPr fullCalcOnLoad="1"', 1)
+        return _workbook_xml[:match.start()] + new_tag + _workbook_xml[match.end():]
+
+    return _workbook_xml.replace(u'</workbook>', u'<calcPr fullCalcOnLoad="1"/></workbook>', 1)
+
+
+def write_cells(_source, _target, _cells):
+    """Copies the source .xlsx to the target path, with new values in the given cells.
+
+    Args:
+        _source (str | file): The source (template) .xlsx file path or file-like object
+        _target (str): The path for the new .xlsx file. May be the same as _source.
+        _cells (dict): {sheet_name: {(row, col): value}}
+    Returns:
+        (int): The number of cells written
+    """
+
+    count = 0
+    with XlsxPackage(_source) as package:
+        parts = OrderedDict()
+        for sheet_name, cells in _cells.items():
+            if not cells:
+                continue
+            path = package.sheet_paths.get(sheet_name)
+            if not path:
+                raise XlsxError('Worksheet "{}" not found in the .xlsx file.'.format(sheet_name))
+            parts[path] = _SheetPatcher(package.read_part(path), cells).patch()
+            count += len(cells)
+
+        if parts:
+            for name in ('[Content_Types].xml', 'xl/_rels/workbook.xml.rels'):
+                parts[name] = package.read_part(name)
+            parts['xl/workbook.xml'] = _set_full_calc_on_load(package.read_part('xl/workbook.xml'))
+            _remove_calc_chain(parts)
+            parts['xl/calcChain.xml'] = None  # Marks it as 'deleted' for the copy below
+
+        target_dir = os.path.dirname(os.path.abspath(_target))
+        temp_path = os.path.join(target_dir, '.{}.tmp'.format(os.path.basename(_target)))
+        with zipfile.ZipFile(temp_path, 'w', zipfile.ZIP_DEFLATED) as out:
+            for info in package.zip.infolist():
+                if info.filename in parts:
+                    data = parts[info.filename]
+                    if data is None:
+                        continue
+                    out.writestr(info, data.encode('utf-8'))
+                else:
+                    out.writestr(info, package.zip.read(info.filename))
+
+    if os.path.exists(_target):
+        os.remove(_target)
+    os.rename(temp_path, _target)
+
+    return count
+
+
+def get_unit_type(_package):
+    """Looks at 'Data'!B3 to find the PHPP version. Returns 'SI' or 'IP' """
+
+    try:
+        version = _package.read_value('Data', 'B3')
+    except XlsxError:
+        return 'SI'
+
+    if version and 'IP' in unicode(version):
+        return 'IP'
+    return 'SI'
+
+
+def write_xl_objects(_source, _target, _objects, _unit_type=None):
+    """Writes a whole tree/list of PHPP_XL_Obj to a new copy of the source PHPP
+
+    Args:
+        _source (str): The source (template) PHPP .xlsx file
+        _target (str): The path to save the new PHPP .xlsx file to
+        _objects: The PHPP_XL_Obj to write. A list, list of lists, a DataTree or
+            the path to a write-plan file (see xl_planfile).
+        _unit_type (str): 'SI' or 'IP'. If None, will be read from the PHPP.
+    Returns:
+        (int): The number of cells written
+    """
+
+    cells = OrderedDict()
+    with XlsxPackage(_source) as package:
+        unit_type = _unit_type or get_unit_type(package)
+        for obj in LBT2PH.xl_planfile.iter_objects(_objects):
+            _add_cell(package, cells, obj.getWorksheet(unit_type), obj.Range, obj.getValueOrRaw(unit_type))
+
+    return write_cells(_source, _target, cells)
+
+
+def _add_cell(_package, _cells, _sheet, _address, _value):
+    """Adds a value to the {sheet: {(row, col): value}} dict, following defined
+    names to their cells (see xl_ranges.spread)
+    """
+
+    sheet, address = _package.resolve(_sheet, _address)
+    try:
+        LBT2PH.xl_ranges.spread(_cells, sheet, address, _value)
+    except ValueError as e:
+        raise XlsxError(unicode(e))
+
+
+# ------------------------------------------------------------------------------
+# ExcelInstance stand-in
+
+class _HeadlessApp(object):
+    """Holds the Excel application settings the components set. Does nothing """
+
+    def __init__(self):
+        self.Calculation = -4105
+        self.ScreenUpdating = True
+        self.DisplayAlerts = False
+        self.EnableEvents = False
+        self.Visible = False
+
+    def Calculate(self):
+        pass
+
+
+class _HeadlessInterior(object):
+    """Cell highlighting is not applied in the headless mode """
+
+    ColorIndex = None
+
+
+class _HeadlessRange(object):
+    def __init__(self, _sheet, _address):
+        self._sheet = _sheet
+        self._address = _address
+
+    @property
+    def Value2(self):
+        return self._sheet._read(self._address)
+
+    @Value2.setter
+    def Value2(self, _value):
+        self._sheet._write(self._address, _value)
+
+    @property
+    def Interior(self):
+        return _HeadlessInterior()
+
+
+class _RangeIndexer(object):
+    def __init__(self, _sheet):
+        self._sheet = _sheet
+
+    def __getitem__(self, _address):
+        return _HeadlessRange(self._sheet, _address)
+
+
+class HeadlessSheet(object):
+    """A worksheet with the same Range[...].Value2 access as an Excel COM Worksheet """
+
+    def __init__(self, _instance, _name):
+        self._instance = _instance
+        self.Name = _name
+        self.Range = _RangeIndexer(self)
+
+    def Unprotect(self, *args):
+        pass
+
+    def Calculate(self):
+        pass
+
+    def _write(self, _address, _value):
+        _add_cell(self._instance.package, self._instance.pending, self.Name, _address, _value)
+        self._instance.calc_generation += 1
+
+    def _read(self, _address):
+        sheet, address = self._instance.package.resolve(self.Name, _address)
+        pending = self._instance.pending.get(sheet, {})
+        cells = self._instance.package.read_sheet(sheet)
+
+        def _get(row_col):
+            if row_col in pending:
+                return pending[row_col]
+            return cells.get(row_col, (None, None))[0]
+
+        row_col = LBT2PH.xl_ranges.parse_address(address)
+        if row_col:
+            return _get(row_col)
+
+        corners = [LBT2PH.xl_ranges.parse_address(a) for a in unicode(address).split(':')]
+        if len(corners) != 2 or None in corners:
+            raise XlsxError('Cannot read the range "{}"!{}'.format(self.Name, _address))
+        (r1, c1), (r2, c2) = corners
+        return tuple(tuple(_get((r, c)) for c in range(c1, c2 + 1)) for r in range(r1, r2 + 1))
+
+
+class HeadlessInstance(object):
+    """Edits the PHPP .xlsx file directly. Same interface as xl_connect.ExcelInstance
+
+    Writes are held in memory and then saved in one pass over the file when
+    save_and_quit() (or save()) is called.
+    """
+
+    def __init__(self):
+        self.excel_app = _HeadlessApp()
+        self.active_workbook = None
+        self.active_workbook_name = ''
+        self.sheets_dict = {}
+        self.filename = None
+        self.package = None
+        self.pending = OrderedDict()
+        self.calc_generation = 0
+        self.profiler = None  # See xl_profile.instrument()
+
+    def start_new_instance(self, _filename):
+        self.filename = _filename
+
+    def _source(self):
+        """The file, or its content from memory if it's still the same as the template it was made from """
+
+        if LBT2PH.xl_template.get_store().is_loaded(self.filename):
+            return LBT2PH.xl_template.open_file(self.filename)
+        return self.filename
+
+    def open_workbook(self):
+        self.active_workbook_name = self.filename
+        self.package = XlsxPackage(self._source())
+        self.active_workbook = self.package
+
+    def is_alive(self):
+        return True
+
+    def workbook_is_open(self):
+        return self.package is not None
+
+    def reopen_workbook(self):
+        self.sheets_dict = {}
+        self.open_workbook()
+        self.load_sheets()
+        self.calc_generation += 1
+
+    def load_sheets(self):
+        for name in self.package.sheet_names:
+            self.sheets_dict[name] = HeadlessSheet(self, name)
+
+    def require_sheets(self, _sheet_names):
+        return [name for name in _sheet_names if name not in self.sheets_dict]
+
+    @staticmethod
+    def to_2d_array(_rows):
+        return _rows
+
+    @staticmethod
+    def from_2d_array(_value):
+        if not LBT2PH.xl_ranges.is_2d(_value):
+            return [[_value]]
+        return [list(row) for row in _value]
+
+    def read_range(self, _sheet_name, _address):
+        return self.from_2d_array(self.sheets_dict[_sheet_name].Range[_address].Value2)
+
+    def calculate(self):
+        """Formulas are not recalculated in the headless mode. Excel does it on the next open """
+
+        self.calc_generation += 1
+
+    def save(self):
+        if not self.package or not any(self.pending.values()):
+            return 0
+
+        self.package.close()
+        count = write_cells(self._source(), self.filename, self.pending)
+        self.pending = OrderedDict()
+        self.package = XlsxPackage(self.filename)
+        self.active_workbook = self.package
+        LBT2PH.xl_ledger.DiffLedger.record_saved(self.filename)
+        return count
+
+    def save_and_quit(self):
+        self.save()
+        if self.package:
+            self.package.close()
+        self.package = None
+        self.active_workbook = None
+        self.active_workbook_name = ''
+
+    def __unicode__(self):
+        return u"Headless Excel Instance | Active Worksheet: {}".format(self.active_workbook_name)
+    def __str__(self):
+        return unicode(self).encode("utf-8")
+    def __repr__(self):
+        return "{}()".format(
+               self.__class__.__name__ )
+    def ToString(self):
+        return str(self)
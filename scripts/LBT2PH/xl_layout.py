@@ -0,0 +1,265 @@
+"""Finds where the input tables start in a PHPP template, instead of guessing
+
+The builders in to_excel write each table (Areas surfaces, Windows, the
+Additional Ventilation rooms, ...) starting at a fixed row. Those rows are
+different if the PHPP has had rows added, or is another version or language.
+
+The indexer scans the template once for each table's heading (the 'anchor')
+and works out the table's first row from it. A heading only counts if the
+whole cell is the heading's text, in the few columns it is expected in, and
+puts the table near its default row (see ROW_WINDOW). If no cell or more than
+one row matches, the table keeps its default row: a wrong row would write
+the model over some other part of the PHPP.
+
+The result is saved, by the template file's hash, in the temp folder (see
+CACHE_FOLDER), so later runs just load it.
+
+The LayoutIndex can be passed to the builders anywhere they take the
+'start_rows' dict: layout.get('Areas').get('TB') works the same.
+
+Note: This module has no Rhino / Grasshopper / COM dependencies so that it can
+be used (and tested) outside of Rhino.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+
+import LBT2PH.xl_headless
+import LBT2PH.xl_ranges
+import LBT2PH.xl_template
+
+try:
+    unicode
+except NameError:
+    unicode = str
+
+CACHE_FOLDER = os.path.join(tempfile.gettempdir(), 'lbt2ph_layouts')
+MAX_SCAN_ROWS = 1500
+ROW_WINDOW = (10, 300)  # How far the table can be above and below its default row
+
+
+def _normalize(_text):
+    """Lower case, single spaces and no trailing ':' so that 'Area input: ' matches 'area input' """
+
+    return u' '.join(unicode(_text).split()).lower().rstrip(u':').strip()
+
+
+class Anchor(object):
+    """A table to find: the heading to look for, and where the table is from it """
+
+    def __init__(self, _sheet, _key, _default_row, _headers, _columns, _offset, _window=ROW_WINDOW):
+        """
+        Args:
+            _sheet (str): The worksheet name
+            _key (str): The table's name in the start rows dict (ie: 'Surfaces')
+            _default_row (int): The first row of the table in the standard PHPP
+            _headers (tuple): The heading's text. The whole cell has to be one of
+                these (case, extra spaces and a trailing ':' are ignored)
+            _columns (tuple): The first and last column letters to look for the heading in
+            _offset (int): The number of rows from the heading to the first row of the table
+            _window (tuple): How many rows above and below the default row the
+                table can be
+        """
+        self.sheet = _sheet
+        self.key = _key
+        self.default_row = _default_row
+        self.headers = tuple(_headers)
+        self.columns = tuple(LBT2PH.xl_ranges.col_to_index(c) for c in _columns)
+        self.offset = _offset
+        self.window = tuple(_window)
+
+    def candidates(self, _cells):
+        """Returns the sorted first rows of the table for each heading found in the
+        anchor's columns, within its row window
+
+        Args:
+            _cells (dict): {(row, col): (value, formula)} for the worksheet
+        """
+
+        headers = set(_normalize(h) for h in self.headers)
+        first_col, last_col = self.columns
+        low, high = self.default_row - self.window[0], self.default_row + self.window[1]
+
+        rows = set()
+        for (row, col), (value, _) in _cells.items():
+            if row > MAX_SCAN_ROWS or not first_col <= col <= last_col:
+                continue
+            if isinstance(value, (str, unicode)) and _normalize(value) in headers:
+                if low <= row + self.offset <= high:
+                    rows.add(row + self.offset)
+        return sorted(rows)
+
+    def find(self, _cells):
+        """Returns the first row of the table, or None if the heading isn't found
+        or is found on more than one row
+
+        Args:
+            _cells (dict): {(row, col): (value, formula)} for the worksheet
+        """
+
+        rows = self.candidates(_cells)
+        return rows[0] if len(rows) == 1 else None
+
+    def __repr__(self):
+        return "{}(_sheet={!r}, _key={!r}, _default_row={!r})".format(
+            self.__class__.__name__, self.sheet, self.key, self.default_row)
+
+
+# The headings as they are in the English PHPP 9/10. The offsets put the
+# default row in the standard PHPP. Edit or add to these for other versions.
+# The ventilator list on 'Components' has no heading of its own next to it,
+# so it always keeps its default (or user) row.
+ANCHORS = [
+    Anchor('U-Values', 'Constructions', 10, ('Assembly no.', 'Assembly no'), ('B', 'C'), 0),
+    Anchor('Components', 'Glazing', 15, ('Glazing',), ('IC', 'ID'), 2),
+    Anchor('Components', 'Frames', 15, ('Window frames', 'Window frame'), ('IJ', 'IK'), 2),
+    Anchor('Areas', 'Surfaces', 41, ('Area input',), ('B', 'C'), 4),
+    Anchor('Areas', 'TB', 145, ('Thermal bridge inputs', 'Thermal bridge input'), ('B', 'C'), 3),
+    Anchor('Windows', 'Windows', 24, ('Window input',), ('B', 'C'), 4),
+    Anchor('Shading', 'Windows', 17, ('Shading',), ('B', 'C'), 7),
+    Anchor('Additional Ventilation', 'Rooms', 56, ('Dimensioning of air quantities',), ('B', 'C'), 3),
+    Anchor('Additional Ventilation', 'Vent Unit Selection', 97,
+           ('Ventilation unit selection', 'Ventilation units selection'), ('B', 'C'), 3),
+    Anchor('Additional Ventilation', 'Vent Ducts', 127, ('Ducts', 'Duct'), ('B', 'C'), 3),
+    Anchor('Electricity non-res', 'Lighting', 19, ('Lighting',), ('B', 'C'), 3),
+    Anchor('Electricity non-res', 'Office Equip', 62, ('Office equipment',), ('B', 'C'), 3),
+    Anchor('Electricity non-res', 'Kitchen', 77, ('Kitchen',), ('B', 'C'), 3),
+]
+
+
+def anchors_version(_anchors=None):
+    """A short hash of the anchor definitions, so a saved layout is redone if they change """
+
+    text = u'|'.join(u'{}/{}/{}/{}/{}/{}/{}'.format(a.sheet, a.key, a.default_row, a.headers,
+                                                     a.columns, a.offset, a.window)
+                     for a in (_anchors or ANCHORS))
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:12]
+
+
+def file_hash(_path):
+    return LBT2PH.xl_template.get_store().content_hash(_path)
+
+
+class LayoutIndex(object):
+    """The first row of each table: {worksheet: {table: row}} """
+
+    def __init__(self, _template_hash=None):
+        self.template_hash = _template_hash
+        self.start_rows = {}
+        self.found = []  # [(worksheet, table), ...] found in the template
+        self.missing = []  # [(worksheet, table), ...] using the default row
+        self.ambiguous = []  # [(worksheet, table), ...] of the missing, found on more than one row
+
+    @classmethod
+    def scan(cls, _template_path, _anchors=None, _template_hash=None):
+        """Scans the template for all the anchors """
+
+        layout = cls(_template_hash or file_hash(_template_path))
+        anchors = _anchors or ANCHORS
+
+        with LBT2PH.xl_headless.XlsxPackage(LBT2PH.xl_template.open_file(_template_path)) as package:
+            for anchor in anchors:
+                rows = []
+                if anchor.sheet in package.sheet_paths:
+                    rows = anchor.candidates(package.read_sheet(anchor.sheet))
+
+                if len(rows) == 1:
+                    layout.found.append((anchor.sheet, anchor.key))
+                    row = rows[0]
+                else:
+                    layout.missing.append((anchor.sheet, anchor.key))
+                    if rows:
+                        layout.ambiguous.append((anchor.sheet, anchor.key))
+                    row = anchor.default_row
+                layout.start_rows.setdefault(anchor.sheet, {})[anchor.key] = row
+
+        return layout
+
+    @classmethod
+    def defaults(cls, _anchors=None):
+        """The layout of the standard PHPP, without scanning anything """
+
+        layout = cls()
+        for anchor in _anchors or ANCHORS:
+            layout.start_rows.setdefault(anchor.sheet, {})[anchor.key] = anchor.default_row
+            layout.missing.append((anchor.sheet, anchor.key))
+        return layout
+
+    def get(self, _sheet, _default=None):
+        """Same as the start rows dict's get() """
+
+        return self.start_rows.get(_sheet, _default)
+
+    def found_rows(self):
+        """{worksheet: {table: row}} of only the tables found in the template """
+
+        rows = {}
+        for sheet, key in self.found:
+            rows.setdefault(sheet, {})[key] = self.start_rows[sheet][key]
+        return rows
+
+    def to_dict(self):
+        return {'template_hash': self.template_hash,
+                'anchors_version': anchors_version(),
+                'start_rows': self.start_rows,
+                'found': [list(k) for k in self.found],
+                'missing': [list(k) for k in self.missing],
+                'ambiguous': [list(k) for k in self.ambiguous]}
+
+    @classmethod
+    def from_dict(cls, _dict):
+        layout = cls(_dict.get('template_hash'))
+        layout.start_rows = _dict.get('start_rows', {})
+        layout.found = [tuple(k) for k in _dict.get('found', [])]
+        layout.missing = [tuple(k) for k in _dict.get('missing', [])]
+        layout.ambiguous = [tuple(k) for k in _dict.get('ambiguous', [])]
+        return layout
+
+    def __unicode__(self):
+        return u"PHPP Layout | Tables found: {}  |  Using the default row: {}  |  Found more than once: {}".format(
+            len(self.found), ', '.join(u'{}/{}'.format(*k) for k in self.missing) or '-',
+            ', '.join(u'{}/{}'.format(*k) for k in self.ambiguous) or '-')
+    def __str__(self):
+        return unicode(self).encode('utf-8')
+    def __repr__(self):
+        return "{}(_template_hash={!r})".format(self.__class__.__name__, self.template_hash)
+    def ToString(self):
+        return str(self)
+
+
+def layout_path(_template_hash):
+    """The saved layout of the template with the hash. In the temp folder, not next to the
+    template, so that nothing is added to a (maybe shared or read-only) template folder """
+
+    return os.path.join(CACHE_FOLDER, u'{}.json'.format(_template_hash))
+
+
+def load_layout(_template_path):
+    """Returns the template's LayoutIndex. Loaded from the saved file if a template with
+    the same content was scanned before, otherwise scanned (and saved) again.
+    """
+
+    template_hash = file_hash(_template_path)
+    path = layout_path(template_hash)
+
+    if os.path.isfile(path):
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+            if data.get('template_hash') == template_hash and data.get('anchors_version') == anchors_version():
+                return LayoutIndex.from_dict(data)
+        except (IOError, OSError, ValueError) as e:
+            print('Could not read the layout file "{}": {}'.format(path, e))
+
+    layout = LayoutIndex.scan(_template_path, _template_hash=template_hash)
+    try:
+        if not os.path.isdir(CACHE_FOLDER):
+            os.makedirs(CACHE_FOLDER)
+        with open(path, 'w') as f:
+            json.dump(layout.to_dict(), f, indent=2, sort_keys=True)
+    except (IOError, OSError) as e:
+        print('Could not save the layout file "{}": {}'.format(path, e))
+
+    return layout
@@ -0,0 +1,333 @@
+"""A record of the cell values last written to a PHPP workbook, saved next to it.
+
+The 'Write to Workbook' component uses the ledger to only write the cells that
+changed since the last write. Since it lives on disk next to the workbook, it
+survives Rhino restarts and can't get mixed up with some other PHPP file.
+
+The ledger also keeps the workbook file's modified time and size from the last
+time the workbook was saved with all the cells in it (see record_saved). The
+cells written since then are only in Excel until it saves the file, so the
+fingerprint is dropped with each write. If the workbook file isn't the one
+fingerprinted (ie: it was edited, or Excel closed without saving the last
+write), all of the owned cells are checked against it again.
+"""
+
+import os
+import json
+import hashlib
+import numbers
+
+try:
+    unicode
+except NameError:
+    unicode = str
+
+
+class DiffLedger(object):
+    """The cells LBT2PH owns in one workbook: {(worksheet, range): last written value} """
+
+    VERSION = 2
+    FILE_SUFFIX = '.lbt2ph_ledger.json'
+
+    def __init__(self, _workbook_path):
+        self.workbook_path = self.key(_workbook_path)
+        self.cells = {}  # {(worksheet, range): value, as stored_value()}
+        self.highlighted = set()
+        self.workbook_changed = False  # True if the workbook file may not hold the cells (see load)
+        self.fingerprint = None  # The workbook file's, when it was last saved with the cells in it
+        self.stats = {'writes': 0, 'cells_written': 0, 'cells_skipped': 0, 'cells_cleared': 0}
+        self._pending = None
+
+    # --------------------------------------------------------------------------
+    # File
+
+    @staticmethod
+    def key(_workbook_path):
+        """Returns the normalized, absolute path used to identify the workbook """
+
+        return os.path.normcase(os.path.abspath(unicode(_workbook_path)))
+
+    @classmethod
+    def ledger_path(cls, _workbook_path):
+        return unicode(_workbook_path) + cls.FILE_SUFFIX
+
+    @classmethod
+    def load(cls, _workbook_path):
+        """Returns the saved ledger for the workbook, or a new empty one if there is
+        no saved ledger, or the saved one belongs to another file or doesn't
+        match its own checksum. If the workbook file isn't the same as when it
+        was last saved with the cells in it, its 'workbook_changed' is True.
+        """
+
+        ledger = cls(_workbook_path)
+        path = cls.ledger_path(_workbook_path)
+        if not os.path.isfile(path):
+            return ledger
+
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+        except (IOError, OSError, ValueError) as e:
+            print('Could not read the ledger file "{}": {}'.format(path, e))
+            return ledger
+
+        if data.get('version') != cls.VERSION:
+            return ledger
+
+        if data.get('workbook') != ledger.workbook_path:
+            print('Ledger "{}" belongs to the workbook "{}". Ignoring it.'.format(path, data.get('workbook')))
+            return ledger
+
+        ledger.cells = dict(((sheet, rng), val)
+                            for sheet, sheet_cells in data.get('cells', {}).items()
+                            for rng, val in sheet_cells.items())
+        ledger.highlighted = set((sheet, rng)
+                                 for sheet, ranges in data.get('highlighted', {}).items()
+                                 for rng in ranges)
+        ledger.stats.update(data.get('stats', {}))
+
+        if ledger.checksum() != data.get('checksum'):
+            print('Ledger "{}" does not match its checksum. Ignoring it.'.format(path))
+            ledger.cells = {}
+            ledger.highlighted = set()
+
+        ledger.fingerprint = data.get('fingerprint')
+        ledger.workbook_changed = ledger.fingerprint is None or workbook_fingerprint(_workbook_path) != ledger.fingerprint
+        return ledger
+
+    def save(self):
+        path = self.ledger_path(self.workbook_path)
+        sheets = {}
+        for (sheet, rng), val in self.cells.items():
+            sheets.setdefault(sheet, {})[rng] = val
+
+        highlighted = {}
+        for sheet, rng in sorted(self.highlighted):
+            highlighted.setdefault(sheet, []).append(rng)
+
+        data = {'version': self.VERSION,
+                'workbook': self.workbook_path,
+                'fingerprint': self.fingerprint,
+                'checksum': self.checksum(),
+                'stats': self.stats,
+                'cells': sheets,
+                'highlighted': highlighted}
+
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(data, f)
+        if os.path.exists(path):
+            os.remove(path)
+        os.rename(temp_path, path)
+
+    @classmethod
+    def record_saved(cls, _workbook_path, _ledgers=None):
+        """Called after the workbook was saved (ie: by save_and_quit), so the ledger
+        matches the file again and doesn't need to be verified when it's loaded
+
+        Args:
+            _workbook_path (str): The workbook file
+            _ledgers (dict): Optional {key: DiffLedger} of the ledgers kept in memory
+                (ie: by the Write component) to update as well
+        """
+
+        ledger = (_ledgers or {}).get(cls.key(_workbook_path))
+        if ledger is None:
+            if not os.path.isfile(cls.ledger_path(_workbook_path)):
+                return
+            ledger = cls.load(_workbook_path)
+        ledger.fingerprint = workbook_fingerprint(_workbook_path)
+        ledger.workbook_changed = False
+        try:
+            ledger.save()
+        except (IOError, OSError) as e:
+            print('Could not save the ledger file "{}": {}'.format(cls.ledger_path(_workbook_path), e))
+
+    @classmethod
+    def delete(cls, _workbook_path):
+        """Removes any saved ledger for the workbook (ie: when the file is replaced) """
+
+        path = cls.ledger_path(_workbook_path)
+        if os.path.isfile(path):
+            os.remove(path)
+
+    def checksum(self):
+        """Returns a hash of all the owned cells and their values, to check the file with """
+
+        sha = hashlib.sha1()
+        for (sheet, rng), val in sorted(self.cells.items(), key=lambda item: item[0]):
+            sha.update(u'{}\t{}\t{!r}\n'.format(sheet, rng, normalize_value(val)).encode('utf-8'))
+        return sha.hexdigest()
+
+    # --------------------------------------------------------------------------
+    # Diff
+
+    def diff(self, _new_cells, _full=False):
+        """Compares the new cell values to the ledger
+
+        The new state is held as 'pending' until commit() is called after the
+        write to Excel is done.
+
+        Args:
+            _new_cells (dict): {(worksheet, range): value} for all the cells to write
+            _full (bool): Set True to return all the cells, changed or not
+        Returns:
+            (list): [(worksheet, range, value), ...] to write. Cells in the ledger
+                which are not in the new cells get a value of "" (cleared).
+        """
+
+        changes = []
+        skipped = 0
+        new_cells = {}
+        for key, val in _new_cells.items():
+            # Compared as it's saved, so a value doesn't 'change' by being saved and loaded again
+            new_cells[key] = stored = stored_value(val)
+            if not _full and key in self.cells and self.cells[key] == stored:
+                skipped += 1
+                continue
+            changes.append((key[0], key[1], val))
+
+        cleared = [(key[0], key[1], "") for key in self.cells if key not in _new_cells]
+
+        self._pending = (new_cells, len(changes), skipped, len(cleared))
+        return changes + cleared
+
+    def commit(self):
+        """Records the pending state from the last diff() as written """
+
+        if self._pending is None:
+            return
+
+        self.cells, written, skipped, cleared = self._pending
+        self._pending = None
+        if written or cleared:
+            # Only in Excel until the workbook is saved
+            self.fingerprint = None
+
+        self.stats['writes'] += 1
+        self.stats['cells_written'] += written
+        self.stats['cells_skipped'] += skipped
+        self.stats['cells_cleared'] += cleared
+
+    def mark_highlighted(self, _cells):
+        """Records the (worksheet, range) cells as colored, so they can be skipped next time """
+
+        self.highlighted.update(_cells)
+
+    def invalidate_sheet(self, _sheet_name):
+        """Forgets everything written to the sheet, so all its cells are written next time """
+
+        self.cells = dict((k, v) for k, v in self.cells.items() if k[0] != _sheet_name)
+        self.highlighted = set(k for k in self.highlighted if k[0] != _sheet_name)
+
+    def clear(self):
+        self.cells = {}
+        self.highlighted = set()
+
+    # --------------------------------------------------------------------------
+    # Checks
+
+    def verify(self, _read_values):
+        """Checks all the owned cells (except formulas) against what is in the workbook now
+
+        Args:
+            _read_values (callable): f([(worksheet, range), ...]) -> the current
+                Value2 of each, in the same order (ie: xl_read.read_fields)
+        Returns:
+            (bool): True if the cells all match the ledger.
+        """
+
+        fields = sorted(k for k, v in self.cells.items()
+                        if not unicode(v).startswith('='))
+        if not fields:
+            return True
+
+        try:
+            values = _read_values(fields)
+        except Exception as e:
+            print('Could not read the workbook to check the ledger: {}'.format(e))
+            return False
+
+        for (sheet, rng), current in zip(fields, values):
+            if not _matches(current, self.cells[(sheet, rng)]):
+                print('Ledger mismatch at {}!{}: {!r} != {!r}'.format(
+                    sheet, rng, current, self.cells[(sheet, rng)]))
+                return False
+
+        return True
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats['cells_owned'] = len(self.cells)
+        stats['cells_highlighted'] = len(self.highlighted)
+        stats['workbook'] = self.workbook_path
+        return stats
+
+    def export_stats(self, _filepath):
+        """Writes the ledger statistics out to a JSON file """
+
+        with open(_filepath, 'w') as f:
+            json.dump(self.get_stats(), f, indent=2, sort_keys=True)
+
+    def __unicode__(self):
+        return u"Diff Ledger | {} cells owned | Written: {}  Skipped: {}  Cleared: {}".format(
+            len(self.cells), self.stats['cells_written'], self.stats['cells_skipped'],
+            self.stats['cells_cleared'])
+    def __str__(self):
+        return unicode(self).encode('utf-8')
+    def __repr__(self):
+        return "{}(_workbook_path={!r})".format(
+               self.__class__.__name__,
+               self.workbook_path)
+    def ToString(self):
+        return str(self)
+
+
+def _matches(_current, _written):
+    """True if a cell or range (Value2) holds the written value. A range given one value has it in every cell """
+
+    current, written = normalize_value(_current), normalize_value(_written)
+    if isinstance(current, tuple) and not isinstance(written, tuple):
+        return all(v == written for row in current for v in (row if isinstance(row, tuple) else [row]))
+    return current == written
+
+
+def workbook_fingerprint(_workbook_path):
+    """Returns [modified time, size] of the workbook file, or None if it's not there """
+
+    try:
+        stat = os.stat(unicode(_workbook_path))
+    except (IOError, OSError):
+        return None
+    return [stat.st_mtime, stat.st_size]
+
+
+def stored_value(_value):
+    """Puts a value into the form it has once saved to the ledger file and loaded
+    again: lists for tuples, text for anything JSON can't hold.
+    """
+
+    if isinstance(_value, (list, tuple)):
+        return [stored_value(v) for v in _value]
+    if _value is None or isinstance(_value, (numbers.Real, unicode)):
+        return _value
+    if isinstance(_value, bytes):
+        return _value.decode('utf-8', 'replace')
+    return unicode(_value)
+
+
+def normalize_value(_value):
+    """Puts a cell value into the form Excel would hand back: numbers (and
+    numeric text) as floats, empty text as None. A range of values is a tuple of rows.
+    """
+
+    if isinstance(_value, (list, tuple)):
+        return tuple(normalize_value(v) for v in _value)
+    if _value is None or _value == '':
+        return None
+    if isinstance(_value, bool):
+        return _value
+    try:
+        return round(float(_value), 9)
+    except (TypeError, ValueError):
+        return unicode(_value)
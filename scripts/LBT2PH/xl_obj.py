@@ -0,0 +1,204 @@
+"""The PHPP_XL_Obj: a single cell value to write to a PHPP worksheet
+
+A big model makes tens of thousands of these, so they are kept small: the
+worksheet is stored as an integer id and single-cell addresses as integer
+row / column numbers, all in __slots__. The usual .Worksheet / .Range / .Value
+attributes are still there for the GH components to use.
+
+Note: This module has no Rhino / Grasshopper / COM dependencies so that it can
+be used (and tested) outside of Rhino.
+"""
+
+import LBT2PH.units
+import LBT2PH.xl_ranges
+
+try:
+    unicode
+except NameError:
+    unicode = str
+
+
+class _SheetNames(object):
+    """Worksheet name <-> integer id, shared by all the PHPP_XL_Obj """
+
+    def __init__(self):
+        self.names = []
+        self.ids = {}
+
+    def get_id(self, _name):
+        sheet_id = self.ids.get(_name)
+        if sheet_id is None:
+            sheet_id = self.ids[_name] = len(self.names)
+            self.names.append(_name)
+        return sheet_id
+
+    def get_name(self, _id):
+        return self.names[_id]
+
+# Kept if the module is reload()ed so objects made before still find their sheet
+try:
+    _SHEETS
+except NameError:
+    _SHEETS = _SheetNames()
+
+_col_indexes = {}
+
+
+def _split_address(_address):
+    """Returns (row, col, None) for single cells or (0, 0, address) for anything else
+
+    Args:
+        _address (str | tuple): An 'A1' style address, or a tuple of (column letters, row)
+    """
+
+    if type(_address) is tuple:
+        col_letters, row = _address
+        col = _col_indexes.get(col_letters)
+        if col is None:
+            col = _col_indexes[col_letters] = LBT2PH.xl_ranges.col_to_index(col_letters)
+        return int(row), col, None
+
+    row_col = LBT2PH.xl_ranges.parse_address(_address)
+    if row_col is None:
+        return 0, 0, _address
+    return row_col[0], row_col[1], None
+
+
+class PHPP_XL_Obj(object):
+    """ A holder for an Excel writable datapoint with a worksheet, range and value """
+
+    __slots__ = ('sheet_id', 'row', 'col', '_address', 'Value', 'Unit_SI', 'Unit_IP')
+
+    # {Unit You have: {Unit you Want}, {...}, ...}
+    conversionSchema = LBT2PH.units.TO_IP_SCHEMA
+
+    def __init__(self, _shtNm, _rangeAddress, _val, _unitSI=None, _unitIP='SI'):
+        """
+        Args:
+            _shtNm (str): The Name of the Worksheet to write to
+            _rangeAddress (str | tuple): The Cell Range (A1, B12, etc...) to write to
+                on the Worksheet. Can also be a tuple of (column, row) ie: ('AC', 41)
+            _val (str): The Value to write to the Cell Range (Value2)
+            _unitSI: (str) The SI unit for the item
+            _unitIP: (str) The IP unit for the item
+        """
+        self.sheet_id = _SHEETS.get_id(_shtNm)
+        self.row, self.col, self._address = _split_address(_rangeAddress)
+        self.Value = _val
+        self.Unit_SI = _unitSI
+        self.Unit_IP = _unitIP
+
+    @classmethod
+    def from_cell(cls, _shtNm, _row, _col, _val, _unitSI=None, _unitIP='SI'):
+        """ Makes the object for a single cell from its row / column numbers, without
+        parsing an address. Used when loading a lot of them (ie: from a write-plan file) """
+
+        obj = cls.__new__(cls)
+        obj.sheet_id = _SHEETS.get_id(_shtNm)
+        obj.row = _row
+        obj.col = _col
+        obj._address = None
+        obj.Value = _val
+        obj.Unit_SI = _unitSI
+        obj.Unit_IP = _unitIP
+        return obj
+
+    @property
+    def Worksheet(self):
+        return _SHEETS.get_name(self.sheet_id)
+
+    @Worksheet.setter
+    def Worksheet(self, _shtNm):
+        self.sheet_id = _SHEETS.get_id(_shtNm)
+
+    @property
+    def Range(self):
+        if self._address is not None:
+            return self._address
+        return LBT2PH.xl_ranges.format_address(self.row, self.col)
+
+    @Range.setter
+    def Range(self, _rangeAddress):
+        self.row, self.col, self._address = _split_address(_rangeAddress)
+
+    @property
+    def is_single_cell(self):
+        return self._address is None
+
+    def getWorksheet(self, _units='SI'):
+        if _units == 'SI':
+            return self.Worksheet
+
+        if self.Worksheet == 'U-Values':
+            return 'R-Values'
+        elif self.Worksheet == 'Additional Vent':
+            return 'Addl vent'
+        else:
+            return self.Worksheet
+
+    def getValue(self, _targetUnit='SI'):
+        """ Get the Item Value properly. Allows for unit conversion.
+
+        For instance calling "obj.getValue(obj.Unit_IP)" will return the
+        converted value into Inch-Pound units. Pass 'SI' or leave
+        input blank for no conversion (return = self.Value x 1.0)
+
+        Blank values and formulas are returned as-is.
+
+        Args:
+            _targetUnit: (str) The unit to convert the value to. 'SI' or 'IP'
+        Returns:
+            value converted into the right units
+        Raises:
+            LBT2PH.units.UnknownUnitError: If there is no conversion to the target unit
+            LBT2PH.units.UnitValueError: If the Value is not a number
+        """
+
+        if not self.Unit_SI:
+            return self.Value
+
+        if _targetUnit == 'IP':
+            targetUnit = self.Unit_IP
+        elif _targetUnit == 'SI':
+            targetUnit = self.Unit_SI
+        else:
+            targetUnit = _targetUnit
+
+        return LBT2PH.units.convert(self.Value, self.Unit_SI, targetUnit)
+
+    def getValueOrRaw(self, _targetUnit='SI', _warnings=None):
+        """ Same as getValue(), but if the value can't be converted, returns the
+        value without conversion and adds a warning.
+
+        Args:
+            _targetUnit: (str) The unit to convert the value to. 'SI' or 'IP'
+            _warnings: (list) Optional list to add the warning to. Printed if None.
+        Returns:
+            value converted into the right units, or the Value as is
+        """
+
+        try:
+            return self.getValue(_targetUnit)
+        except LBT2PH.units.UnitError as e:
+            msg = "{}!{}: {}. Writing the value without conversion.".format(
+                self.getWorksheet(_targetUnit), self.Range, e)
+            if _warnings is None:
+                print(msg)
+            else:
+                _warnings.append(msg)
+            return self.Value
+
+    def __unicode__(self):
+        return u"PHPP Obj | Worksheet: {self.Worksheet}  |  Cell: {self.Range}  |  Value: {self.Value}".format(self=self)
+    def __str__(self):
+        return unicode(self).encode('utf-8')
+    def __repr__(self):
+       return "{}( _shtNm={!r}, _rangeAddress={!r}, _val={!r}, _unitSI={!r}, _unitIP={!r}".format(
+               self.__class__.__name__,
+               self.Worksheet,
+               self.Range,
+               self.Value,
+               self.Unit_SI,
+               self.Unit_IP)
+    def ToString(self):
+        return str(self)
@@ -0,0 +1,223 @@
+"""Compiles the (worksheet, range, value) writes made by the Convert component into a 'write plan'
+
+A lot of the writes overlap: the 'UD Custom' and 'Variants' objects overwrite
+cells which the settings / location builders already set, and cells get a
+default first and the real value later. Excel only ever sees the last value
+of each cell, so the plan keeps just that one. Cells whose value is the same
+as in the blank PHPP template can be dropped as well, and what is left is
+sorted by worksheet, row and column (up to each named or formula range, see
+compile_plan) so that the block writer (see xl_write) finds the biggest blocks.
+
+Note: This module has no Rhino / Grasshopper / COM dependencies so that it can
+be used (and tested) outside of Rhino.
+"""
+
+from collections import OrderedDict
+
+import LBT2PH.stage_cache
+import LBT2PH.xl_headless
+import LBT2PH.xl_ledger
+import LBT2PH.xl_ranges
+import LBT2PH.xl_template
+
+try:
+    unicode
+except NameError:
+    unicode = str
+
+PRUNE_LOG_LIMIT = 25
+
+
+class WritePlan(object):
+    """The cells to write, one value per cell, in sheet / row / column order """
+
+    def __init__(self):
+        self.cells = OrderedDict()  # {(worksheet, range): value}
+        self.items_in = 0
+        self.overwritten = {}  # {worksheet: count}
+        self.defaults = {}  # {worksheet: count}
+        self.pruned = []  # [(worksheet, range, value, reason), ...] the first few, for the log
+
+    def _prune(self, _counts, _sheet, _address, _value, _reason):
+        _counts[_sheet] = _counts.get(_sheet, 0) + 1
+        if len(self.pruned) < PRUNE_LOG_LIMIT:
+            self.pruned.append((_sheet, _address, _value, _reason))
+
+    def prune_defaults(self, _defaults, _owned=None, _skip_sheets=None):
+        """Drops the cells whose value is the same as the template's
+
+        Only safe for cells which still hold the template value. So cells the
+        diff ledger owns (LBT2PH wrote something else there before) are always
+        kept, as are the cells on any worksheets being reset.
+
+        Args:
+            _defaults (TemplateDefaults): The blank template's values
+            _owned (dict | set): Optional (worksheet, range) keys to keep
+            _skip_sheets (iterable): Optional worksheet names to keep all the cells of
+        Returns:
+            (int): The number of cells dropped
+        """
+
+        skip_sheets = set(_skip_sheets or [])
+        count = 0
+        for key, value in list(self.cells.items()):
+            if key[0] in skip_sheets or (_owned and key in _owned):
+                continue
+
+            if _defaults.is_default(key[0], key[1], value):
+                del self.cells[key]
+                self._prune(self.defaults, key[0], key[1], value, 'template default')
+                count += 1
+
+        return count
+
+    def content_key(self):
+        """A hash of the cells and their values, to tell if the same state was written before.
+        Unlike the cells themselves, it works for values which can't be hashed (ie: lists) """
+
+        return LBT2PH.stage_cache.content_hash([list(self.cells.items())])
+
+    def log_lines(self):
+        """Returns the lines describing what was pruned, for printing """
+
+        lines = [unicode(self)]
+        for sheet in sorted(set(self.overwritten) | set(self.defaults)):
+            lines.append(u'  {}: {} overwritten, {} template defaults'.format(
+                sheet, self.overwritten.get(sheet, 0), self.defaults.get(sheet, 0)))
+        for sheet, address, value, reason in self.pruned:
+            lines.append(u'  - {}!{} = {!r} ({})'.format(sheet, address, value, reason))
+
+        hidden = sum(self.overwritten.values()) + sum(self.defaults.values()) - len(self.pruned)
+        if hidden > 0:
+            lines.append(u'  ... and {} more'.format(hidden))
+        return lines
+
+    def __unicode__(self):
+        return u"Write Plan | {} writes in  |  {} cells out  |  Overwritten: {}  Template defaults: {}".format(
+            self.items_in, len(self.cells), sum(self.overwritten.values()), sum(self.defaults.values()))
+    def __str__(self):
+        return unicode(self).encode('utf-8')
+    def __repr__(self):
+        return "{}()".format(self.__class__.__name__)
+    def ToString(self):
+        return str(self)
+
+
+def _is_formula(_value):
+    return isinstance(_value, (str, unicode)) and _value.startswith('=')
+
+
+def _expand(_address, _value):
+    """Returns [((row, col), value), ...] for the cells the write sets, or None if
+    that can't be worked out (named ranges, formulas spread over a range, ...)
+    """
+
+    row_col = LBT2PH.xl_ranges.parse_address(_address)
+    if row_col:
+        return [(row_col, _value)]
+
+    corners = [LBT2PH.xl_ranges.parse_address(a) for a in unicode(_address).split(':')]
+    if len(corners) != 2 or None in corners or _is_formula(_value):
+        return None
+
+    (r1, c1), (r2, c2) = corners
+    rows = range(min(r1, r2), max(r1, r2) + 1)
+    cols = range(min(c1, c2), max(c1, c2) + 1)
+
+    if isinstance(_value, (list, tuple)):
+        if len(_value) != len(rows) or any(len(row) != len(cols) for row in _value):
+            return None
+        return [((row, col), _value[i][j])
+                for i, row in enumerate(rows) for j, col in enumerate(cols)]
+
+    return [((row, col), _value) for row in rows for col in cols]
+
+
+def compile_plan(_items):
+    """Builds the WritePlan for a set of writes
+
+    Args:
+        _items (iterable): (worksheet, range, value) in the order they would be
+            written. Later writes to a cell win.
+    Returns:
+        (WritePlan): The single cells in worksheet / row / column order, with any
+            ranges which are not plain cell addresses (ie: named ranges) in their
+            original order in between them. A range is a barrier: the cells
+            written before it are all sorted before it, and those written after
+            it (which may overwrite some of it) come after it.
+    """
+
+    plan = WritePlan()
+    cells = OrderedDict()  # {(worksheet, row, col): value} since the last range
+
+    def _flush():
+        for sheet, row, col in sorted(cells):
+            plan.cells[(sheet, LBT2PH.xl_ranges.format_address(row, col))] = cells[(sheet, row, col)]
+        cells.clear()
+
+    for sheet, address, value in _items:
+        plan.items_in += 1
+
+        expanded = _expand(address, value)
+        if expanded is None:
+            _flush()
+            key = (sheet, address)
+            if key in plan.cells:
+                plan._prune(plan.overwritten, sheet, address, plan.cells.pop(key), 'overwritten')
+            plan.cells[key] = value
+            continue
+
+        for (row, col), val in expanded:
+            key = (sheet, row, col)
+            cell_address = LBT2PH.xl_ranges.format_address(row, col)
+            if key in cells:
+                plan._prune(plan.overwritten, sheet, cell_address, cells[key], 'overwritten')
+            elif (sheet, cell_address) in plan.cells:
+                # Written before a range, so it has to move after that range
+                plan._prune(plan.overwritten, sheet, cell_address, plan.cells.pop((sheet, cell_address)), 'overwritten')
+            cells[key] = val
+
+    _flush()
+    return plan
+
+
+class TemplateDefaults(object):
+    """The values in a blank PHPP template (.xlsx), read one worksheet at a time as needed """
+
+    def __init__(self, _template_path):
+        self.template_path = _template_path
+        self.sheets = {}  # {worksheet: {(row, col): (value, formula)} or None if missing}
+
+    def _sheet_cells(self, _sheet_name):
+        if _sheet_name not in self.sheets:
+            try:
+                with LBT2PH.xl_headless.XlsxPackage(LBT2PH.xl_template.open_file(self.template_path)) as package:
+                    self.sheets[_sheet_name] = package.read_sheet(_sheet_name)
+            except LBT2PH.xl_headless.XlsxError:
+                self.sheets[_sheet_name] = None
+        return self.sheets[_sheet_name]
+
+    def is_default(self, _sheet_name, _address, _value):
+        """True if writing the value would leave the template cell unchanged.
+        Cells with a formula in the template are never a default.
+        """
+
+        cells = self._sheet_cells(_sheet_name)
+        row_col = LBT2PH.xl_ranges.parse_address(_address)
+        if cells is None or row_col is None:
+            return False
+
+        default, formula = cells.get(row_col, (None, None))
+        if formula:
+            return False
+        return LBT2PH.xl_ledger.normalize_value(default) == LBT2PH.xl_ledger.normalize_value(_value)
+
+    def __unicode__(self):
+        return u"Template Defaults | {}  |  Worksheets read: {}".format(
+            self.template_path, len(self.sheets))
+    def __str__(self):
+        return unicode(self).encode('utf-8')
+    def __repr__(self):
+        return "{}(_template_path={!r})".format(self.__class__.__name__, self.template_path)
+    def ToString(self):
+        return str(self)
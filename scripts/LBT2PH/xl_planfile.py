@@ -0,0 +1,229 @@
+"""Saves the PHPP_XL_Obj made by the Convert component to a 'write-plan' file, and loads them back
+
+With a plan file the export can be made in one Grasshopper session (or on one
+machine) and written to the PHPP in another, or replayed for profiling.
+
+The file is plain UTF-8 text, one line per object, so it can be read (and
+written) as a stream. The first line is the header:
+
+    LBT2PH-WRITE-PLAN<tab>{"version": 1, "lbt2ph_version": ..., "model_hash": ..., ...}
+
+and each line after it is one object, as tab separated fields:
+
+    worksheet, row, col, unit SI, unit IP, value type, value
+
+For anything which isn't a single cell the 'row' is the range address and the
+'col' is empty. The value types are: '' (None), 'n' (float), 'i' (int), 'b'
+(bool), 's' (text) or 'j' (anything else, as JSON). Tabs, newlines and
+backslashes in the text are escaped with a backslash.
+
+Note: This module has no Rhino / Grasshopper / COM dependencies so that it can
+be used (and tested) outside of Rhino.
+"""
+
+import hashlib
+import io
+import json
+import os
+import re
+import time
+
+import LBT2PH.__versions__
+import LBT2PH.xl_obj
+
+try:
+    unicode
+except NameError:
+    unicode = str
+
+try:
+    long
+except NameError:
+    long = int
+
+MAGIC = u'LBT2PH-WRITE-PLAN'
+FORMAT_VERSION = 1
+FILE_EXTENSION = '.lbt2ph_plan'
+
+_escapes = {u'\\': u'\\\\', u'\t': u'\\t', u'\n': u'\\n', u'\r': u'\\r'}
+_unescapes = dict((v[1], k) for k, v in _escapes.items())
+_re_escape = re.compile(u'[\\\\\t\n\r]')
+_re_unescape = re.compile(u'\\\\(.)')
+
+
+class PlanFileError(Exception):
+    """Raised when a file is not a write-plan, or is from a newer version of LBT2PH """
+
+
+def _escape(_text):
+    return _re_escape.sub(lambda m: _escapes[m.group(0)], _text)
+
+
+def _unescape(_text):
+    if u'\\' not in _text:
+        return _text
+    return _re_unescape.sub(lambda m: _unescapes.get(m.group(1), m.group(1)), _text)
+
+
+def _encode_value(_value):
+    """Returns the (type, text) for the value """
+
+    if _value is None:
+        return u'', u''
+    elif isinstance(_value, bool):
+        return u'b', u'1' if _value else u'0'
+    elif isinstance(_value, (int, long)):
+        return u'i', unicode(_value)
+    elif isinstance(_value, float):
+        return u'n', unicode(repr(_value))
+    elif isinstance(_value, (str, unicode)):
+        return u's', _escape(_value)
+    return u'j', _escape(unicode(json.dumps(_value, default=unicode)))
+
+
+def _decode_value(_type, _text):
+    if _type == u's':
+        return _unescape(_text)
+    elif _type == u'n':
+        return float(_text)
+    elif _type == u'i':
+        return int(_text)
+    elif _type == u'b':
+        return _text == u'1'
+    elif _type == u'j':
+        return json.loads(_unescape(_text))
+    return None
+
+
+def model_hash(_model):
+    """Returns a SHA1 of the model's data, to tell which model a plan was made from
+
+    Args:
+        _model: The Honeybee Model (anything with a .to_dict() will do)
+    Returns:
+        (str): The hex digest
+    """
+
+    try:
+        data = _model.to_dict()
+    except AttributeError:
+        data = unicode(_model)
+
+    text = json.dumps(data, sort_keys=True, default=unicode)
+    if isinstance(text, unicode):
+        text = text.encode('utf-8')
+    return hashlib.sha1(text).hexdigest()
+
+
+def is_plan_file(_path):
+    return isinstance(_path, (str, unicode)) and _path.lower().endswith(FILE_EXTENSION)
+
+
+def iter_objects(_objects):
+    """Yields the PHPP_XL_Obj from a list, a list of lists, a DataTree or
+    the path to a write-plan file (or any mix of these)
+    """
+
+    if hasattr(_objects, 'Branches'):
+        for branch in _objects.Branches:
+            for obj in iter_objects(branch):
+                yield obj
+        return
+
+    if is_plan_file(_objects):
+        for obj in read_objects(_objects):
+            yield obj
+        return
+
+    for item in _objects:
+        if isinstance(item, (list, tuple)) or is_plan_file(item):
+            for obj in iter_objects(item):
+                yield obj
+        else:
+            yield item
+
+
+# ------------------------------------------------------------------------------
+# Write
+
+def write_plan(_path, _objects, _model_hash=None):
+    """Saves the objects to a write-plan file
+
+    Args:
+        _path (str): The file to write. Should end with FILE_EXTENSION
+        _objects: The PHPP_XL_Obj to save. A list, list of lists or a DataTree.
+        _model_hash (str): Optional hash of the model the objects were made from
+    Returns:
+        (dict): The header written to the file
+    """
+
+    objects = list(iter_objects(_objects))
+    header = {'version': FORMAT_VERSION,
+              'lbt2ph_version': LBT2PH.__versions__.RELEASE_VERSION,
+              'model_hash': _model_hash,
+              'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+              'objects': len(objects)}
+
+    temp_path = _path + '.tmp'
+    with io.open(temp_path, 'w', encoding='utf-8', newline='\n') as f:
+        f.write(u'{}\t{}\n'.format(MAGIC, unicode(json.dumps(header, sort_keys=True))))
+
+        for obj in objects:
+            if obj.is_single_cell:
+                row, col = unicode(obj.row), unicode(obj.col)
+            else:
+                row, col = _escape(unicode(obj.Range)), u''
+            value_type, value = _encode_value(obj.Value)
+            f.write(u'\t'.join((obj.Worksheet, row, col, obj.Unit_SI or u'',
+                                obj.Unit_IP or u'', value_type, value)) + u'\n')
+
+    if os.path.exists(_path):
+        os.remove(_path)
+    os.rename(temp_path, _path)
+
+    return header
+
+
+# ------------------------------------------------------------------------------
+# Read
+
+def _parse_header(_line, _path):
+    magic, _, header = _line.rstrip(u'\n').partition(u'\t')
+    if magic != MAGIC:
+        raise PlanFileError('"{}" is not an LBT2PH write-plan file.'.format(_path))
+
+    header = json.loads(header)
+    if header.get('version', 0) > FORMAT_VERSION:
+        raise PlanFileError('The write-plan "{}" was made by a newer version of LBT2PH ({}).'.format(
+            _path, header.get('lbt2ph_version')))
+    return header
+
+
+def read_header(_path):
+    """Returns the header dict of a write-plan file """
+
+    with io.open(_path, 'r', encoding='utf-8') as f:
+        return _parse_header(f.readline(), _path)
+
+
+def read_objects(_path):
+    """Yields the PHPP_XL_Obj saved in a write-plan file, one at a time
+
+    Raises:
+        PlanFileError: If the file isn't a write-plan, or is a newer version
+    """
+
+    from_cell = LBT2PH.xl_obj.PHPP_XL_Obj.from_cell
+    PHPP_XL_Obj = LBT2PH.xl_obj.PHPP_XL_Obj
+
+    with io.open(_path, 'r', encoding='utf-8') as f:
+        _parse_header(f.readline(), _path)
+
+        for line in f:
+            sheet, row, col, unit_si, unit_ip, value_type, value = line.rstrip(u'\n').split(u'\t')
+            value = _decode_value(value_type, value)
+
+            if col:
+                yield from_cell(sheet, int(row), int(col), value, unit_si or None, unit_ip or None)
+            else:
+                yield PHPP_XL_Obj(sheet, _unescape(row), value, unit_si or None, unit_ip or None)
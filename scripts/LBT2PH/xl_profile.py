@@ -0,0 +1,330 @@
+"""Counts and times the calls made to Excel, to see where the export time goes
+
+instrument() wraps the Excel Instance's application, workbook and worksheets
+(and the Workbooks / Worksheets / Range / Interior objects got from them) in
+thin proxies. Each call, property get and property set made through them is
+recorded, with its time, by operation (ie: 'Range.Value2=' for a write),
+by the kind of work (open, unprotect, write, read, style, recalc, ...) and by
+worksheet.
+
+Nothing is wrapped until instrument() is called, and uninstrument() puts the
+original objects back, so it costs nothing when it is turned off. Anything
+which looks like the Excel object model can be wrapped, so tests can use a
+fake in place of Excel.
+
+Note: This module has no Rhino / Grasshopper / COM dependencies so that it can
+be used (and tested) outside of Rhino.
+"""
+
+from collections import OrderedDict
+import threading
+import time
+
+try:
+    unicode
+except NameError:
+    unicode = str
+
+_timer = getattr(time, 'perf_counter', time.time)
+
+# The upper edge of each latency bucket, in milliseconds
+BUCKETS_MS = (0.1, 0.3, 1, 3, 10, 30, 100, 300, 1000, float('inf'))
+
+# {attribute: the kind of object it gets}, for the objects which are wrapped too
+CHILD_KINDS = {'Workbooks': 'Workbooks', 'ActiveWorkbook': 'Workbook', 'Worksheets': 'Worksheets',
+               'Sheets': 'Worksheets', 'ActiveSheet': 'Worksheet', 'Interior': 'Interior',
+               'Open': 'Workbook', 'Add': 'Workbook'}
+ITEM_KINDS = {'Workbooks': 'Workbook', 'Worksheets': 'Worksheet'}
+INDEXERS = ('Range', 'Cells')
+
+CATEGORIES = ('open / save', 'unprotect', 'write', 'read', 'style', 'recalc', 'range', 'other')
+
+
+def category(_kind, _name, _is_set=False):
+    """Which kind of work the call is (one of the CATEGORIES) """
+
+    if _name in ('Open', 'Close', 'Save', 'SaveAs', 'Quit'):
+        return 'open / save'
+    elif _name in ('Unprotect', 'Protect'):
+        return 'unprotect'
+    elif _kind == 'Interior' or _name == 'Interior':
+        return 'style'
+    elif _name in ('Calculate', 'CalculateFull', 'Calculation'):
+        return 'recalc'
+    elif _name in ('Value2', 'Value', 'Formula'):
+        return 'write' if _is_set else 'read'
+    elif _name in INDEXERS:
+        return 'range'
+    return 'other'
+
+
+class _Timing(object):
+    __slots__ = ('calls', 'seconds', 'max_seconds', 'buckets')
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.buckets = [0] * len(BUCKETS_MS)
+
+    def add(self, _seconds):
+        self.calls += 1
+        self.seconds += _seconds
+        self.max_seconds = max(self.max_seconds, _seconds)
+        ms = _seconds * 1000.0
+        for i, edge in enumerate(BUCKETS_MS):
+            if ms < edge:
+                self.buckets[i] += 1
+                break
+
+    @property
+    def mean_ms(self):
+        return self.seconds * 1000.0 / self.calls if self.calls else 0.0
+
+
+class CallStats(object):
+    """The calls recorded, by operation, by kind of work and by worksheet """
+
+    def __init__(self):
+        self.operations = OrderedDict()  # {(operation, category): _Timing}
+        self.categories = OrderedDict()  # {category: _Timing}
+        self.sheets = OrderedDict()  # {worksheet: _Timing}
+        self.started = _timer()
+        self._lock = threading.Lock()
+
+    def record(self, _operation, _category, _sheet, _seconds):
+        with self._lock:
+            for table, key in ((self.operations, (_operation, _category)),
+                               (self.categories, _category),
+                               (self.sheets, _sheet or '-')):
+                timing = table.get(key)
+                if timing is None:
+                    timing = table[key] = _Timing()
+                timing.add(_seconds)
+
+    @property
+    def calls(self):
+        return sum(t.calls for t in self.categories.values())
+
+    @property
+    def seconds(self):
+        return sum(t.seconds for t in self.categories.values())
+
+    @staticmethod
+    def _histogram(_buckets):
+        labels = [u'<{:g}'.format(edge) for edge in BUCKETS_MS[:-1]] + [u'>={:g}'.format(BUCKETS_MS[-2])]
+        return u' '.join(u'{}:{}'.format(label, n) for label, n in zip(labels, _buckets) if n)
+
+    def summary_lines(self):
+        """The summary table, as a list of text lines """
+
+        lines = [u'Excel calls: {}  |  In Excel: {:.1f} ms  |  Elapsed: {:.1f} ms'.format(
+            self.calls, self.seconds * 1000.0, (_timer() - self.started) * 1000.0)]
+
+        row = u'{:<28} {:<12} {:>8} {:>11} {:>9} {:>9}  {}'
+        lines.append(row.format(u'Operation', u'Kind', u'Calls', u'Total ms', u'Mean ms', u'Max ms',
+                                u'Histogram (ms: calls)'))
+        operations = sorted(self.operations.items(), key=lambda item: -item[1].seconds)
+        for (operation, cat), t in operations:
+            lines.append(row.format(operation, cat, t.calls, u'{:.2f}'.format(t.seconds * 1000.0),
+                                    u'{:.3f}'.format(t.mean_ms), u'{:.3f}'.format(t.max_seconds * 1000.0),
+                                    self._histogram(t.buckets)))
+
+        lines.append(u'')
+        row = u'{:<28} {:>8} {:>11}'
+        lines.append(row.format(u'Kind', u'Calls', u'Total ms'))
+        for cat in CATEGORIES:
+            t = self.categories.get(cat)
+            if t:
+                lines.append(row.format(cat, t.calls, u'{:.2f}'.format(t.seconds * 1000.0)))
+
+        lines.append(u'')
+        lines.append(row.format(u'Worksheet', u'Calls', u'Total ms'))
+        for sheet, t in sorted(self.sheets.items(), key=lambda item: -item[1].seconds):
+            lines.append(row.format(sheet, t.calls, u'{:.2f}'.format(t.seconds * 1000.0)))
+
+        return lines
+
+    def __unicode__(self):
+        return u"Call Stats | Calls: {}  |  In Excel: {:.1f} ms  |  Operations: {}  |  Worksheets: {}".format(
+            self.calls, self.seconds * 1000.0, len(self.operations), len(self.sheets))
+    def __str__(self):
+        return unicode(self).encode('utf-8')
+    def __repr__(self):
+        return "{}()".format(self.__class__.__name__)
+    def ToString(self):
+        return str(self)
+
+
+class Profiler(object):
+    """Shared by all the proxies of one Excel Instance. start() begins a new set of stats """
+
+    def __init__(self):
+        self.stats = CallStats()
+
+    def start(self):
+        self.stats = CallStats()
+        return self.stats
+
+    def record(self, _kind, _name, _sheet, _seconds, _is_set=False):
+        operation = u'{}.{}{}'.format(_kind, _name, u'=' if _is_set else u'')
+        self.stats.record(operation, category(_kind, _name, _is_set), _sheet, _seconds)
+
+
+class _Proxy(object):
+    """Wraps one object of the Excel object model and records everything done with it """
+
+    def __init__(self, _target, _profiler, _kind, _sheet=None):
+        object.__setattr__(self, '_lbt2ph_target', _target)
+        object.__setattr__(self, '_lbt2ph_profiler', _profiler)
+        object.__setattr__(self, '_lbt2ph_kind', _kind)
+        object.__setattr__(self, '_lbt2ph_sheet', _sheet)
+
+    def _wrap(self, _value, _kind, _sheet=None):
+        if _value is None:
+            return None
+        if _kind == 'Worksheet' and _sheet is None:
+            _sheet = getattr(_value, 'Name', None)
+        return _Proxy(_value, self._lbt2ph_profiler, _kind, _sheet or self._lbt2ph_sheet)
+
+    def __getattr__(self, _name):
+        target = self._lbt2ph_target
+        kind, sheet = self._lbt2ph_kind, self._lbt2ph_sheet
+
+        if _name in INDEXERS:
+            return _Indexer(getattr(target, _name), self._lbt2ph_profiler, kind, _name, sheet)
+
+        start = _timer()
+        value = getattr(target, _name)
+
+        if _name not in CHILD_KINDS and callable(value):
+            return _Method(value, self, _name)
+
+        self._lbt2ph_profiler.record(kind, _name, sheet, _timer() - start)
+        if _name in CHILD_KINDS:
+            return self._wrap(value, CHILD_KINDS[_name])
+        return value
+
+    def __setattr__(self, _name, _value):
+        start = _timer()
+        setattr(self._lbt2ph_target, _name, _value)
+        self._lbt2ph_profiler.record(self._lbt2ph_kind, _name, self._lbt2ph_sheet, _timer() - start, True)
+
+    def __iter__(self):
+        kind = ITEM_KINDS.get(self._lbt2ph_kind, self._lbt2ph_kind)
+        for item in self._lbt2ph_target:
+            yield self._wrap(item, kind)
+
+    def __getitem__(self, _key):
+        start = _timer()
+        value = self._lbt2ph_target[_key]
+        self._lbt2ph_profiler.record(self._lbt2ph_kind, u'Item', self._lbt2ph_sheet, _timer() - start)
+        return self._wrap(value, ITEM_KINDS.get(self._lbt2ph_kind, self._lbt2ph_kind))
+
+    def __repr__(self):
+        return "{}({!r})".format(self.__class__.__name__, self._lbt2ph_target)
+
+
+class _Method(object):
+    """A method got from a proxy. Records the call when it is called """
+
+    __slots__ = ('func', 'owner', 'name')
+
+    def __init__(self, _func, _owner, _name):
+        self.func = _func
+        self.owner = _owner
+        self.name = _name
+
+    def __call__(self, *args, **kwargs):
+        start = _timer()
+        value = self.func(*args, **kwargs)
+        owner = self.owner
+        owner._lbt2ph_profiler.record(owner._lbt2ph_kind, self.name, owner._lbt2ph_sheet, _timer() - start)
+        if self.name in CHILD_KINDS:
+            return owner._wrap(value, CHILD_KINDS[self.name])
+        return value
+
+
+class _Indexer(object):
+    """sheet.Range / sheet.Cells. Getting a Range from it is one call """
+
+    __slots__ = ('target', 'profiler', 'kind', 'name', 'sheet')
+
+    def __init__(self, _target, _profiler, _kind, _name, _sheet):
+        self.target = _target
+        self.profiler = _profiler
+        self.kind = _kind
+        self.name = _name
+        self.sheet = _sheet
+
+    def _get(self, _get_range):
+        start = _timer()
+        value = _get_range()
+        self.profiler.record(self.kind, self.name, self.sheet, _timer() - start)
+        return _Proxy(value, self.profiler, 'Range', self.sheet)
+
+    def __getitem__(self, _address):
+        return self._get(lambda: self.target[_address])
+
+    def __call__(self, *args):
+        return self._get(lambda: self.target(*args))
+
+
+def unwrap(_obj):
+    """The original object, if it is wrapped in a proxy """
+
+    if isinstance(_obj, _Proxy):
+        return object.__getattribute__(_obj, '_lbt2ph_target')
+    return _obj
+
+
+def instrument(_excel):
+    """Starts recording the calls made to the Excel Instance. Does nothing if it already is
+
+    Returns:
+        (Profiler): The profiler, also set as _excel.profiler
+    """
+
+    profiler = getattr(_excel, 'profiler', None)
+    if profiler is not None:
+        return profiler
+
+    profiler = Profiler()
+    _excel.excel_app = _Proxy(_excel.excel_app, profiler, 'Application')
+    if _excel.active_workbook is not None:
+        _excel.active_workbook = _Proxy(_excel.active_workbook, profiler, 'Workbook')
+
+    if isinstance(_excel.sheets_dict, dict):
+        _excel.sheets_dict = dict((name, _Proxy(sheet, profiler, 'Worksheet', name))
+                                  for name, sheet in _excel.sheets_dict.items())
+    else:
+        _excel.load_sheets()  # ie: xl_sheets.LazySheets, over the wrapped workbook
+
+    _excel.profiler = profiler
+    return profiler
+
+
+def uninstrument(_excel):
+    """Stops recording, and puts the original objects back """
+
+    if getattr(_excel, 'profiler', None) is None:
+        return
+
+    _excel.excel_app = unwrap(_excel.excel_app)
+    _excel.active_workbook = unwrap(_excel.active_workbook)
+    if isinstance(_excel.sheets_dict, dict):
+        _excel.sheets_dict = dict((name, unwrap(sheet)) for name, sheet in _excel.sheets_dict.items())
+    else:
+        _excel.load_sheets()
+    _excel.profiler = None
+
+
+def start(_excel):
+    """Starts a new set of stats, if the Excel Instance is instrumented
+
+    Returns:
+        (CallStats): The new stats, or None if it isn't instrumented
+    """
+
+    profiler = getattr(_excel, 'profiler', None)
+    return profiler.start() if profiler is not None else None
@@ -0,0 +1,233 @@
+"""A background writer for a workbook: one worker thread, latest state wins
+
+The Write component hands the whole state to write (as a 'job') to the queue
+and returns right away. The worker runs one job at a time. If several jobs
+come in while it is busy, only the newest one is kept: the states in between
+are dropped since they would be overwritten anyway.
+
+Each queue also has the 'workbook_lock' which is held for the whole of each
+write. Anything reading from the workbook (ie: the Read component) should hold
+it too, so that it never sees a half-written workbook.
+
+Excel's COM objects (and sc.sticky) belong to Grasshopper's UI thread, so the
+worker doesn't call them itself: with the queue's 'invoke' set, each job is
+handed over to the UI thread (see call_on) and the worker just waits for it.
+The component returns right away all the same, and the write runs in between
+solves. The workbook_lock is taken on the thread running the job, so a reader
+waiting for it on the UI thread can't block the job it is waiting for.
+
+Note: This module has no Rhino / Grasshopper / COM dependencies so that it can
+be used (and tested) outside of Rhino.
+"""
+
+import threading
+import time
+import traceback
+
+try:
+    unicode
+except NameError:
+    unicode = str
+
+
+class WriteQueue(object):
+    """Runs the submitted jobs on a single background thread, newest job only """
+
+    IDLE_TIMEOUT = 30.0
+    MAX_ERRORS = 10
+
+    def __init__(self, _name=''):
+        self.name = _name
+        self.workbook_lock = threading.RLock()
+        self.on_done = None  # Optional f(queue), called by the worker after each job
+        self.invoke = None  # Optional f(call) -> result, runs each job on another thread (see call_on)
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pending = None  # (key, job, cell_count)
+        self._running = None  # (key, cell_count)
+
+        self.last_key = None
+        self.last_completed = None
+        self.last_result = None
+        self.errors = []
+        self.jobs_done = 0
+        self.jobs_dropped = 0
+
+    # --------------------------------------------------------------------------
+    # Submit
+
+    def submit(self, _key, _job, _cell_count=0):
+        """Queues the job, replacing any job still waiting to run
+
+        Args:
+            _key: A hashable key for the state being written. If it is the same
+                as the state waiting, running or last written, nothing is queued.
+            _job (callable): f() -> result. Does the whole write.
+            _cell_count (int): The number of cells in the state, for the status
+        Returns:
+            (bool): True if the job was queued
+        """
+
+        with self._lock:
+            if _key is not None and _key in self._known_keys():
+                return False
+
+            if self._pending is not None:
+                self.jobs_dropped += 1
+            self._pending = (_key, _job, _cell_count)
+
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._work, name='LBT2PH Write Queue')
+                self._thread.daemon = True
+                self._thread.start()
+
+        self._wakeup.set()
+        return True
+
+    def _known_keys(self):
+        keys = [self.last_key]
+        if self._pending is not None:
+            keys.append(self._pending[0])
+        if self._running is not None:
+            keys.append(self._running[0])
+        return keys
+
+    # --------------------------------------------------------------------------
+    # Worker
+
+    def _work(self):
+        while True:
+            self._wakeup.wait(self.IDLE_TIMEOUT)
+
+            with self._lock:
+                self._wakeup.clear()
+                if self._pending is None:
+                    # Nothing came in for a while, let the thread end
+                    self._thread = None
+                    return
+
+                key, job, cell_count = self._pending
+                self._pending = None
+                self._running = (key, cell_count)
+
+            def _locked(_job=job):
+                with self.workbook_lock:
+                    return _job()
+
+            try:
+                result = self.invoke(_locked) if self.invoke is not None else _locked()
+            except Exception as e:
+                with self._lock:
+                    self.last_key = None
+                    self.errors.append(u'{}: {}'.format(time.strftime('%H:%M:%S'), e))
+                    self.errors = self.errors[-self.MAX_ERRORS:]
+                print(traceback.format_exc())
+            else:
+                with self._lock:
+                    self.last_key = key
+                    self.last_result = result
+                    self.last_completed = time.strftime('%H:%M:%S')
+                    self.jobs_done += 1
+                    self.errors = []
+            finally:
+                with self._lock:
+                    self._running = None
+
+            if self.on_done is not None:
+                try:
+                    self.on_done(self)
+                except Exception:
+                    print(traceback.format_exc())
+
+    # --------------------------------------------------------------------------
+    # Status
+
+    @property
+    def busy(self):
+        """True if a job is waiting or running """
+
+        with self._lock:
+            return self._pending is not None or self._running is not None
+
+    def wait(self, _timeout=None):
+        """Waits until the queue is empty. Returns False if it timed out.
+        Not on the thread the jobs are invoked on, which would never get to run them. """
+
+        end = None if _timeout is None else time.time() + _timeout
+        while self.busy:
+            if end is not None and time.time() > end:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def status(self):
+        """Returns a dict of the queue's status for the component output """
+
+        with self._lock:
+            return {'pending_cells': self._pending[2] if self._pending else 0,
+                    'running_cells': self._running[1] if self._running else 0,
+                    'last_completed': self.last_completed,
+                    'last_result': self.last_result,
+                    'jobs_done': self.jobs_done,
+                    'jobs_dropped': self.jobs_dropped,
+                    'errors': list(self.errors)}
+
+    def __unicode__(self):
+        status = self.status()
+        return u"Write Queue | Pending: {} cells  |  Writing: {} cells  |  Last write: {}  |"\
+            "  Done: {}  Dropped: {}  |  Errors: {}".format(
+                status['pending_cells'], status['running_cells'],
+                status['last_completed'] or '-', status['jobs_done'],
+                status['jobs_dropped'], len(status['errors']))
+    def __str__(self):
+        return unicode(self).encode('utf-8')
+    def __repr__(self):
+        return "{}(_name={!r})".format(self.__class__.__name__, self.name)
+    def ToString(self):
+        return str(self)
+
+
+def call_on(_post, _func):
+    """Runs _func on another thread and waits for it. Returns its result, or raises its error
+
+    Args:
+        _post (callable): f(call) which has the call run on the other thread,
+            without waiting for it (ie: RhinoApp.InvokeOnUiThread)
+        _func (callable): f() -> result
+    """
+
+    done = threading.Event()
+    outcome = {}
+
+    def _call():
+        try:
+            outcome['result'] = _func()
+        except Exception as e:
+            outcome['error'] = e
+            print(traceback.format_exc())
+        finally:
+            done.set()
+
+    _post(_call)
+    done.wait()
+    if 'error' in outcome:
+        raise outcome['error']
+    return outcome.get('result')
+
+
+def get_queue(_excel):
+    """Returns the WriteQueue for the Excel instance, making one the first time """
+
+    queue = getattr(_excel, 'write_queue', None)
+    if queue is None:
+        queue = WriteQueue(getattr(_excel, 'filename', ''))
+        _excel.write_queue = queue
+    return queue
+
+
+def workbook_lock(_excel):
+    """The lock to hold while reading from or writing to the Excel instance's workbook """
+
+    return get_queue(_excel).workbook_lock
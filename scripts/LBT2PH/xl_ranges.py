@@ -0,0 +1,354 @@
+"""Helpers for working with Excel 'A1' style cell addresses and for grouping
+single-cell writes into rectangular blocks which can be written in one call.
+Also the Range.Value2 rules shared by the headless writer, the Excel simulator
+and the formula engine (is_2d, spread, re_number).
+
+Note: This module has no Rhino / Grasshopper / COM dependencies so that it can
+be used (and tested) outside of Rhino.
+"""
+
+import re
+from collections import OrderedDict
+
+try:
+    unicode
+except NameError:
+    unicode = str
+
+_re_cell = re.compile(r'^\$?([A-Za-z]{1,3})\$?([0-9]+)$')
+
+# Text which Excel turns into a number when it's written to a cell
+re_number = re.compile(r'^\s*[-+]?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?\s*$')
+
+# The same few thousand addresses come up over and over, so the parse / format
+# results are kept. Cleared if they ever get too big.
+_CACHE_LIMIT = 250000
+_parsed = {}
+_formatted = {}
+
+
+def col_to_index(_col_letters):
+    """Converts Excel column letters into a 1-based column number. ie: 'A' -> 1, 'AB' -> 28"""
+
+    num = 0
+    for char in _col_letters.upper():
+        num = num * 26 + (ord(char) - 64)
+    return num
+
+
+def index_to_col(_col_num):
+    """Converts a 1-based column number into Excel column letters. ie: 28 -> 'AB'"""
+
+    letters = ''
+    while _col_num > 0:
+        _col_num, remainder = divmod(_col_num - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+def parse_address(_address):
+    """Splits a single-cell address such as 'AC41' or '$AC$41' into (row, col)
+
+    Args:
+        _address (str): The Excel cell address
+    Returns:
+        (tuple | None): (row, column) as 1-based integers, or None if the address
+            is not a single cell (named ranges, multi-cell ranges, etc..)
+    """
+
+    try:
+        return _parsed[_address]
+    except (KeyError, TypeError):
+        pass
+
+    match = _re_cell.match(str(_address).strip())
+    row_col = (int(match.group(2)), col_to_index(match.group(1))) if match else None
+
+    if len(_parsed) > _CACHE_LIMIT:
+        _parsed.clear()
+    try:
+        _parsed[_address] = row_col
+    except TypeError:
+        pass
+    return row_col
+
+
+def format_address(_row, _col):
+    """Returns the 'A1' style address for the 1-based row and column numbers"""
+
+    try:
+        return _formatted[(_row, _col)]
+    except KeyError:
+        pass
+
+    if len(_formatted) > _CACHE_LIMIT:
+        _formatted.clear()
+    address = _formatted[(_row, _col)] = '{}{}'.format(index_to_col(_col), _row)
+    return address
+
+
+def format_range(_row, _col, _n_rows=1, _n_cols=1):
+    """Returns the 'A1:B2' style address for a rectangle of cells"""
+
+    top_left = format_address(_row, _col)
+    if _n_rows == 1 and _n_cols == 1:
+        return top_left
+
+    return '{}:{}'.format(top_left, format_address(_row + _n_rows - 1, _col + _n_cols - 1))
+
+
+def is_2d(_value):
+    """True if the value is a list of rows (ie: for a Range.Value2 of more than one cell) """
+
+    return isinstance(_value, (list, tuple)) and len(_value) > 0 and isinstance(_value[0], (list, tuple))
+
+
+def spread(_cells, _sheet, _address, _value):
+    """Adds a value to the {sheet: {(row, col): value}} dict, like Range.Value2 = ...
+
+    A range ('A1:B2') gets the value in every cell, or a list of rows spread
+    over it. A single cell given a list of rows gets the first value.
+
+    Args:
+        _cells (dict): The {sheet: {(row, col): value}} to add to
+        _sheet (str): The worksheet name
+        _address (str): The 'A1' or 'A1:B2' style address
+        _value: The value, or a list of rows
+    Raises:
+        ValueError: If the address is not a cell or a range of cells
+    """
+
+    corners = [parse_address(a) for a in unicode(_address).split(':')]
+    if len(corners) > 2 or None in corners:
+        raise ValueError('Only cell addresses like "A1" or "A1:B2" can be set, not "{}"!{}'.format(
+            _sheet, _address))
+
+    (r1, c1), (r2, c2) = corners[0], corners[-1]
+    rows_of_values = is_2d(_value)
+    sheet_cells = _cells.setdefault(_sheet, {})
+    for i, row in enumerate(range(min(r1, r2), max(r1, r2) + 1)):
+        for j, col in enumerate(range(min(c1, c2), max(c1, c2) + 1)):
+            sheet_cells[(row, col)] = _value[i][j] if rows_of_values else _value
+
+
+class Block(object):
+    """A rectangle of cell values on a single worksheet, written as one 2D array"""
+
+    __slots__ = ('sheet', 'row', 'col', 'values')
+
+    def __init__(self, _sheet, _row, _col, _values):
+        """
+        Args:
+            _sheet (str): The worksheet name
+            _row (int): The 1-based row of the top-left cell
+            _col (int): The 1-based column of the top-left cell
+            _values (list[list]): The values, as a list of rows
+        """
+        self.sheet = _sheet
+        self.row = _row
+        self.col = _col
+        self.values = _values
+
+    @property
+    def n_rows(self):
+        return len(self.values)
+
+    @property
+    def n_cols(self):
+        return len(self.values[0]) if self.values else 0
+
+    @property
+    def cell_count(self):
+        return self.n_rows * self.n_cols
+
+    @property
+    def address(self):
+        return format_range(self.row, self.col, self.n_rows, self.n_cols)
+
+    def __unicode__(self):
+        return u"Block | Worksheet: {}  |  Range: {}  |  Cells: {}".format(
+            self.sheet, self.address, self.cell_count)
+    def __str__(self):
+        return unicode(self).encode('utf-8')
+    def __repr__(self):
+        return "{}(_sheet={!r}, _row={!r}, _col={!r}, _values={!r})".format(
+               self.__class__.__name__,
+               self.sheet,
+               self.row,
+               self.col,
+               self.values)
+
+
+def _row_runs(_row_cells):
+    """Splits a dict of {col: value} for a single row into runs of adjacent columns
+
+    Returns:
+        (list): [(first_col, last_col, [values...]), ...] ordered by column
+    """
+
+    runs = []
+    for col in sorted(_row_cells.keys()):
+        if runs and runs[-1][1] == col - 1:
+            first, _, vals = runs[-1]
+            vals.append(_row_cells[col])
+            runs[-1] = (first, col, vals)
+        else:
+            runs.append((col, col, [_row_cells[col]]))
+    return runs
+
+
+def coalesce(_data):
+    """Groups single-cell writes into rectangular Blocks
+
+    Adjacent columns in a row are joined into a run, and runs which span the
+    same columns on consecutive rows are stacked into one rectangle. Only cells
+    that are actually being written end up inside a Block, so nothing else in
+    the worksheet is touched. If the same cell is written more than once, the
+    last value wins (same as writing the cells one at a time, in order).
+
+    Args:
+        _data (iterable): Tuples of (worksheet_name, cell_address, value)
+    Returns:
+        (tuple):
+            blocks (list[Block]): The Blocks, ordered by sheet, row, column
+            leftovers (list[tuple]): Any items with an address that is not a
+                single cell (named or multi-cell ranges) which must be written
+                on their own. These may overlap the cells in the Blocks, so to
+                write them all use coalesce_in_order() instead.
+    """
+
+    sheets = OrderedDict()
+    leftovers = []
+
+    for sheet, address, value in _data:
+        row_col = parse_address(address)
+        if row_col is None:
+            leftovers.append((sheet, address, value))
+            continue
+
+        row, col = row_col
+        sheets.setdefault(sheet, {}).setdefault(row, {})[col] = value
+
+    blocks = []
+    for sheet, rows in sheets.items():
+        open_blocks = {}  # {(first_col, last_col): Block} for the previous row only
+        sheet_blocks = []
+
+        for row in sorted(rows.keys()):
+            still_open = {}
+            for first_col, last_col, vals in _row_runs(rows[row]):
+                key = (first_col, last_col)
+                block = open_blocks.get(key)
+
+                if block and block.row + block.n_rows == row:
+                    block.values.append(vals)
+                else:
+                    block = Block(sheet, row, first_col, [vals])
+                    sheet_blocks.append(block)
+                still_open[key] = block
+            open_blocks = still_open
+
+        sheet_blocks.sort(key=lambda b: (b.row, b.col))
+        blocks.extend(sheet_blocks)
+
+    return blocks, leftovers
+
+
+def coalesce_in_order(_data):
+    """Groups single-cell writes into Blocks, keeping them in order with the other writes
+
+    A named or multi-cell range may overlap the single cells written before or
+    after it. So the single cells are only grouped up to each such range, then
+    the range comes, and so on. Writing the returned items in order gives the
+    same cell contents as writing the items one at a time, in order.
+
+    Args:
+        _data (iterable): Tuples of (worksheet_name, cell_address, value)
+    Returns:
+        (list): The Blocks and the (worksheet_name, address, value) items for the
+            named or multi-cell ranges, in the order to write them.
+    """
+
+    ordered = []
+    pending = []
+    for sheet, address, value in _data:
+        if parse_address(address) is not None:
+            pending.append((sheet, address, value))
+            continue
+
+        # A name can point to any worksheet, so all the cells before it go first
+        ordered.extend(coalesce(pending)[0])
+        ordered.append((sheet, address, value))
+        pending = []
+
+    ordered.extend(coalesce(pending)[0])
+    return ordered
+
+
+MAX_ADDRESS_LENGTH = 255
+
+
+def join_addresses(_addresses, _max_length=MAX_ADDRESS_LENGTH):
+    """Joins range addresses into multi-area addresses ('A1:B2,D4,F6:F9') for a
+    single Range call. Excel won't take an address longer than 255 characters,
+    so longer lists are split over several strings.
+
+    Args:
+        _addresses (iterable): The 'A1' or 'A1:B2' style addresses
+        _max_length (int): The longest string to make
+    Returns:
+        (list[str]): The joined addresses
+    """
+
+    joined = []
+    current = ''
+    for address in _addresses:
+        if current and len(current) + 1 + len(address) > _max_length:
+            joined.append(current)
+            current = ''
+        current = '{},{}'.format(current, address) if current else address
+    if current:
+        joined.append(current)
+    return joined
+
+
+# Cell references inside a formula. Quoted strings and quoted sheet names are
+# matched (and skipped) first so that text inside them is never shifted.
+_re_formula_token = re.compile(
+    r'"(?:[^"]|"")*"'                                       # "string literal"
+    r"|'(?:[^']|'')*'!"                                     # 'Quoted Sheet'!
+    r'|(?<![A-Za-z0-9_.])(\$?)([A-Za-z]{1,3})(\$?)([0-9]+)(?![A-Za-z0-9_(!])'
+)
+
+
+def shift_formula(_formula, _d_rows, _d_cols):
+    """Moves the relative cell references in a formula, like copy/paste does in Excel.
+
+    This is what is needed to expand the 'shared' formulas in an .xlsx file,
+    where only the first cell of the group stores the formula text. Absolute
+    references ($A$1) are left as is.
+
+    Args:
+        _formula (str): The formula text (with or without the leading '=')
+        _d_rows (int): The number of rows to move the references by
+        _d_cols (int): The number of columns to move the references by
+    Returns:
+        (str): The new formula text
+    """
+
+    if not _d_rows and not _d_cols:
+        return _formula
+
+    def _shift(match):
+        if match.group(2) is None:
+            return match.group(0)
+
+        abs_col, col, abs_row, row = match.groups()
+        new_col = col_to_index(col) if abs_col else col_to_index(col) + _d_cols
+        new_row = int(row) if abs_row else int(row) + _d_rows
+        if new_col < 1 or new_row < 1:
+            return '#REF!'
+
+        return '{}{}{}{}'.format(abs_col, index_to_col(new_col), abs_row, new_row)
+
+    return _re_formula_token.sub(_shift, _formula)
@@ -0,0 +1,214 @@
+"""Reads a list of (worksheet, cell) fields from a PHPP workbook in as few calls as possible
+
+The fields are grouped by worksheet and each group is read as one rectangle
+(one Range.Value2 call), then the values are picked out of it in Python.
+Groups which would make a very large rectangle are split into row-bands.
+
+The reader only needs an 'excel' object with a 'sheets_dict' of worksheets
+and a 'read_range()' method (see xl_connect.ExcelInstance).
+
+Note: This module has no Rhino / Grasshopper / COM dependencies so that it can
+be used (and tested) outside of Rhino.
+"""
+
+from collections import OrderedDict
+
+import LBT2PH.xl_ranges
+
+try:
+    unicode
+except NameError:
+    unicode = str
+
+MAX_BOX_CELLS = 2500
+
+# The results read when no fields are given: [label, worksheet, cell]
+DEFAULT_FIELDS = [
+    ["TFA", "Verification", "I34"],
+    ["Heating Demand", "Verification", "I35"],
+    ["Heating Load", "Verification", "I36"],
+    ["Cooling + Dehum Demand", "Verification", "I38"],
+    ["Cooling Load", "Verification", "I39"],
+    ["Frequency of Overheating", "Verification", "I40"],
+    ["Frequency of excessively high humidity", "Verification", "I41"],
+    ["Pressurization test result", "Verification", "I43"],
+    ["Non-Renewable PE", "Verification", "I53"],
+    ["PER Demand", "Verification", "I55"],
+    ["PER", "Verification", "I56"],
+    ["Heating Total", "Heating", "O27"],
+    ["Cooling Total", "Cooling", "O28"],
+    ]
+
+
+class ReadBox(object):
+    """A rectangle of cells on one worksheet to read in one go, and the fields inside it """
+
+    __slots__ = ('sheet', 'row', 'col', 'last_row', 'last_col', 'fields')
+
+    def __init__(self, _sheet, _row, _col):
+        self.sheet = _sheet
+        self.row = self.last_row = _row
+        self.col = self.last_col = _col
+        self.fields = []  # [(index, row, col), ...]
+
+    @property
+    def address(self):
+        return LBT2PH.xl_ranges.format_range(self.row, self.col,
+            self.last_row - self.row + 1, self.last_col - self.col + 1)
+
+    @property
+    def cell_count(self):
+        return (self.last_row - self.row + 1) * (self.last_col - self.col + 1)
+
+    def grown_size(self, _row, _col):
+        """The number of cells in the box if the cell were added to it """
+
+        return ((max(self.last_row, _row) - min(self.row, _row) + 1) *
+                (max(self.last_col, _col) - min(self.col, _col) + 1))
+
+    def add(self, _index, _row, _col):
+        self.row, self.last_row = min(self.row, _row), max(self.last_row, _row)
+        self.col, self.last_col = min(self.col, _col), max(self.last_col, _col)
+        self.fields.append((_index, _row, _col))
+
+    def __unicode__(self):
+        return u"Read Box | Worksheet: {}  |  Range: {}  |  Fields: {}".format(
+            self.sheet, self.address, len(self.fields))
+    def __str__(self):
+        return unicode(self).encode('utf-8')
+    def __repr__(self):
+        return "{}(_sheet={!r}, _row={!r}, _col={!r})".format(
+               self.__class__.__name__,
+               self.sheet,
+               self.row,
+               self.col)
+
+
+def plan_reads(_fields, _max_box_cells=MAX_BOX_CELLS):
+    """Groups the fields into rectangles to read
+
+    Args:
+        _fields (list): [(worksheet_name, cell_address), ...]
+        _max_box_cells (int): The largest rectangle to read in one call
+    Returns:
+        (tuple):
+            boxes (list[ReadBox]): The rectangles, by sheet and row
+            leftovers (list): [(index, worksheet_name, address), ...] for any
+                fields which are not a single cell (named or multi-cell ranges)
+    """
+
+    by_sheet = OrderedDict()
+    leftovers = []
+    for i, (sheet, address) in enumerate(_fields):
+        row_col = LBT2PH.xl_ranges.parse_address(address)
+        if row_col is None:
+            leftovers.append((i, sheet, address))
+        else:
+            by_sheet.setdefault(sheet, []).append((row_col[0], row_col[1], i))
+
+    boxes = []
+    for sheet, cells in by_sheet.items():
+        box = None
+        for row, col, i in sorted(cells):
+            if box is None or box.grown_size(row, col) > _max_box_cells:
+                box = ReadBox(sheet, row, col)
+                boxes.append(box)
+            box.add(i, row, col)
+
+    return boxes, leftovers
+
+
+class BlockCache(object):
+    """Keeps the rectangles read from a workbook until the workbook recalculates
+
+    The 'generation' is the Excel instance plus its calculation counter (see
+    ExcelInstance.calc_generation). When it changes, everything is dropped.
+
+    Excel doesn't tell us about the user's own edits (its events are turned off,
+    see ExcelInstance.start_new_instance), so the cache must also be clear()ed
+    whenever the user may have edited the workbook: the Read component only
+    keeps it for one Grasshopper solution.
+    """
+
+    def __init__(self):
+        self.generation = None
+        self.blocks = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, _sheet, _address, _generation):
+        if _generation != self.generation:
+            self.blocks = {}
+            self.generation = _generation
+
+        rows = self.blocks.get((_sheet, _address))
+        if rows is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return rows
+
+    def put(self, _sheet, _address, _rows):
+        self.blocks[(_sheet, _address)] = _rows
+
+    def clear(self):
+        self.generation = None
+        self.blocks = {}
+
+    def __unicode__(self):
+        return u"Read Cache | Generation: {}  |  Blocks: {}  |  Hits: {}  Misses: {}".format(
+            self.generation, len(self.blocks), self.hits, self.misses)
+    def __str__(self):
+        return unicode(self).encode('utf-8')
+    def __repr__(self):
+        return "{}()".format(self.__class__.__name__)
+    def ToString(self):
+        return str(self)
+
+
+def _read_box(_excel, _box, _cache):
+    generation = (id(_excel), getattr(_excel, 'calc_generation', None))
+    if _cache is not None:
+        rows = _cache.get(_box.sheet, _box.address, generation)
+        if rows is not None:
+            return rows
+
+    rows = _excel.read_range(_box.sheet, _box.address)
+    if _cache is not None:
+        _cache.put(_box.sheet, _box.address, rows)
+    return rows
+
+
+def read_fields(_excel, _fields, _cache=None):
+    """Reads the Value2 of each field
+
+    Args:
+        _excel (ExcelInstance): The open Excel Instance
+        _fields (list): [(worksheet_name, cell_address), ...]. The worksheets
+            must all be in the _excel.sheets_dict
+        _cache (BlockCache): Optional cache to keep the blocks in between reads
+    Returns:
+        (list): The values, in the same order as the _fields
+    """
+
+    values = [None] * len(_fields)
+    boxes, leftovers = plan_reads(_fields)
+
+    for box in boxes:
+        try:
+            rows = _read_box(_excel, box, _cache)
+        except Exception as e:
+            print('Block read of {}!{} failed, reading cell-by-cell: {}'.format(
+                box.sheet, box.address, e))
+            sheet = _excel.sheets_dict[box.sheet]
+            for i, row, col in box.fields:
+                values[i] = sheet.Range[LBT2PH.xl_ranges.format_address(row, col)].Value2
+            continue
+
+        for i, row, col in box.fields:
+            values[i] = rows[row - box.row][col - box.col]
+
+    for i, sheet, address in leftovers:
+        values[i] = _excel.sheets_dict[sheet].Range[address].Value2
+
+    return values
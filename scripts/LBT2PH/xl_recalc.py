@@ -0,0 +1,254 @@
+"""Recalculates only the worksheets which depend on the ones written to
+
+The PHPP's worksheets reference each other in formulas. The dependency map
+(which sheets each sheet's formulas read from) is worked out once by scanning
+the formulas in the .xlsx file. After a write, only the written sheets and the
+sheets which depend on them (directly or through other sheets) are
+recalculated with Worksheet.Calculate(), precedents first.
+
+If the order can't be worked out (the sheets reference each other in a loop,
+or use INDIRECT() and such, which could point anywhere) the whole workbook is
+calculated instead.
+
+The recalculation can also be put off until something is read from the
+workbook: the written sheets are kept as 'dirty' on the Excel instance until
+ensure_calculated() is called.
+
+Note: This module has no Rhino / Grasshopper / COM dependencies so that it can
+be used (and tested) outside of Rhino.
+"""
+
+import re
+from xml.sax.saxutils import unescape
+
+import LBT2PH.xl_headless
+import LBT2PH.xl_template
+
+try:
+    unicode
+except NameError:
+    unicode = str
+
+FULL = 'full'
+TARGETED = 'targeted'
+DEFERRED = 'deferred'
+MODES = (FULL, TARGETED, DEFERRED)
+
+XL_CALCULATION_MANUAL = -4135
+XL_CALCULATION_AUTOMATIC = -4105
+
+_xml_entities = {'&apos;': "'", '&quot;': '"'}
+_re_formula = re.compile(r'<f\b[^>]*>(.*?)</f>', re.S)
+_re_defined_name = re.compile(r'<definedName\b[^>]*\bname="([^"]*)"[^>]*>(.*?)</definedName>', re.S)
+_re_reference = re.compile(
+    r'"(?:[^"]|"")*"'                                    # "string literal", skipped
+    r"|'((?:[^']|'')*)'!"                                # 'Quoted Sheet'!
+    r'|(?<![\w.\]])([A-Za-z_][\w.]*)!'                   # Sheet!
+    r'|(?<![\w.!])([A-Za-z_\\][\w.]*)(?![\w.!(])'        # a defined name (or anything else)
+)
+_re_unknown_target = re.compile(r'\b(INDIRECT|OFFSET)\s*\(|\[\d+\]', re.I)
+
+
+def _references(_formula, _names):
+    """Returns (sheet names the formula reads from, True if it might read from anywhere) """
+
+    sheets = set()
+    for match in _re_reference.finditer(_formula):
+        quoted, plain, name = match.groups()
+        if quoted is not None:
+            sheets.add(quoted.replace("''", "'"))
+        elif plain is not None:
+            sheets.add(plain)
+        elif name is not None and name.upper() in _names:
+            sheets.update(_names[name.upper()])
+
+    return sheets, bool(_re_unknown_target.search(_formula))
+
+
+class DependencyMap(object):
+    """{worksheet: set of the worksheets its formulas read from} """
+
+    def __init__(self, _source=None):
+        self.source = _source
+        self.precedents = {}
+        self.uncertain = set()  # Sheets with formulas that might read from anywhere
+
+    @classmethod
+    def from_xlsx(cls, _path):
+        """Scans all the formulas in the .xlsx file """
+
+        dep_map = cls(_path)
+        with LBT2PH.xl_headless.XlsxPackage(LBT2PH.xl_template.open_file(_path)) as package:
+            names = {}
+            for name, text in _re_defined_name.findall(package.read_part('xl/workbook.xml')):
+                sheets, _ = _references(unescape(text, _xml_entities), {})
+                names[unescape(name, _xml_entities).upper()] = sheets
+
+            for sheet in package.sheet_names:
+                dep_map.precedents[sheet] = set()
+                for text in _re_formula.findall(package.sheet_xml(sheet)):
+                    dep_map.add_formula(sheet, unescape(text, _xml_entities), names)
+
+        return dep_map
+
+    def copy(self):
+        dep_map = self.__class__(self.source)
+        dep_map.precedents = dict((k, set(v)) for k, v in self.precedents.items())
+        dep_map.uncertain = set(self.uncertain)
+        return dep_map
+
+    def add_formula(self, _sheet, _formula, _names=None):
+        """Adds the references of a formula on the sheet (ie: one LBT2PH is writing) """
+
+        sheets, uncertain = _references(_formula, _names or {})
+        sheets.discard(_sheet)
+        self.precedents.setdefault(_sheet, set()).update(sheets)
+        if uncertain:
+            self.uncertain.add(_sheet)
+
+    def dependents(self, _sheets):
+        """All the sheets which read from the given sheets, directly or through other sheets """
+
+        readers = {}
+        for sheet, precedents in self.precedents.items():
+            for precedent in precedents:
+                readers.setdefault(precedent, set()).add(sheet)
+
+        found = set(_sheets)
+        todo = list(found)
+        while todo:
+            for reader in readers.get(todo.pop(), ()):
+                if reader not in found:
+                    found.add(reader)
+                    todo.append(reader)
+        return found
+
+    def calculation_order(self, _sheets):
+        """The sheets to recalculate after writing to _sheets, precedents first
+
+        Returns:
+            (list): The sheet names in order, or None if the whole workbook
+                should be calculated instead.
+        """
+
+        affected = self.dependents(_sheets)
+        if affected & self.uncertain or any(sheet not in self.precedents for sheet in _sheets):
+            return None
+
+        order = []
+        state = {}  # sheet: 1 = visiting, 2 = done
+
+        def _visit(sheet):
+            state[sheet] = 1
+            for precedent in sorted(self.precedents.get(sheet, ())):
+                if precedent not in affected:
+                    continue
+                if state.get(precedent) == 1:
+                    raise ValueError(precedent)
+                if precedent not in state:
+                    _visit(precedent)
+            state[sheet] = 2
+            order.append(sheet)
+
+        try:
+            for sheet in sorted(affected):
+                if sheet not in state:
+                    _visit(sheet)
+        except ValueError:
+            return None  # The sheets reference each other in a loop
+
+        return order
+
+    def __unicode__(self):
+        return u"Dependency Map | {}  |  Worksheets: {}  |  Links: {}  |  Uncertain: {}".format(
+            self.source, len(self.precedents), sum(len(v) for v in self.precedents.values()),
+            len(self.uncertain))
+    def __str__(self):
+        return unicode(self).encode('utf-8')
+    def __repr__(self):
+        return "{}(_source={!r})".format(self.__class__.__name__, self.source)
+    def ToString(self):
+        return str(self)
+
+
+class RecalcState(object):
+    """The sheets written to but not recalculated yet, for one Excel instance """
+
+    def __init__(self):
+        self.dirty = set()
+        self.dep_map = None
+        self.last_calculated = []
+        self.full_calcs = 0
+        self.sheet_calcs = 0
+
+    def mark_written(self, _cells):
+        """Records the (worksheet, range, value) items written. Formulas are added to the map """
+
+        for sheet, _, value in _cells:
+            self.dirty.add(sheet)
+            if self.dep_map is not None and isinstance(value, (str, unicode)) and value.startswith('='):
+                self.dep_map.add_formula(sheet, value)
+
+    def calculate(self, _excel, _full=False):
+        """Recalculates the dirty sheets and their dependents, or everything if needed
+
+        Args:
+            _excel (ExcelInstance): The open Excel Instance
+            _full (bool): Set True to calculate the whole workbook, dirty or not
+        Returns:
+            (list): The sheets calculated, or None if the whole workbook was calculated
+        """
+
+        if not self.dirty and not _full:
+            return []
+
+        order = None
+        if not _full and self.dep_map is not None:
+            order = self.dep_map.calculation_order(self.dirty)
+
+        if order is None:
+            _excel.calculate()
+            self.full_calcs += 1
+        else:
+            for sheet in order:
+                _excel.sheets_dict[sheet].Calculate()
+            self.sheet_calcs += len(order)
+            _excel.calc_generation += 1
+
+        self.dirty = set()
+        self.last_calculated = order
+        return order
+
+    def __unicode__(self):
+        if self.last_calculated is None:
+            last = 'whole workbook'
+        else:
+            last = ', '.join(self.last_calculated) or '-'
+        return u"Recalc | Waiting: {}  |  Last calculated: {}  |  Full: {}  Sheets: {}".format(
+            ', '.join(sorted(self.dirty)) or '-', last, self.full_calcs, self.sheet_calcs)
+    def __str__(self):
+        return unicode(self).encode('utf-8')
+    def __repr__(self):
+        return "{}()".format(self.__class__.__name__)
+    def ToString(self):
+        return str(self)
+
+
+def get_state(_excel):
+    """Returns the RecalcState for the Excel instance, making one the first time """
+
+    state = getattr(_excel, 'recalc_state', None)
+    if state is None:
+        state = RecalcState()
+        _excel.recalc_state = state
+    return state
+
+
+def ensure_calculated(_excel):
+    """Recalculates anything left dirty by a deferred write. Call before reading results
+
+    Returns:
+        (list): The sheets calculated (see RecalcState.calculate)
+    """
+
+    return get_state(_excel).calculate(_excel)
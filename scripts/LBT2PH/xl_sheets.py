@@ -0,0 +1,74 @@
+"""The worksheets of a workbook, fetched and unprotected as they are used
+
+Used by xl_connect.ExcelInstance over the Excel COM workbook, and by
+xl_sim.SimExcelInstance over its simulated one, so both make the same calls.
+
+Note: This module has no Rhino / Grasshopper / COM dependencies so that it can
+be used (and tested) outside of Rhino.
+"""
+
+
+class LazySheets(object):
+    """The workbook's worksheets by name, like a dict. Each sheet is only fetched
+    and unprotected the first time it is used, so runs which only touch a few
+    sheets don't pay for all 40+ of them.
+    """
+
+    def __init__(self, _workbook):
+        self._workbook = _workbook
+        self._handles = None    # {name: COM Worksheet}, listed once
+        self._ready = {}        # {name: COM Worksheet}, unprotected
+
+    def _list(self):
+        if self._handles is None:
+            self._handles = dict((sheet.Name, sheet) for sheet in self._workbook.Worksheets)
+        return self._handles
+
+    def __getitem__(self, _name):
+        try:
+            return self._ready[_name]
+        except KeyError:
+            pass
+
+        sheet = self._list()[_name]
+        sheet.Unprotect()
+        self._ready[_name] = sheet
+        return sheet
+
+    def get(self, _name, _default=None):
+        try:
+            return self[_name]
+        except KeyError:
+            return _default
+
+    def __contains__(self, _name):
+        return _name in self._list()
+
+    def __iter__(self):
+        return iter(self._list())
+
+    def __len__(self):
+        return len(self._list())
+
+    def keys(self):
+        return list(self._list().keys())
+
+    def values(self):
+        return [self[name] for name in self.keys()]
+
+    def items(self):
+        return [(name, self[name]) for name in self.keys()]
+
+    def preload(self, _names):
+        """Gets the sheets ready ahead of time. Returns the names which aren't in the workbook """
+
+        missing = []
+        for name in _names:
+            if self.get(name) is None:
+                missing.append(name)
+        return missing
+
+    def handles(self):
+        """All the COM worksheet objects fetched so far """
+
+        return list((self._handles or {}).values())
@@ -0,0 +1,453 @@
+"""An in-memory stand-in for Excel, for benchmarking and testing the writers without Windows
+
+SimExcelInstance has the same interface as xl_connect.ExcelInstance, and
+behind it a small copy of the Excel object model: the Application, Workbooks,
+Workbook, Worksheets, Worksheet, Range (with Value2 as a single value or as
+rows of values, and multi-area addresses like 'A1:B2,D4') and Interior.
+Cell values and colors are kept in memory. Like Excel, writing to a protected
+worksheet raises an error until it is unprotected. Like ExcelInstance, the
+sheets_dict unprotects each sheet the first time it is used (see xl_sheets).
+
+Each call is charged a cost from a LatencyModel: a fixed cost per call, plus a
+cost per cell for Range calls, plus optional costs for slow calls like
+Calculate or Unprotect. The cost is added to a simulated clock (the default,
+so tests stay fast) or actually slept, to see the effect in real time. The
+clock and the call counts then show how the writer strategies compare:
+
+    sim = SimExcelInstance(LatencyModel.excel_like(), ['Areas', 'Windows'])
+    LBT2PH.xl_write.write_blocks(sim, data)
+    print(sim.clock, sim.calls)
+
+Note: This module has no Rhino / Grasshopper / COM dependencies so that it can
+be used (and tested) outside of Rhino.
+"""
+
+from collections import OrderedDict
+import os
+import time
+
+import LBT2PH.xl_headless
+import LBT2PH.xl_ranges
+import LBT2PH.xl_sheets
+
+try:
+    unicode
+except NameError:
+    unicode = str
+
+XL_CALCULATION_AUTOMATIC = -4105
+
+
+class SimError(Exception):
+    """What Excel would raise as a COMException (ie: writing to a protected sheet) """
+
+
+class LatencyModel(object):
+    """How long each call to the simulated Excel takes, in seconds """
+
+    def __init__(self, _call=0.0, _per_cell=0.0, _operations=None, _sleep=False):
+        """
+        Args:
+            _call (float): The cost of every call
+            _per_cell (float): The extra cost for each cell a Range call reads or writes
+            _operations (dict): Optional extra cost of particular calls, by name
+                (ie: {'Calculate': 0.5, 'Unprotect': 0.002})
+            _sleep (bool): Set True to really wait for the time. Otherwise it is only
+                added to the SimExcelInstance's clock.
+        """
+        self.call = _call
+        self.per_cell = _per_cell
+        self.operations = dict(_operations or {})
+        self.sleep = _sleep
+
+    @classmethod
+    def excel_like(cls, _sleep=False):
+        """Roughly what calls to Excel through COM cost on a desktop PC with a full PHPP open """
+
+        return cls(0.0002, 0.000002, {'Open': 3.0, 'Save': 1.5, 'Calculate': 0.05,
+                                      'Unprotect': 0.002, 'ColorIndex': 0.0005}, _sleep)
+
+    def cost(self, _operation, _cells=0):
+        return self.call + self.per_cell * _cells + self.operations.get(_operation, 0.0)
+
+    def __unicode__(self):
+        return u"Latency Model | Per call: {} s  |  Per cell: {} s  |  Operations: {}".format(
+            self.call, self.per_cell, self.operations)
+    def __str__(self):
+        return unicode(self).encode('utf-8')
+    def __repr__(self):
+        return "{}(_call={!r}, _per_cell={!r}, _operations={!r}, _sleep={!r})".format(
+            self.__class__.__name__, self.call, self.per_cell, self.operations, self.sleep)
+    def ToString(self):
+        return str(self)
+
+
+def _parse_area(_address):
+    """Returns (first row, first col, last row, last col) for 'A1' or 'A1:C4' """
+
+    corners = [LBT2PH.xl_ranges.parse_address(a.strip()) for a in unicode(_address).split(':')]
+    if not 1 <= len(corners) <= 2 or None in corners:
+        raise SimError('Cannot find the range "{}"'.format(_address))
+    (r1, c1), (r2, c2) = corners[0], corners[-1]
+    return min(r1, r2), min(c1, c2), max(r1, r2), max(c1, c2)
+
+
+def _as_value2(_value):
+    """Numbers come back from Value2 as floats """
+
+    if isinstance(_value, bool) or not isinstance(_value, (int, float)):
+        return _value
+    return float(_value)
+
+
+class SimInterior(object):
+    def __init__(self, _range):
+        self._range = _range
+
+    @property
+    def ColorIndex(self):
+        rng = self._range
+        rng._charge('ColorIndex', 1)
+        area = rng.areas[0]
+        return rng.sheet.colors.get((area[0], area[1]))
+
+    @ColorIndex.setter
+    def ColorIndex(self, _value):
+        rng = self._range
+        rng._charge('ColorIndex=', rng.cell_count)
+        for row, col in rng.cells():
+            rng.sheet.colors[(row, col)] = _value
+
+
+class SimRange(object):
+    def __init__(self, _sheet, _address):
+        self.sheet = _sheet
+        self.address = _address
+        self.areas = [_parse_area(area) for area in unicode(_address).split(',')]
+
+    @property
+    def cell_count(self):
+        return sum((r2 - r1 + 1) * (c2 - c1 + 1) for r1, c1, r2, c2 in self.areas)
+
+    def cells(self):
+        for r1, c1, r2, c2 in self.areas:
+            for row in range(r1, r2 + 1):
+                for col in range(c1, c2 + 1):
+                    yield row, col
+
+    def _charge(self, _operation, _cells):
+        self.sheet.workbook.app.charge(_operation, _cells)
+
+    @property
+    def Value2(self):
+        """A single value for one cell, or rows of values (of the first area, like Excel) """
+
+        r1, c1, r2, c2 = self.areas[0]
+        self._charge('Value2', (r2 - r1 + 1) * (c2 - c1 + 1))
+        values = self.sheet.values
+        if r1 == r2 and c1 == c2:
+            return values.get((r1, c1))
+        return tuple(tuple(values.get((row, col)) for col in range(c1, c2 + 1))
+                     for row in range(r1, r2 + 1))
+
+    @Value2.setter
+    def Value2(self, _value):
+        """A single value sets every cell. Rows of values fill the range from the top left,
+        with '#N/A' in any cells the rows don't reach (like Excel) """
+
+        self._charge('Value2=', self.cell_count)
+        if self.sheet.protected:
+            raise SimError('The cell or chart you are trying to change is on a protected sheet. ({}!{})'.format(
+                self.sheet.Name, self.address))
+
+        values = self.sheet.values
+        for r1, c1, r2, c2 in self.areas:
+            for row in range(r1, r2 + 1):
+                for col in range(c1, c2 + 1):
+                    if LBT2PH.xl_ranges.is_2d(_value):
+                        i, j = row - r1, col - c1
+                        value = _value[i][j] if i < len(_value) and j < len(_value[i]) else '#N/A'
+                    else:
+                        value = _value
+                    values[(row, col)] = _as_value2(value)
+        self.sheet.workbook.app.changed()
+
+    @property
+    def Interior(self):
+        return SimInterior(self)
+
+
+class _SimRangeIndexer(object):
+    def __init__(self, _sheet):
+        self._sheet = _sheet
+
+    def __getitem__(self, _address):
+        self._sheet.workbook.app.charge('Range')
+        return SimRange(self._sheet, _address)
+
+
+class SimWorksheet(object):
+    def __init__(self, _workbook, _name, _values=None, _protected=True):
+        self.workbook = _workbook
+        self.Name = _name
+        self.values = _values if _values is not None else {}  # {(row, col): value}
+        self.colors = {}  # {(row, col): ColorIndex}
+        self.protected = _protected
+        self.calculated = 0
+        self.Range = _SimRangeIndexer(self)
+
+    def Unprotect(self, *args):
+        self.workbook.app.charge('Unprotect')
+        self.protected = False
+
+    def Protect(self, *args):
+        self.workbook.app.charge('Protect')
+        self.protected = True
+
+    def Calculate(self):
+        self.workbook.app.charge('Calculate')
+        self.calculated += 1
+
+
+class SimWorksheets(object):
+    def __init__(self, _workbook):
+        self._workbook = _workbook
+        self._sheets = OrderedDict()
+
+    def add(self, _sheet):
+        self._sheets[_sheet.Name] = _sheet
+
+    def __getitem__(self, _name):
+        self._workbook.app.charge('Item')
+        return self._sheets[_name]
+
+    def __iter__(self):
+        self._workbook.app.charge('Worksheets')
+        return iter(list(self._sheets.values()))
+
+    @property
+    def Count(self):
+        self._workbook.app.charge('Count')
+        return len(self._sheets)
+
+
+class SimWorkbook(object):
+    def __init__(self, _app, _filename):
+        self.app = _app
+        self.FullName = _filename
+        self.Worksheets = SimWorksheets(self)
+        self.saved = 0
+        self.closed = False
+
+    def Save(self):
+        self.app.charge('Save')
+        self.saved += 1
+
+    def Close(self, *args):
+        self.app.charge('Close')
+        self.closed = True
+        self.app.Workbooks.remove(self)
+
+
+class SimWorkbooks(object):
+    def __init__(self, _app):
+        self._app = _app
+        self._books = []
+
+    def Open(self, _filename):
+        self._app.charge('Open')
+        workbook = self._app.make_workbook(_filename)
+        self._books.append(workbook)
+        return workbook
+
+    def remove(self, _workbook):
+        if _workbook in self._books:
+            self._books.remove(_workbook)
+
+    def __iter__(self):
+        self._app.charge('Workbooks')
+        return iter(list(self._books))
+
+    @property
+    def Count(self):
+        self._app.charge('Count')
+        return len(self._books)
+
+
+class SimApplication(object):
+    """The Excel application. Also keeps the clock and the call counts for everything under it """
+
+    _SETTINGS = ('Calculation', 'ScreenUpdating', 'DisplayAlerts', 'EnableEvents', 'Visible')
+
+    def __init__(self, _latency=None, _sheet_names=None, _protected=True):
+        object.__setattr__(self, 'latency', _latency or LatencyModel())
+        object.__setattr__(self, 'sheet_names', list(_sheet_names or []))
+        object.__setattr__(self, 'protected', _protected)
+        object.__setattr__(self, 'clock', 0.0)
+        object.__setattr__(self, 'calls', OrderedDict())
+        object.__setattr__(self, 'recalcs', 0)
+        object.__setattr__(self, 'dirty', False)
+        object.__setattr__(self, 'running', True)
+        object.__setattr__(self, 'Workbooks', SimWorkbooks(self))
+        for name, value in zip(self._SETTINGS, (XL_CALCULATION_AUTOMATIC, True, True, True, False)):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, _name, _value):
+        if _name in self._SETTINGS:
+            self.charge(_name + '=')
+        object.__setattr__(self, _name, _value)
+
+    def charge(self, _operation, _cells=0):
+        if not self.running:
+            raise SimError('The RPC server is unavailable. (Excel was closed)')
+
+        self.calls[_operation] = self.calls.get(_operation, 0) + 1
+        seconds = self.latency.cost(_operation.rstrip('='), _cells)
+        object.__setattr__(self, 'clock', self.clock + seconds)
+        if self.latency.sleep and seconds > 0:
+            time.sleep(seconds)
+
+    def changed(self):
+        """A value was written. In automatic mode Excel recalculates straight away """
+
+        if self.Calculation == XL_CALCULATION_AUTOMATIC:
+            self.charge('Calculate')
+            object.__setattr__(self, 'recalcs', self.recalcs + 1)
+        else:
+            object.__setattr__(self, 'dirty', True)
+
+    def make_workbook(self, _filename):
+        """The workbook's sheets are the ones in the file (with its values), if it is an .xlsx """
+
+        workbook = SimWorkbook(self, _filename)
+        if _filename and os.path.isfile(_filename):
+            with LBT2PH.xl_headless.XlsxPackage(_filename) as package:
+                for name in package.sheet_names:
+                    values = dict((k, v[0]) for k, v in package.read_sheet(name).items() if v[0] is not None)
+                    workbook.Worksheets.add(SimWorksheet(workbook, name, values, self.protected))
+        else:
+            for name in self.sheet_names:
+                workbook.Worksheets.add(SimWorksheet(workbook, name, None, self.protected))
+        return workbook
+
+    def Calculate(self):
+        self.charge('Calculate')
+        object.__setattr__(self, 'recalcs', self.recalcs + 1)
+        object.__setattr__(self, 'dirty', False)
+
+    def Quit(self):
+        self.charge('Quit')
+        object.__setattr__(self, 'running', False)
+
+
+class SimExcelInstance(object):
+    """Same interface as xl_connect.ExcelInstance, with a SimApplication in place of Excel """
+
+    def __init__(self, _latency=None, _sheet_names=None, _protected=True):
+        """
+        Args:
+            _latency (LatencyModel): The cost of each call. Default is no cost.
+            _sheet_names (list): The worksheets to make, if the workbook isn't
+                opened from an .xlsx file
+            _protected (bool): Set False to start with the worksheets unprotected
+        """
+        self.latency = _latency
+        self.sheet_names = _sheet_names
+        self.protected = _protected
+        self.excel_app = None
+        self.active_workbook = None
+        self.active_workbook_name = ''
+        self.sheets_dict = {}
+        self.filename = None
+        self.calc_generation = 0
+        self.profiler = None
+
+        # Ready to use straight away, if there is no file to open
+        if _sheet_names:
+            self.start_new_instance(None)
+            self.open_workbook()
+            self.load_sheets()
+
+    @property
+    def clock(self):
+        """The simulated seconds taken by all the calls so far """
+        return self.excel_app.clock if self.excel_app else 0.0
+
+    @property
+    def calls(self):
+        """The number of calls so far, by operation """
+        return self.excel_app.calls if self.excel_app else {}
+
+    def start_new_instance(self, _filename):
+        self.excel_app = SimApplication(self.latency, self.sheet_names, self.protected)
+        self.filename = _filename
+
+    def open_workbook(self):
+        self.active_workbook_name = self.filename
+        self.active_workbook = self.excel_app.Workbooks.Open(self.filename)
+
+    def is_alive(self):
+        return self.excel_app is not None and self.excel_app.running
+
+    def workbook_is_open(self):
+        return self.active_workbook is not None and not self.active_workbook.closed
+
+    def reopen_workbook(self):
+        self.sheets_dict = {}
+        self.open_workbook()
+        self.load_sheets()
+        self.calc_generation += 1
+
+    def load_sheets(self):
+        """Same as ExcelInstance: each sheet is unprotected the first time it is used """
+
+        self.sheets_dict = LBT2PH.xl_sheets.LazySheets(self.active_workbook)
+
+    def require_sheets(self, _sheet_names):
+        """Unprotects the named sheets. Returns the names of any not in the workbook """
+
+        screen_updating = self.excel_app.ScreenUpdating
+        self.excel_app.ScreenUpdating = False
+        try:
+            return self.sheets_dict.preload(_sheet_names)
+        finally:
+            self.excel_app.ScreenUpdating = screen_updating
+
+    @staticmethod
+    def to_2d_array(_rows):
+        return _rows
+
+    @staticmethod
+    def from_2d_array(_value):
+        if not LBT2PH.xl_ranges.is_2d(_value):
+            return [[_value]]
+        return [list(row) for row in _value]
+
+    def read_range(self, _sheet_name, _address):
+        return self.from_2d_array(self.sheets_dict[_sheet_name].Range[_address].Value2)
+
+    def calculate(self):
+        self.excel_app.Calculate()
+        self.calc_generation += 1
+
+    def save_and_quit(self):
+        if self.excel_app and self.excel_app.running:
+            if self.workbook_is_open():
+                self.excel_app.Calculation = XL_CALCULATION_AUTOMATIC
+                self.active_workbook.Save()
+                self.active_workbook.Close()
+            self.excel_app.Quit()
+        self.active_workbook = None
+        self.active_workbook_name = ''
+        self.sheets_dict = {}
+
+    def __unicode__(self):
+        return u"Simulated Excel Instance | Calls: {}  |  Simulated time: {:.3f} s".format(
+            sum(self.calls.values()), self.clock)
+    def __str__(self):
+        return unicode(self).encode("utf-8")
+    def __repr__(self):
+        return "{}(_latency={!r}, _sheet_names={!r})".format(
+            self.__class__.__name__, self.latency, self.sheet_names)
+    def ToString(self):
+        return str(self)
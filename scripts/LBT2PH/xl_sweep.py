@@ -0,0 +1,434 @@
+"""Runs a grid of design variants through the PHPP, without Rhino or Excel
+
+A sweep starts from the PHPP_XL_Obj of one converted model (the 'base' write
+plan: a list, DataTree or write-plan file) and a list of Parameters. Each
+Parameter names the PHPP input cells it sets (ie: the insulation thickness of
+an assembly on 'U-Values', the window type IDs on 'Windows', the ventilation
+unit on 'Additional Vent') and the values to try. Every combination of the
+values is one Variant.
+
+A variant's write plan is the base plan with only the parameters' cells
+replaced (keeping the units of the objects they replace), so nothing has to
+be rebuilt in Rhino / Grasshopper.
+
+The variants are calculated with the xl_formula.FormulaEngine. Each process
+loads the PHPP template once and writes the base plan to it. Then, for each
+variant, it puts back the cells the last variant changed, sets the new ones
+and recalculates only the formulas downstream of them. The variants are
+shared out over a pool of processes, like xl_harvest. Each variant can also
+be saved as its own .xlsx file (to open in Excel later).
+
+From the command line:
+
+    python -m LBT2PH.xl_sweep PHPP.xlsx model.lbt2ph_plan -o sweep.csv
+        -p "Insulation: U-Values!M14 = 0.1 | 0.2 | 0.3"
+        -p "Window: Windows!Q24:Q30 = 01ud-Glazing | 02ud-Glazing"
+
+Note: This module has no Rhino / Grasshopper / COM dependencies so that it can
+be used (and tested) outside of Rhino.
+"""
+
+from collections import OrderedDict
+import itertools
+import os
+import time
+
+import LBT2PH.xl_formula
+import LBT2PH.xl_harvest
+import LBT2PH.xl_headless
+import LBT2PH.xl_obj
+import LBT2PH.xl_planfile
+import LBT2PH.xl_ranges
+import LBT2PH.xl_read
+import LBT2PH.xl_template
+
+try:
+    unicode
+except NameError:
+    unicode = str
+
+VARIANT_COLUMN = 'Variant'
+
+
+def _split_cell(_cell):
+    """'U-Values!M14' or ('U-Values', 'M14') -> ('U-Values', 'M14') """
+
+    if isinstance(_cell, (list, tuple)):
+        sheet, address = _cell
+    else:
+        sheet, _, address = unicode(_cell).rpartition('!')
+        if sheet.startswith("'") and sheet.endswith("'"):
+            sheet = sheet[1:-1].replace("''", "'")
+    if not sheet or not address:
+        raise ValueError('Cells must be given as "Worksheet!A1", not "{}"'.format(_cell))
+    return sheet.strip(), address.strip().replace('$', '')
+
+
+def _parse_value(_text):
+    text = _text.strip()
+    try:
+        return float(text)
+    except ValueError:
+        return text
+
+
+class Parameter(object):
+    """One design parameter: the PHPP input cells it sets, and the values to try """
+
+    def __init__(self, _name, _cells, _values):
+        """
+        Args:
+            _name (str): The name, for the column in the results
+            _cells (list): The cells it sets: ['Worksheet!A1', ...] or [(worksheet, address), ...].
+                An address can be a range ('A1:A4') to set all its cells.
+            _values (list): The values to try. Each is either a single value (set in
+                all the cells) or a list with a value for each of the _cells.
+        """
+
+        self.name = _name
+        self.cells = [_split_cell(cell) for cell in _cells]
+        self.values = list(_values)
+
+    @classmethod
+    def from_text(cls, _text):
+        """'Name: Worksheet!A1, Worksheet!B2 = value | value | ...' """
+
+        name, _, rest = _text.partition(':')
+        cells, _, values = rest.partition('=')
+        if not name.strip() or not cells.strip() or not values.strip():
+            raise ValueError('Parameters must be given as "Name: Worksheet!A1 = value | value", '
+                             'not "{}"'.format(_text))
+        return cls(name.strip(), [c for c in cells.split(',') if c.strip()],
+                   [_parse_value(v) for v in values.split('|')])
+
+    def settings(self, _value):
+        """Yields (worksheet, address, value) for each of the cells """
+
+        if isinstance(_value, (list, tuple)):
+            if len(_value) != len(self.cells):
+                raise ValueError('Parameter "{}" has {} cells but a value with {} items: {}'.format(
+                    self.name, len(self.cells), len(_value), _value))
+            values = _value
+        else:
+            values = [_value] * len(self.cells)
+
+        for (sheet, address), value in zip(self.cells, values):
+            yield sheet, address, value
+
+    def __unicode__(self):
+        return u"Parameter | {}  |  Cells: {}  |  Values: {}".format(self.name, len(self.cells), len(self.values))
+    def __str__(self):
+        return unicode(self).encode('utf-8')
+    def __repr__(self):
+        return "{}(_name={!r}, _cells={!r}, _values={!r})".format(
+            self.__class__.__name__, self.name, self.cells, self.values)
+    def ToString(self):
+        return str(self)
+
+
+class Variant(object):
+    """One combination of the parameter values """
+
+    def __init__(self, _index, _settings):
+        """
+        Args:
+            _index (int): The variant's number, from 0
+            _settings (list): [(Parameter, value), ...]
+        """
+
+        self.index = _index
+        self.settings = list(_settings)
+
+    @property
+    def name(self):
+        return u'{:04d}'.format(self.index)
+
+    @property
+    def values(self):
+        return [value for _, value in self.settings]
+
+    def __unicode__(self):
+        return u"Variant {} | {}".format(self.name, u', '.join(
+            u'{}={}'.format(parameter.name, value) for parameter, value in self.settings))
+    def __str__(self):
+        return unicode(self).encode('utf-8')
+    def __repr__(self):
+        return "{}(_index={!r}, _settings={!r})".format(self.__class__.__name__, self.index, self.settings)
+    def ToString(self):
+        return str(self)
+
+
+def variant_grid(_parameters):
+    """Every combination of the parameters' values, the first parameter changing slowest """
+
+    combinations = itertools.product(*[[(p, v) for v in p.values] for p in _parameters])
+    return [Variant(i, settings) for i, settings in enumerate(combinations)]
+
+
+class SweepTable(LBT2PH.xl_harvest.HarvestTable):
+    """The results: a row for each variant, with its parameter values and result fields """
+
+    def __init__(self, _parameter_names, _labels):
+        """
+        Raises:
+            ValueError: If two of the parameters / result fields have the same
+                name, since each is a column of the table
+        """
+
+        super(SweepTable, self).__init__(_labels)
+        self.parameter_names = list(_parameter_names)
+        self.unsupported = {}  # {cell: reason}, formulas which kept their saved value
+
+        columns = self.columns
+        duplicates = sorted(set(c for c in columns if columns.count(c) > 1))
+        if duplicates:
+            raise ValueError('The parameters and result fields need different names. Used more than once: {}'.format(
+                ', '.join(duplicates)))
+
+    @property
+    def columns(self):
+        return [VARIANT_COLUMN] + self.parameter_names + self.labels + [LBT2PH.xl_harvest.ERROR_COLUMN]
+
+    @property
+    def variants_per_minute(self):
+        return len(self.rows) * 60.0 / self.seconds if self.seconds else 0.0
+
+    def __unicode__(self):
+        return u"Sweep | Variants: {}  |  Fields: {}  |  Errors: {}  |  {:.1f}s on {} process(es), " \
+               u"{:.0f} variants / min  |  Unsupported formulas: {}".format(
+                   len(self.rows), len(self.labels), len(self.errors), self.seconds, self.processes,
+                   self.variants_per_minute, len(self.unsupported))
+    def __repr__(self):
+        return "{}(_parameter_names={!r}, _labels={!r})".format(
+            self.__class__.__name__, self.parameter_names, self.labels)
+
+
+class VariantRunner(object):
+    """Calculates variants one after the other on one FormulaEngine
+
+    The engine is loaded from the template with the base cells written once.
+    Each variant only changes its own cells (and puts back the ones the variant
+    before it changed), so only their downstream formulas are recalculated.
+    """
+
+    def __init__(self, _template, _base_cells, _fields, _folder=None):
+        self.template = _template
+        self.fields = _fields
+        self.folder = _folder
+        self.base_cells = _base_cells
+        self.engine = LBT2PH.xl_formula.FormulaEngine.from_xlsx(_template, _fields)
+        self.engine.set_cells(_base_cells)
+        self.engine.recalculate()
+        self._originals = {}  # {(sheet, row, col): the base value / formula}
+        self._changed = set()  # The cells the last variant set
+
+    def _original(self, _key):
+        if _key not in self._originals:
+            formula = self.engine.formulas.get(_key)
+            self._originals[_key] = formula if formula is not None else self.engine.values.get(_key)
+        return self._originals[_key]
+
+    def run(self, _job):
+        """Calculates one variant
+
+        Args:
+            _job (tuple): (variant name, {sheet: {(row, col): value}} of the cells it sets)
+        Returns:
+            (tuple): (the values of the result fields, the error message or None)
+        """
+
+        name, cells = _job
+        keys = set((sheet, row, col) for sheet, sheet_cells in cells.items() for row, col in sheet_cells)
+
+        changes = OrderedDict()
+        for key in self._changed - keys:
+            changes.setdefault(key[0], {})[key[1:]] = self._original(key)
+        for sheet, sheet_cells in cells.items():
+            for (row, col), value in sheet_cells.items():
+                self._original((sheet, row, col))
+                changes.setdefault(sheet, {})[(row, col)] = value
+        self._changed = keys
+
+        try:
+            self.engine.set_cells(changes)
+            values = list(self.engine.results().values())
+            if self.folder:
+                self.save(name, cells)
+        except Exception as e:
+            return [None] * len(self.fields), '{}: {}'.format(type(e).__name__, e)
+        return [_result_value(v) for v in values], None
+
+    def save(self, _name, _cells):
+        """Saves the variant as a new copy of the template, with the base and variant cells written """
+
+        all_cells = OrderedDict((sheet, dict(sheet_cells)) for sheet, sheet_cells in self.base_cells.items())
+        for sheet, sheet_cells in _cells.items():
+            all_cells.setdefault(sheet, {}).update(sheet_cells)
+
+        target = os.path.join(self.folder, u'{}_{}.xlsx'.format(
+            os.path.splitext(os.path.basename(self.template))[0], _name))
+        LBT2PH.xl_headless.write_cells(LBT2PH.xl_template.open_file(self.template), target, all_cells)
+        return target
+
+
+def _result_value(_value):
+    """Errors as their text (ie: '#DIV/0!'), like Excel saves them """
+
+    return _value.code if isinstance(_value, LBT2PH.xl_formula.XlError) else _value
+
+
+# The runner of each process in the pool, made once by _init_worker
+_runner = None
+
+
+def _init_worker(_template, _base_cells, _fields, _folder):
+    global _runner
+    _runner = VariantRunner(_template, _base_cells, _fields, _folder)
+
+
+def _run_job(_job):
+    return _runner.run(_job)
+
+
+class Sweep(object):
+    """A base write plan, the parameters to vary and the results to collect """
+
+    def __init__(self, _template, _objects, _parameters, _fields=None, _unit_type=None):
+        """
+        Args:
+            _template (str): The PHPP .xlsx file, before anything is written to it
+            _objects: The base plan's PHPP_XL_Obj. A list, DataTree or write-plan file
+            _parameters (list): The Parameters to vary
+            _fields (list): The results: [[label, worksheet, cell], ...].
+                Default is xl_read.DEFAULT_FIELDS
+            _unit_type (str): 'SI' or 'IP'. If None, will be read from the PHPP.
+        """
+
+        self.template = _template
+        self.base = list(LBT2PH.xl_planfile.iter_objects(_objects))
+        self.parameters = list(_parameters)
+        self.fields = [list(field) for field in (_fields or LBT2PH.xl_read.DEFAULT_FIELDS)]
+
+        if _unit_type is None:
+            with LBT2PH.xl_headless.XlsxPackage(LBT2PH.xl_template.open_file(_template)) as package:
+                _unit_type = LBT2PH.xl_headless.get_unit_type(package)
+        self.unit_type = _unit_type
+
+        # {(worksheet, row, col): position in the base plan}, for the single cells
+        self._index = dict(((obj.Worksheet, obj.row, obj.col), i)
+                           for i, obj in enumerate(self.base) if obj.is_single_cell)
+
+    def variants(self):
+        return variant_grid(self.parameters)
+
+    def patch_objects(self, _variant):
+        """The new PHPP_XL_Obj for the cells the variant sets. Each keeps the units
+        of the base plan's object for the same cell, if there is one.
+        """
+
+        objects = []
+        for parameter, value in _variant.settings:
+            for sheet, address, cell_value in parameter.settings(value):
+                row_col = LBT2PH.xl_ranges.parse_address(address)
+                base = self.base[self._index[(sheet,) + row_col]] if (
+                    row_col and (sheet,) + row_col in self._index) else None
+                if base is not None:
+                    objects.append(LBT2PH.xl_obj.PHPP_XL_Obj(sheet, address, cell_value, base.Unit_SI, base.Unit_IP))
+                else:
+                    objects.append(LBT2PH.xl_obj.PHPP_XL_Obj(sheet, address, cell_value))
+        return objects
+
+    def write_plan(self, _variant):
+        """The base plan, with the objects for the variant's cells swapped in (or added) """
+
+        plan = list(self.base)
+        for obj in self.patch_objects(_variant):
+            key = (obj.Worksheet, obj.row, obj.col)
+            if obj.is_single_cell and key in self._index:
+                plan[self._index[key]] = obj
+            else:
+                plan.append(obj)
+        return plan
+
+    def run(self, _processes=None, _folder=None):
+        """Calculates all the variants
+
+        Args:
+            _processes (int): The number of processes to use. Default is one per core.
+                Set to 1 to calculate the variants one after the other, in this process.
+            _folder (str): If given, each variant is also saved there as an .xlsx file
+        Returns:
+            (SweepTable): A row for each variant, in grid order
+        """
+
+        variants = self.variants()
+        table = SweepTable([p.name for p in self.parameters], [field[0].strip() for field in self.fields])
+        start = time.time()
+
+        if _folder and not os.path.isdir(_folder):
+            os.makedirs(_folder)
+
+        base_cells = LBT2PH.xl_formula.cells_from_objects(self.base, self.unit_type)
+        jobs = [(v.name, LBT2PH.xl_formula.cells_from_objects(self.patch_objects(v), self.unit_type))
+                for v in variants]
+
+        processes = LBT2PH.xl_harvest.process_count(_processes, len(jobs))
+
+        # Each process loads the PHPP once, so give them the variants in a few big chunks
+        results = LBT2PH.xl_harvest.run_jobs(_run_job, jobs, processes, max(1, len(jobs) // (processes * 4)),
+                                             _init_worker, (self.template, base_cells, self.fields, _folder))
+
+        # Every variant sets the same cells, so reaches the same formulas: the ones
+        # the engine can't calculate are found once, here, not from each process
+        if processes == 1:
+            runner = _runner
+        else:
+            runner = VariantRunner(self.template, base_cells, self.fields)
+            if jobs:
+                runner.run(jobs[0])
+        table.unsupported.update(runner.engine.unsupported)
+
+        for variant, (values, error) in zip(variants, results):
+            table.rows.append((variant.name, variant.values + values, error))
+
+        table.seconds = time.time() - start
+        table.processes = processes
+        return table
+
+    def __unicode__(self):
+        return u"Sweep | Template: {}  |  Base objects: {}  |  Parameters: {}  |  Variants: {}".format(
+            self.template, len(self.base), len(self.parameters), len(self.variants()))
+    def __str__(self):
+        return unicode(self).encode('utf-8')
+    def __repr__(self):
+        return "{}(_template={!r}, _parameters={!r})".format(self.__class__.__name__, self.template, self.parameters)
+    def ToString(self):
+        return str(self)
+
+
+def main(_args=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Calculate a grid of design variants of a PHPP, without Excel.')
+    parser.add_argument('template', help='The PHPP .xlsx file')
+    parser.add_argument('plan', help='The base write-plan file (' + LBT2PH.xl_planfile.FILE_EXTENSION + ')')
+    parser.add_argument('-p', '--parameter', action='append', required=True,
+                        help='"Name: Worksheet!A1, Worksheet!B2 = value | value | ..."')
+    parser.add_argument('-o', '--output', default='phpp_sweep.csv', help='The .csv file to write')
+    parser.add_argument('-f', '--fields', help='A .csv file of fields to read: label, worksheet, cell')
+    parser.add_argument('-n', '--processes', type=int, help='Number of processes. Default is one per core')
+    parser.add_argument('-s', '--save', help='A folder to save each variant to, as an .xlsx file')
+    args = parser.parse_args(_args)
+
+    fields = LBT2PH.xl_harvest.read_fields_file(args.fields) if args.fields else None
+    sweep = Sweep(args.template, args.plan, [Parameter.from_text(p) for p in args.parameter], fields)
+    table = sweep.run(args.processes, args.save)
+    table.write_csv(args.output)
+
+    print(table.__unicode__())
+    for name, error in table.errors:
+        print('  Variant {}: {}'.format(name, error))
+
+
+if __name__ == '__main__':
+    main()
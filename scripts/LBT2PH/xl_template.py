@@ -0,0 +1,225 @@
+"""Makes the new PHPP files from the template, and keeps the template in memory
+
+A PHPP template is 10+ MB, and every new output file starts as a copy of it.
+Where the file system supports it the copy is a 'clone' (copy-on-write:
+the new file shares the template's blocks on disk until it is written to)
+so making the file is almost free:
+
+    - Linux (Btrfs, XFS, ...): the FICLONE ioctl (a 'reflink')
+    - macOS (APFS): clonefile()
+    - Windows: File.Copy(), which Windows 11 does as a block clone on ReFS / Dev Drives
+
+Anywhere else it is a normal copy.
+
+The TemplateStore keeps the bytes of each template read, by the hash of its
+content, so the same template (even at a different path) is only read from
+disk once per session. The headless writer, layout indexer, dependency map
+and template defaults all read the template through it.
+
+Note: This module has no Rhino / Grasshopper / COM dependencies so that it can
+be used (and tested) outside of Rhino.
+"""
+
+from collections import OrderedDict
+import hashlib
+import io
+import os
+import shutil
+import sys
+
+try:
+    unicode
+except NameError:
+    unicode = str
+
+FICLONE = 0x40049409  # Linux ioctl number, from <linux/fs.h>
+MAX_STORE_BYTES = 256 * 1024 * 1024
+
+COPY = 'copy'
+REFLINK = 'reflink'
+CLONEFILE = 'clonefile'
+DOTNET_COPY = 'File.Copy'
+
+
+def _reflink(_source, _target):
+    import fcntl
+
+    with open(_source, 'rb') as src:
+        with open(_target, 'wb') as dst:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+
+
+def _clonefile(_source, _target):
+    import ctypes
+    import ctypes.util
+
+    libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+    if libc.clonefile(_source.encode('utf-8'), _target.encode('utf-8'), 0) != 0:
+        raise OSError(ctypes.get_errno(), 'clonefile() failed')
+
+
+def _dotnet_copy(_source, _target):
+    import System.IO
+    System.IO.File.Copy(_source, _target, True)
+
+
+def _clone_functions():
+    """The ways to try to clone a file on this platform, best first """
+
+    if sys.platform == 'cli':
+        return [(DOTNET_COPY, _dotnet_copy)]
+    elif sys.platform.startswith('linux'):
+        return [(REFLINK, _reflink)]
+    elif sys.platform == 'darwin':
+        return [(CLONEFILE, _clonefile)]
+    return []
+
+
+def _try_clone(_source, _target):
+    """Returns how the file was cloned, or None if it can't be on this file system """
+
+    for name, func in _clone_functions():
+        try:
+            func(_source, _target)
+            return name
+        except Exception:  # Includes .NET exceptions in IronPython
+            if os.path.isfile(_target):
+                os.remove(_target)
+    return None
+
+
+def clone_file(_source, _target):
+    """Copies the file, as a copy-on-write clone if the file system supports it
+
+    Args:
+        _source (str): The file to copy
+        _target (str): The new file. Must not exist yet
+    Returns:
+        (str): How it was copied: REFLINK, CLONEFILE, DOTNET_COPY or COPY
+    """
+
+    method = _try_clone(_source, _target)
+    if method is None:
+        shutil.copyfile(_source, _target)
+        method = COPY
+    return method
+
+
+def _stat_key(_path):
+    stat = os.stat(_path)
+    return (stat.st_mtime, stat.st_size)
+
+
+class TemplateStore(object):
+    """The bytes of each template file read this session, by the SHA1 of their content """
+
+    def __init__(self, _max_bytes=MAX_STORE_BYTES):
+        self.max_bytes = _max_bytes
+        self.blobs = OrderedDict()  # {sha1: bytes}, oldest used first
+        self.paths = {}  # {path: ((mtime, size), sha1)}
+        self.disk_reads = 0
+        self.hits = 0
+
+    @staticmethod
+    def key(_path):
+        return os.path.normcase(os.path.abspath(unicode(_path)))
+
+    def is_loaded(self, _path):
+        """True if the file's current content is in memory """
+
+        known = self.paths.get(self.key(_path))
+        return (known is not None and known[1] in self.blobs and
+                os.path.isfile(_path) and known[0] == _stat_key(_path))
+
+    def content_hash(self, _path):
+        """Returns the SHA1 of the file, reading it only if it changed since the last time """
+
+        if self.is_loaded(_path):
+            return self.paths[self.key(_path)][1]
+        return self._load(_path, self.key(_path), _stat_key(_path))
+
+    def _load(self, _path, _key, _stat_key):
+        with open(_path, 'rb') as f:
+            data = f.read()
+        self.disk_reads += 1
+
+        sha1 = hashlib.sha1(data).hexdigest()
+        self.blobs.pop(sha1, None)
+        self.blobs[sha1] = data
+        self.paths[_key] = (_stat_key, sha1)
+
+        # Forget the oldest, but always keep the one just read
+        while len(self.blobs) > 1 and sum(len(b) for b in self.blobs.values()) > self.max_bytes:
+            self.blobs.popitem(last=False)
+        return sha1
+
+    def get_bytes(self, _path):
+        """Returns the content of the file, from memory if it hasn't changed """
+
+        if self.is_loaded(_path):
+            sha1 = self.paths[self.key(_path)][1]
+            self.hits += 1
+            self.blobs[sha1] = self.blobs.pop(sha1)  # Now the most recently used
+            return self.blobs[sha1]
+        return self.blobs[self._load(_path, self.key(_path), _stat_key(_path))]
+
+    def open_file(self, _path):
+        """Returns a read-only file-like object of the file's content (ie: for XlsxPackage) """
+
+        return io.BytesIO(self.get_bytes(_path))
+
+    def make_copy(self, _source, _target):
+        """Makes the target file as a copy of the source template
+
+        The copy is a clone if the file system supports it. If not, it is written
+        from the template in memory. Either way, if the template is in memory, the
+        target is then known to have the same content, so reading it is from
+        memory too (until it is written to). A cloned template isn't read just to
+        hash it: that would take longer than the clone (ie: in IronPython).
+
+        Returns:
+            (str): How the file was made (see clone_file)
+        """
+
+        if os.path.exists(_target):
+            os.remove(_target)
+
+        method = _try_clone(_source, _target)
+        if method is not None:
+            if self.is_loaded(_source):
+                self.paths[self.key(_target)] = (_stat_key(_target), self.paths[self.key(_source)][1])
+            return method
+
+        sha1 = self.content_hash(_source)
+        with open(_target, 'wb') as f:
+            f.write(self.blobs[sha1])
+        self.paths[self.key(_target)] = (_stat_key(_target), sha1)
+        return COPY
+
+    def __unicode__(self):
+        return u"Template Store | Templates: {}  |  {:.1f} MB  |  Disk reads: {}  Memory reads: {}".format(
+            len(self.blobs), sum(len(b) for b in self.blobs.values()) / 1048576.0,
+            self.disk_reads, self.hits)
+    def __str__(self):
+        return unicode(self).encode('utf-8')
+    def __repr__(self):
+        return "{}(_max_bytes={!r})".format(self.__class__.__name__, self.max_bytes)
+    def ToString(self):
+        return str(self)
+
+
+# Kept if the module is reload()ed so the templates are only read once per session
+try:
+    _STORE
+except NameError:
+    _STORE = TemplateStore()
+
+
+def get_store():
+    return _STORE
+
+
+def open_file(_path):
+    """The file's content from the session's TemplateStore, as a file-like object """
+
+    return _STORE.open_file(_path)
@@ -0,0 +1,229 @@
+"""Strategies for pushing (worksheet, range, value) items into an open Excel workbook.
+
+The writers only need an 'excel' object with a 'sheets_dict' of worksheets
+(see xl_connect.ExcelInstance) and, for the block writer, a 'to_2d_array()'
+method which packs a list of rows into whatever the Range.Value2 expects.
+
+The written cells are highlighted after all the values are in, a worksheet at
+a time, using multi-area addresses ('A1:C9,F4,...') so that the coloring takes
+a handful of calls rather than one per cell.
+"""
+
+from collections import OrderedDict
+
+import LBT2PH.xl_ranges
+
+HIGHLIGHT_COLOR_INDEX = 8
+
+
+class WriteReport(object):
+    """Simple counter for what happened during a write, for the user's info """
+
+    def __init__(self):
+        self.cells = 0
+        self.com_calls = 0
+        self.per_cell_calls = 0
+        self.blocks = 0
+        self.highlighted = []
+        self.highlight_skipped = 0
+        self.warnings = []
+
+    @property
+    def calls_saved(self):
+        return self.per_cell_calls - self.com_calls
+
+    def warn(self, _msg):
+        if _msg not in self.warnings:
+            self.warnings.append(_msg)
+
+    def __unicode__(self):
+        return u"Wrote {} cells using {} Excel calls ({} blocks). Saved {} calls"\
+            " compared to writing cell-by-cell. Highlighted {} cells ({} already"\
+            " highlighted).".format(
+                self.cells, self.com_calls, self.blocks, self.calls_saved,
+                len(self.highlighted), self.highlight_skipped)
+    def __str__(self):
+        return unicode(self).encode('utf-8')
+    def __repr__(self):
+        return "{}()".format(self.__class__.__name__)
+    def ToString(self):
+        return str(self)
+
+
+def _write_values(_excel, _data, _report):
+    """Writes each item's value with its own Range.Value2 call
+
+    Returns:
+        (list): The (worksheet_name, cell_address) of the items written
+    """
+
+    written = []
+    for sheet_name, address, value in _data:
+        _report.per_cell_calls += 1
+        sheet = _excel.sheets_dict.get(sheet_name)
+        if sheet is None:
+            _report.warn("Sheet not found: " + sheet_name)
+            continue
+
+        try:
+            sheet.Range[address].Value2 = value
+        except Exception as e:
+            _report.warn("Could not write {}!{}: {}".format(sheet_name, address, e))
+            continue
+
+        _report.com_calls += 1
+        _report.cells += 1
+        written.append((sheet_name, address))
+
+    return written
+
+
+def highlight(_excel, _cells, _report, _highlighted=None):
+    """Colors the cells, using one call for as many of them as will fit in an address
+
+    Args:
+        _excel (ExcelInstance): The open Excel Instance
+        _cells (iterable): The (worksheet_name, cell_address) to color
+        _report (WriteReport): The report to add the counts to
+        _highlighted (set): Optional (worksheet_name, cell_address) which are
+            already colored (ie: from the diff ledger). These are skipped.
+    """
+
+    todo = []
+    for sheet_name, address in _cells:
+        _report.per_cell_calls += 1
+        if _highlighted and (sheet_name, address) in _highlighted:
+            _report.highlight_skipped += 1
+            continue
+        todo.append((sheet_name, address, None))
+
+    blocks, leftovers = LBT2PH.xl_ranges.coalesce(todo)
+
+    areas = OrderedDict()
+    for block in blocks:
+        areas.setdefault(block.sheet, []).append(block.address)
+
+    for sheet_name, addresses in areas.items():
+        sheet = _excel.sheets_dict.get(sheet_name)
+        if sheet is None:
+            _report.warn("Sheet not found: " + sheet_name)
+            continue
+
+        for joined in LBT2PH.xl_ranges.join_addresses(addresses):
+            try:
+                sheet.Range[joined].Interior.ColorIndex = HIGHLIGHT_COLOR_INDEX
+                _report.com_calls += 1
+            except Exception as e:
+                print('Highlighting {}!{} failed, coloring each area: {}'.format(
+                    sheet_name, joined, e))
+                for address in joined.split(','):
+                    try:
+                        sheet.Range[address].Interior.ColorIndex = HIGHLIGHT_COLOR_INDEX
+                        _report.com_calls += 1
+                    except Exception as e:
+                        _report.warn("Could not highlight {}!{}: {}".format(sheet_name, address, e))
+
+    for sheet_name, address, _ in leftovers:
+        sheet = _excel.sheets_dict.get(sheet_name)
+        if sheet is None:
+            _report.warn("Sheet not found: " + sheet_name)
+            continue
+
+        try:
+            sheet.Range[address].Interior.ColorIndex = HIGHLIGHT_COLOR_INDEX
+            _report.com_calls += 1
+        except Exception as e:
+            _report.warn("Could not highlight {}!{}: {}".format(sheet_name, address, e))
+
+    _report.highlighted.extend((sheet_name, address) for sheet_name, address, _ in todo)
+
+
+def _highlight_written(_excel, _written, _report, _highlighted):
+    try:
+        highlight(_excel, _written, _report, _highlighted)
+    except Exception as e:
+        _report.warn("Could not highlight the written cells: {}".format(e))
+
+
+def write_cells(_excel, _data, _highlight=True, _highlighted=None):
+    """Writes each item to Excel with its own Range.Value2 call
+
+    Args:
+        _excel (ExcelInstance): The open Excel Instance
+        _data (iterable): Tuples of (worksheet_name, cell_address, value)
+        _highlight (bool): Set True to color the written cells
+        _highlighted (set): Optional (worksheet_name, cell_address) already colored
+    Returns:
+        (WriteReport)
+    """
+
+    report = WriteReport()
+    written = _write_values(_excel, _data, report)
+    if _highlight:
+        _highlight_written(_excel, written, report, _highlighted)
+
+    return report
+
+
+def write_blocks(_excel, _data, _highlight=True, _highlighted=None):
+    """Writes the items to Excel, one Range.Value2 call per block of adjacent cells
+
+    Produces the same final cell contents as write_cells(), but with far fewer
+    round-trips to Excel: a table like the 'Areas' surfaces writes each set of
+    adjacent columns (ie: 'AJ:AL') for all the rows at once. If a block
+    can't be written, its cells are retried one at a time.
+
+    Args:
+        _excel (ExcelInstance): The open Excel Instance
+        _data (iterable): Tuples of (worksheet_name, cell_address, value)
+        _highlight (bool): Set True to color the written cells
+        _highlighted (set): Optional (worksheet_name, cell_address) already colored
+    Returns:
+        (WriteReport)
+    """
+
+    report = WriteReport()
+    written = []
+
+    # Named and multi-cell ranges are written in between the blocks, in their
+    # original order, so the last write to a cell still wins.
+    for block in LBT2PH.xl_ranges.coalesce_in_order(_data):
+        if not isinstance(block, LBT2PH.xl_ranges.Block):
+            written.extend(_write_values(_excel, [block], report))
+            continue
+
+        sheet = _excel.sheets_dict.get(block.sheet)
+        if sheet is None:
+            report.warn("Sheet not found: " + block.sheet)
+            continue
+
+        values = _excel.to_2d_array(block.values)
+        try:
+            sheet.Range[block.address].Value2 = values
+        except Exception as e:
+            print('Block write to {}!{} failed, writing cell-by-cell: {}'.format(
+                block.sheet, block.address, e))
+            written.extend(_write_values(_excel, _block_items(block), report))
+            continue
+
+        report.com_calls += 1
+        report.blocks += 1
+        report.cells += block.cell_count
+        report.per_cell_calls += block.cell_count
+        written.extend((sheet_name, address) for sheet_name, address, _ in _block_items(block))
+
+    # The values are all in by now, so a failure to color them is only a warning
+    # and never a reason to write them again.
+    if _highlight:
+        _highlight_written(_excel, written, report, _highlighted)
+
+    return report
+
+
+def _block_items(_block):
+    """Unpacks a Block back into (worksheet_name, cell_address, value) items """
+
+    for i, row_vals in enumerate(_block.values):
+        for j, val in enumerate(row_vals):
+            address = LBT2PH.xl_ranges.format_address(_block.row + i, _block.col + j)
+            yield (_block.sheet, address, val)